@@ -0,0 +1,106 @@
+"""
+benchmarks 共用的计时和基线比较工具
+
+基线文件是 JSON 格式:
+
+    {"meta": {...}, "results": {"<name>": <value>, ...}}
+
+value 越小越好 (耗时, 延迟, 内存), 当前结果超过 基线 * (1 + tolerance) 时视为性能回退。
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional as Opt, Tuple
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def timeit(fn: Callable[[], int], setup: Opt[Callable[[], None]] = None, repeat: int = 3) -> float:
+    """
+    fn 执行一轮测试并返回执行的操作数, 结果为 repeat 轮中最快一轮的每次操作耗时 (纳秒)
+    setup 在每一轮之前调用, 不计入耗时
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter_ns()
+        ops = fn()
+        elapsed = time.perf_counter_ns() - start
+        best = min(best, elapsed / max(ops, 1))
+    return best
+
+
+def environment() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+
+def baselinePath(name: str) -> str:
+    return os.path.join(BASELINE_DIR, name + '.json')
+
+
+def loadBaseline(path: str) -> Opt[Dict[str, float]]:
+    try:
+        with open(path) as f:
+            return json.load(f)['results']
+    except FileNotFoundError:
+        return None
+
+
+def saveBaseline(path: str, results: Dict[str, float], meta: Opt[dict] = None) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {'meta': dict(environment(), **(meta or {})), 'results': results}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compareResults(results: Dict[str, float], baseline: Dict[str, float],
+                   tolerances: Dict[str, float], default_tolerance: float) -> List[Tuple[str, float, float, float]]:
+    """
+    返回所有回退的项目: (name, baseline, current, ratio)
+    tolerances 的 key 是结果名的前缀, 最长匹配的前缀生效
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        tolerance = default_tolerance
+        prefix_len = -1
+        for prefix, tol in tolerances.items():
+            if name.startswith(prefix) and len(prefix) > prefix_len:
+                tolerance, prefix_len = tol, len(prefix)
+        ratio = current / base
+        if ratio > 1 + tolerance:
+            regressions.append((name, base, current, ratio))
+    return regressions
+
+
+def printResults(results: Dict[str, float], baseline: Opt[Dict[str, float]], unit: str) -> None:
+    width = max((len(name) for name in results), default=0)
+    for name, value in results.items():
+        line = "%-*s %14.1f %s" % (width, name, value, unit)
+        if baseline and baseline.get(name):
+            line += "   (baseline %.1f, x%.2f)" % (baseline[name], value / baseline[name])
+        print(line)
+
+
+def reportRegressions(regressions: List[Tuple[str, float, float, float]], unit: str) -> int:
+    if not regressions:
+        print("\nno regressions")
+        return 0
+    print("\n" + "!" * 72, file=sys.stderr)
+    print("PERFORMANCE REGRESSION: %d result(s) exceed the baseline tolerance" % len(regressions), file=sys.stderr)
+    for name, base, current, ratio in regressions:
+        print("  %s: %.1f %s -> %.1f %s (x%.2f)" % (name, base, unit, current, unit, ratio), file=sys.stderr)
+    print("!" * 72, file=sys.stderr)
+    return 1
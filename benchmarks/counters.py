@@ -0,0 +1,112 @@
+"""
+计数器的吞吐量测试: 在子进程中启动服务器, 用 redis_server.benchmark 分别压测 GET 和 INCR,
+INCR 的吞吐量应该不低于 GET
+
+    python -m benchmarks.counters                    # GET 和 INCR 各测 3 轮, 取最好的一轮
+    python -m benchmarks.counters --quick            # 每轮 0.5 秒
+    python -m benchmarks.counters --min-ratio 0.8 --unix
+
+压测之前写入所有的键: GET 读到 3 字节的值, INCR 的计数器从 COUNTER_START 开始,
+不在共享整数的范围内, 走原地修改整数的路径。
+INCR 的吞吐量低于 GET 的 min-ratio 倍时进程以状态码 1 退出。
+"""
+
+import argparse
+import sys
+from typing import Dict, Optional as Opt, Sequence
+
+from redis_server.benchmark import encodeCommand, runBenchmark
+
+from .latency import ServerProcess, Connection, ServerError
+
+COMMANDS = ['get', 'incr']
+DEFAULT_ROUNDS = 3
+DEFAULT_DURATION = 2.0
+QUICK_DURATION = 0.5
+DEFAULT_KEYSPACE = 1000
+DEFAULT_MIN_RATIO = 0.9
+COUNTER_START = 100000
+PRELOAD_BATCH = 100
+
+
+def preload(conn: Connection, keyspace: int) -> None:
+    # 键名和 redis_server.benchmark 中生成的键名相同
+    for start in range(0, keyspace, PRELOAD_BATCH):
+        end = min(start + PRELOAD_BATCH, keyspace)
+        payload = b''.join(
+            encodeCommand([b'MSET', b'key:%012d' % i, b'xxx', b'counter:key:%012d' % i, b'%d' % COUNTER_START])
+            for i in range(start, end))
+        replies = conn.pipeline(payload, end - start)
+        if replies != b'+OK\r\n' * (end - start):
+            raise ServerError("unexpected reply while preloading keys: %r" % replies[:200])
+
+
+def runCounters(opts: argparse.Namespace) -> Dict[str, float]:
+    """返回每个命令最好一轮的每秒操作数, 以及 incr/get 的比值"""
+    server = ServerProcess(opts.unix, opts.clients + 32)
+    try:
+        conn = Connection(server.connect())
+        try:
+            preload(conn, opts.keyspace)
+        finally:
+            conn.close()
+        target = ['-s', server.unixsocket] if opts.unix else ['-p', str(server.port)]
+        best = {name: 0.0 for name in COMMANDS}
+        # GET 和 INCR 交替进行, 机器负载的变化对两者的影响相近
+        for _ in range(opts.rounds):
+            for name in COMMANDS:
+                report = runBenchmark(target + [
+                    '-c', str(opts.clients), '-P', str(opts.pipeline), '-r', str(opts.keyspace),
+                    '-m', name, '-t', str(opts.duration), '--seed', '0'])
+                if report['errors']:
+                    raise ServerError("%d error replies to %s" % (report['errors'], name.upper()))
+                best[name] = max(best[name], report['ops_per_sec'])
+        server.checkAlive()
+    finally:
+        server.stop()
+    results = {'ops_per_sec.' + name: round(ops, 1) for name, ops in best.items()}
+    results['ratio.incr_get'] = round(best['incr'] / best['get'], 3) if best['get'] else 0.0
+    return results
+
+
+def parseArgs(argv: Opt[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.counters', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='run each round for %.1f seconds' % QUICK_DURATION)
+    parser.add_argument('--unix', action='store_true', help='connect through a unix socket instead of TCP')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help='rounds per command, the best one is reported (default %d)' % DEFAULT_ROUNDS)
+    parser.add_argument('-t', '--duration', type=float, default=None,
+                        help='seconds per round (default %.1f)' % DEFAULT_DURATION)
+    parser.add_argument('-c', '--clients', type=int, default=10, help='parallel connections (default 10)')
+    parser.add_argument('-P', '--pipeline', type=int, default=1, help='pipeline <numreq> requests (default 1)')
+    parser.add_argument('-r', '--keyspace', type=int, default=DEFAULT_KEYSPACE,
+                        help='number of keys and counters (default %d)' % DEFAULT_KEYSPACE)
+    parser.add_argument('--min-ratio', type=float, default=DEFAULT_MIN_RATIO,
+                        help='fail when INCR ops/sec is below this ratio of GET ops/sec (default %.2f)'
+                        % DEFAULT_MIN_RATIO)
+    opts = parser.parse_args(argv)
+    if opts.duration is None:
+        opts.duration = QUICK_DURATION if opts.quick else DEFAULT_DURATION
+    return opts
+
+
+def main(argv: Opt[Sequence[str]] = None) -> None:
+    opts = parseArgs(argv)
+    try:
+        results = runCounters(opts)
+    except ServerError as e:
+        print("COUNTER BENCHMARK FAILED: %s" % e, file=sys.stderr)
+        sys.exit(1)
+    for name, value in results.items():
+        print("%-24s %12.3f" % (name, value))
+    if results['ratio.incr_get'] < opts.min_ratio:
+        print("\n" + "!" * 72, file=sys.stderr)
+        print("PERFORMANCE REGRESSION: INCR runs at %.2fx GET throughput, expected at least %.2fx"
+              % (results['ratio.incr_get'], opts.min_ratio), file=sys.stderr)
+        print("!" * 72, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+"""
+端到端的延迟回归测试: 在子进程中启动服务器 (python -m redis_server), 运行固定的负载,
+记录每个负载的 p50/p99 延迟和服务器的 RSS, 并和 baselines/latency.json 比较
+
+    python -m benchmarks.latency                     # 运行所有负载并和基线比较
+    python -m benchmarks.latency --quick             # 减少请求数和空闲连接数
+    python -m benchmarks.latency -w get -w idle_clients --unix
+    python -m benchmarks.latency --tolerance-for p99_us.=1.5
+    python -m benchmarks.latency --save              # 用本次结果覆盖基线
+
+负载:
+    get             单个客户端依次发送 GET
+    pipeline_set    每批 100 个 SET 一次性发送, 延迟按批次计算
+    large_value     交替 SET / GET 1MB 的值
+    idle_clients    先建立 10000 个空闲连接, 再由一个客户端依次发送 GET
+
+只使用本机的 TCP 回环地址或 unix socket, 不需要网络; 存在性能回退或服务器异常退出时进程以状态码 1 退出。
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional as Opt, Sequence
+
+from redis_server.benchmark import encodeCommand, skipReply, percentile
+
+from .common import (
+    baselinePath, loadBaseline, saveBaseline, compareResults, printResults, reportRegressions,
+)
+
+# 每个负载测量的请求数 (pipeline_set 为批次数), --quick 时除以 QUICK_DIVISOR
+WORKLOAD_REQUESTS = {
+    'get': 5000,
+    'pipeline_set': 500,
+    'large_value': 200,
+    'idle_clients': 2000,
+}
+QUICK_DIVISOR = 10
+# 正式测量之前丢弃的请求数
+WARMUP_REQUESTS = 20
+PIPELINE_SIZE = 100
+SMALL_VALUE_SIZE = 64
+LARGE_VALUE_SIZE = 1024 * 1024
+LARGE_VALUE_KEYS = 8
+IDLE_CLIENTS = 10000
+QUICK_IDLE_CLIENTS = 1000
+SERVER_START_TIMEOUT = 10.0
+
+# 结果名的前缀 -> 允许的误差, 尾延迟的噪声比中位数大得多
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_TOLERANCES = {
+    'p50_us.': 0.5,
+    'p99_us.': 1.0,
+    'rss_kb.': 0.25,
+}
+
+Results = Dict[str, float]
+
+
+class ServerError(Exception):
+    pass
+
+
+class ServerProcess:
+    """在子进程中运行的服务器, 通过 TCP 回环地址或 unix socket 连接"""
+
+    def __init__(self, unix: bool, maxclients: int) -> None:
+        self.tmpdir = tempfile.mkdtemp(prefix='redis-latency-')
+        self.unixsocket = os.path.join(self.tmpdir, 'redis.sock') if unix else ''
+        self.port = 0 if unix else freePort()
+        self.logpath = os.path.join(self.tmpdir, 'server.log')
+        args = [sys.executable, '-m', 'redis_server', '--port', str(self.port), '--bind', '127.0.0.1',
+                '--maxclients', str(maxclients)]
+        if unix:
+            args += ['--unixsocket', self.unixsocket]
+        self.log = open(self.logpath, 'wb')
+        self.proc = subprocess.Popen(args, stdout=self.log, stderr=subprocess.STDOUT,
+                                     cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.waitReady()
+
+    def connect(self) -> socket.socket:
+        if self.unixsocket:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.unixsocket)
+        else:
+            sock = socket.create_connection(('127.0.0.1', self.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def waitReady(self) -> None:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            self.checkAlive()
+            try:
+                conn = Connection(self.connect())
+            except OSError:
+                time.sleep(0.05)
+                continue
+            reply = conn.call(b'INFO', b'server')
+            conn.close()
+            if reply.startswith(b'$'):
+                return
+        raise ServerError("server did not become ready in %.0f seconds\n%s" % (SERVER_START_TIMEOUT, self.logTail()))
+
+    def checkAlive(self) -> None:
+        if self.proc.poll() is not None:
+            raise ServerError("server exited with status %d\n%s" % (self.proc.returncode, self.logTail()))
+
+    def logTail(self, lines: int = 20) -> str:
+        self.log.flush()
+        with open(self.logpath, 'rb') as f:
+            return b''.join(f.readlines()[-lines:]).decode(errors='replace')
+
+    def rssKb(self) -> float:
+        # 只在 Linux 上可用, 其他系统返回 0, 不参与比较
+        try:
+            with open('/proc/%d/status' % self.proc.pid) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return float(line.split()[1])
+        except OSError:
+            pass
+        return 0.0
+
+    def stop(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.log.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class Connection:
+    """阻塞的 RESP 客户端, 回复只做边界解析"""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.buf = bytearray()
+
+    def readReplies(self, count: int) -> bytes:
+        pos = 0
+        while count:
+            end = skipReply(self.buf, pos)
+            if end < 0:
+                chunk = self.sock.recv(1 << 20)
+                if not chunk:
+                    raise ConnectionError("server closed the connection")
+                self.buf += chunk
+                continue
+            pos = end
+            count -= 1
+        replies = bytes(self.buf[:pos])
+        del self.buf[:pos]
+        return replies
+
+    def call(self, *args: bytes) -> bytes:
+        self.sock.sendall(encodeCommand(args))
+        return self.readReplies(1)
+
+    def pipeline(self, payload: bytes, count: int) -> bytes:
+        self.sock.sendall(payload)
+        return self.readReplies(count)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def freePort() -> int:
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def timeRequests(requests: int, fn: Callable[[int], None]) -> List[float]:
+    for i in range(WARMUP_REQUESTS):
+        fn(i)
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def checkReply(reply: bytes) -> None:
+    if reply.startswith(b'-'):
+        raise ServerError("unexpected error reply: %r" % reply[:200])
+
+
+def workloadGet(server: ServerProcess, conn: Connection, requests: int, opts: argparse.Namespace) -> List[float]:
+    checkReply(conn.call(b'SET', b'latency:get', b'x' * SMALL_VALUE_SIZE))
+    get = encodeCommand([b'GET', b'latency:get'])
+
+    def run(i: int) -> None:
+        checkReply(conn.pipeline(get, 1))
+
+    return timeRequests(requests, run)
+
+
+def workloadPipelineSet(server: ServerProcess, conn: Connection, requests: int,
+                        opts: argparse.Namespace) -> List[float]:
+    value = b'x' * SMALL_VALUE_SIZE
+    batch = b''.join(encodeCommand([b'SET', b'latency:pipeline:%d' % i, value]) for i in range(PIPELINE_SIZE))
+
+    def run(i: int) -> None:
+        replies = conn.pipeline(batch, PIPELINE_SIZE)
+        if replies != b'+OK\r\n' * PIPELINE_SIZE:
+            raise ServerError("unexpected reply to pipelined SET: %r" % replies[:200])
+
+    return timeRequests(requests, run)
+
+
+def workloadLargeValue(server: ServerProcess, conn: Connection, requests: int,
+                       opts: argparse.Namespace) -> List[float]:
+    value = b'x' * LARGE_VALUE_SIZE
+    sets = [encodeCommand([b'SET', b'latency:large:%d' % i, value]) for i in range(LARGE_VALUE_KEYS)]
+    gets = [encodeCommand([b'GET', b'latency:large:%d' % i]) for i in range(LARGE_VALUE_KEYS)]
+
+    def run(i: int) -> None:
+        # 偶数次写入, 奇数次读出刚写入的值
+        key = (i // 2) % LARGE_VALUE_KEYS
+        if i % 2 == 0:
+            checkReply(conn.pipeline(sets[key], 1))
+        else:
+            reply = conn.pipeline(gets[key], 1)
+            if len(reply) != LARGE_VALUE_SIZE + len(b'$%d\r\n\r\n' % LARGE_VALUE_SIZE):
+                checkReply(reply)
+                raise ServerError("GET returned %d bytes, expected a %d byte value" % (len(reply), LARGE_VALUE_SIZE))
+
+    return timeRequests(requests, run)
+
+
+def workloadIdleClients(server: ServerProcess, conn: Connection, requests: int,
+                        opts: argparse.Namespace) -> List[float]:
+    idle: List[socket.socket] = []
+    try:
+        for _ in range(opts.idle_clients):
+            idle.append(server.connect())
+        # 等待服务器接受所有连接, 保证测量时它们都在事件循环中
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            server.checkAlive()
+            info = conn.call(b'INFO', b'clients')
+            connected = int(info.split(b'connected_clients:')[1].split(b'\r\n')[0])
+            if connected >= len(idle) + 1:
+                break
+            if time.monotonic() > deadline:
+                raise ServerError("only %d of %d idle clients were accepted" % (connected - 1, len(idle)))
+            time.sleep(0.05)
+        return workloadGet(server, conn, requests, opts)
+    finally:
+        for sock in idle:
+            sock.close()
+
+
+WORKLOADS: Dict[str, Callable[[ServerProcess, Connection, int, argparse.Namespace], List[float]]] = {
+    'get': workloadGet,
+    'pipeline_set': workloadPipelineSet,
+    'large_value': workloadLargeValue,
+    'idle_clients': workloadIdleClients,
+}
+
+
+def raiseOpenFilesLimit(needed: int) -> None:
+    """子进程继承这个限制, 服务器和压测客户端都需要足够多的文件描述符"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= needed:
+        return
+    if hard != resource.RLIM_INFINITY and hard < needed:
+        raise ServerError("need %d open files for the idle_clients workload but the hard limit is %d, "
+                          "use --idle-clients to lower the number of connections" % (needed, hard))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+
+def runWorkload(name: str, opts: argparse.Namespace) -> Results:
+    """每个负载使用一个新启动的服务器, RSS 不受其他负载的影响"""
+    requests = WORKLOAD_REQUESTS[name] // (QUICK_DIVISOR if opts.quick else 1)
+    server = ServerProcess(opts.unix, opts.idle_clients + 32)
+    try:
+        conn = Connection(server.connect())
+        try:
+            latencies = sorted(WORKLOADS[name](server, conn, requests, opts))
+        finally:
+            conn.close()
+        rss = server.rssKb()
+        server.checkAlive()
+    except (OSError, ServerError) as e:
+        # 连接被重置等错误通常说明服务器崩溃了, 附上日志
+        if server.proc.poll() is not None and not isinstance(e, ServerError):
+            e = ServerError("%s: %s\n%s" % (name, e, server.logTail()))
+        raise ServerError("workload %s failed: %s" % (name, e)) from None
+    finally:
+        server.stop()
+    us = 1e6
+    return {
+        'p50_us.' + name: round(percentile(latencies, 50) * us, 1),
+        'p99_us.' + name: round(percentile(latencies, 99) * us, 1),
+        'rss_kb.' + name: rss,
+    }
+
+
+def runAll(opts: argparse.Namespace) -> Results:
+    if 'idle_clients' in opts.workload:
+        raiseOpenFilesLimit(opts.idle_clients + 256)
+    results: Results = {}
+    for name in opts.workload:
+        res = runWorkload(name, opts)
+        printResults(res, None, '')
+        results.update(res)
+    return results
+
+
+def parseTolerances(items: Sequence[str]) -> Dict[str, float]:
+    tolerances = dict(DEFAULT_TOLERANCES)
+    for item in items:
+        prefix, sep, ratio = item.partition('=')
+        if not sep:
+            raise ValueError("tolerance must be PREFIX=RATIO, got %r" % item)
+        tolerances[prefix] = float(ratio)
+    return tolerances
+
+
+def parseArgs(argv: Opt[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.latency', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-w', '--workload', action='append', choices=list(WORKLOADS),
+                        help='workload to run, may be repeated (default all)')
+    parser.add_argument('--quick', action='store_true',
+                        help='run %dx fewer requests and %d idle clients' % (QUICK_DIVISOR, QUICK_IDLE_CLIENTS))
+    parser.add_argument('--unix', action='store_true', help='connect through a unix socket instead of TCP')
+    parser.add_argument('--idle-clients', type=int, default=None,
+                        help='idle connections for the idle_clients workload (default %d)' % IDLE_CLIENTS)
+    parser.add_argument('--baseline', default=baselinePath('latency'), help='baseline file')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed increase ratio for results without a prefix tolerance (default %.2f)'
+                        % DEFAULT_TOLERANCE)
+    parser.add_argument('--tolerance-for', action='append', default=[], metavar='PREFIX=RATIO',
+                        help='allowed increase ratio for results starting with PREFIX, e.g. p99_us.get=2 (defaults: %s)'
+                        % ', '.join('%s=%s' % item for item in DEFAULT_TOLERANCES.items()))
+    opts = parser.parse_args(argv)
+    if not opts.workload:
+        opts.workload = list(WORKLOADS)
+    if opts.idle_clients is None:
+        opts.idle_clients = QUICK_IDLE_CLIENTS if opts.quick else IDLE_CLIENTS
+    try:
+        opts.tolerances = parseTolerances(opts.tolerance_for)
+    except ValueError as e:
+        parser.error(str(e))
+    return opts
+
+
+def main(argv: Opt[Sequence[str]] = None) -> None:
+    opts = parseArgs(argv)
+    try:
+        results = runAll(opts)
+    except ServerError as e:
+        print("\n" + "!" * 72, file=sys.stderr)
+        print("LATENCY HARNESS FAILED: %s" % e, file=sys.stderr)
+        print("!" * 72, file=sys.stderr)
+        sys.exit(1)
+    if opts.save:
+        saveBaseline(opts.baseline, results, {
+            'unix': opts.unix, 'quick': opts.quick, 'idle_clients': opts.idle_clients,
+        })
+        print("\nbaseline written to %s" % opts.baseline)
+        return
+    baseline = loadBaseline(opts.baseline)
+    if baseline is None:
+        print("\nno baseline at %s, run with --save to create one" % opts.baseline)
+        return
+    print("\ncompared with %s:" % opts.baseline)
+    printResults(results, baseline, '')
+    sys.exit(reportRegressions(compareResults(results, baseline, opts.tolerances, opts.tolerance), ''))
+
+
+if __name__ == '__main__':
+    main()
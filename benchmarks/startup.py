@@ -0,0 +1,139 @@
+"""
+服务器启动时间的基准测试
+
+    python -m benchmarks.startup              # 运行并和 baselines/startup.json 比较
+    python -m benchmarks.startup -n 20        # 每项测量 20 次
+    python -m benchmarks.startup --save       # 用本次结果覆盖基线
+
+测量项目 (单位毫秒, 取多次运行的中位数和最小值):
+    import      子进程中 import redis_server.redis 的耗时
+    ready       从启动 python -m redis_server 子进程到第一个 INFO 命令返回的耗时,
+                包括解释器启动, import, 初始化和第一次创建共享对象
+
+子进程使用单独的 bytecode 缓存目录 (PYTHONPYCACHEPREFIX), 即使设置了 PYTHONDONTWRITEBYTECODE,
+测量的也是已经有 .pyc 缓存时的启动时间, 和实际部署的情况一致。
+存在性能回退时进程以状态码 1 退出。
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .common import (
+    baselinePath, loadBaseline, saveBaseline, compareResults, printResults, reportRegressions,
+)
+from .latency import freePort
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RUNS = 10
+SERVER_START_TIMEOUT = 10.0
+# 进程启动时间的噪声较大
+DEFAULT_TOLERANCE = 0.5
+
+IMPORT_SCRIPT = (
+    "import time\n"
+    "t = time.perf_counter()\n"
+    "import redis_server.redis\n"
+    "print(time.perf_counter() - t)\n"
+)
+
+Results = Dict[str, float]
+
+
+def childEnv(pycache: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPYCACHEPREFIX'] = pycache
+    return env
+
+
+def measureImport(env: Dict[str, str]) -> float:
+    out = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], env=env, cwd=ROOT_DIR,
+                         check=True, stdout=subprocess.PIPE).stdout
+    return float(out)
+
+
+def measureReady(env: Dict[str, str]) -> float:
+    port = freePort()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'redis_server', '--port', str(port), '--bind', '127.0.0.1'],
+                            env=env, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                sock = socket.create_connection(('127.0.0.1', port))
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited with status %d" % proc.returncode)
+                if time.perf_counter() - start > SERVER_START_TIMEOUT:
+                    raise RuntimeError("server did not start in %.0f seconds" % SERVER_START_TIMEOUT)
+                time.sleep(0.001)
+        sock.sendall(b'*2\r\n$4\r\nINFO\r\n$6\r\nserver\r\n')
+        reply = sock.recv(16)
+        elapsed = time.perf_counter() - start
+        sock.close()
+        if not reply.startswith(b'$'):
+            raise RuntimeError("unexpected reply to INFO: %r" % reply)
+        return elapsed
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def summarize(results: Results, name: str, values: List[float]) -> None:
+    ms = 1000.0
+    results['startup_ms.%s.median' % name] = round(statistics.median(values) * ms, 2)
+    results['startup_ms.%s.min' % name] = round(min(values) * ms, 2)
+
+
+def runAll(runs: int) -> Results:
+    pycache = tempfile.mkdtemp(prefix='redis-startup-pycache-')
+    try:
+        env = childEnv(pycache)
+        # 第一次运行生成 .pyc 缓存, 不计入结果
+        measureImport(env)
+        measureReady(env)
+        results: Results = {}
+        summarize(results, 'import', [measureImport(env) for _ in range(runs)])
+        summarize(results, 'ready', [measureReady(env) for _ in range(runs)])
+    finally:
+        shutil.rmtree(pycache, ignore_errors=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--runs', type=int, default=DEFAULT_RUNS,
+                        help='runs per measurement (default %d)' % DEFAULT_RUNS)
+    parser.add_argument('--baseline', default=baselinePath('startup'), help='baseline file')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown ratio before failing (default %.2f)' % DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = runAll(args.runs)
+    printResults(results, None, 'ms')
+    if args.save:
+        saveBaseline(args.baseline, results, {'unit': 'ms', 'runs': args.runs})
+        print("\nbaseline written to %s" % args.baseline)
+        return
+    baseline = loadBaseline(args.baseline)
+    if baseline is None:
+        print("\nno baseline at %s, run with --save to create one" % args.baseline)
+        return
+    print("\ncompared with %s:" % args.baseline)
+    printResults(results, baseline, 'ms')
+    sys.exit(reportRegressions(compareResults(results, baseline, {}, args.tolerance), 'ms'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+"""
+底层数据结构的微基准测试: rdict, ziplist, intset, zskiplist, zarray, sds, adlist
+
+    python -m benchmarks.structures                # 运行并和 baselines/structures.json 比较
+    python -m benchmarks.structures --quick        # 只测试较小的规模
+    python -m benchmarks.structures --save         # 用本次结果覆盖基线
+    python -m benchmarks.structures -k ziplist     # 只运行名字包含 ziplist 的项目
+
+结果单位是每次操作的纳秒数, 存在性能回退时进程以状态码 1 退出。
+"""
+
+import argparse
+import random
+import sys
+from typing import Callable, Dict, List
+
+from redis_server.adlist import (
+    listCreate, listAddNodeHead, listAddNodeTail, listGetIterator, listNext, listIndex, AL_START_HEAD,
+)
+from redis_server.csix import intptr
+from redis_server.db import keyptrDictType
+from redis_server.intset import intsetNew, intsetAdd, intsetFind
+from redis_server.rdict import dictCreate, dictAdd, dictFind, dictExpand, dictRehash, dictIsRehashing
+from redis_server.robject import createStringObject
+from redis_server.sds import sdsnew, sdsempty, sdscatlen, sdsMakeRoomFor, sdsIncrLen, sdsrange
+from redis_server.ziplist import ziplistNew, ziplistPush, ziplistFind, ziplistIndex, ZIPLIST_TAIL
+from redis_server.zskiplist import (
+    zslCreate, zslInsert, zslCreateFromSorted, zslGetRank, zslFirstInRange, zslLastInRange, zrangespec,
+)
+from redis_server.zarray import zarrCreate, zarrInsert, zarrGetRank, zarrScoreRank, zarrRankRangeByScore, zarrRangeByRank
+
+from .common import (
+    timeit, baselinePath, loadBaseline, saveBaseline, compareResults, printResults, reportRegressions,
+)
+
+RDICT_SIZES = [1000, 10000, 100000, 1000000]
+RDICT_QUICK_SIZES = [1000, 10000]
+RDICT_LOOKUPS = 10000
+ZIPLIST_ENTRIES = 256
+INTSET_ENTRIES = 1000
+ZSKIPLIST_ENTRIES = 10000
+ZSET_MIX_OPS = 5000
+SDS_APPENDS = 10000
+ADLIST_NODES = 10000
+
+# 单项的默认允许误差, 微基准的噪声比较大
+DEFAULT_TOLERANCE = 0.30
+
+Results = Dict[str, float]
+
+
+def benchRdict(results: Results, sizes: List[int]) -> None:
+    rand = random.Random(0)
+    for n in sizes:
+        keys = [sdsnew(b'key:%d' % i) for i in range(n)]
+        d = dictCreate(keyptrDictType, None)
+
+        def add() -> int:
+            nonlocal d
+            d = dictCreate(keyptrDictType, None)
+            for k in keys:
+                dictAdd(d, k, None)
+            return n
+
+        results['rdict.add[n=%d]' % n] = timeit(add, repeat=3 if n <= 10000 else 1)
+        while dictRehash(d, 1000):
+            pass
+
+        lookups = [keys[rand.randrange(n)] for _ in range(RDICT_LOOKUPS)]
+
+        def find() -> int:
+            for k in lookups:
+                dictFind(d, k)
+            return len(lookups)
+
+        results['rdict.find[n=%d]' % n] = timeit(find)
+
+        # 扩展哈希表后立即查找, 每次查找都会顺带迁移一个桶
+        dictExpand(d, d.ht[0].size * 2)
+        assert dictIsRehashing(d)
+        results['rdict.find_rehashing[n=%d]' % n] = timeit(find, repeat=1)
+
+
+def benchZiplist(results: Results) -> None:
+    strs = [b'field:%08d' % i for i in range(ZIPLIST_ENTRIES)]
+    ints = [b'%d' % (i * 1000003) for i in range(ZIPLIST_ENTRIES)]
+
+    def push(values: List[bytes]) -> Callable[[], int]:
+        def run() -> int:
+            zl = ziplistNew()
+            for v in values:
+                zl = ziplistPush(zl, v, len(v), ZIPLIST_TAIL)
+            return len(values)
+        return run
+
+    results['ziplist.push_str'] = timeit(push(strs))
+    results['ziplist.push_int'] = timeit(push(ints))
+
+    def find(values: List[bytes]) -> Callable[[], int]:
+        zl = ziplistNew()
+        for v in values:
+            zl = ziplistPush(zl, v, len(v), ZIPLIST_TAIL)
+        last = values[-1]
+
+        def run() -> int:
+            # 查找最后一个节点, 需要遍历整个 ziplist
+            for _ in range(50):
+                assert ziplistFind(ziplistIndex(zl, 0), last, len(last), 0) is not None   # type: ignore
+            return 50
+        return run
+
+    results['ziplist.find_str[n=%d]' % ZIPLIST_ENTRIES] = timeit(find(strs))
+    results['ziplist.find_int[n=%d]' % ZIPLIST_ENTRIES] = timeit(find(ints))
+
+    zl = ziplistNew()
+    for v in strs:
+        zl = ziplistPush(zl, v, len(v), ZIPLIST_TAIL)
+    rand = random.Random(0)
+    indexes = [rand.randrange(-ZIPLIST_ENTRIES, ZIPLIST_ENTRIES) for _ in range(1000)]
+
+    def index() -> int:
+        for i in indexes:
+            ziplistIndex(zl, i)
+        return len(indexes)
+
+    results['ziplist.index[n=%d]' % ZIPLIST_ENTRIES] = timeit(index)
+
+
+def benchIntset(results: Results) -> None:
+    rand = random.Random(0)
+    int16 = [rand.randint(-2**15, 2**15 - 1) for _ in range(INTSET_ENTRIES)]
+    # 依次触发 int16 -> int32 -> int64 的编码升级
+    upgrade = ([rand.randint(-2**15, 2**15 - 1) for _ in range(INTSET_ENTRIES // 3)] +
+               [rand.randint(-2**31, 2**31 - 1) for _ in range(INTSET_ENTRIES // 3)] +
+               [rand.randint(-2**63, 2**63 - 1) for _ in range(INTSET_ENTRIES // 3)])
+
+    def add(values: List[int]) -> Callable[[], int]:
+        def run() -> int:
+            s = intsetNew()
+            success = intptr()
+            for v in values:
+                s = intsetAdd(s, v, success)
+            return len(values)
+        return run
+
+    results['intset.add_int16[n=%d]' % INTSET_ENTRIES] = timeit(add(int16))
+    results['intset.add_upgrade[n=%d]' % len(upgrade)] = timeit(add(upgrade))
+
+    s = intsetNew()
+    success = intptr()
+    for v in upgrade:
+        s = intsetAdd(s, v, success)
+    lookups = [rand.choice(upgrade) if rand.random() < 0.5 else rand.randint(-2**31, 2**31) for _ in range(10000)]
+
+    def find() -> int:
+        for v in lookups:
+            intsetFind(s, v)
+        return len(lookups)
+
+    results['intset.find[n=%d]' % len(upgrade)] = timeit(find)
+
+
+def benchZskiplist(results: Results) -> None:
+    rand = random.Random(0)
+    members = [createStringObject(b'member:%d' % i, len(b'member:%d' % i)) for i in range(ZSKIPLIST_ENTRIES)]
+    scores = [float(rand.randrange(ZSKIPLIST_ENTRIES * 10)) for _ in range(ZSKIPLIST_ENTRIES)]
+    zsl = zslCreate()
+
+    def insert() -> int:
+        nonlocal zsl
+        zsl = zslCreate()
+        for score, obj in zip(scores, members):
+            zslInsert(zsl, score, obj)
+        return ZSKIPLIST_ENTRIES
+
+    results['zskiplist.insert[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(insert)
+
+    # ZUNIONSTORE 等命令用排好序的结果直接构建目标跳跃表
+    ordered = sorted(zip(scores, members), key=lambda item: (item[0], item[1].ptr.buf[:item[1].ptr.len]))
+
+    def create_from_sorted() -> int:
+        zslCreateFromSorted(ordered)
+        return ZSKIPLIST_ENTRIES
+
+    results['zskiplist.create_from_sorted[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(create_from_sorted)
+
+    picks = [rand.randrange(ZSKIPLIST_ENTRIES) for _ in range(5000)]
+
+    def rank() -> int:
+        for i in picks:
+            zslGetRank(zsl, scores[i], members[i])
+        return len(picks)
+
+    results['zskiplist.get_rank[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(rank)
+
+    ranges = []
+    for _ in range(5000):
+        spec = zrangespec()
+        spec.min = rand.randrange(ZSKIPLIST_ENTRIES * 10)
+        spec.max = spec.min + rand.randrange(100)
+        ranges.append(spec)
+
+    def first_in_range() -> int:
+        for spec in ranges:
+            zslFirstInRange(zsl, spec)
+        return len(ranges)
+
+    results['zskiplist.first_in_range[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(first_in_range)
+
+
+def benchZarray(results: Results) -> None:
+    # 和 benchZskiplist 使用相同的数据, 结果可以直接比较
+    rand = random.Random(0)
+    members = [b'member:%d' % i for i in range(ZSKIPLIST_ENTRIES)]
+    scores = [float(rand.randrange(ZSKIPLIST_ENTRIES * 10)) for _ in range(ZSKIPLIST_ENTRIES)]
+    za = zarrCreate()
+
+    def insert() -> int:
+        nonlocal za
+        za = zarrCreate()
+        for score, ele in zip(scores, members):
+            zarrInsert(za, score, ele)
+        return ZSKIPLIST_ENTRIES
+
+    results['zarray.insert[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(insert)
+
+    picks = [rand.randrange(ZSKIPLIST_ENTRIES) for _ in range(5000)]
+
+    def rank() -> int:
+        for i in picks:
+            zarrGetRank(za, scores[i], members[i])
+        return len(picks)
+
+    results['zarray.get_rank[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(rank)
+
+    ranges = []
+    for _ in range(5000):
+        spec = zrangespec()
+        spec.min = rand.randrange(ZSKIPLIST_ENTRIES * 10)
+        spec.max = spec.min + rand.randrange(100)
+        ranges.append(spec)
+
+    def first_in_range() -> int:
+        for spec in ranges:
+            zarrScoreRank(za, spec.min, spec.minex)
+        return len(ranges)
+
+    results['zarray.first_in_range[n=%d]' % ZSKIPLIST_ENTRIES] = timeit(first_in_range)
+
+
+def benchZsetMix(results: Results) -> None:
+    """
+    在已有 ZSKIPLIST_ENTRIES 个元素的有序集合上混合执行插入和范围查询, 比较跳跃表和有序数组:
+    插入为主 (90% 插入) 和查询为主 (90% 查询), 每次查询计算 ZCOUNT 并取出范围内的前 10 个元素
+    """
+    rand = random.Random(0)
+    base = [(float(rand.randrange(ZSKIPLIST_ENTRIES * 10)), b'member:%d' % i) for i in range(ZSKIPLIST_ENTRIES)]
+    extra = [(float(rand.randrange(ZSKIPLIST_ENTRIES * 10)), b'extra:%d' % i) for i in range(ZSET_MIX_OPS)]
+    ranges = []
+    for _ in range(ZSET_MIX_OPS):
+        spec = zrangespec()
+        spec.min = rand.randrange(ZSKIPLIST_ENTRIES * 10)
+        spec.max = spec.min + rand.randrange(1000)
+        ranges.append(spec)
+
+    for mix, insert_ratio in (('insert_heavy', 0.9), ('range_heavy', 0.1)):
+        plan = [rand.random() < insert_ratio for _ in range(ZSET_MIX_OPS)]
+        zsl = zslCreate()
+        za = zarrCreate()
+
+        def setupSkiplist() -> None:
+            nonlocal zsl
+            zsl = zslCreate()
+            for score, ele in base:
+                zslInsert(zsl, score, createStringObject(ele, len(ele)))
+
+        def runSkiplist() -> int:
+            for j, insert in enumerate(plan):
+                if insert:
+                    score, ele = extra[j]
+                    zslInsert(zsl, score, createStringObject(ele, len(ele)))
+                    continue
+                first = zslFirstInRange(zsl, ranges[j])
+                if first is None:
+                    continue
+                last = zslLastInRange(zsl, ranges[j])
+                assert last is not None
+                zslGetRank(zsl, last.score, last.obj) - zslGetRank(zsl, first.score, first.obj)
+                node, n = first, 10
+                while node is not None and n:
+                    node, n = node.level[0].forward, n - 1
+            return ZSET_MIX_OPS
+
+        def setupZarray() -> None:
+            nonlocal za
+            za = zarrCreate()
+            for score, ele in base:
+                zarrInsert(za, score, ele)
+
+        def runZarray() -> int:
+            for j, insert in enumerate(plan):
+                if insert:
+                    score, ele = extra[j]
+                    zarrInsert(za, score, ele)
+                    continue
+                first, last = zarrRankRangeByScore(za, ranges[j])
+                zarrRangeByRank(za, first, min(last, first + 9))
+            return ZSET_MIX_OPS
+
+        results['zset_mix.%s.zskiplist[n=%d]' % (mix, ZSKIPLIST_ENTRIES)] = timeit(runSkiplist, setupSkiplist)
+        results['zset_mix.%s.zarray[n=%d]' % (mix, ZSKIPLIST_ENTRIES)] = timeit(runZarray, setupZarray)
+
+
+def benchSds(results: Results) -> None:
+    chunk = b'x' * 16
+
+    def catlen() -> int:
+        s = sdsempty()
+        for _ in range(SDS_APPENDS):
+            s = sdscatlen(s, chunk, 16)
+        return SDS_APPENDS
+
+    results['sds.catlen'] = timeit(catlen)
+
+    def make_room_for() -> int:
+        # 和 readQueryFromClient 中读取数据的方式相同
+        s = sdsempty()
+        for _ in range(SDS_APPENDS):
+            s = sdsMakeRoomFor(s, 16)
+            sdsIncrLen(s, 16)
+        return SDS_APPENDS
+
+    results['sds.make_room_for'] = timeit(make_room_for)
+
+    big = sdsnew(b'x' * 100000)
+
+    def range_() -> int:
+        # 和处理完一条命令后从 querybuf 中去掉已处理的部分相同
+        s = sdsnew(big.content)
+        for _ in range(5000):
+            sdsrange(s, 16, -1)
+        return 5000
+
+    results['sds.range[len=100000]'] = timeit(range_)
+
+
+def benchAdlist(results: Results) -> None:
+    def add(head: bool) -> Callable[[], int]:
+        def run() -> int:
+            l = listCreate()
+            for i in range(ADLIST_NODES):
+                if head:
+                    listAddNodeHead(l, i)
+                else:
+                    listAddNodeTail(l, i)
+            return ADLIST_NODES
+        return run
+
+    results['adlist.add_head'] = timeit(add(True))
+    results['adlist.add_tail'] = timeit(add(False))
+
+    l = listCreate()
+    for i in range(ADLIST_NODES):
+        listAddNodeTail(l, i)
+
+    def iterate() -> int:
+        it = listGetIterator(l, AL_START_HEAD)
+        n = 0
+        while listNext(it) is not None:
+            n += 1
+        return n
+
+    results['adlist.iterate[n=%d]' % ADLIST_NODES] = timeit(iterate)
+
+    rand = random.Random(0)
+    indexes = [rand.randrange(-ADLIST_NODES, ADLIST_NODES) for _ in range(200)]
+
+    def index() -> int:
+        for i in indexes:
+            listIndex(l, i)
+        return len(indexes)
+
+    results['adlist.index[n=%d]' % ADLIST_NODES] = timeit(index)
+
+
+def runAll(quick: bool, keyword: str) -> Results:
+    from redis_server.redis import RedisServer, initServerConfig
+    # createStringObject 依赖服务器配置 (LRU 时钟等)
+    initServerConfig(RedisServer())
+
+    suites = [
+        ('rdict', lambda r: benchRdict(r, RDICT_QUICK_SIZES if quick else RDICT_SIZES)),
+        ('ziplist', benchZiplist),
+        ('intset', benchIntset),
+        ('zskiplist', benchZskiplist),
+        ('zarray', benchZarray),
+        ('zset_mix', benchZsetMix),
+        ('sds', benchSds),
+        ('adlist', benchAdlist),
+    ]
+    results: Results = {}
+    for name, suite in suites:
+        if keyword and keyword not in name:
+            continue
+        suite_results: Results = {}
+        suite(suite_results)
+        results.update((k, round(v, 1)) for k, v in suite_results.items())
+        printResults(suite_results, None, 'ns/op')
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.structures', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='skip the largest rdict sizes')
+    parser.add_argument('-k', '--keyword', default='', help='only run suites whose name contains this string')
+    parser.add_argument('--baseline', default=baselinePath('structures'), help='baseline file')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown ratio before failing (default %.2f)' % DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = runAll(args.quick, args.keyword)
+    if args.save:
+        saveBaseline(args.baseline, results, {'unit': 'ns/op'})
+        print("\nbaseline written to %s" % args.baseline)
+        return
+    baseline = loadBaseline(args.baseline)
+    if baseline is None:
+        print("\nno baseline at %s, run with --save to create one" % args.baseline)
+        return
+    print("\ncompared with %s:" % args.baseline)
+    printResults(results, baseline, 'ns/op')
+    sys.exit(reportRegressions(compareResults(results, baseline, {}, args.tolerance), 'ns/op'))
+
+
+if __name__ == '__main__':
+    main()
@@ -42,6 +42,9 @@ AE_DONT_WAIT = 4
 AE_NOMORE = -1
 
 class aeFileEvent:
+    # 事件循环启动时要为每个 fd 创建一个对象, 用 __slots__ 减少创建的开销和内存
+    __slots__ = ('mask', 'rfileProc', 'wfileProc', 'clientData')
+
     def __init__(self):
         self.mask: int = 0
         self.rfileProc = None
@@ -59,6 +62,8 @@ class aeTimeEvent:
         self.next: Opt['aeTimeEvent'] = None
 
 class aeFiredEvent:
+    __slots__ = ('fd', 'mask')
+
     def __init__(self):
         self.fd: int = 0
         self.mask: int = 0
@@ -88,9 +93,8 @@ def aeCreateEventLoop(setsize: int) -> aeEventLoop:
     eventLoop.stop = 0
     eventLoop.maxfd = -1
     eventLoop.beforesleep = None
+    # aeFileEvent 创建时 mask 已经是 AE_NONE, 不需要像 C 版本一样再初始化一遍
     aeApiCreate(eventLoop)
-    for i in range(setsize):
-        eventLoop.events[i].mask = AE_NONE
     return eventLoop
 
 def aeDeleteEventLoop(eventLoop: aeEventLoop):
@@ -141,7 +145,8 @@ def aeGetFileEvents(eventLoop: aeEventLoop, fd: int) -> int:
 
 def aeCreateTimeEvent(eventLoop: aeEventLoop, milliseconds: int,
                       proc: Callable, clientData, finalizerProc: Opt[Callable]) -> int:
-    ident = eventLoop.timeEventNextId + 1
+    ident = eventLoop.timeEventNextId
+    eventLoop.timeEventNextId += 1
     te = aeTimeEvent()
     te.id = ident
     te.when_sec, te.when_ms = aeAddMillisecondsToNow(milliseconds)
@@ -188,7 +193,7 @@ def processTimeEvents(eventLoop: aeEventLoop) -> int:
             te = te.next
             continue
         now_sec, now_ms = aeGetTime()
-        if now_sec > te.when_sec or (now_sec == te.when_ms and now_ms >= te.when_ms):
+        if now_sec > te.when_sec or (now_sec == te.when_sec and now_ms >= te.when_ms):
             ident = te.id
             retval = te.timeProc(eventLoop, ident, te.clientData)
             processed += 1
@@ -1,2 +1,8 @@
-from .ae_select import *
-# TODO(ruan.lj@foxmail.com): add epoll and poll support.
+import select
+
+# 和 ae.c 一样, 优先使用系统支持的性能最好的多路复用库
+if hasattr(select, 'epoll'):
+    from .ae_epoll import *
+else:
+    from .ae_select import *
+# TODO(ruan.lj@foxmail.com): add poll and kqueue support.
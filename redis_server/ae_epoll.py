@@ -0,0 +1,98 @@
+__all__ = (
+    'aeApiCreate',
+    'aeApiFree',
+    'aeApiAddEvent',
+    'aeApiDelEvent',
+    'aeApiPoll',
+    'aeApiName',
+    'aeApiResize',
+)
+
+import select
+import typing
+from typing import Optional as Opt
+
+if typing.TYPE_CHECKING:
+    from .ae import aeEventLoop, timeval
+
+class aeApiState:
+    def __init__(self, setsize: int) -> None:
+        self.epfd = select.epoll(setsize)
+
+### public api ###
+
+def aeApiCreate(eventLoop: 'aeEventLoop') -> int:
+    eventLoop.apidata = aeApiState(eventLoop.setsize)
+    return 0
+
+def aeApiFree(eventLoop: 'aeEventLoop') -> None:
+    state: aeApiState = eventLoop.apidata
+    state.epfd.close()
+
+def aeApiAddEvent(eventLoop: 'aeEventLoop', fd: int, mask: int) -> int:
+    from .ae import AE_READABLE, AE_WRITABLE, AE_NONE
+    state: aeApiState = eventLoop.apidata
+    # 如果 fd 已经注册过了, 需要修改而不是添加, 同时合并旧的事件
+    old = eventLoop.events[fd].mask
+    mask |= old
+    events = 0
+    if mask & AE_READABLE:
+        events |= select.EPOLLIN
+    if mask & AE_WRITABLE:
+        events |= select.EPOLLOUT
+    try:
+        if old == AE_NONE:
+            state.epfd.register(fd, events)
+        else:
+            state.epfd.modify(fd, events)
+    except FileExistsError:
+        # fd 被关闭后又被复用, 内核中残留了旧的注册
+        state.epfd.modify(fd, events)
+    except OSError:
+        return -1
+    return 0
+
+def aeApiDelEvent(eventLoop: 'aeEventLoop', fd: int, mask: int) -> None:
+    from .ae import AE_READABLE, AE_WRITABLE, AE_NONE
+    state: aeApiState = eventLoop.apidata
+    # 调用时 eventLoop.events[fd].mask 已经去掉了要删除的事件
+    mask = eventLoop.events[fd].mask & (~mask)
+    events = 0
+    if mask & AE_READABLE:
+        events |= select.EPOLLIN
+    if mask & AE_WRITABLE:
+        events |= select.EPOLLOUT
+    try:
+        if mask != AE_NONE:
+            state.epfd.modify(fd, events)
+        else:
+            state.epfd.unregister(fd)
+    except OSError:
+        # fd 已经被关闭, 内核会自动移除它的注册
+        pass
+
+def aeApiPoll(eventLoop: 'aeEventLoop', tvp: Opt['timeval']) -> int:
+    from .ae import AE_READABLE, AE_WRITABLE
+    state: aeApiState = eventLoop.apidata
+    timeout = tvp.tv_sec + tvp.tv_usec / 1000000 if tvp else -1
+    numevents = 0
+    for fd, events in state.epfd.poll(timeout, eventLoop.setsize):
+        mask = 0
+        if events & select.EPOLLIN:
+            mask |= AE_READABLE
+        if events & select.EPOLLOUT:
+            mask |= AE_WRITABLE
+        if events & select.EPOLLERR:
+            mask |= AE_WRITABLE
+        if events & select.EPOLLHUP:
+            mask |= AE_WRITABLE
+        eventLoop.fired[numevents].fd = fd
+        eventLoop.fired[numevents].mask = mask
+        numevents += 1
+    return numevents
+
+def aeApiName() -> str:
+    return "epoll"
+
+def aeApiResize(eventLoop: 'aeEventLoop', setsize: int) -> int:
+    return 0
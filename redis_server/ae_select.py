@@ -63,7 +63,7 @@ def aeApiPoll(eventLoop: 'aeEventLoop', tvp: Opt['timeval']) -> int:
     numevents = 0
     state: aeApiState = eventLoop.apidata
 
-    timeout = tvp.time
+    timeout = tvp.tv_sec + tvp.tv_usec / 1000000
     _rfds, _wfds, _ = select.select(state.rfds, state.wfds, [], timeout)
     _rfds_set = set(_rfds)
     _wfds_set = set(_wfds)
@@ -134,7 +134,8 @@ def anetV6Only(s: socket.socket) -> None:
 
 def anetListen(s: socket.socket, host: str, port: Opt[int], backlog: int) -> None:
     try:
-        s.bind((host, port))
+        # unix socket 的地址是文件路径, 没有端口
+        s.bind(host if port is None else (host, port))
         s.listen(backlog)
     except OSError:
         s.close()
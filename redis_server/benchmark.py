@@ -0,0 +1,287 @@
+"""
+redis-benchmark 风格的压测工具
+
+    python -m redis_server.benchmark -c 50 -P 16 -r 100000 -d 64 --mix get=80,set=20 -t 10 --json report.json
+
+所有连接在同一个线程中用非阻塞 socket + selectors 驱动, 请求由手写的 RESP 编码器生成,
+回复只做边界解析不做解码, 保证压测客户端本身不是瓶颈。
+每个请求的延迟从所在批次发出开始计算, 到对应的回复被完整读取为止。
+"""
+
+import argparse
+import json
+import random
+import selectors
+import socket
+import sys
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional as Opt, Sequence, Tuple
+
+__all__ = [
+    'encodeCommand',
+    'skipReply',
+    'percentile',
+    'latencySummary',
+    'runBenchmark',
+    'main',
+]
+
+def encodeCommand(args: Sequence[bytes]) -> bytes:
+    parts = [b'*%d\r\n' % len(args)]
+    for a in args:
+        parts.append(b'$%d\r\n%s\r\n' % (len(a), a))
+    return b''.join(parts)
+
+def skipReply(buf: bytearray, pos: int) -> int:
+    """返回 buf 中从 pos 开始的一个完整回复的结束位置, 回复不完整时返回 -1"""
+    pending = 1
+    while pending:
+        eol = buf.find(b'\r\n', pos)
+        if eol < 0:
+            return -1
+        t = buf[pos]
+        pending -= 1
+        if t == 0x24:   # '$'
+            n = int(buf[pos+1:eol])
+            pos = eol + 2
+            if n >= 0:
+                pos += n + 2
+                if pos > len(buf):
+                    return -1
+        elif t == 0x2a:   # '*'
+            n = int(buf[pos+1:eol])
+            pos = eol + 2
+            if n > 0:
+                pending += n
+        else:
+            pos = eol + 2
+    return pos
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[k]
+
+def latencySummary(sorted_values: List[float]) -> Dict[str, float]:
+    """sorted_values 的单位是秒, 结果的单位是毫秒"""
+    lat = sorted_values
+    ms = 1000.0
+    return {
+        'min': lat[0] * ms if lat else 0.0,
+        'p50': percentile(lat, 50) * ms,
+        'p90': percentile(lat, 90) * ms,
+        'p99': percentile(lat, 99) * ms,
+        'p99.9': percentile(lat, 99.9) * ms,
+        'max': lat[-1] * ms if lat else 0.0,
+        'avg': sum(lat) / len(lat) * ms if lat else 0.0,
+    }
+
+# 命令名 -> 根据 (key, value) 生成参数的函数
+CommandGen = Callable[[bytes, bytes], List[bytes]]
+benchmarkCommands: Dict[str, CommandGen] = {
+    'ping': lambda k, v: [b'PING'],
+    'get': lambda k, v: [b'GET', k],
+    'set': lambda k, v: [b'SET', k, v],
+    'incr': lambda k, v: [b'INCR', b'counter:' + k],
+    'lpush': lambda k, v: [b'LPUSH', b'list:' + k[-2:], v],
+    'rpush': lambda k, v: [b'RPUSH', b'list:' + k[-2:], v],
+    'lpop': lambda k, v: [b'LPOP', b'list:' + k[-2:]],
+    'rpop': lambda k, v: [b'RPOP', b'list:' + k[-2:]],
+    'sadd': lambda k, v: [b'SADD', b'set:' + k[-2:], k],
+    'hset': lambda k, v: [b'HSET', b'hash:' + k[-2:], k, v],
+    'zadd': lambda k, v: [b'ZADD', b'zset:' + k[-2:], b'%d' % len(k), k],
+    'mset': lambda k, v: [b'MSET', k, v, k + b':2', v],
+    'mget': lambda k, v: [b'MGET', k, k + b':2'],
+}
+
+def parseMix(mix: str) -> List[Tuple[str, int]]:
+    res = []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip().lower()
+        if name not in benchmarkCommands:
+            raise ValueError("unknown command in mix: %s" % name)
+        res.append((name, int(weight) if weight else 1))
+    return res
+
+class benchClient:
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.outbuf = bytearray()
+        self.inbuf = bytearray()
+        # 已发出但还没收到回复的请求的发送时间
+        self.inflight: Deque[float] = deque()
+        self.writing = False
+
+class BenchmarkRunner:
+    def __init__(self, opts: argparse.Namespace) -> None:
+        self.opts = opts
+        self.value = b'x' * opts.datasize
+        mix = parseMix(opts.mix)
+        self.mix_names = [name for name, _ in mix]
+        self.mix_weights = [weight for _, weight in mix]
+        self.rand = random.Random(opts.seed)
+        self.latencies: List[float] = []
+        self.per_command: Dict[str, int] = {name: 0 for name in self.mix_names}
+        self.errors = 0
+        self.sel = selectors.DefaultSelector()
+        self.clients: List[benchClient] = []
+        self.stopping = False
+
+    def connect(self) -> socket.socket:
+        if self.opts.socket:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.opts.socket)
+        else:
+            sock = socket.create_connection((self.opts.host, self.opts.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        return sock
+
+    def nextCommand(self) -> bytes:
+        name = self.rand.choices(self.mix_names, self.mix_weights)[0]
+        self.per_command[name] += 1
+        key = b'key:%012d' % self.rand.randrange(self.opts.keyspace)
+        return encodeCommand(benchmarkCommands[name](key, self.value))
+
+    def sendBatch(self, c: benchClient) -> None:
+        now = time.perf_counter()
+        for _ in range(self.opts.pipeline):
+            c.outbuf += self.nextCommand()
+            c.inflight.append(now)
+        self.flush(c)
+
+    def flush(self, c: benchClient) -> None:
+        try:
+            n = c.sock.send(c.outbuf)
+        except BlockingIOError:
+            n = 0
+        del c.outbuf[:n]
+        want_write = bool(c.outbuf)
+        if want_write != c.writing:
+            c.writing = want_write
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if want_write else 0)
+            self.sel.modify(c.sock, events, c)
+
+    def readReplies(self, c: benchClient) -> None:
+        try:
+            chunk = c.sock.recv(1 << 16)
+        except BlockingIOError:
+            return
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        c.inbuf += chunk
+        pos = 0
+        now = time.perf_counter()
+        while c.inflight:
+            end = skipReply(c.inbuf, pos)
+            if end < 0:
+                break
+            if c.inbuf[pos] == 0x2d:   # '-'
+                self.errors += 1
+            self.latencies.append(now - c.inflight.popleft())
+            pos = end
+        del c.inbuf[:pos]
+        if not c.inflight and not self.stopping:
+            self.sendBatch(c)
+
+    def run(self) -> dict:
+        opts = self.opts
+        for _ in range(opts.clients):
+            c = benchClient(self.connect())
+            self.clients.append(c)
+            self.sel.register(c.sock, selectors.EVENT_READ, c)
+        start = time.perf_counter()
+        deadline = start + opts.duration
+        for c in self.clients:
+            self.sendBatch(c)
+        while True:
+            now = time.perf_counter()
+            if not self.stopping and (now >= deadline or (opts.requests and len(self.latencies) >= opts.requests)):
+                self.stopping = True
+            if self.stopping and not any(c.inflight for c in self.clients):
+                break
+            for key, mask in self.sel.select(timeout=0.1):
+                c = key.data
+                if mask & selectors.EVENT_WRITE:
+                    self.flush(c)
+                if mask & selectors.EVENT_READ:
+                    self.readReplies(c)
+        elapsed = time.perf_counter() - start
+        for c in self.clients:
+            self.sel.unregister(c.sock)
+            c.sock.close()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        lat = sorted(self.latencies)
+        return {
+            'config': {
+                'clients': self.opts.clients,
+                'pipeline': self.opts.pipeline,
+                'keyspace': self.opts.keyspace,
+                'datasize': self.opts.datasize,
+                'mix': self.opts.mix,
+                'duration': self.opts.duration,
+            },
+            'requests': len(lat),
+            'errors': self.errors,
+            'elapsed_sec': elapsed,
+            'ops_per_sec': len(lat) / elapsed if elapsed else 0.0,
+            'commands': self.per_command,
+            'latency_ms': latencySummary(lat),
+        }
+
+def runBenchmark(argv: Opt[Sequence[str]] = None) -> dict:
+    return BenchmarkRunner(parseArgs(argv)).run()
+
+def parseArgs(argv: Opt[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m redis_server.benchmark', description='Redis load generator')
+    parser.add_argument('-H', '--host', default='127.0.0.1', help='server hostname (default 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=6379, help='server port (default 6379)')
+    parser.add_argument('-s', '--socket', default=None, help='server unix socket (overrides host and port)')
+    parser.add_argument('-c', '--clients', type=int, default=50, help='number of parallel connections (default 50)')
+    parser.add_argument('-P', '--pipeline', type=int, default=1, help='pipeline <numreq> requests (default 1)')
+    parser.add_argument('-r', '--keyspace', type=int, default=10000, help='number of distinct keys (default 10000)')
+    parser.add_argument('-d', '--datasize', type=int, default=3, help='value size in bytes for SET etc. (default 3)')
+    parser.add_argument('-m', '--mix', default='get=50,set=50',
+                        help='weighted command mix, e.g. get=80,set=20 (available: %s)' % ','.join(benchmarkCommands))
+    parser.add_argument('-t', '--duration', type=float, default=10, help='test duration in seconds (default 10)')
+    parser.add_argument('-n', '--requests', type=int, default=0, help='stop after this many requests (default no limit)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for keys and command mix')
+    parser.add_argument('--json', default=None, help='write the report as JSON to this path ("-" for stdout)')
+    return parser.parse_args(argv)
+
+def printReport(report: dict) -> None:
+    lat = report['latency_ms']
+    print("====== %s ======" % report['config']['mix'])
+    print("  %d requests completed in %.2f seconds" % (report['requests'], report['elapsed_sec']))
+    print("  %d parallel clients, pipeline %d, %d bytes payload, %d keys" % (
+        report['config']['clients'], report['config']['pipeline'],
+        report['config']['datasize'], report['config']['keyspace']))
+    print("  %d errors" % report['errors'])
+    print()
+    print("throughput: %.2f requests per second" % report['ops_per_sec'])
+    print("latency (msec): min=%.3f avg=%.3f p50=%.3f p90=%.3f p99=%.3f p99.9=%.3f max=%.3f" % (
+        lat['min'], lat['avg'], lat['p50'], lat['p90'], lat['p99'], lat['p99.9'], lat['max']))
+
+def main(argv: Opt[Sequence[str]] = None) -> None:
+    opts = parseArgs(argv)
+    try:
+        report = BenchmarkRunner(opts).run()
+    except (OSError, ValueError) as e:
+        print("benchmark failed: %s" % e, file=sys.stderr)
+        sys.exit(1)
+    if opts.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    printReport(report)
+    if opts.json:
+        with open(opts.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
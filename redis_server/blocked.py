@@ -0,0 +1,178 @@
+import heapq
+import itertools
+import typing
+from typing import List, Tuple, Optional as Opt
+
+from .adlist import listCreate, listAddNodeTail, listLast, listDelNode, listLength
+from .ae import aeCreateTimeEvent, aeDeleteTimeEvent, aeEventLoop, AE_NOMORE
+from .csix import timeval, LONG_MAX
+from .config import *
+from .robject import redisObject, incrRefCount, decrRefCount, getLongDoubleFromObject
+from .multi import watchedKeyName
+from .networking import addReply, addReplyError, processInputBuffer
+from .sds import sdslen
+from .util import get_server, get_shared
+
+if typing.TYPE_CHECKING:
+    from .redis import RedisClient
+    from .db import RedisDB
+
+
+# 阻塞操作的实现, BLPOP 等命令如何服务阻塞的客户端见 commands/list.py。
+#
+# db.blocking_keys 以键的内容 (bytes) 为键, 值为阻塞在这个键上的客户端链表, 按阻塞的先后顺序排列。
+# 客户端的 bpop.keys 记录自己在每个链表中的节点, 解除阻塞时直接删除节点, 不需要在链表中查找,
+# 唤醒一个客户端的开销和同一个键上还阻塞着多少客户端无关。
+#
+# 有超时时间的客户端按到期时间放在 server.bpop_timeouts 最小堆中, 只用一个时间事件处理,
+# 它总是在最早的到期时间触发。客户端解除阻塞时不从堆中删除, 到期时发现记录已经失效就跳过。
+
+class readyList:
+    """server.ready_keys 中的元素, 一个有客户端阻塞的列表键刚刚被创建"""
+    __slots__ = ('db', 'key')
+
+    def __init__(self, db: 'RedisDB', key: redisObject) -> None:
+        self.db = db
+        self.key = key
+
+# 到期时间相同时按加入的先后排序, 堆中的元素不会比较到客户端对象
+_timeoutSeq = itertools.count()
+
+def getTimeoutFromObjectOrReply(c: 'RedisClient', o: redisObject) -> Tuple[int, int]:
+    """解析以秒为单位的超时时间 (可以是小数), 返回到期的毫秒时间戳, 0 表示永久阻塞"""
+    status, tval = getLongDoubleFromObject(o)
+    if status != REDIS_OK or tval * 1000 > LONG_MAX:
+        addReplyError(c, "timeout is not a float or out of range")
+        return REDIS_ERR, 0
+    if tval < 0:
+        addReplyError(c, "timeout is negative")
+        return REDIS_ERR, 0
+    timeout = int(tval * 1000)
+    if timeout > 0:
+        timeout += timeval.from_datetime().mstime
+    return REDIS_OK, timeout
+
+def blockClient(c: 'RedisClient', btype: int) -> None:
+    server = get_server()
+    c.flags |= REDIS_BLOCKED
+    c.btype = btype
+    server.bpop_blocked_clients += 1
+    if c.bpop.timeout:
+        addClientToTimeoutTable(c)
+
+def unblockClient(c: 'RedisClient') -> None:
+    server = get_server()
+    if c.btype == REDIS_BLOCKED_LIST:
+        unblockClientWaitingData(c)
+    else:
+        raise RuntimeError("Unknown btype in unblockClient().")
+    c.bpop.timeout_entry = None
+    c.flags &= ~REDIS_BLOCKED
+    c.btype = REDIS_BLOCKED_NONE
+    server.bpop_blocked_clients -= 1
+    # 查询缓冲区中可能还有命令, 在下一次事件循环之前处理
+    if not (c.flags & REDIS_UNBLOCKED):
+        c.flags |= REDIS_UNBLOCKED
+        server.unblocked_clients.append(c)
+
+def replyToBlockedClientTimedOut(c: 'RedisClient') -> None:
+    if c.btype == REDIS_BLOCKED_LIST:
+        addReply(c, get_shared().nullmultibulk)
+    else:
+        raise RuntimeError("Unknown btype in replyToBlockedClientTimedOut().")
+
+def processUnblockedClients() -> None:
+    """处理被解除阻塞的客户端在阻塞期间收到的命令, 在 beforeSleep() 中调用"""
+    server = get_server()
+    while server.unblocked_clients:
+        c = server.unblocked_clients.popleft()
+        c.flags &= ~REDIS_UNBLOCKED
+        if c.querybuf and sdslen(c.querybuf) > 0:
+            server.current_client = c
+            processInputBuffer(c)
+            server.current_client = None
+
+def blockForKeys(c: 'RedisClient', keys: List[redisObject], timeout: int, target: Opt[redisObject],
+                 wherefrom: int, whereto: int) -> None:
+    """
+    让客户端阻塞在 keys 上, 直到其中一个键被推入元素或者超时
+    target 不为空时 (BRPOPLPUSH / BLMOVE) 弹出的元素从 whereto 一端推入 target
+    """
+    c.bpop.timeout = timeout
+    c.bpop.target = target
+    c.bpop.wherefrom = wherefrom
+    c.bpop.whereto = whereto
+    if target is not None:
+        incrRefCount(target)
+    for key in keys:
+        name = watchedKeyName(key)
+        # 同一个键只阻塞一次
+        if name in c.bpop.keys:
+            continue
+        clients = c.db.blocking_keys.get(name)
+        if clients is None:
+            clients = c.db.blocking_keys[name] = listCreate()
+        listAddNodeTail(clients, c)
+        ln = listLast(clients)
+        assert ln
+        c.bpop.keys[name] = ln
+    blockClient(c, REDIS_BLOCKED_LIST)
+
+def unblockClientWaitingData(c: 'RedisClient') -> None:
+    for name, ln in c.bpop.keys.items():
+        clients = c.db.blocking_keys[name]
+        listDelNode(clients, ln)
+        if listLength(clients) == 0:
+            del c.db.blocking_keys[name]
+    c.bpop.keys = {}
+    if c.bpop.target is not None:
+        decrRefCount(c.bpop.target)
+        c.bpop.target = None
+
+def signalListAsReady(db: 'RedisDB', key: redisObject) -> None:
+    """
+    列表键被创建时调用, 如果有客户端阻塞在这个键上, 把它加入 server.ready_keys,
+    命令执行完之后由 handleClientsBlockedOnLists() 服务这些客户端
+    """
+    if not db.blocking_keys:
+        return
+    name = watchedKeyName(key)
+    if name not in db.blocking_keys or name in db.ready_keys:
+        return
+    db.ready_keys.add(name)
+    incrRefCount(key)
+    listAddNodeTail(get_server().ready_keys, readyList(db, key))
+
+def addClientToTimeoutTable(c: 'RedisClient') -> None:
+    server = get_server()
+    entry = (c.bpop.timeout, next(_timeoutSeq), c)
+    c.bpop.timeout_entry = entry
+    heap = server.bpop_timeouts
+    heapq.heappush(heap, entry)
+    # 失效的记录太多时重建堆, 均摊下来每次阻塞的开销仍然是 O(log n)
+    if len(heap) > 2 * server.bpop_blocked_clients + 64:
+        heap[:] = [e for e in heap if e[2].bpop.timeout_entry is e]
+        heapq.heapify(heap)
+    if server.bpop_timer_id == -1 or c.bpop.timeout < server.bpop_timer_when:
+        if server.bpop_timer_id != -1:
+            aeDeleteTimeEvent(server.el, server.bpop_timer_id)
+        server.bpop_timer_when = c.bpop.timeout
+        delay = max(0, c.bpop.timeout - timeval.from_datetime().mstime)
+        server.bpop_timer_id = aeCreateTimeEvent(server.el, delay, blockedClientsTimeoutProc, None, None)
+
+def blockedClientsTimeoutProc(eventLoop: aeEventLoop, ident: int, clientData) -> int:
+    """处理所有已经到期的阻塞客户端, 返回距离下一个到期时间的毫秒数"""
+    server = get_server()
+    heap = server.bpop_timeouts
+    now = timeval.from_datetime().mstime
+    while heap and (heap[0][0] <= now or heap[0][2].bpop.timeout_entry is not heap[0]):
+        entry = heapq.heappop(heap)
+        c = entry[2]
+        if c.bpop.timeout_entry is entry:
+            replyToBlockedClientTimedOut(c)
+            unblockClient(c)
+    if not heap:
+        server.bpop_timer_id = -1
+        return AE_NOMORE
+    server.bpop_timer_when = heap[0][0]
+    return heap[0][0] - now
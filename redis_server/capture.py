@@ -0,0 +1,131 @@
+"""
+命令流量录制, 由 capture-file 配置项或 CLIENT CAPTURE START/STOP 控制
+
+call() 在执行每个命令之前把它追加到录制文件中, python -m redis_server.replay 可以按原来的
+时间间隔 (或加速) 重放录制的文件。
+
+文件格式 (所有整数都是小端序):
+
+    文件头: magic "RCAP", 版本号 (uint8), 开始录制时的 unix 时间 (double, 秒)
+    每条命令: 相对开始时间的微秒数 (uint64), client id (uint64), db (uint16), argc (uint32),
+              然后是 argc 个参数, 每个参数为长度 (uint32) + 内容
+"""
+
+import struct
+import time
+import typing
+from logging import getLogger
+from typing import BinaryIO, Iterator, List, NamedTuple
+
+from .robject import sdsEncodedObject
+
+if typing.TYPE_CHECKING:
+    from .redis import RedisClient, RedisServer
+
+logger = getLogger(__name__)
+
+CAPTURE_MAGIC = b'RCAP'
+CAPTURE_VERSION = 1
+CAPTURE_BUFFER_SIZE = 1 << 16
+
+captureHeader = struct.Struct('<4sBd')
+captureRecord = struct.Struct('<QQHI')
+captureArgLen = struct.Struct('<I')
+
+
+class captureEntry(NamedTuple):
+    # 相对开始录制时间的微秒数
+    time_us: int
+    client_id: int
+    db: int
+    argv: List[bytes]
+
+
+class Capture:
+    def __init__(self, path: str, fp: BinaryIO, start_us: int) -> None:
+        self.path = path
+        self.fp = fp
+        self.start_us = start_us
+        self.commands = 0
+
+
+def captureStart(server: 'RedisServer', path: str) -> None:
+    """开始录制到 path, 已经存在的文件会被覆盖; 打开文件失败时抛出 OSError"""
+    fp = open(path, 'wb', buffering=CAPTURE_BUFFER_SIZE)
+    start = time.time()
+    fp.write(captureHeader.pack(CAPTURE_MAGIC, CAPTURE_VERSION, start))
+    server.capture = Capture(path, fp, int(start * 1000000))
+    logger.info("Capturing commands to %s", path)
+
+def captureStop(server: 'RedisServer') -> bool:
+    capture = server.capture
+    if capture is None:
+        return False
+    server.capture = None
+    try:
+        capture.fp.close()
+    except OSError as e:
+        logger.warning("Error closing capture file %s: %s", capture.path, e)
+    logger.info("Captured %d commands to %s", capture.commands, capture.path)
+    return True
+
+def captureCommand(server: 'RedisServer', c: 'RedisClient', ustime: int) -> None:
+    capture = server.capture
+    assert capture is not None
+    parts = [captureRecord.pack(max(ustime - capture.start_us, 0), c.id, c.db.id, c.argc)]
+    for i in range(c.argc):
+        o = c.argv[i]
+        arg = o.ptr.content if sdsEncodedObject(o) else b'%d' % o.ptr
+        parts.append(captureArgLen.pack(len(arg)))
+        parts.append(arg)
+    try:
+        capture.fp.write(b''.join(parts))
+    except OSError as e:
+        # 磁盘写满等错误不应该影响命令的执行, 直接停止录制
+        logger.warning("Error writing capture file %s, capture stopped: %s", capture.path, e)
+        captureStop(server)
+        return
+    capture.commands += 1
+
+def captureFlush(server: 'RedisServer') -> None:
+    """serverCron 中调用, 保证服务器异常退出时最多丢失一个 cron 周期的数据"""
+    capture = server.capture
+    if capture is None:
+        return
+    try:
+        capture.fp.flush()
+    except OSError as e:
+        logger.warning("Error writing capture file %s, capture stopped: %s", capture.path, e)
+        captureStop(server)
+
+def readCaptureHeader(fp: BinaryIO) -> float:
+    """检查文件头, 返回开始录制的 unix 时间"""
+    header = fp.read(captureHeader.size)
+    if len(header) < captureHeader.size:
+        raise ValueError("truncated capture header")
+    magic, version, start = captureHeader.unpack(header)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError("not a capture file")
+    if version != CAPTURE_VERSION:
+        raise ValueError("unsupported capture version %d" % version)
+    return start
+
+def readCapture(fp: BinaryIO) -> Iterator[captureEntry]:
+    """按录制的顺序返回所有命令, 忽略文件末尾不完整的记录 (录制时服务器异常退出)"""
+    readCaptureHeader(fp)
+    while True:
+        head = fp.read(captureRecord.size)
+        if len(head) < captureRecord.size:
+            return
+        time_us, client_id, db, argc = captureRecord.unpack(head)
+        argv = []
+        for _ in range(argc):
+            raw = fp.read(captureArgLen.size)
+            if len(raw) < captureArgLen.size:
+                return
+            n, = captureArgLen.unpack(raw)
+            arg = fp.read(n)
+            if len(arg) < n:
+                return
+            argv.append(arg)
+        yield captureEntry(time_us, client_id, db, argv)
@@ -0,0 +1,615 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from typing import List, Tuple, Union
+from ..config import *
+from ..robject import *
+from ..sds import sds, sdsgrowzero, sdsempty, sdslen
+from ..db import (
+    lookupKeyWrite, lookupKeyRead, lookupKeyReadOrReply, dbAdd, dbDelete, setKey, dbUnshareStringValue,
+    signalModifiedKey, notifyKeyspaceEvent,
+)
+from ..util import get_shared, get_server, optionalImport
+from ..networking import addReply, addReplyError, addReplyLongLong, addReplyString
+
+__all__ = [
+    'setbitCommand',
+    'getbitCommand',
+    'bitcountCommand',
+    'bitposCommand',
+    'bitopCommand',
+    'bitfieldCommand',
+    'bitfieldroCommand',
+]
+
+# 位图的计数, 查找和位运算都不在 Python 中逐字节循环:
+# 安装了 numpy 时在 frombuffer 得到的 uint8 数组上计算, 否则每块用 int.from_bytes 转换成一个大整数计算。
+# 按块进行是为了让临时对象不会和整个值一样大
+BITOPS_CHUNK_BYTES = 1024*1024
+# 大整数的转换比较慢, 使用较小的块, 数据可以留在 CPU 缓存中
+BITOPS_INT_CHUNK_BYTES = 64*1024
+
+# int.bit_count 在 Python 3.10 中才加入
+if hasattr(int, 'bit_count'):
+    bitCount: typing.Callable[[int], int] = int.bit_count
+else:
+    def bitCount(v: int) -> int:
+        return bin(v).count('1')
+
+BITOP_AND = 0
+BITOP_OR = 1
+BITOP_XOR = 2
+BITOP_NOT = 3
+
+# 字符串的最大长度 512MB, 位偏移不能超出
+BITOPS_MAX_BYTES = 512*1024*1024
+
+
+def getBitOffsetFromArgument(c: 'RedisClient', o: robj) -> Tuple[int, int]:
+    msg = "bit offset is not an integer or out of range"
+    status, loffset = getLongLongFromObjectOrReply(c, o, msg)
+    if status != REDIS_OK:
+        return REDIS_ERR, 0
+    if loffset < 0 or (loffset >> 3) >= BITOPS_MAX_BYTES:
+        addReplyError(c, msg)
+        return REDIS_ERR, 0
+    return REDIS_OK, loffset
+
+def stringObjectBuffer(o: robj) -> Tuple[Union[bytes, bytearray], int]:
+    """字符串对象的内容和长度, 整数编码的对象转换成字符串"""
+    if sdsEncodedObject(o):
+        return o.ptr.buf, sdslen(o.ptr)
+    buf = b'%d' % o.ptr
+    return buf, len(buf)
+
+def redisPopcount(p: memoryview) -> int:
+    np = optionalImport('numpy')
+    count = 0
+    if np is not None:
+        # numpy 2.0 之前没有 bitwise_count
+        popcount = getattr(np, 'bitwise_count', None) or np.unpackbits
+        for i in range(0, len(p), BITOPS_CHUNK_BYTES):
+            count += int(popcount(np.frombuffer(p[i:i+BITOPS_CHUNK_BYTES], dtype=np.uint8)).sum())
+        return count
+    for i in range(0, len(p), BITOPS_INT_CHUNK_BYTES):
+        count += bitCount(int.from_bytes(p[i:i+BITOPS_INT_CHUNK_BYTES], 'little'))
+    return count
+
+def redisBitpos(p: memoryview, bit: int) -> int:
+    """
+    第一个值为 bit 的位的位置, 字节中的最高位是第 0 位
+    没有找到时: bit 为 1 返回 -1, bit 为 0 返回 len(p)*8, 即把值的右边看作无限多个 0
+    """
+    np = optionalImport('numpy')
+    # 查找 1 时跳过全 0 的字节, 查找 0 时跳过全 1 的字节
+    skip = 0 if bit else 0xff
+    chunksize = BITOPS_CHUNK_BYTES if np is not None else BITOPS_INT_CHUNK_BYTES
+    for i in range(0, len(p), chunksize):
+        chunk = p[i:i+chunksize]
+        if np is not None:
+            idx = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) != skip)
+            if not idx.size:
+                continue
+            # 只需要在找到的字节中确定是哪一位
+            pos = int(idx[0])
+            chunk = chunk[pos:pos+1]
+            base = (i + pos) * 8
+        else:
+            base = i * 8
+        nbits = len(chunk) * 8
+        # 大端序: 第一个字节是最高的 8 位, 第一个为 1 的位就是最高的为 1 的位
+        v = int.from_bytes(chunk, 'big')
+        if not bit:
+            v ^= (1 << nbits) - 1
+        if v:
+            return base + nbits - v.bit_length()
+    return -1 if bit else len(p) * 8
+
+def redisBitopNumpy(np: typing.Any, op: int, srcs: List[memoryview], buf: bytearray) -> None:
+    # 直接在结果的 bytearray 上计算, 不需要最后再复制一次;
+    # 数组在函数返回时释放, 之后 buf 才能改变大小
+    maxlen = len(buf) - 1
+    res = np.frombuffer(buf, dtype=np.uint8)
+    first = np.frombuffer(srcs[0], dtype=np.uint8)
+    res[:len(first)] = first
+    if op == BITOP_NOT:
+        np.invert(res[:maxlen], out=res[:maxlen])
+    for src in srcs[1:]:
+        a = np.frombuffer(src, dtype=np.uint8)
+        out = res[:len(a)]
+        if op == BITOP_AND:
+            np.bitwise_and(out, a, out=out)
+            # 短的值右边的 0 使结果的这一部分为 0
+            res[len(a):maxlen] = 0
+        elif op == BITOP_OR:
+            np.bitwise_or(out, a, out=out)
+        else:
+            np.bitwise_xor(out, a, out=out)
+
+def redisBitop(op: int, srcs: List[memoryview], maxlen: int) -> bytearray:
+    """
+    对 srcs 做位运算, 较短的值在右边补 0, 和 Redis 相同
+    返回的 bytearray 长度为 maxlen + 1, 最后一个字节是 0, 可以直接作为 sds 的 buf
+    """
+    np = optionalImport('numpy')
+    buf = bytearray(maxlen + 1)
+    if np is not None:
+        redisBitopNumpy(np, op, srcs, buf)
+        return buf
+    step = BITOPS_INT_CHUNK_BYTES
+    for i in range(0, maxlen, step):
+        n = min(step, maxlen - i)
+        # 小端序: 超出较短的值的部分为空, 转换得到 0 的高位, 结果和在右边补 0 相同
+        v = int.from_bytes(srcs[0][i:i+n], 'little')
+        if op == BITOP_NOT:
+            v ^= (1 << (n * 8)) - 1
+        for src in srcs[1:]:
+            w = int.from_bytes(src[i:i+n], 'little')
+            if op == BITOP_AND:
+                v &= w
+            elif op == BITOP_OR:
+                v |= w
+            else:
+                v ^= w
+        buf[i:i+n] = v.to_bytes(n, 'little')
+    return buf
+
+def setbitCommand(c: 'RedisClient'):
+    shared = get_shared()
+    status, bitoffset = getBitOffsetFromArgument(c, c.argv[2])
+    if status != REDIS_OK:
+        return
+    msg = "bit is not an integer or out of range"
+    status, on = getLongLongFromObjectOrReply(c, c.argv[3], msg)
+    if status != REDIS_OK:
+        return
+    if on & ~1:
+        addReplyError(c, msg)
+        return
+    o = lookupKeyWrite(c.db, c.argv[1])
+    if o is None:
+        o = createObject(REDIS_STRING, sdsempty())
+        dbAdd(c.db, c.argv[1], o)
+    else:
+        if o.type != REDIS_STRING:
+            addReply(c, shared.wrongtypeerr)
+            return
+        o = dbUnshareStringValue(c.db, c.argv[1], o)
+    byte = bitoffset >> 3
+    # 只在需要时增长, 新增的字节为 0
+    o.ptr = sdsgrowzero(o.ptr, byte + 1)
+    bit = 7 - (bitoffset & 0x7)
+    byteval = o.ptr.buf[byte]
+    bitval = byteval & (1 << bit)
+    byteval &= ~(1 << bit)
+    byteval |= (on & 0x1) << bit
+    o.ptr.buf[byte] = byteval
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'setbit', c.argv[1], c.db.id)
+    get_server().dirty += 1
+    addReply(c, shared.cone if bitval else shared.czero)
+
+def getbitCommand(c: 'RedisClient'):
+    shared = get_shared()
+    status, bitoffset = getBitOffsetFromArgument(c, c.argv[2])
+    if status != REDIS_OK:
+        return
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.czero)
+    if o is None:
+        return
+    if o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    byte = bitoffset >> 3
+    bit = 7 - (bitoffset & 0x7)
+    buf, strlen = stringObjectBuffer(o)
+    bitval = byte < strlen and buf[byte] & (1 << bit)
+    addReply(c, shared.cone if bitval else shared.czero)
+
+def bitcountCommand(c: 'RedisClient'):
+    shared = get_shared()
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.czero)
+    if o is None:
+        return
+    if o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    buf, strlen = stringObjectBuffer(o)
+    if c.argc == 4:
+        status, start = getLongLongFromObjectOrReply(c, c.argv[2], None)
+        if status != REDIS_OK:
+            return
+        status, end = getLongLongFromObjectOrReply(c, c.argv[3], None)
+        if status != REDIS_OK:
+            return
+        # 转换成非负的下标
+        if start < 0:
+            start = strlen + start
+        if end < 0:
+            end = strlen + end
+        if start < 0:
+            start = 0
+        if end < 0:
+            end = 0
+        if end >= strlen:
+            end = strlen - 1
+    elif c.argc == 2:
+        start = 0
+        end = strlen - 1
+    else:
+        addReply(c, shared.syntaxerr)
+        return
+    if start > end:
+        addReply(c, shared.czero)
+    else:
+        addReplyLongLong(c, redisPopcount(memoryview(buf)[start:end+1]))
+
+def bitposCommand(c: 'RedisClient'):
+    shared = get_shared()
+    status, bit = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    if bit != 0 and bit != 1:
+        addReplyError(c, "The bit argument must be 1 or 0.")
+        return
+    # 键不存在时看作空字符串: 查找 1 返回 -1, 查找 0 返回 0
+    o = lookupKeyRead(c.db, c.argv[1])
+    if o is None:
+        addReplyLongLong(c, -1 if bit else 0)
+        return
+    if o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    buf, strlen = stringObjectBuffer(o)
+    end_given = 0
+    if c.argc == 4 or c.argc == 5:
+        status, start = getLongLongFromObjectOrReply(c, c.argv[3], None)
+        if status != REDIS_OK:
+            return
+        if c.argc == 5:
+            status, end = getLongLongFromObjectOrReply(c, c.argv[4], None)
+            if status != REDIS_OK:
+                return
+            end_given = 1
+        else:
+            end = strlen - 1
+        if start < 0:
+            start = strlen + start
+        if end < 0:
+            end = strlen + end
+        if start < 0:
+            start = 0
+        if end < 0:
+            end = 0
+        if end >= strlen:
+            end = strlen - 1
+    elif c.argc == 3:
+        start = 0
+        end = strlen - 1
+    else:
+        addReply(c, shared.syntaxerr)
+        return
+    if start > end:
+        addReplyLongLong(c, -1)
+        return
+    nbytes = end - start + 1
+    pos = redisBitpos(memoryview(buf)[start:end+1], bit)
+    # 指定了范围的结束位置时, 范围之外的位不能看作 0
+    if end_given and bit == 0 and pos == nbytes * 8:
+        addReplyLongLong(c, -1)
+        return
+    if pos != -1:
+        pos += start * 8
+    addReplyLongLong(c, pos)
+
+def bitopCommand(c: 'RedisClient'):
+    shared = get_shared()
+    opname = c.argv[1].ptr
+    if opname.lowereq('and'):
+        op = BITOP_AND
+    elif opname.lowereq('or'):
+        op = BITOP_OR
+    elif opname.lowereq('xor'):
+        op = BITOP_XOR
+    elif opname.lowereq('not'):
+        op = BITOP_NOT
+    else:
+        addReply(c, shared.syntaxerr)
+        return
+    if op == BITOP_NOT and c.argc != 4:
+        addReplyError(c, "BITOP NOT must be called with a single source key.")
+        return
+    targetkey = c.argv[2]
+    # 先检查所有的源键, 有类型错误时不修改目标键
+    srcs: List[memoryview] = []
+    maxlen = 0
+    for j in range(3, c.argc):
+        o = lookupKeyRead(c.db, c.argv[j])
+        if o is None:
+            srcs.append(memoryview(b''))
+            continue
+        if o.type != REDIS_STRING:
+            addReply(c, shared.wrongtypeerr)
+            return
+        buf, strlen = stringObjectBuffer(o)
+        srcs.append(memoryview(buf)[:strlen])
+        maxlen = max(maxlen, strlen)
+    if maxlen:
+        o = createObject(REDIS_STRING, sds(maxlen, 0, redisBitop(op, srcs, maxlen)))
+        # 释放对源键 buf 的引用, 之后源键才可以被原地修改
+        for src in srcs:
+            src.release()
+        setKey(c.db, targetkey, o)
+        notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'set', targetkey, c.db.id)
+        decrRefCount(o)
+    elif dbDelete(c.db, targetkey):
+        signalModifiedKey(c.db, targetkey)
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, 'del', targetkey, c.db.id)
+    get_server().dirty += 1
+    addReplyLongLong(c, maxlen)
+
+
+# BITFIELD 的子命令
+BITFIELDOP_GET = 0
+BITFIELDOP_SET = 1
+BITFIELDOP_INCRBY = 2
+
+# 溢出时的处理方式
+BFOVERFLOW_WRAP = 0
+BFOVERFLOW_SAT = 1
+BFOVERFLOW_FAIL = 2
+
+# 安装了 numpy 时, 连续的, 按字节对齐的同类型字段达到这个数量就在 numpy 数组上一次处理
+BITFIELD_VECTOR_MIN_FIELDS = 8
+
+class bitfieldOp:
+    __slots__ = ('offset', 'i64', 'opcode', 'owtype', 'bits', 'sign')
+
+    def __init__(self, offset: int, i64: int, opcode: int, owtype: int, bits: int, sign: int) -> None:
+        # 字段的位偏移
+        self.offset = offset
+        # SET 的值或 INCRBY 的增量
+        self.i64 = i64
+        self.opcode = opcode
+        self.owtype = owtype
+        self.bits = bits
+        # 1 为有符号整数
+        self.sign = sign
+
+def getBitfieldTypeFromArgument(c: 'RedisClient', o: robj) -> Tuple[int, int, int]:
+    """解析 i16 / u8 这样的类型, 返回 (status, sign, bits)"""
+    p = bytes(o.ptr.buf[:o.ptr.len])
+    sign = 1 if p[:1] in (b'i', b'I') else 0
+    ok = p[:1] in (b'i', b'I', b'u', b'U') and p[1:].isdigit()
+    bits = int(p[1:]) if ok else 0
+    if not ok or bits < 1 or (sign and bits > 64) or (not sign and bits > 63):
+        addReplyError(c, "Invalid bitfield type. Use something like i16 u8. "
+                         "Note that u64 is not supported but i64 is.")
+        return REDIS_ERR, 0, 0
+    return REDIS_OK, sign, bits
+
+def getBitfieldOffsetFromArgument(c: 'RedisClient', o: robj, bits: int) -> Tuple[int, int]:
+    """偏移可以是位数, 也可以是 #N, 表示第 N 个这个类型的字段"""
+    msg = "bit offset is not an integer or out of range"
+    p = o.ptr.buf[:o.ptr.len]
+    usehash = p[:1] == b'#'
+    if usehash:
+        o = createStringObject(p[1:], len(p) - 1)
+    status, loffset = getLongLongFromObjectOrReply(c, o, msg)
+    if status != REDIS_OK:
+        return REDIS_ERR, 0
+    if usehash:
+        loffset *= bits
+    if loffset < 0 or (loffset >> 3) >= BITOPS_MAX_BYTES:
+        addReplyError(c, msg)
+        return REDIS_ERR, 0
+    return REDIS_OK, loffset
+
+def checkBitfieldOverflow(value: int, incr: int, bits: int, sign: int, owtype: int) -> Tuple[int, int]:
+    """
+    value + incr 是否超出字段的范围, 返回 (overflow, limit)
+    overflow: 0 没有溢出, 1 上溢, -1 下溢; limit 是 WRAP 或 SAT 处理之后的值, 没有溢出时为 value + incr
+    和 Redis 一样, 无符号字段的 SET 的值按 uint64 解释, 负数会变成很大的数, 是上溢
+    """
+    if sign:
+        vmax = (1 << (bits - 1)) - 1
+        vmin = -vmax - 1
+    else:
+        vmax = (1 << bits) - 1
+        vmin = 0
+    total = value + incr
+    if vmin <= total <= vmax:
+        return 0, total
+    overflow = 1 if total > vmax else -1
+    if owtype == BFOVERFLOW_WRAP:
+        # 按二进制补码截断到 bits 位
+        total &= (1 << bits) - 1
+        if sign and total >> (bits - 1):
+            total -= 1 << bits
+        return overflow, total
+    return overflow, vmax if overflow > 0 else vmin
+
+def getBitfield(mv: memoryview, strlen: int, offset: int, bits: int, sign: int) -> int:
+    """读出字段的值, 超出字符串长度的部分看作 0"""
+    start = offset >> 3
+    end = (offset + bits - 1) >> 3
+    chunk = mv[start:min(end + 1, strlen)]
+    v = int.from_bytes(chunk, 'big') << (8 * (end + 1 - start - len(chunk)))
+    v = (v >> ((end + 1) * 8 - offset - bits)) & ((1 << bits) - 1)
+    if sign and v >> (bits - 1):
+        v -= 1 << bits
+    return v
+
+def setBitfield(mv: memoryview, offset: int, bits: int, value: int) -> None:
+    """写入字段, 调用者保证 mv 足够长"""
+    start = offset >> 3
+    end = (offset + bits - 1) >> 3
+    shift = (end + 1) * 8 - offset - bits
+    mask = ((1 << bits) - 1) << shift
+    nbytes = end + 1 - start
+    v = int.from_bytes(mv[start:end+1], 'big')
+    v = (v & ~mask) | ((value << shift) & mask)
+    mv[start:end+1] = v.to_bytes(nbytes, 'big')
+
+def bitfieldRunLength(ops: List[bitfieldOp], i: int, strlen: int) -> int:
+    """
+    从 ops[i] 开始, 可以在 numpy 数组上一次处理的字段数:
+    同一种操作和类型, 按字节对齐, 位置连续; SET / INCRBY 只支持 WRAP, 截断和 numpy 的类型转换相同
+    """
+    op = ops[i]
+    if op.bits not in (8, 16, 32, 64) or op.offset & 7:
+        return 1
+    if op.opcode != BITFIELDOP_GET and op.owtype != BFOVERFLOW_WRAP:
+        return 1
+    j = i + 1
+    while j < len(ops):
+        nxt = ops[j]
+        if (nxt.opcode != op.opcode or nxt.bits != op.bits or nxt.sign != op.sign or
+                nxt.owtype != op.owtype or nxt.offset != ops[j-1].offset + op.bits):
+            break
+        j += 1
+    # 写操作之前已经增长到足够的长度; 读超出字符串结尾的部分需要补 0, 逐个处理
+    if op.opcode == BITFIELDOP_GET and (ops[j-1].offset + op.bits) >> 3 > strlen:
+        return 1
+    return j - i
+
+def bitfieldExecuteRun(np: typing.Any, mv: memoryview, ops: List[bitfieldOp], reply: bytearray) -> None:
+    """在 numpy 数组上执行一段连续的同类型字段, 结果追加到 reply"""
+    first = ops[0]
+    start = first.offset >> 3
+    arr = np.frombuffer(mv[start:start + len(ops) * first.bits // 8],
+                        dtype='>%s%d' % ('i' if first.sign else 'u', first.bits // 8))
+    if first.opcode == BITFIELDOP_GET:
+        retvals = arr.tolist()
+    else:
+        old = arr.astype(np.int64)
+        args = np.array([op.i64 for op in ops], dtype=np.int64)
+        # int64 的加法溢出时回绕, 再截断到字段的类型, 结果和逐个 WRAP 相同
+        with np.errstate(over='ignore'):
+            new = old + args if first.opcode == BITFIELDOP_INCRBY else args
+            arr[:] = new.astype(arr.dtype)
+        retvals = old.tolist() if first.opcode == BITFIELDOP_SET else arr.tolist()
+    for v in retvals:
+        reply += b':%d\r\n' % v
+
+def bitfieldExecute(mv: memoryview, strlen: int, ops: List[bitfieldOp], reply: bytearray) -> int:
+    """依次执行所有的子命令, 回复追加到 reply, 返回修改的字段数"""
+    np = optionalImport('numpy')
+    changes = 0
+    i = 0
+    while i < len(ops):
+        op = ops[i]
+        n = bitfieldRunLength(ops, i, strlen) if np is not None else 1
+        if n >= BITFIELD_VECTOR_MIN_FIELDS:
+            bitfieldExecuteRun(np, mv, ops[i:i+n], reply)
+            if op.opcode != BITFIELDOP_GET:
+                changes += n
+            i += n
+            continue
+        i += 1
+        oldval = getBitfield(mv, strlen, op.offset, op.bits, op.sign)
+        if op.opcode == BITFIELDOP_GET:
+            reply += b':%d\r\n' % oldval
+            continue
+        if op.opcode == BITFIELDOP_INCRBY:
+            overflow, newval = checkBitfieldOverflow(oldval, op.i64, op.bits, op.sign, op.owtype)
+            retval = newval
+        else:
+            value = op.i64 if op.sign else op.i64 & 0xffffffffffffffff
+            overflow, newval = checkBitfieldOverflow(value, 0, op.bits, op.sign, op.owtype)
+            retval = oldval
+        if overflow and op.owtype == BFOVERFLOW_FAIL:
+            reply += b'$-1\r\n'
+            continue
+        setBitfield(mv, op.offset, op.bits, newval)
+        reply += b':%d\r\n' % retval
+        changes += 1
+    return changes
+
+def bitfieldGeneric(c: 'RedisClient', readonly: int):
+    shared = get_shared()
+    ops: List[bitfieldOp] = []
+    owtype = BFOVERFLOW_WRAP
+    # 写操作会写到的最大的位偏移, -1 表示没有写操作
+    highest_write_offset = -1
+    j = 2
+    while j < c.argc:
+        remargs = c.argc - j - 1
+        subcmd = c.argv[j].ptr
+        if subcmd.lowereq('get') and remargs >= 2:
+            opcode = BITFIELDOP_GET
+        elif subcmd.lowereq('set') and remargs >= 3:
+            opcode = BITFIELDOP_SET
+        elif subcmd.lowereq('incrby') and remargs >= 3:
+            opcode = BITFIELDOP_INCRBY
+        elif subcmd.lowereq('overflow') and remargs >= 1:
+            mode = c.argv[j+1].ptr
+            if mode.lowereq('wrap'):
+                owtype = BFOVERFLOW_WRAP
+            elif mode.lowereq('sat'):
+                owtype = BFOVERFLOW_SAT
+            elif mode.lowereq('fail'):
+                owtype = BFOVERFLOW_FAIL
+            else:
+                addReplyError(c, "Invalid OVERFLOW type specified")
+                return
+            j += 2
+            continue
+        else:
+            addReply(c, shared.syntaxerr)
+            return
+        status, sign, bits = getBitfieldTypeFromArgument(c, c.argv[j+1])
+        if status != REDIS_OK:
+            return
+        status, offset = getBitfieldOffsetFromArgument(c, c.argv[j+2], bits)
+        if status != REDIS_OK:
+            return
+        i64 = 0
+        if opcode != BITFIELDOP_GET:
+            if readonly:
+                addReplyError(c, "BITFIELD_RO only supports the GET subcommand")
+                return
+            status, i64 = getLongLongFromObjectOrReply(c, c.argv[j+3], None)
+            if status != REDIS_OK:
+                return
+            highest_write_offset = max(highest_write_offset, offset + bits - 1)
+        ops.append(bitfieldOp(offset, i64, opcode, owtype, bits, sign))
+        j += 3 if opcode == BITFIELDOP_GET else 4
+    if highest_write_offset >= 0:
+        o = lookupKeyWrite(c.db, c.argv[1])
+        if o is None:
+            o = createObject(REDIS_STRING, sdsempty())
+            dbAdd(c.db, c.argv[1], o)
+        else:
+            if o.type != REDIS_STRING:
+                addReply(c, shared.wrongtypeerr)
+                return
+            o = dbUnshareStringValue(c.db, c.argv[1], o)
+        # 一次增长到所有写操作需要的长度, 之后所有的子命令都在同一个 memoryview 上执行
+        o.ptr = sdsgrowzero(o.ptr, (highest_write_offset >> 3) + 1)
+        buf, strlen = o.ptr.buf, sdslen(o.ptr)
+    else:
+        o = lookupKeyRead(c.db, c.argv[1])
+        if o is not None and o.type != REDIS_STRING:
+            addReply(c, shared.wrongtypeerr)
+            return
+        buf, strlen = stringObjectBuffer(o) if o is not None else (b'', 0)
+    reply = bytearray(b'*%d\r\n' % len(ops))
+    mv = memoryview(buf)
+    try:
+        changes = bitfieldExecute(mv, strlen, ops, reply)
+    finally:
+        # 释放对 buf 的引用, 之后这个值才可以改变大小
+        mv.release()
+    if changes:
+        signalModifiedKey(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'setbit', c.argv[1], c.db.id)
+        get_server().dirty += changes
+    addReplyString(c, reply, len(reply))
+
+def bitfieldCommand(c: 'RedisClient'):
+    bitfieldGeneric(c, 0)
+
+def bitfieldroCommand(c: 'RedisClient'):
+    bitfieldGeneric(c, 1)
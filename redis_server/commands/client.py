@@ -0,0 +1,47 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from ..config import REDIS_CLOSE_AFTER_REPLY
+from ..util import get_shared, get_server
+from ..networking import addReply, addReplyError
+
+__all__ = [
+    'clientCommand',
+    'quitCommand',
+]
+
+CLIENT_SYNTAX_ERROR = "Syntax error, try CLIENT CAPTURE START <path> | STOP"
+
+def clientCaptureCommand(c: 'RedisClient') -> None:
+    from ..capture import captureStart, captureStop
+    server = get_server()
+    sub = c.argv[2].ptr
+    if sub.lowereq('start') and c.argc == 4:
+        if server.capture is not None:
+            addReplyError(c, "Capture already running")
+            return
+        try:
+            captureStart(server, c.argv[3].ptr.text)
+        except OSError as e:
+            addReplyError(c, "Can't open the capture file: %s" % e.strerror)
+            return
+        addReply(c, get_shared().ok)
+    elif sub.lowereq('stop') and c.argc == 3:
+        if not captureStop(server):
+            addReplyError(c, "Capture not running")
+        else:
+            addReply(c, get_shared().ok)
+    else:
+        addReplyError(c, CLIENT_SYNTAX_ERROR)
+
+def clientCommand(c: 'RedisClient') -> None:
+    if c.argv[1].ptr.lowereq('capture') and c.argc >= 3:
+        clientCaptureCommand(c)
+    else:
+        addReplyError(c, CLIENT_SYNTAX_ERROR)
+
+def quitCommand(c: 'RedisClient') -> None:
+    # 回复发送完毕之后关闭连接
+    addReply(c, get_shared().ok)
+    c.flags |= REDIS_CLOSE_AFTER_REPLY
@@ -0,0 +1,40 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from ..util import get_shared
+from ..networking import addReply, addReplyError
+
+__all__ = [
+    'debugCommand',
+]
+
+def debugProfileCommand(c: 'RedisClient') -> None:
+    from ..profiler import profileStart, profileStop, profileDump, PROFILE_MODE_SAMPLING, PROFILE_MODE_DETERMINISTIC
+    sub = c.argv[2].ptr
+    if sub.lowereq('start') and c.argc <= 4:
+        mode = c.argv[3].ptr.text.lower() if c.argc == 4 else PROFILE_MODE_SAMPLING
+        if mode not in (PROFILE_MODE_SAMPLING, PROFILE_MODE_DETERMINISTIC):
+            addReplyError(c, "Unknown profile mode, use SAMPLING or DETERMINISTIC")
+        elif not profileStart(mode):
+            addReplyError(c, "Profiler already running")
+        else:
+            addReply(c, get_shared().ok)
+    elif sub.lowereq('stop') and c.argc == 3:
+        if not profileStop():
+            addReplyError(c, "Profiler not running")
+        else:
+            addReply(c, get_shared().ok)
+    elif sub.lowereq('dump') and c.argc == 4:
+        if not profileDump(c.argv[3].ptr.text):
+            addReplyError(c, "No profile data to dump")
+        else:
+            addReply(c, get_shared().ok)
+    else:
+        addReplyError(c, "Syntax error, try DEBUG PROFILE START [SAMPLING|DETERMINISTIC] | STOP | DUMP <path>")
+
+def debugCommand(c: 'RedisClient') -> None:
+    if c.argv[1].ptr.lowereq('profile') and c.argc >= 3:
+        debugProfileCommand(c)
+    else:
+        addReplyError(c, "Syntax error, try DEBUG PROFILE START [SAMPLING|DETERMINISTIC] | STOP | DUMP <path>")
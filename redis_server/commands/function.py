@@ -0,0 +1,75 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from ..config import REDIS_OK, REDIS_PREVENT_PROP
+from ..robject import createStringObject, getLongLongFromObjectOrReply
+from ..util import get_shared, get_server
+from ..networking import addReply, addReplyBulk, addReplyError, addReplyMultiBulkLen, addReplyString
+
+__all__ = [
+    'functionCommand',
+    'fcallCommand',
+]
+
+FUNCTION_SYNTAX_ERROR = "Syntax error, try FUNCTION LOAD <code> | FLUSH | LIST"
+
+def addReplyFunctionError(c: 'RedisClient', msg: str) -> None:
+    # 异常信息中可能有换行, 会破坏协议
+    addReplyError(c, msg.replace('\r', ' ').replace('\n', ' '))
+
+def functionCommand(c: 'RedisClient') -> None:
+    # 函数引擎用到 ast 等模块, 第一次使用时才导入, 不影响启动时间
+    from ..functions import functionCreate, functionError
+    server = get_server()
+    sub = c.argv[1].ptr
+    if sub.lowereq('load') and c.argc == 3:
+        body = bytes(c.argv[2].ptr.content)
+        try:
+            fn = functionCreate(body)
+        except functionError as e:
+            addReplyFunctionError(c, str(e))
+            return
+        server.functions.setdefault(fn.sha1, fn)
+        addReplyBulk(c, createStringObject(fn.sha1, len(fn.sha1)))
+    elif sub.lowereq('flush') and c.argc == 2:
+        server.functions.clear()
+        addReply(c, get_shared().ok)
+    elif sub.lowereq('list') and c.argc == 2:
+        addReplyMultiBulkLen(c, len(server.functions))
+        for sha1 in server.functions:
+            addReplyBulk(c, createStringObject(sha1, len(sha1)))
+    else:
+        addReplyError(c, FUNCTION_SYNTAX_ERROR)
+
+def fcallCommand(c: 'RedisClient') -> None:
+    from ..functions import functionRun, functionTimeout, functionObjectValue, encodeFunctionReply
+    server = get_server()
+    status, numkeys = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    if numkeys > c.argc - 3:
+        addReplyError(c, "Number of keys can't be greater than number of args")
+        return
+    if numkeys < 0:
+        addReplyError(c, "Number of keys can't be negative")
+        return
+    fn = server.functions.get(functionObjectValue(c.argv[1]).decode('latin-1').lower())
+    if fn is None:
+        addReplyError(c, "No matching function. Use FUNCTION LOAD.")
+        return
+    args = [functionObjectValue(o) for o in c.argv[3:]]
+    # FCALL 本身不传播, 只传播函数实际执行的写操作, 重放时不依赖函数是否已经加载
+    c.flags |= REDIS_PREVENT_PROP
+    try:
+        result = functionRun(c, fn, args[:numkeys], args[numkeys:], server.function_time_limit)
+        reply = bytearray()
+        encodeFunctionReply(result, reply)
+    except functionTimeout:
+        addReplyError(c, "Function %s killed after running for more than %d milliseconds" % (
+            fn.sha1, server.function_time_limit))
+        return
+    except Exception as e:
+        addReplyFunctionError(c, "Error running function %s: %s: %s" % (fn.sha1, type(e).__name__, e))
+        return
+    addReplyString(c, reply, len(reply))
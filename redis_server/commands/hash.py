@@ -0,0 +1,507 @@
+import math
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from typing import List, Optional as Opt, Tuple, Union
+from ..config import *
+from ..robject import *
+from ..sds import sds, sdslen, sdsnewlen, sdsfromlonglong
+from ..db import (
+    lookupKeyRead, lookupKeyWrite, lookupKeyReadOrReply, lookupKeyWriteOrReply, dbAdd, dbDelete, signalModifiedKey,
+    notifyKeyspaceEvent, hashDictType, htNeedsResize, parseScanCursorOrReply, scanGenericCommand,
+)
+from ..rdict import (
+    rDict, dictCreate, dictAdd, dictReplace, dictDelete, dictFind, dictSize, dictResize, dictGetIterator,
+    dictNext, dictReleaseIterator, dictEntry, dictIterator, DICT_OK,
+)
+from ..ziplist import (
+    ziplistIndex, ziplistNext, ziplistFind, ziplistGetValue, ziplistPush, ziplistInsert, ziplistDelete, ziplistLen,
+    ZIPLIST_HEAD, ZIPLIST_TAIL,
+)
+from ..csix import cstr, cstrptr, LONG_MIN, LONG_MAX
+from ..util import get_shared, get_server, string2ll
+from ..networking import (
+    addReply, addReplyError, addReplyLongLong, addReplyMultiBulkLen, addReplyBulk, addReplyBulkCBuffer,
+    rewriteClientCommandArgument,
+)
+
+__all__ = [
+    'hsetCommand',
+    'hsetnxCommand',
+    'hmsetCommand',
+    'hgetCommand',
+    'hmgetCommand',
+    'hdelCommand',
+    'hlenCommand',
+    'hexistsCommand',
+    'hincrbyCommand',
+    'hincrbyfloatCommand',
+    'hkeysCommand',
+    'hvalsCommand',
+    'hgetallCommand',
+    'hscanCommand',
+]
+
+# 哈希对象有两种编码:
+# REDIS_ENCODING_ZIPLIST: 一个 ziplist, 字段和值作为相邻的两个节点依次保存, 查找字段时用 ziplistFind
+#     的 skip=1 跳过值节点。字段数超过 hash_max_ziplist_entries, 或者字段/值的长度超过
+#     hash_max_ziplist_value 时转换成哈希表编码。
+# REDIS_ENCODING_HT: 一个 rDict (hashDictType), 字段和值都是 sds。
+# 转换只会从 ziplist 到哈希表, 删除字段之后不会转换回去。
+
+REDIS_HASH_KEY = 1
+REDIS_HASH_VALUE = 2
+
+HashValue = Union[bytes, int]
+
+def hashObjectBuffer(o: robj) -> Tuple[cstr, int]:
+    """字段或值参数的内容和长度, 整数编码的对象转换成字符串"""
+    if sdsEncodedObject(o):
+        return o.ptr.buf, sdslen(o.ptr)
+    buf = b'%d' % o.ptr
+    return buf, len(buf)
+
+def hashObjectSds(o: robj) -> sds:
+    """复制参数对象的内容, 作为哈希表编码中的字段或值"""
+    buf, length = hashObjectBuffer(o)
+    return sdsnewlen(buf, length)
+
+def hashValueBytes(value: HashValue) -> bytes:
+    return b'%d' % value if isinstance(value, int) else value
+
+def hashTypeTryConversion(o: robj, argv: List[robj], start: int, end: int) -> None:
+    """检查 argv[start:end+1] 中的参数, 有参数太长时把 ziplist 编码的 o 转换成哈希表"""
+    if o.encoding != REDIS_ENCODING_ZIPLIST:
+        return
+    limit = get_server().hash_max_ziplist_value
+    for i in range(start, end + 1):
+        if sdsEncodedObject(argv[i]) and sdslen(argv[i].ptr) > limit:
+            hashTypeConvert(o, REDIS_ENCODING_HT)
+            break
+
+def hashTypeGetFromZiplist(o: robj, field: robj) -> Opt[HashValue]:
+    zl = o.ptr
+    fptr = ziplistIndex(zl, ZIPLIST_HEAD)
+    if fptr is None:
+        return None
+    buf, length = hashObjectBuffer(field)
+    fptr = ziplistFind(fptr, buf, length, 1)
+    if fptr is None:
+        return None
+    vptr = ziplistNext(zl, fptr)
+    assert vptr is not None
+    return ziplistGetValue(vptr)
+
+def hashTypeGetFromHashTable(o: robj, field: robj) -> Opt[sds]:
+    key = field.ptr if sdsEncodedObject(field) else sdsfromlonglong(field.ptr)
+    de = dictFind(o.ptr, key)
+    if de is None:
+        return None
+    return de.v.val
+
+def hashTypeGetValue(o: robj, field: robj) -> Opt[HashValue]:
+    """字段的值, 字段不存在时返回 None"""
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        return hashTypeGetFromZiplist(o, field)
+    elif o.encoding == REDIS_ENCODING_HT:
+        value = hashTypeGetFromHashTable(o, field)
+        return None if value is None else bytes(value.buf[:sdslen(value)])
+    raise RuntimeError("Unknown hash encoding")
+
+def hashTypeExists(o: robj, field: robj) -> bool:
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        return hashTypeGetFromZiplist(o, field) is not None
+    elif o.encoding == REDIS_ENCODING_HT:
+        return hashTypeGetFromHashTable(o, field) is not None
+    raise RuntimeError("Unknown hash encoding")
+
+def hashTypeSet(o: robj, field: robj, value: robj) -> int:
+    """设置字段的值, 字段已经存在时返回 1, 新增字段时返回 0"""
+    update = 0
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = o.ptr
+        fbuf, flen = hashObjectBuffer(field)
+        vbuf, vlen = hashObjectBuffer(value)
+        fptr = ziplistIndex(zl, ZIPLIST_HEAD)
+        if fptr is not None:
+            fptr = ziplistFind(fptr, fbuf, flen, 1)
+            if fptr is not None:
+                vptr = ziplistNext(zl, fptr)
+                assert vptr is not None
+                update = 1
+                # 删除旧值之后 vptr 指向下一个字段, 新值插入在它前面
+                zl = ziplistDelete(zl, vptr)
+                zl = ziplistInsert(zl, vptr, vbuf, vlen)
+        if not update:
+            zl = ziplistPush(zl, fbuf, flen, ZIPLIST_TAIL)
+            zl = ziplistPush(zl, vbuf, vlen, ZIPLIST_TAIL)
+        o.ptr = zl
+        if hashTypeLength(o) > get_server().hash_max_ziplist_entries:
+            hashTypeConvert(o, REDIS_ENCODING_HT)
+    elif o.encoding == REDIS_ENCODING_HT:
+        if dictReplace(o.ptr, hashObjectSds(field), hashObjectSds(value)) == 0:
+            update = 1
+    else:
+        raise RuntimeError("Unknown hash encoding")
+    return update
+
+def hashTypeDelete(o: robj, field: robj) -> int:
+    """删除字段, 字段存在时返回 1"""
+    deleted = 0
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = o.ptr
+        fptr = ziplistIndex(zl, ZIPLIST_HEAD)
+        if fptr is not None:
+            buf, length = hashObjectBuffer(field)
+            fptr = ziplistFind(fptr, buf, length, 1)
+            if fptr is not None:
+                # 删除字段之后 fptr 指向它的值
+                zl = ziplistDelete(zl, fptr)
+                zl = ziplistDelete(zl, fptr)
+                o.ptr = zl
+                deleted = 1
+    elif o.encoding == REDIS_ENCODING_HT:
+        key = field.ptr if sdsEncodedObject(field) else sdsfromlonglong(field.ptr)
+        if dictDelete(o.ptr, key) == DICT_OK:
+            deleted = 1
+            # 删除之后哈希表可能太空, 尝试收缩
+            if htNeedsResize(o.ptr):
+                dictResize(o.ptr)
+    else:
+        raise RuntimeError("Unknown hash encoding")
+    return deleted
+
+def hashTypeLength(o: robj) -> int:
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        return ziplistLen(o.ptr) // 2
+    elif o.encoding == REDIS_ENCODING_HT:
+        return dictSize(o.ptr)
+    raise RuntimeError("Unknown hash encoding")
+
+class hashTypeIterator:
+    def __init__(self, subject: robj) -> None:
+        self.subject = subject
+        self.encoding = subject.encoding
+        # ziplist 编码: 当前字段和值节点
+        self.fptr: Opt[cstrptr] = None
+        self.vptr: Opt[cstrptr] = None
+        # 哈希表编码: 字典迭代器和当前节点
+        self.di: Opt[dictIterator] = None
+        self.de: Opt[dictEntry] = None
+
+def hashTypeInitIterator(subject: robj) -> hashTypeIterator:
+    hi = hashTypeIterator(subject)
+    if hi.encoding == REDIS_ENCODING_HT:
+        hi.di = dictGetIterator(subject.ptr)
+    elif hi.encoding != REDIS_ENCODING_ZIPLIST:
+        raise RuntimeError("Unknown hash encoding")
+    return hi
+
+def hashTypeReleaseIterator(hi: hashTypeIterator) -> None:
+    if hi.di is not None:
+        dictReleaseIterator(hi.di)
+        hi.di = None
+
+def hashTypeNext(hi: hashTypeIterator) -> int:
+    """移动到下一个字段, 没有更多字段时返回 REDIS_ERR"""
+    if hi.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = hi.subject.ptr
+        if hi.fptr is None:
+            # 第一次调用, 从第一个字段开始
+            assert hi.vptr is None
+            fptr = ziplistIndex(zl, 0)
+        else:
+            assert hi.vptr is not None
+            fptr = ziplistNext(zl, hi.vptr)
+        if fptr is None:
+            return REDIS_ERR
+        vptr = ziplistNext(zl, fptr)
+        assert vptr is not None
+        hi.fptr = fptr
+        hi.vptr = vptr
+    elif hi.encoding == REDIS_ENCODING_HT:
+        assert hi.di is not None
+        hi.de = dictNext(hi.di)
+        if hi.de is None:
+            return REDIS_ERR
+    else:
+        raise RuntimeError("Unknown hash encoding")
+    return REDIS_OK
+
+def hashTypeCurrent(hi: hashTypeIterator, what: int) -> HashValue:
+    """迭代器当前位置的字段 (what 为 REDIS_HASH_KEY) 或值 (REDIS_HASH_VALUE)"""
+    if hi.encoding == REDIS_ENCODING_ZIPLIST:
+        p = hi.fptr if what & REDIS_HASH_KEY else hi.vptr
+        assert p is not None
+        return ziplistGetValue(p)
+    assert hi.de is not None
+    s = hi.de.key if what & REDIS_HASH_KEY else hi.de.v.val
+    return bytes(s.buf[:sdslen(s)])
+
+def addHashIteratorCursorToReply(c: 'RedisClient', hi: hashTypeIterator, what: int) -> None:
+    if hi.encoding == REDIS_ENCODING_HT:
+        assert hi.de is not None
+        s = hi.de.key if what & REDIS_HASH_KEY else hi.de.v.val
+        addReplyBulkCBuffer(c, s.buf, sdslen(s))
+        return
+    value = hashValueBytes(hashTypeCurrent(hi, what))
+    addReplyBulkCBuffer(c, value, len(value))
+
+def hashTypeLookupWriteOrCreate(c: 'RedisClient', key: robj) -> Opt[robj]:
+    o = lookupKeyWrite(c.db, key)
+    if o is None:
+        o = createHashObject()
+        dbAdd(c.db, key, o)
+    elif o.type != REDIS_HASH:
+        addReply(c, get_shared().wrongtypeerr)
+        return None
+    return o
+
+def hashTypeConvertZiplist(o: robj, enc: int) -> None:
+    assert o.type == REDIS_HASH and o.encoding == REDIS_ENCODING_ZIPLIST
+    if enc == REDIS_ENCODING_ZIPLIST:
+        return
+    elif enc != REDIS_ENCODING_HT:
+        raise RuntimeError("Unknown hash encoding")
+    d: rDict = dictCreate(hashDictType, None)
+    hi = hashTypeInitIterator(o)
+    while hashTypeNext(hi) != REDIS_ERR:
+        field = hashValueBytes(hashTypeCurrent(hi, REDIS_HASH_KEY))
+        value = hashValueBytes(hashTypeCurrent(hi, REDIS_HASH_VALUE))
+        ret = dictAdd(d, sdsnewlen(field, len(field)), sdsnewlen(value, len(value)))
+        if ret != DICT_OK:
+            raise RuntimeError("Ziplist corruption detected")
+    hashTypeReleaseIterator(hi)
+    o.encoding = REDIS_ENCODING_HT
+    o.ptr = d
+
+def hashTypeConvert(o: robj, enc: int) -> None:
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        hashTypeConvertZiplist(o, enc)
+    elif o.encoding == REDIS_ENCODING_HT:
+        raise RuntimeError("Not implemented")
+    else:
+        raise RuntimeError("Unknown hash encoding")
+
+def checkHashType(c: 'RedisClient', o: robj) -> bool:
+    if o.type != REDIS_HASH:
+        addReply(c, get_shared().wrongtypeerr)
+        return True
+    return False
+
+def hsetCommand(c: 'RedisClient') -> None:
+    """HSET key field value [field value ...], 返回新增的字段数"""
+    if c.argc % 2 == 1:
+        addReplyError(c, "wrong number of arguments for '%s' command" % c.argv[0].ptr.text.lower())
+        return
+    o = hashTypeLookupWriteOrCreate(c, c.argv[1])
+    if o is None:
+        return
+    hashTypeTryConversion(o, c.argv, 2, c.argc - 1)
+    created = 0
+    for i in range(2, c.argc, 2):
+        if not hashTypeSet(o, c.argv[i], c.argv[i+1]):
+            created += 1
+    addReplyLongLong(c, created)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_HASH, "hset", c.argv[1], c.db.id)
+    get_server().dirty += (c.argc - 2) // 2
+
+def hmsetCommand(c: 'RedisClient') -> None:
+    if c.argc % 2 == 1:
+        addReplyError(c, "wrong number of arguments for HMSET")
+        return
+    o = hashTypeLookupWriteOrCreate(c, c.argv[1])
+    if o is None:
+        return
+    hashTypeTryConversion(o, c.argv, 2, c.argc - 1)
+    for i in range(2, c.argc, 2):
+        hashTypeSet(o, c.argv[i], c.argv[i+1])
+    addReply(c, get_shared().ok)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_HASH, "hset", c.argv[1], c.db.id)
+    get_server().dirty += 1
+
+def hsetnxCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    o = hashTypeLookupWriteOrCreate(c, c.argv[1])
+    if o is None:
+        return
+    hashTypeTryConversion(o, c.argv, 2, 3)
+    if hashTypeExists(o, c.argv[2]):
+        addReply(c, shared.czero)
+        return
+    hashTypeSet(o, c.argv[2], c.argv[3])
+    addReply(c, shared.cone)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_HASH, "hset", c.argv[1], c.db.id)
+    get_server().dirty += 1
+
+def addHashFieldToReply(c: 'RedisClient', o: Opt[robj], field: robj) -> None:
+    if o is None:
+        addReply(c, get_shared().nullbulk)
+        return
+    if o.encoding == REDIS_ENCODING_HT:
+        s = hashTypeGetFromHashTable(o, field)
+        if s is None:
+            addReply(c, get_shared().nullbulk)
+        else:
+            addReplyBulkCBuffer(c, s.buf, sdslen(s))
+        return
+    value = hashTypeGetValue(o, field)
+    if value is None:
+        addReply(c, get_shared().nullbulk)
+    else:
+        value = hashValueBytes(value)
+        addReplyBulkCBuffer(c, value, len(value))
+
+def hgetCommand(c: 'RedisClient') -> None:
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().nullbulk)
+    if o is None or checkHashType(c, o):
+        return
+    addHashFieldToReply(c, o, c.argv[2])
+
+def hmgetCommand(c: 'RedisClient') -> None:
+    # 键不存在时每个字段都回复空值, 所以不使用 lookupKeyReadOrReply
+    o = lookupKeyRead(c.db, c.argv[1])
+    if o is not None and checkHashType(c, o):
+        return
+    addReplyMultiBulkLen(c, c.argc - 2)
+    for i in range(2, c.argc):
+        addHashFieldToReply(c, o, c.argv[i])
+
+def hdelCommand(c: 'RedisClient') -> None:
+    o = lookupKeyWriteOrReply(c, c.argv[1], get_shared().czero)
+    if o is None or checkHashType(c, o):
+        return
+    deleted = 0
+    keyremoved = False
+    for i in range(2, c.argc):
+        if hashTypeDelete(o, c.argv[i]):
+            deleted += 1
+            if hashTypeLength(o) == 0:
+                dbDelete(c.db, c.argv[1])
+                keyremoved = True
+                break
+    if deleted:
+        signalModifiedKey(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_HASH, "hdel", c.argv[1], c.db.id)
+        if keyremoved:
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+        get_server().dirty += deleted
+    addReplyLongLong(c, deleted)
+
+def hlenCommand(c: 'RedisClient') -> None:
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().czero)
+    if o is None or checkHashType(c, o):
+        return
+    addReplyLongLong(c, hashTypeLength(o))
+
+def hexistsCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.czero)
+    if o is None or checkHashType(c, o):
+        return
+    addReply(c, shared.cone if hashTypeExists(o, c.argv[2]) else shared.czero)
+
+def hincrbyCommand(c: 'RedisClient') -> None:
+    status, incr = getLongLongFromObjectOrReply(c, c.argv[3], None)
+    if status != REDIS_OK:
+        return
+    o = hashTypeLookupWriteOrCreate(c, c.argv[1])
+    if o is None:
+        return
+    current = hashTypeGetValue(o, c.argv[2])
+    value = 0
+    if current is not None:
+        if isinstance(current, int):
+            value = current
+        else:
+            ok, value = string2ll(current, len(current))
+            if not ok:
+                addReplyError(c, "hash value is not an integer")
+                return
+    if (incr < 0 and value < 0 and incr < LONG_MIN - value) or (incr > 0 and value > 0 and incr > LONG_MAX - value):
+        addReplyError(c, "increment or decrement would overflow")
+        return
+    value += incr
+    new = createStringObjectFromLongLong(value)
+    hashTypeTryConversion(o, c.argv, 2, 3)
+    hashTypeSet(o, c.argv[2], new)
+    decrRefCount(new)
+    addReplyLongLong(c, value)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_HASH, "hincrby", c.argv[1], c.db.id)
+    get_server().dirty += 1
+
+def hincrbyfloatCommand(c: 'RedisClient') -> None:
+    status, incr = getLongDoubleFromObjectOrReply(c, c.argv[3], None)
+    if status != REDIS_OK:
+        return
+    o = hashTypeLookupWriteOrCreate(c, c.argv[1])
+    if o is None:
+        return
+    current = hashTypeGetValue(o, c.argv[2])
+    value = 0.0
+    if current is not None:
+        current = hashValueBytes(current)
+        status, value = getLongDoubleFromObject(createStringObject(current, len(current)))
+        if status != REDIS_OK:
+            addReplyError(c, "hash value is not a float")
+            return
+    value += incr
+    if math.isnan(value) or math.isinf(value):
+        addReplyError(c, "increment would produce NaN or Infinity")
+        return
+    new = createStringObjectFromLongDouble(value)
+    hashTypeTryConversion(o, c.argv, 2, 3)
+    hashTypeSet(o, c.argv[2], new)
+    addReplyBulk(c, new)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_HASH, "hincrbyfloat", c.argv[1], c.db.id)
+    get_server().dirty += 1
+    # 和 INCRBYFLOAT 一样, 以 HSET 传播计算结果
+    aux = createStringObject(b'HSET', 4)
+    rewriteClientCommandArgument(c, 0, aux)
+    decrRefCount(aux)
+    rewriteClientCommandArgument(c, 3, new)
+    decrRefCount(new)
+
+def genericHgetallCommand(c: 'RedisClient', flags: int) -> None:
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().emptymultibulk)
+    if o is None or checkHashType(c, o):
+        return
+    length = hashTypeLength(o)
+    if flags & REDIS_HASH_KEY and flags & REDIS_HASH_VALUE:
+        length *= 2
+    addReplyMultiBulkLen(c, length)
+    hi = hashTypeInitIterator(o)
+    count = 0
+    while hashTypeNext(hi) != REDIS_ERR:
+        if flags & REDIS_HASH_KEY:
+            addHashIteratorCursorToReply(c, hi, REDIS_HASH_KEY)
+            count += 1
+        if flags & REDIS_HASH_VALUE:
+            addHashIteratorCursorToReply(c, hi, REDIS_HASH_VALUE)
+            count += 1
+    hashTypeReleaseIterator(hi)
+    assert count == length
+
+def hkeysCommand(c: 'RedisClient') -> None:
+    genericHgetallCommand(c, REDIS_HASH_KEY)
+
+def hvalsCommand(c: 'RedisClient') -> None:
+    genericHgetallCommand(c, REDIS_HASH_VALUE)
+
+def hgetallCommand(c: 'RedisClient') -> None:
+    genericHgetallCommand(c, REDIS_HASH_KEY | REDIS_HASH_VALUE)
+
+def hscanCommand(c: 'RedisClient') -> None:
+    status, cursor = parseScanCursorOrReply(c, c.argv[2])
+    if status != REDIS_OK:
+        return
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().emptyscan)
+    if o is None or checkHashType(c, o):
+        return
+    scanGenericCommand(c, o, cursor)
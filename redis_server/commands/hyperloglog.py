@@ -0,0 +1,577 @@
+import typing
+import weakref
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from typing import List, Optional as Opt, Tuple, Union
+from ..config import *
+from ..robject import *
+from ..sds import sds, sdslen
+from ..db import lookupKeyWrite, lookupKeyRead, dbAdd, dbUnshareStringValue, signalModifiedKey, notifyKeyspaceEvent
+from ..util import get_shared, get_server, optionalImport
+from ..networking import addReply, addReplyLongLong, addReplyString
+
+__all__ = [
+    'pfaddCommand',
+    'pfcountCommand',
+    'pfmergeCommand',
+]
+
+# HyperLogLog 保存在字符串中, 格式和 Redis 相同, 可以和 Redis 互相复制/迁移:
+#
+# +------+---+-----+----------+
+# | HYLL | E | N/U | Cardin.  |
+# +------+---+-----+----------+
+#
+# 16 字节的头部: 4 字节的 "HYLL", 1 字节的编码, 3 字节未使用, 8 字节小端序的基数缓存,
+# 基数缓存最高字节的最高位为 1 时缓存无效。
+#
+# 密集编码: 16384 个 6 位的寄存器, 从低位开始连续存放, 一共 12288 字节。
+# 稀疏编码: 由三种操作码组成, 描述连续的寄存器:
+#   ZERO  00xxxxxx           xxxxxx+1 个值为 0 的寄存器 (1-64)
+#   XZERO 01xxxxxx yyyyyyyy  xxxxxxyyyyyyyy+1 个值为 0 的寄存器 (1-16384)
+#   VAL   1vvvvvxx           xx+1 个值为 vvvvv+1 的寄存器 (值 1-32, 个数 1-4)
+# 稀疏编码的长度超过 hll-sparse-max-bytes, 或者有寄存器的值超过 32 时转换成密集编码。
+
+HLL_P = 14
+HLL_Q = 64 - HLL_P
+HLL_REGISTERS = 1 << HLL_P
+HLL_P_MASK = HLL_REGISTERS - 1
+HLL_BITS = 6
+HLL_REGISTER_MAX = (1 << HLL_BITS) - 1
+HLL_HDR_SIZE = 16
+HLL_DENSE_SIZE = HLL_HDR_SIZE + (HLL_REGISTERS * HLL_BITS + 7) // 8
+HLL_DENSE = 0
+HLL_SPARSE = 1
+HLL_MAX_ENCODING = 1
+HLL_ALPHA_INF = 0.721347520444481703680
+HLL_HASH_SEED = 0xadc83b19
+
+HLL_SPARSE_VAL_MAX_VALUE = 32
+HLL_SPARSE_VAL_MAX_LEN = 4
+HLL_SPARSE_ZERO_MAX_LEN = 64
+HLL_SPARSE_XZERO_MAX_LEN = 16384
+
+HLL_INVALID_ERR = b"-INVALIDOBJ Corrupted HLL object detected\r\n"
+HLL_WRONGTYPE_ERR = b"-WRONGTYPE Key is not a valid HyperLogLog string value.\r\n"
+
+# 寄存器值的直方图, 以值的 sds 为键, 对象被释放时自动删除。
+# PFCOUNT 第一次计算基数时建立, 之后 PFADD 修改寄存器时同步更新, 基数缓存失效后只需要 O(64) 重新计算。
+# 只有被 PFCOUNT 过的键才有直方图, 从不计数的键不占用额外的内存
+hllHistoCache: 'weakref.WeakKeyDictionary[sds, List[int]]' = weakref.WeakKeyDictionary()
+
+_U64 = 0xffffffffffffffff
+
+def MurmurHash64A(key: Union[bytes, bytearray], length: int, seed: int) -> int:
+    m = 0xc6a4a7935bd1e995
+    r = 47
+    h = (seed ^ (length * m)) & _U64
+    end = length & ~7
+    for i in range(0, end, 8):
+        k = int.from_bytes(key[i:i+8], 'little')
+        k = (k * m) & _U64
+        k ^= k >> r
+        k = (k * m) & _U64
+        h ^= k
+        h = (h * m) & _U64
+    if length & 7:
+        h ^= int.from_bytes(key[end:length], 'little')
+        h = (h * m) & _U64
+    h ^= h >> r
+    h = (h * m) & _U64
+    h ^= h >> r
+    return h
+
+def hllPatLen(ele: Union[bytes, bytearray], elesize: int) -> Tuple[int, int]:
+    """返回元素对应的寄存器和 "000..1" 模式的长度"""
+    h = MurmurHash64A(ele, elesize, HLL_HASH_SEED)
+    index = h & HLL_P_MASK
+    h >>= HLL_P
+    # 保证循环会结束, 长度最多为 Q+1
+    h |= 1 << HLL_Q
+    return index, (h & -h).bit_length()
+
+# ------------------------- 密集编码 -------------------------
+# 寄存器的读写按 Redis 的宏逐个进行; 整体的解码/编码每 3 字节对应 4 个寄存器,
+# 用 bytes.translate 和大整数的或运算在 C 中完成, 不在 Python 中逐个寄存器循环
+
+def _table(f: typing.Callable[[int], int]) -> bytes:
+    return bytes(f(i) & 0xff for i in range(256))
+
+_LOW6 = _table(lambda b: b & 63)
+_SHR6 = _table(lambda b: b >> 6)
+_SHR4 = _table(lambda b: b >> 4)
+_SHR2 = _table(lambda b: b >> 2)
+_LOW4_SHL2 = _table(lambda b: (b & 15) << 2)
+_LOW2_SHL4 = _table(lambda b: (b & 3) << 4)
+_SHL6 = _table(lambda b: b << 6)
+_SHL4 = _table(lambda b: b << 4)
+_SHL2 = _table(lambda b: b << 2)
+
+def _orBytes(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+def hllDenseGetRegister(buf: bytearray, regnum: int) -> int:
+    # 最后一个寄存器读到的下一个字节是 sds 结尾的 \0
+    byte = HLL_HDR_SIZE + regnum * HLL_BITS // 8
+    fb = regnum * HLL_BITS & 7
+    return ((buf[byte] >> fb) | (buf[byte+1] << (8 - fb))) & HLL_REGISTER_MAX
+
+def hllDenseSetRegister(buf: bytearray, regnum: int, val: int) -> None:
+    byte = HLL_HDR_SIZE + regnum * HLL_BITS // 8
+    fb = regnum * HLL_BITS & 7
+    fb8 = 8 - fb
+    buf[byte] = (buf[byte] & ~(HLL_REGISTER_MAX << fb) | (val << fb)) & 0xff
+    buf[byte+1] = buf[byte+1] & ~(HLL_REGISTER_MAX >> fb8) & 0xff | (val >> fb8)
+
+def hllDenseSet(buf: bytearray, index: int, count: int, histo: Opt[List[int]]) -> int:
+    """寄存器的值小于 count 时更新并返回 1, 否则返回 0"""
+    oldcount = hllDenseGetRegister(buf, index)
+    if count > oldcount:
+        hllDenseSetRegister(buf, index, count)
+        if histo is not None:
+            histo[oldcount] -= 1
+            histo[count] += 1
+        return 1
+    return 0
+
+def hllDenseRegisters(buf: bytearray) -> bytes:
+    """把密集编码的寄存器解码成每个寄存器一个字节"""
+    p = buf[HLL_HDR_SIZE:HLL_DENSE_SIZE]
+    b0, b1, b2 = bytes(p[0::3]), bytes(p[1::3]), bytes(p[2::3])
+    regs = bytearray(HLL_REGISTERS)
+    regs[0::4] = b0.translate(_LOW6)
+    regs[1::4] = _orBytes(b0.translate(_SHR6), b1.translate(_LOW4_SHL2))
+    regs[2::4] = _orBytes(b1.translate(_SHR4), b2.translate(_LOW2_SHL4))
+    regs[3::4] = b2.translate(_SHR2)
+    return bytes(regs)
+
+def hllDenseFromRegisters(buf: bytearray, regs: Union[bytes, bytearray]) -> None:
+    """hllDenseRegisters 的逆操作, 寄存器的值不超过 63"""
+    r0, r1, r2, r3 = bytes(regs[0::4]), bytes(regs[1::4]), bytes(regs[2::4]), bytes(regs[3::4])
+    p = bytearray(HLL_DENSE_SIZE - HLL_HDR_SIZE)
+    p[0::3] = _orBytes(r0, r1.translate(_SHL6))
+    p[1::3] = _orBytes(r1.translate(_SHR2), r2.translate(_SHL4))
+    p[2::3] = _orBytes(r2.translate(_SHR4), r3.translate(_SHL2))
+    buf[HLL_HDR_SIZE:HLL_DENSE_SIZE] = p
+
+# ------------------------- 稀疏编码 -------------------------
+
+def hllSparseIsZero(op: int) -> bool:
+    return op & 0xc0 == 0
+
+def hllSparseIsXZero(op: int) -> bool:
+    return op & 0xc0 == 0x40
+
+def hllSparseIsVal(op: int) -> bool:
+    return op & 0x80 != 0
+
+def hllSparseValValue(op: int) -> int:
+    return ((op >> 2) & 0x1f) + 1
+
+def hllSparseValLen(op: int) -> int:
+    return (op & 0x3) + 1
+
+def hllSparseZero(length: int) -> bytes:
+    return bytes((length - 1,))
+
+def hllSparseXZero(length: int) -> bytes:
+    return bytes((((length - 1) >> 8) | 0x40, (length - 1) & 0xff))
+
+def hllSparseVal(val: int, length: int) -> int:
+    return ((val - 1) << 2 | (length - 1)) | 0x80
+
+def hllSparseZeros(length: int) -> bytes:
+    if length > HLL_SPARSE_ZERO_MAX_LEN:
+        return hllSparseXZero(length)
+    return hllSparseZero(length)
+
+def hllSparseRuns(s: sds) -> typing.Iterator[Tuple[int, int, int]]:
+    """依次返回稀疏编码中每个操作码的 (起始寄存器, 个数, 值)"""
+    buf = s.buf
+    p = HLL_HDR_SIZE
+    end = sdslen(s)
+    idx = 0
+    while p < end:
+        op = buf[p]
+        if hllSparseIsZero(op):
+            runlen = (op & 0x3f) + 1
+            yield idx, runlen, 0
+            p += 1
+        elif hllSparseIsXZero(op):
+            runlen = (((op & 0x3f) << 8) | buf[p+1]) + 1
+            yield idx, runlen, 0
+            p += 2
+        else:
+            runlen = hllSparseValLen(op)
+            yield idx, runlen, hllSparseValValue(op)
+            p += 1
+        idx += runlen
+
+def hllSparseRegisters(s: sds) -> Opt[bytearray]:
+    """解码稀疏编码的寄存器, 编码不合法时返回 None"""
+    regs = bytearray(HLL_REGISTERS)
+    idx = 0
+    for idx, runlen, val in hllSparseRuns(s):
+        if idx + runlen > HLL_REGISTERS:
+            return None
+        if val:
+            regs[idx:idx+runlen] = bytes((val,)) * runlen
+        idx += runlen
+    if idx != HLL_REGISTERS:
+        return None
+    return regs
+
+def hllSparseToDense(o: robj) -> int:
+    """把 o 转换成密集编码, 稀疏编码不合法时返回 REDIS_ERR"""
+    s = o.ptr
+    regs = hllSparseRegisters(s)
+    if regs is None:
+        return REDIS_ERR
+    buf = bytearray(HLL_DENSE_SIZE + 1)
+    buf[:HLL_HDR_SIZE] = s.buf[:HLL_HDR_SIZE]
+    buf[4] = HLL_DENSE
+    hllDenseFromRegisters(buf, regs)
+    dense = sds(HLL_DENSE_SIZE, 0, buf)
+    histo = hllHistoCache.pop(s, None)
+    if histo is not None:
+        hllHistoCache[dense] = histo
+    o.ptr = dense
+    return REDIS_OK
+
+def hllSparseSet(o: robj, index: int, count: int) -> int:
+    """
+    把寄存器 index 设置为 count (如果更大), 返回值和 hllDenseSet 相同, 编码不合法时返回 -1
+    稀疏编码放不下时转换成密集编码再设置
+    """
+    server = get_server()
+    s = o.ptr
+    histo = hllHistoCache.get(s)
+    if count > HLL_SPARSE_VAL_MAX_VALUE:
+        return hllSparsePromote(o, index, count)
+    buf = s.buf
+
+    # 找到包含 index 的操作码, prev 是它之前的一个操作码
+    p = HLL_HDR_SIZE
+    end = sdslen(s)
+    first = 0
+    prev = -1
+    span = 0
+    while p < end:
+        op = buf[p]
+        oplen = 1
+        if hllSparseIsZero(op):
+            span = (op & 0x3f) + 1
+        elif hllSparseIsVal(op):
+            span = hllSparseValLen(op)
+        else:
+            span = (((op & 0x3f) << 8) | buf[p+1]) + 1
+            oplen = 2
+        if index <= first + span - 1:
+            break
+        prev = p
+        p += oplen
+        first += span
+    if span == 0 or p >= end:
+        return -1
+
+    op = buf[p]
+    is_xzero = hllSparseIsXZero(op)
+    oldcount = 0
+    if hllSparseIsVal(op):
+        oldcount = hllSparseValValue(op)
+        if oldcount >= count:
+            return 0
+    if span == 1 and not is_xzero:
+        # 只描述一个寄存器的 ZERO 或 VAL, 原地修改
+        buf[p] = hllSparseVal(count, 1)
+    else:
+        # 一般情况: 把操作码拆成最多三段, 前后两段保持原来的值
+        last = first + span - 1
+        if oldcount == 0:
+            seq = hllSparseZeros(index - first) if index != first else b''
+            seq += bytes((hllSparseVal(count, 1),))
+            if index != last:
+                seq += hllSparseZeros(last - index)
+        else:
+            seq = bytes((hllSparseVal(oldcount, index - first),)) if index != first else b''
+            seq += bytes((hllSparseVal(count, 1),))
+            if index != last:
+                seq += bytes((hllSparseVal(oldcount, last - index),))
+        oldlen = 2 if is_xzero else 1
+        deltalen = len(seq) - oldlen
+        if deltalen > 0 and sdslen(s) + deltalen > server.hll_sparse_max_bytes:
+            return hllSparsePromote(o, index, count)
+        buf[p:p+oldlen] = seq
+        s.len += deltalen
+        end += deltalen
+
+    # 合并相邻的值相同的 VAL 操作码, 新的操作码最多影响前后 5 个操作码
+    p = prev if prev >= 0 else HLL_HDR_SIZE
+    scanlen = 5
+    while p < end and scanlen:
+        scanlen -= 1
+        op = buf[p]
+        if hllSparseIsXZero(op):
+            p += 2
+            continue
+        if hllSparseIsZero(op):
+            p += 1
+            continue
+        if p + 1 < end and hllSparseIsVal(buf[p+1]):
+            v1 = hllSparseValValue(op)
+            length = hllSparseValLen(op) + hllSparseValLen(buf[p+1])
+            if v1 == hllSparseValValue(buf[p+1]) and length <= HLL_SPARSE_VAL_MAX_LEN:
+                buf[p+1] = hllSparseVal(v1, length)
+                del buf[p]
+                s.len -= 1
+                end -= 1
+                continue
+        p += 1
+    if histo is not None:
+        histo[oldcount] -= 1
+        histo[count] += 1
+    return 1
+
+def hllSparsePromote(o: robj, index: int, count: int) -> int:
+    if hllSparseToDense(o) == REDIS_ERR:
+        return -1
+    return hllDenseSet(o.ptr.buf, index, count, hllHistoCache.get(o.ptr))
+
+def hllAdd(o: robj, ele: robj) -> int:
+    if sdsEncodedObject(ele):
+        index, count = hllPatLen(ele.ptr.buf, sdslen(ele.ptr))
+    else:
+        buf = b'%d' % ele.ptr
+        index, count = hllPatLen(buf, len(buf))
+    s = o.ptr
+    if s.buf[4] == HLL_DENSE:
+        return hllDenseSet(s.buf, index, count, hllHistoCache.get(s))
+    return hllSparseSet(o, index, count)
+
+# ------------------------- 基数估计 -------------------------
+
+def hllSigma(x: float) -> float:
+    if x == 1.:
+        return float('inf')
+    y = 1.
+    z = x
+    while True:
+        x *= x
+        zPrime = z
+        z += x * y
+        y += y
+        if zPrime == z:
+            return z
+
+def hllTau(x: float) -> float:
+    if x == 0. or x == 1.:
+        return 0.
+    y = 1.
+    z = 1 - x
+    while True:
+        x = x ** 0.5
+        zPrime = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if zPrime == z:
+            return z / 3
+
+def hllCount(reghisto: List[int]) -> int:
+    """
+    根据寄存器值的直方图估计基数, 使用 Otmar Ertl 的改进估计 (和 Redis 相同),
+    不需要针对小基数的修正
+    """
+    m = HLL_REGISTERS
+    z = m * hllTau((m - reghisto[HLL_Q+1]) / m)
+    for j in range(HLL_Q, 0, -1):
+        z += reghisto[j]
+        z *= 0.5
+    z += m * hllSigma(reghisto[0] / m)
+    return int(HLL_ALPHA_INF * m * m / z + 0.5)
+
+def hllRawRegHisto(regs: Union[bytes, bytearray]) -> List[int]:
+    np = optionalImport('numpy')
+    if np is not None:
+        return np.bincount(np.frombuffer(regs, dtype=np.uint8), minlength=HLL_REGISTER_MAX+1).tolist()
+    # bytes.count 在 C 中扫描, 64 次扫描比逐个寄存器的 Python 循环快得多
+    return [regs.count(i) for i in range(HLL_REGISTER_MAX+1)]
+
+def hllRegHisto(s: sds) -> Opt[List[int]]:
+    """寄存器值的直方图, 优先使用缓存; 编码不合法时返回 None"""
+    histo = hllHistoCache.get(s)
+    if histo is not None:
+        return histo
+    if s.buf[4] == HLL_DENSE:
+        histo = hllRawRegHisto(hllDenseRegisters(s.buf))
+    else:
+        histo = [0] * (HLL_REGISTER_MAX+1)
+        idx = 0
+        for idx, runlen, val in hllSparseRuns(s):
+            histo[val] += runlen
+            idx += runlen
+        if idx != HLL_REGISTERS:
+            return None
+    hllHistoCache[s] = histo
+    return histo
+
+def hllRegisters(s: sds) -> Opt[Union[bytes, bytearray]]:
+    if s.buf[4] == HLL_DENSE:
+        return hllDenseRegisters(s.buf)
+    return hllSparseRegisters(s)
+
+def hllMerge(regmax: bytearray, o: robj) -> int:
+    """把 o 的寄存器合并到 regmax 中, 每个寄存器取最大值"""
+    s = o.ptr
+    if s.buf[4] == HLL_SPARSE:
+        # 稀疏编码只需要处理 VAL 操作码
+        idx = 0
+        for idx, runlen, val in hllSparseRuns(s):
+            if idx + runlen > HLL_REGISTERS:
+                return REDIS_ERR
+            if val:
+                for i in range(idx, idx + runlen):
+                    if regmax[i] < val:
+                        regmax[i] = val
+            idx += runlen
+        return REDIS_OK if idx == HLL_REGISTERS else REDIS_ERR
+    regs = hllDenseRegisters(s.buf)
+    np = optionalImport('numpy')
+    if np is not None:
+        m = np.frombuffer(regmax, dtype=np.uint8)
+        np.maximum(m, np.frombuffer(regs, dtype=np.uint8), out=m)
+    else:
+        regmax[:] = bytes(map(max, regmax, regs))
+    return REDIS_OK
+
+# ------------------------- 命令 -------------------------
+
+def createHLLObject() -> robj:
+    """创建一个空的 HyperLogLog, 使用稀疏编码, 所有寄存器都是 0"""
+    buf = bytearray(b'HYLL')
+    buf.append(HLL_SPARSE)
+    buf += bytes(HLL_HDR_SIZE - 5)
+    for _ in range(0, HLL_REGISTERS, HLL_SPARSE_XZERO_MAX_LEN):
+        buf += hllSparseXZero(HLL_SPARSE_XZERO_MAX_LEN)
+    length = len(buf)
+    buf.append(0)
+    return createObject(REDIS_STRING, sds(length, 0, buf))
+
+def isHLLObjectOrReply(c: 'RedisClient', o: robj) -> int:
+    if o.type != REDIS_STRING:
+        addReply(c, get_shared().wrongtypeerr)
+        return REDIS_ERR
+    if sdsEncodedObject(o) and sdslen(o.ptr) >= HLL_HDR_SIZE:
+        buf = o.ptr.buf
+        if buf[:4] == b'HYLL' and buf[4] <= HLL_MAX_ENCODING and (
+                buf[4] != HLL_DENSE or sdslen(o.ptr) == HLL_DENSE_SIZE):
+            return REDIS_OK
+    addReplyString(c, HLL_WRONGTYPE_ERR, len(HLL_WRONGTYPE_ERR))
+    return REDIS_ERR
+
+def hllValidCache(s: sds) -> bool:
+    return s.buf[15] & 0x80 == 0
+
+def hllInvalidateCache(s: sds) -> None:
+    s.buf[15] |= 0x80
+
+def pfaddCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    o = lookupKeyWrite(c.db, c.argv[1])
+    updated = 0
+    if o is None:
+        o = createHLLObject()
+        dbAdd(c.db, c.argv[1], o)
+        updated += 1
+    else:
+        if isHLLObjectOrReply(c, o) != REDIS_OK:
+            return
+        o = dbUnshareStringValue(c.db, c.argv[1], o)
+    for j in range(2, c.argc):
+        retval = hllAdd(o, c.argv[j])
+        if retval == 1:
+            updated += 1
+        elif retval == -1:
+            hllHistoCache.pop(o.ptr, None)
+            addReplyString(c, HLL_INVALID_ERR, len(HLL_INVALID_ERR))
+            return
+    if updated:
+        hllInvalidateCache(o.ptr)
+        signalModifiedKey(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_STRING, "pfadd", c.argv[1], c.db.id)
+        server.dirty += 1
+    addReply(c, shared.cone if updated else shared.czero)
+
+def pfcountCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    if c.argc > 2:
+        # 多个键: 合并所有键的寄存器后计算并集的基数, 不使用也不更新缓存
+        regmax = bytearray(HLL_REGISTERS)
+        for j in range(1, c.argc):
+            o = lookupKeyRead(c.db, c.argv[j])
+            if o is None:
+                continue
+            if isHLLObjectOrReply(c, o) != REDIS_OK:
+                return
+            if hllMerge(regmax, o) == REDIS_ERR:
+                addReplyString(c, HLL_INVALID_ERR, len(HLL_INVALID_ERR))
+                return
+        addReplyLongLong(c, hllCount(hllRawRegHisto(regmax)))
+        return
+
+    o = lookupKeyWrite(c.db, c.argv[1])
+    if o is None:
+        addReply(c, get_shared().czero)
+        return
+    if isHLLObjectOrReply(c, o) != REDIS_OK:
+        return
+    o = dbUnshareStringValue(c.db, c.argv[1], o)
+    s = o.ptr
+    if hllValidCache(s):
+        card = int.from_bytes(s.buf[8:16], 'little')
+    else:
+        histo = hllRegHisto(s)
+        if histo is None:
+            addReplyString(c, HLL_INVALID_ERR, len(HLL_INVALID_ERR))
+            return
+        card = hllCount(histo)
+        s.buf[8:16] = card.to_bytes(8, 'little')
+        # 基数缓存是值的一部分, 需要传播到 AOF 和从服务器
+        signalModifiedKey(c.db, c.argv[1])
+        server.dirty += 1
+    addReplyLongLong(c, card)
+
+def pfmergeCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    regmax = bytearray(HLL_REGISTERS)
+    # 目标键本身也参与合并
+    for j in range(1, c.argc):
+        o = lookupKeyRead(c.db, c.argv[j])
+        if o is None:
+            continue
+        if isHLLObjectOrReply(c, o) != REDIS_OK:
+            return
+        if hllMerge(regmax, o) == REDIS_ERR:
+            addReplyString(c, HLL_INVALID_ERR, len(HLL_INVALID_ERR))
+            return
+
+    o = lookupKeyWrite(c.db, c.argv[1])
+    if o is None:
+        o = createHLLObject()
+        dbAdd(c.db, c.argv[1], o)
+    else:
+        o = dbUnshareStringValue(c.db, c.argv[1], o)
+    # 结果总是使用密集编码, 寄存器直接整体写入
+    buf = bytearray(HLL_DENSE_SIZE + 1)
+    buf[:HLL_HDR_SIZE] = o.ptr.buf[:HLL_HDR_SIZE]
+    buf[4] = HLL_DENSE
+    hllDenseFromRegisters(buf, regmax)
+    hllHistoCache.pop(o.ptr, None)
+    o.ptr = sds(HLL_DENSE_SIZE, 0, buf)
+    hllInvalidateCache(o.ptr)
+    hllHistoCache[o.ptr] = hllRawRegHisto(regmax)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_STRING, "pfadd", c.argv[1], c.db.id)
+    server.dirty += 1
+    addReply(c, get_shared().ok)
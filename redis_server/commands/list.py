@@ -0,0 +1,536 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+    from ..db import RedisDB
+from typing import Optional as Opt, Tuple, Union
+from ..config import *
+from ..robject import *
+from ..sds import sdslen
+from ..db import (
+    lookupKeyWrite, lookupKeyReadOrReply, lookupKeyWriteOrReply, dbAdd, dbDelete, signalModifiedKey,
+    notifyKeyspaceEvent,
+)
+from ..quicklist import (
+    quicklistEntry, quicklistPush, quicklistPop, quicklistCount, quicklistIndex, quicklistReplaceEntry,
+    quicklistGetIterator, quicklistGetIteratorAtIdx, quicklistNext, quicklistDelEntry, quicklistDelRange,
+    quicklistInsertBefore, quicklistInsertAfter, QUICKLIST_HEAD, QUICKLIST_TAIL, AL_START_HEAD, AL_START_TAIL,
+)
+from ..ziplist import ziplistCompare
+from ..adlist import listCreate, listFirst, listDelNode, listLength
+from ..blocked import blockForKeys, unblockClient, getTimeoutFromObjectOrReply
+from ..multi import watchedKeyName
+from ..csix import cstr
+from ..util import get_shared, get_server
+from ..networking import (
+    addReply, addReplyLongLong, addReplyMultiBulkLen, addReplyBulk, addReplyBulkCBuffer, rewriteClientCommandVector,
+)
+
+__all__ = [
+    'lpushCommand',
+    'rpushCommand',
+    'lpushxCommand',
+    'rpushxCommand',
+    'linsertCommand',
+    'lpopCommand',
+    'rpopCommand',
+    'llenCommand',
+    'lindexCommand',
+    'lsetCommand',
+    'lrangeCommand',
+    'ltrimCommand',
+    'lremCommand',
+    'rpoplpushCommand',
+    'lmoveCommand',
+    'blpopCommand',
+    'brpopCommand',
+    'brpoplpushCommand',
+    'blmoveCommand',
+]
+
+REDIS_HEAD = 0
+REDIS_TAIL = 1
+
+def listObjectBuffer(o: robj) -> Tuple[cstr, int]:
+    """列表元素参数的内容和长度, 整数编码的对象转换成字符串"""
+    if sdsEncodedObject(o):
+        return o.ptr.buf, sdslen(o.ptr)
+    buf = b'%d' % o.ptr
+    return buf, len(buf)
+
+def listTypePush(subject: robj, value: robj, where: int) -> None:
+    buf, length = listObjectBuffer(value)
+    quicklistPush(subject.ptr, buf, length, QUICKLIST_HEAD if where == REDIS_HEAD else QUICKLIST_TAIL)
+
+def listTypePushValue(subject: robj, value: Union[bytes, int], where: int) -> None:
+    """推入从列表中弹出的元素"""
+    if isinstance(value, int):
+        value = b'%d' % value
+    quicklistPush(subject.ptr, value, len(value), QUICKLIST_HEAD if where == REDIS_HEAD else QUICKLIST_TAIL)
+
+def listTypePop(subject: robj, where: int) -> Opt[Union[bytes, int]]:
+    return quicklistPop(subject.ptr, QUICKLIST_HEAD if where == REDIS_HEAD else QUICKLIST_TAIL)
+
+def listTypeLength(subject: robj) -> int:
+    return quicklistCount(subject.ptr)
+
+def addReplyListValue(c: 'RedisClient', value: Union[bytes, int]) -> None:
+    if isinstance(value, int):
+        value = b'%d' % value
+    addReplyBulkCBuffer(c, value, len(value))
+
+def checkListType(c: 'RedisClient', o: robj) -> bool:
+    if o.type != REDIS_LIST:
+        addReply(c, get_shared().wrongtypeerr)
+        return True
+    return False
+
+def pushGenericCommand(c: 'RedisClient', where: int) -> None:
+    server = get_server()
+    lobj = lookupKeyWrite(c.db, c.argv[1])
+    if lobj is not None and checkListType(c, lobj):
+        return
+    if lobj is None:
+        lobj = createQuicklistObject()
+        dbAdd(c.db, c.argv[1], lobj)
+    for j in range(2, c.argc):
+        listTypePush(lobj, c.argv[j], where)
+    pushed = c.argc - 2
+    addReplyLongLong(c, listTypeLength(lobj))
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpush" if where == REDIS_HEAD else "rpush", c.argv[1], c.db.id)
+    server.dirty += pushed
+
+def lpushCommand(c: 'RedisClient') -> None:
+    pushGenericCommand(c, REDIS_HEAD)
+
+def rpushCommand(c: 'RedisClient') -> None:
+    pushGenericCommand(c, REDIS_TAIL)
+
+def pushxGenericCommand(c: 'RedisClient', where: int) -> None:
+    server = get_server()
+    subject = lookupKeyReadOrReply(c, c.argv[1], get_shared().czero)
+    if subject is None or checkListType(c, subject):
+        return
+    listTypePush(subject, c.argv[2], where)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpush" if where == REDIS_HEAD else "rpush", c.argv[1], c.db.id)
+    server.dirty += 1
+    addReplyLongLong(c, listTypeLength(subject))
+
+def lpushxCommand(c: 'RedisClient') -> None:
+    pushxGenericCommand(c, REDIS_HEAD)
+
+def rpushxCommand(c: 'RedisClient') -> None:
+    pushxGenericCommand(c, REDIS_TAIL)
+
+def linsertCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    if c.argv[2].ptr.lowereq('after'):
+        after = True
+    elif c.argv[2].ptr.lowereq('before'):
+        after = False
+    else:
+        addReply(c, shared.syntaxerr)
+        return
+    subject = lookupKeyWriteOrReply(c, c.argv[1], shared.czero)
+    if subject is None or checkListType(c, subject):
+        return
+
+    pivot, pivotlen = listObjectBuffer(c.argv[3])
+    ql = subject.ptr
+    it = quicklistGetIterator(ql, AL_START_HEAD)
+    entry = quicklistEntry()
+    while quicklistNext(it, entry):
+        if ziplistCompare(entry.zi, pivot, pivotlen):
+            value, length = listObjectBuffer(c.argv[4])
+            if after:
+                quicklistInsertAfter(ql, entry, value, length)
+            else:
+                quicklistInsertBefore(ql, entry, value, length)
+            break
+    else:
+        # 没有找到 pivot
+        addReply(c, shared.cnegone)
+        return
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "linsert", c.argv[1], c.db.id)
+    server.dirty += 1
+    addReplyLongLong(c, listTypeLength(subject))
+
+def llenCommand(c: 'RedisClient') -> None:
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().czero)
+    if o is None or checkListType(c, o):
+        return
+    addReplyLongLong(c, listTypeLength(o))
+
+def lindexCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.nullbulk)
+    if o is None or checkListType(c, o):
+        return
+    status, index = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    entry = quicklistIndex(o.ptr, index)
+    if entry is None:
+        addReply(c, shared.nullbulk)
+    else:
+        addReplyListValue(c, entry.value)
+
+def lsetCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    o = lookupKeyWriteOrReply(c, c.argv[1], shared.nokeyerr)
+    if o is None or checkListType(c, o):
+        return
+    status, index = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    entry = quicklistIndex(o.ptr, index)
+    if entry is None:
+        addReply(c, shared.outofrangeerr)
+        return
+    value, length = listObjectBuffer(c.argv[3])
+    quicklistReplaceEntry(o.ptr, entry, value, length)
+    addReply(c, shared.ok)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lset", c.argv[1], c.db.id)
+    server.dirty += 1
+
+def popGenericCommand(c: 'RedisClient', where: int) -> None:
+    server = get_server()
+    shared = get_shared()
+    o = lookupKeyWriteOrReply(c, c.argv[1], shared.nullbulk)
+    if o is None or checkListType(c, o):
+        return
+    value = listTypePop(o, where)
+    if value is None:
+        addReply(c, shared.nullbulk)
+        return
+    addReplyListValue(c, value)
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpop" if where == REDIS_HEAD else "rpop", c.argv[1], c.db.id)
+    if listTypeLength(o) == 0:
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+        dbDelete(c.db, c.argv[1])
+    signalModifiedKey(c.db, c.argv[1])
+    server.dirty += 1
+
+def lpopCommand(c: 'RedisClient') -> None:
+    popGenericCommand(c, REDIS_HEAD)
+
+def rpopCommand(c: 'RedisClient') -> None:
+    popGenericCommand(c, REDIS_TAIL)
+
+def lrangeCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    status, start = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    status, end = getLongLongFromObjectOrReply(c, c.argv[3], None)
+    if status != REDIS_OK:
+        return
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.emptymultibulk)
+    if o is None or checkListType(c, o):
+        return
+    llen = listTypeLength(o)
+
+    if start < 0:
+        start = llen + start
+    if end < 0:
+        end = llen + end
+    if start < 0:
+        start = 0
+    if start > end or start >= llen:
+        addReply(c, shared.emptymultibulk)
+        return
+    if end >= llen:
+        end = llen - 1
+    rangelen = end - start + 1
+
+    addReplyMultiBulkLen(c, rangelen)
+    it = quicklistGetIteratorAtIdx(o.ptr, AL_START_HEAD, start)
+    assert it is not None
+    entry = quicklistEntry()
+    while rangelen:
+        quicklistNext(it, entry)
+        addReplyListValue(c, entry.value)
+        rangelen -= 1
+
+def ltrimCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    status, start = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    status, end = getLongLongFromObjectOrReply(c, c.argv[3], None)
+    if status != REDIS_OK:
+        return
+    o = lookupKeyWriteOrReply(c, c.argv[1], shared.ok)
+    if o is None or checkListType(c, o):
+        return
+    llen = listTypeLength(o)
+
+    if start < 0:
+        start = llen + start
+    if end < 0:
+        end = llen + end
+    if start < 0:
+        start = 0
+    if start > end or start >= llen:
+        # 结果为空列表
+        ltrim = llen
+        rtrim = 0
+    else:
+        if end >= llen:
+            end = llen - 1
+        ltrim = start
+        rtrim = llen - end - 1
+
+    quicklistDelRange(o.ptr, 0, ltrim)
+    quicklistDelRange(o.ptr, -rtrim, rtrim)
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "ltrim", c.argv[1], c.db.id)
+    if listTypeLength(o) == 0:
+        dbDelete(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+    signalModifiedKey(c.db, c.argv[1])
+    server.dirty += ltrim + rtrim
+    addReply(c, shared.ok)
+
+def lremCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    status, toremove = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    subject = lookupKeyWriteOrReply(c, c.argv[1], shared.czero)
+    if subject is None or checkListType(c, subject):
+        return
+
+    value, length = listObjectBuffer(c.argv[3])
+    # count 为负数时从尾部开始删除
+    if toremove < 0:
+        toremove = -toremove
+        it = quicklistGetIterator(subject.ptr, AL_START_TAIL)
+    else:
+        it = quicklistGetIterator(subject.ptr, AL_START_HEAD)
+    entry = quicklistEntry()
+    removed = 0
+    while quicklistNext(it, entry):
+        if ziplistCompare(entry.zi, value, length):
+            quicklistDelEntry(it, entry)
+            server.dirty += 1
+            removed += 1
+            if toremove and removed == toremove:
+                break
+
+    if removed:
+        signalModifiedKey(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lrem", c.argv[1], c.db.id)
+    if listTypeLength(subject) == 0:
+        dbDelete(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+    addReplyLongLong(c, removed)
+
+def getListPositionFromObjectOrReply(c: 'RedisClient', arg: robj) -> Tuple[int, int]:
+    """解析 LMOVE / BLMOVE 的 LEFT 和 RIGHT 参数"""
+    buf, length = listObjectBuffer(arg)
+    pos = bytes(buf[:length]).lower()
+    if pos == b'left':
+        return REDIS_OK, REDIS_HEAD
+    if pos == b'right':
+        return REDIS_OK, REDIS_TAIL
+    addReply(c, get_shared().syntaxerr)
+    return REDIS_ERR, 0
+
+def listPositionObject(where: int) -> robj:
+    shared = get_shared()
+    return shared.left if where == REDIS_HEAD else shared.right
+
+def lmoveHandlePush(c: 'RedisClient', dstkey: robj, dstobj: Opt[robj], value: Union[bytes, int], where: int) -> None:
+    if dstobj is None:
+        dstobj = createQuicklistObject()
+        dbAdd(c.db, dstkey, dstobj)
+    signalModifiedKey(c.db, dstkey)
+    listTypePushValue(dstobj, value, where)
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpush" if where == REDIS_HEAD else "rpush", dstkey, c.db.id)
+    addReplyListValue(c, value)
+
+def lmoveGenericCommand(c: 'RedisClient', wherefrom: int, whereto: int) -> None:
+    server = get_server()
+    sobj = lookupKeyWriteOrReply(c, c.argv[1], get_shared().nullbulk)
+    if sobj is None or checkListType(c, sobj):
+        return
+    dobj = lookupKeyWrite(c.db, c.argv[2])
+    if dobj is not None and checkListType(c, dobj):
+        return
+    # 源键存在时一定不是空列表
+    value = listTypePop(sobj, wherefrom)
+    assert value is not None
+    # 源键和目标键相同时先弹出再推入, 列表不会在中途被删除
+    lmoveHandlePush(c, c.argv[2], dobj, value, whereto)
+    notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpop" if wherefrom == REDIS_HEAD else "rpop", c.argv[1], c.db.id)
+    if listTypeLength(sobj) == 0:
+        dbDelete(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+    signalModifiedKey(c.db, c.argv[1])
+    server.dirty += 1
+
+def rpoplpushCommand(c: 'RedisClient') -> None:
+    lmoveGenericCommand(c, REDIS_TAIL, REDIS_HEAD)
+
+def lmoveCommand(c: 'RedisClient') -> None:
+    status, wherefrom = getListPositionFromObjectOrReply(c, c.argv[3])
+    if status != REDIS_OK:
+        return
+    status, whereto = getListPositionFromObjectOrReply(c, c.argv[4])
+    if status != REDIS_OK:
+        return
+    lmoveGenericCommand(c, wherefrom, whereto)
+
+# 阻塞操作
+#
+# 客户端阻塞在空列表上之后, 键被推入元素 (创建列表键) 时 dbAdd() 调用 signalListAsReady(),
+# 把键加入 server.ready_keys。processCommand() 在命令执行完之后调用 handleClientsBlockedOnLists(),
+# 按阻塞的先后顺序服务阻塞在这些键上的客户端, 直到列表被弹空。
+# 只有被唤醒的客户端会被访问, 其他阻塞的客户端不受影响, 客户端的阻塞状态见 blocked.py。
+
+def serveClientBlockedOnList(receiver: 'RedisClient', key: robj, dstkey: Opt[robj], db: 'RedisDB',
+                             value: Union[bytes, int], wherefrom: int, whereto: int) -> int:
+    """把弹出的元素回复给被唤醒的客户端, 失败时 (目标键的类型不对) 由调用者把元素放回列表"""
+    from ..redis import propagate
+    server = get_server()
+    shared = get_shared()
+    if dstkey is None:
+        # 以 LPOP / RPOP 传播
+        if wherefrom == REDIS_HEAD:
+            propagate(server.lpopCommand, db.id, [shared.lpop, key], REDIS_PROPAGATE_AOF|REDIS_PROPAGATE_REPL)
+        else:
+            propagate(server.rpopCommand, db.id, [shared.rpop, key], REDIS_PROPAGATE_AOF|REDIS_PROPAGATE_REPL)
+        addReplyMultiBulkLen(receiver, 2)
+        addReplyBulk(receiver, key)
+        addReplyListValue(receiver, value)
+    else:
+        dstobj = lookupKeyWrite(receiver.db, dstkey)
+        if dstobj is not None and checkListType(receiver, dstobj):
+            return REDIS_ERR
+        lmoveHandlePush(receiver, dstkey, dstobj, value, whereto)
+        # 以 LMOVE 传播, BRPOPLPUSH 也一样
+        propagate(server.lmoveCommand, db.id,
+                  [shared.lmove, key, dstkey, listPositionObject(wherefrom), listPositionObject(whereto)],
+                  REDIS_PROPAGATE_AOF|REDIS_PROPAGATE_REPL)
+    return REDIS_OK
+
+def handleClientsBlockedOnLists() -> None:
+    server = get_server()
+    while listLength(server.ready_keys):
+        # 服务客户端时 BLMOVE 推入的目标键可能成为新的就绪键, 在下一轮处理
+        l = server.ready_keys
+        server.ready_keys = listCreate()
+        while listLength(l):
+            ln = listFirst(l)
+            assert ln
+            rl = ln.value
+            name = watchedKeyName(rl.key)
+            rl.db.ready_keys.discard(name)
+            # 键在被标记之后可能已经被删除或者覆盖
+            o = lookupKeyWrite(rl.db, rl.key)
+            if o is not None and o.type == REDIS_LIST:
+                clients = rl.db.blocking_keys.get(name)
+                numclients = listLength(clients) if clients is not None else 0
+                while numclients:
+                    numclients -= 1
+                    receiver = clients.head.value   # type: ignore
+                    wherefrom = receiver.bpop.wherefrom
+                    whereto = receiver.bpop.whereto
+                    value = listTypePop(o, wherefrom)
+                    if value is None:
+                        break
+                    dstkey = receiver.bpop.target
+                    if dstkey is not None:
+                        incrRefCount(dstkey)
+                    unblockClient(receiver)
+                    if serveClientBlockedOnList(receiver, rl.key, dstkey, rl.db, value, wherefrom, whereto) != REDIS_OK:
+                        listTypePushValue(o, value, wherefrom)
+                    else:
+                        notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpop" if wherefrom == REDIS_HEAD else "rpop",
+                                            rl.key, rl.db.id)
+                    if dstkey is not None:
+                        decrRefCount(dstkey)
+                if listTypeLength(o) == 0:
+                    dbDelete(rl.db, rl.key)
+                    notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", rl.key, rl.db.id)
+            decrRefCount(rl.key)
+            listDelNode(l, ln)
+
+def blockingPopGenericCommand(c: 'RedisClient', where: int) -> None:
+    server = get_server()
+    shared = get_shared()
+    status, timeout = getTimeoutFromObjectOrReply(c, c.argv[c.argc-1])
+    if status != REDIS_OK:
+        return
+    for j in range(1, c.argc-1):
+        o = lookupKeyWrite(c.db, c.argv[j])
+        if o is None:
+            continue
+        if checkListType(c, o):
+            return
+        # 列表不为空, 和 LPOP / RPOP 一样处理
+        key = c.argv[j]
+        value = listTypePop(o, where)
+        assert value is not None
+        addReplyMultiBulkLen(c, 2)
+        addReplyBulk(c, key)
+        addReplyListValue(c, value)
+        notifyKeyspaceEvent(REDIS_NOTIFY_LIST, "lpop" if where == REDIS_HEAD else "rpop", key, c.db.id)
+        if listTypeLength(o) == 0:
+            dbDelete(c.db, key)
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", key, c.db.id)
+        signalModifiedKey(c.db, key)
+        server.dirty += 1
+        # 以 LPOP / RPOP 传播
+        rewriteClientCommandVector(c, [shared.lpop if where == REDIS_HEAD else shared.rpop, key])
+        return
+    # 事务中不能阻塞, 当作立即超时
+    if c.flags & REDIS_MULTI:
+        addReply(c, shared.nullmultibulk)
+        return
+    blockForKeys(c, c.argv[1:c.argc-1], timeout, None, where, REDIS_HEAD)
+
+def blpopCommand(c: 'RedisClient') -> None:
+    blockingPopGenericCommand(c, REDIS_HEAD)
+
+def brpopCommand(c: 'RedisClient') -> None:
+    blockingPopGenericCommand(c, REDIS_TAIL)
+
+def blmoveGenericCommand(c: 'RedisClient', wherefrom: int, whereto: int) -> None:
+    shared = get_shared()
+    status, timeout = getTimeoutFromObjectOrReply(c, c.argv[c.argc-1])
+    if status != REDIS_OK:
+        return
+    key = lookupKeyWrite(c.db, c.argv[1])
+    if key is None:
+        if c.flags & REDIS_MULTI:
+            addReply(c, shared.nullbulk)
+            return
+        blockForKeys(c, [c.argv[1]], timeout, c.argv[2], wherefrom, whereto)
+        return
+    if checkListType(c, key):
+        return
+    lmoveGenericCommand(c, wherefrom, whereto)
+    # 以 LMOVE 传播
+    rewriteClientCommandVector(c, [shared.lmove, c.argv[1], c.argv[2],
+                                   listPositionObject(wherefrom), listPositionObject(whereto)])
+
+def brpoplpushCommand(c: 'RedisClient') -> None:
+    blmoveGenericCommand(c, REDIS_TAIL, REDIS_HEAD)
+
+def blmoveCommand(c: 'RedisClient') -> None:
+    status, wherefrom = getListPositionFromObjectOrReply(c, c.argv[3])
+    if status != REDIS_OK:
+        return
+    status, whereto = getListPositionFromObjectOrReply(c, c.argv[4])
+    if status != REDIS_OK:
+        return
+    blmoveGenericCommand(c, wherefrom, whereto)
@@ -0,0 +1,71 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from ..config import REDIS_MULTI, REDIS_DIRTY_CAS, REDIS_DIRTY_EXEC, REDIS_CALL_FULL
+from ..util import get_shared
+from ..networking import addReply, addReplyError, addReplyMultiBulkLen
+from ..multi import discardTransaction, watchForKey, unwatchAllKeys, watchedKeysModified
+
+__all__ = [
+    'multiCommand',
+    'discardCommand',
+    'execCommand',
+    'watchCommand',
+    'unwatchCommand',
+]
+
+def multiCommand(c: 'RedisClient') -> None:
+    if c.flags & REDIS_MULTI:
+        addReplyError(c, "MULTI calls can not be nested")
+        return
+    c.flags |= REDIS_MULTI
+    addReply(c, get_shared().ok)
+
+def discardCommand(c: 'RedisClient') -> None:
+    if not (c.flags & REDIS_MULTI):
+        addReplyError(c, "DISCARD without MULTI")
+        return
+    discardTransaction(c)
+    addReply(c, get_shared().ok)
+
+def execCommand(c: 'RedisClient') -> None:
+    from ..redis import call
+    shared = get_shared()
+    if not (c.flags & REDIS_MULTI):
+        addReplyError(c, "EXEC without MULTI")
+        return
+    if watchedKeysModified(c):
+        c.flags |= REDIS_DIRTY_CAS
+    # 排队时有命令出错, 或者监视的键被修改过, 放弃执行事务
+    if c.flags & (REDIS_DIRTY_CAS|REDIS_DIRTY_EXEC):
+        addReply(c, shared.execaborterr if c.flags & REDIS_DIRTY_EXEC else shared.nullmultibulk)
+        discardTransaction(c)
+        return
+    # 事务中的命令可能会修改监视的键, 先取消监视
+    unwatchAllKeys(c)
+    orig_argv = c.argv
+    orig_cmd = c.cmd
+    addReplyMultiBulkLen(c, c.mstate.count)
+    for mc in c.mstate.commands:
+        c.argv = mc.argv
+        c.cmd = mc.cmd
+        call(c, REDIS_CALL_FULL)
+        # 命令执行时可能会改写参数
+        mc.argv = c.argv
+    c.argv = orig_argv
+    c.cmd = orig_cmd
+    discardTransaction(c)
+
+def watchCommand(c: 'RedisClient') -> None:
+    if c.flags & REDIS_MULTI:
+        addReplyError(c, "WATCH inside MULTI is not allowed")
+        return
+    for j in range(1, c.argc):
+        watchForKey(c, c.argv[j])
+    addReply(c, get_shared().ok)
+
+def unwatchCommand(c: 'RedisClient') -> None:
+    unwatchAllKeys(c)
+    c.flags &= ~REDIS_DIRTY_CAS
+    addReply(c, get_shared().ok)
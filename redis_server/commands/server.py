@@ -0,0 +1,261 @@
+import os
+import typing
+from typing import List, Optional as Opt, Tuple, Dict
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient, RedisServer
+from ..ae import aeGetApiName
+from ..adlist import listLength
+from ..rdict import dictSize
+from ..sds import sdsnew, sdslen
+from ..util import get_shared, get_server, zmalloc_used_memory
+from ..config import *
+from ..robject import createObject, decrRefCount, REDIS_STRING
+from ..networking import addReply, addReplyBulk
+
+__all__ = [
+    'bytesToHuman',
+    'genRedisInfoString',
+    'infoCommand',
+]
+
+def bytesToHuman(n: int) -> str:
+    if n < 1024:
+        return "%dB" % n
+    elif n < 1024 * 1024:
+        return "%.2fK" % (n / 1024)
+    elif n < 1024 * 1024 * 1024:
+        return "%.2fM" % (n / (1024 * 1024))
+    elif n < 1024 * 1024 * 1024 * 1024:
+        return "%.2fG" % (n / (1024 * 1024 * 1024))
+    else:
+        return "%.2fT" % (n / (1024 * 1024 * 1024 * 1024))
+
+def getClientsMaxBuffers() -> Tuple[int, int]:
+    server = get_server()
+    lol = bib = 0
+    for c in server.clients:
+        if listLength(c.reply) > lol:
+            lol = listLength(c.reply)
+        if sdslen(c.querybuf) > bib:
+            bib = sdslen(c.querybuf)
+    return lol, bib
+
+# server 段中进程生命周期内不会变化的部分, 第一次 INFO 时生成
+info_server_static: Opt[str] = None
+# 只依赖 serverCron() 采样值的段, 按 cronloops 缓存
+info_cron_cache: Dict[str, Tuple[int, str]] = {}
+
+def genInfoServerStatic(server: 'RedisServer') -> str:
+    # platform 只在 INFO 中使用, 延迟到第一次调用时导入
+    import platform
+    from ..redis import __version__
+    if server.cluster_enabled:
+        mode = "cluster"
+    elif server.sentinel_mode:
+        mode = "sentinel"
+    else:
+        mode = "standalone"
+    uname = platform.uname()
+    return (
+        "redis_version:%s\r\n"
+        "redis_mode:%s\r\n"
+        "os:%s %s %s\r\n"
+        "arch_bits:%d\r\n"
+        "multiplexing_api:%s\r\n"
+        "python_version:%s\r\n"
+        "process_id:%d\r\n"
+        "run_id:%s\r\n"
+        "tcp_port:%d\r\n"
+    ) % (
+        __version__,
+        mode,
+        uname.system, uname.release, uname.machine,
+        server.arch_bits,
+        aeGetApiName(),
+        platform.python_version(),
+        os.getpid(),
+        server.runid,
+        server.port,
+    )
+
+def genInfoServer(server: 'RedisServer') -> str:
+    global info_server_static
+    if info_server_static is None:
+        info_server_static = genInfoServerStatic(server)
+    uptime = server.unixtime - server.stat_starttime
+    return "# Server\r\n%suptime_in_seconds:%d\r\nuptime_in_days:%d\r\nhz:%d\r\nlru_clock:%d\r\nconfig_file:%s\r\n" % (
+        info_server_static,
+        uptime,
+        uptime // (3600 * 24),
+        server.hz,
+        server.lruclock,
+        server.configfile,
+    )
+
+def genInfoClients(server: 'RedisServer') -> str:
+    lol, bib = getClientsMaxBuffers()
+    return (
+        "# Clients\r\n"
+        "connected_clients:%d\r\n"
+        "client_longest_output_list:%d\r\n"
+        "client_biggest_input_buf:%d\r\n"
+        "blocked_clients:%d\r\n"
+    ) % (
+        len(server.clients),
+        lol, bib,
+        server.bpop_blocked_clients,
+    )
+
+def genInfoMemory(server: 'RedisServer') -> str:
+    cached = info_cron_cache.get('memory')
+    if cached and cached[0] == server.cronloops:
+        return cached[1]
+    used = zmalloc_used_memory()
+    rss = server.resident_set_size
+    info = (
+        "# Memory\r\n"
+        "used_memory:%d\r\n"
+        "used_memory_human:%s\r\n"
+        "used_memory_rss:%d\r\n"
+        "used_memory_rss_human:%s\r\n"
+        "used_memory_peak:%d\r\n"
+        "used_memory_peak_human:%s\r\n"
+        "mem_fragmentation_ratio:%.2f\r\n"
+        "mem_allocator:pymalloc\r\n"
+    ) % (
+        used, bytesToHuman(used),
+        rss, bytesToHuman(rss),
+        server.stat_peak_memory, bytesToHuman(server.stat_peak_memory),
+        rss / used if used else 0,
+    )
+    info_cron_cache['memory'] = (server.cronloops, info)
+    return info
+
+def genInfoPersistence(server: 'RedisServer') -> str:
+    return (
+        "# Persistence\r\n"
+        "loading:%d\r\n"
+        "rdb_changes_since_last_save:%d\r\n"
+        "rdb_bgsave_in_progress:%d\r\n"
+        "rdb_last_save_time:%d\r\n"
+        "rdb_last_bgsave_status:%s\r\n"
+        "rdb_last_bgsave_time_sec:%d\r\n"
+        "rdb_current_bgsave_time_sec:%d\r\n"
+        "aof_enabled:%d\r\n"
+        "aof_rewrite_in_progress:%d\r\n"
+        "aof_rewrite_scheduled:%d\r\n"
+        "aof_last_rewrite_time_sec:%d\r\n"
+        "aof_current_rewrite_time_sec:%d\r\n"
+        "aof_last_bgrewrite_status:%s\r\n"
+        "aof_last_write_status:%s\r\n"
+    ) % (
+        server.loading,
+        server.dirty,
+        server.rdb_child_pid != -1,
+        server.lastsave,
+        "ok" if server.lastbgsave_status == REDIS_OK else "err",
+        server.rdb_save_time_last,
+        server.unixtime - server.rdb_save_time_start if server.rdb_child_pid != -1 else -1,
+        server.aof_state != REDIS_AOF_OFF,
+        server.aof_child_pid != -1,
+        server.aof_rewrite_scheduled,
+        server.aof_rewrite_time_last,
+        server.unixtime - server.aof_rewrite_time_start if server.aof_child_pid != -1 else -1,
+        "ok" if server.aof_lastbgrewrite_status == REDIS_OK else "err",
+        "ok" if server.aof_last_write_status == REDIS_OK else "err",
+    )
+
+def genInfoStats(server: 'RedisServer') -> str:
+    from ..redis import getOperationsPerSecond, getInstantaneousKbps
+    input_kbps, output_kbps = getInstantaneousKbps()
+    return (
+        "# Stats\r\n"
+        "total_connections_received:%d\r\n"
+        "total_commands_processed:%d\r\n"
+        "instantaneous_ops_per_sec:%d\r\n"
+        "total_net_input_bytes:%d\r\n"
+        "total_net_output_bytes:%d\r\n"
+        "instantaneous_input_kbps:%.2f\r\n"
+        "instantaneous_output_kbps:%.2f\r\n"
+        "rejected_connections:%d\r\n"
+        "sync_full:%d\r\n"
+        "sync_partial_ok:%d\r\n"
+        "sync_partial_err:%d\r\n"
+        "expired_keys:%d\r\n"
+        "evicted_keys:%d\r\n"
+        "keyspace_hits:%d\r\n"
+        "keyspace_misses:%d\r\n"
+        "pubsub_channels:%d\r\n"
+        "pubsub_patterns:%d\r\n"
+        "latest_fork_usec:%d\r\n"
+    ) % (
+        server.stat_numconnections,
+        server.stat_numcommands,
+        getOperationsPerSecond(),
+        server.stat_net_input_bytes,
+        server.stat_net_output_bytes,
+        input_kbps,
+        output_kbps,
+        server.stat_rejected_conn,
+        server.stat_sync_full,
+        server.stat_sync_partial_ok,
+        server.stat_sync_partial_err,
+        server.stat_expiredkeys,
+        server.stat_evictedkeys,
+        server.stat_keyspace_hits,
+        server.stat_keyspace_misses,
+        dictSize(server.pubsub_channels),
+        listLength(server.pubsub_patterns),
+        server.stat_fork_time,
+    )
+
+def genInfoCommandStats(server: 'RedisServer') -> str:
+    lines = ["# Commandstats\r\n"]
+    for cmd in server.commands.values():
+        if not cmd.calls:
+            continue
+        lines.append("cmdstat_%s:calls=%d,usec=%d,usec_per_call=%.2f\r\n" % (
+            cmd.name, cmd.calls, cmd.microseconds, cmd.microseconds / cmd.calls))
+    return "".join(lines)
+
+def genInfoKeyspace(server: 'RedisServer') -> str:
+    lines = ["# Keyspace\r\n"]
+    for j in range(server.dbnum):
+        db = server.db[j]
+        keys = dictSize(db.dict)
+        vkeys = dictSize(db.expires)
+        if keys or vkeys:
+            lines.append("db%d:keys=%d,expires=%d,avg_ttl=%d\r\n" % (j, keys, vkeys, db.avg_ttl))
+    return "".join(lines)
+
+# (段名, 生成函数, 是否属于 default)
+info_sections = [
+    ('server', genInfoServer, True),
+    ('clients', genInfoClients, True),
+    ('memory', genInfoMemory, True),
+    ('persistence', genInfoPersistence, True),
+    ('stats', genInfoStats, True),
+    ('commandstats', genInfoCommandStats, False),
+    ('keyspace', genInfoKeyspace, True),
+]
+
+def genRedisInfoString(section: str) -> str:
+    """生成 INFO 命令的回复, 只生成被请求的段"""
+    server = get_server()
+    allsections = section == 'all'
+    defsections = section == 'default'
+    parts: List[str] = []
+    for name, proc, default in info_sections:
+        if allsections or (defsections and default) or section == name:
+            parts.append(proc(server))
+    return "\r\n".join(parts)
+
+def infoCommand(c: 'RedisClient') -> None:
+    section = c.argv[1].ptr.text.lower() if c.argc == 2 else 'default'
+    if c.argc > 2:
+        addReply(c, get_shared().syntaxerr)
+        return
+    o = createObject(REDIS_STRING, sdsnew(genRedisInfoString(section)))
+    addReplyBulk(c, o)
+    decrRefCount(o)
@@ -0,0 +1,594 @@
+import random
+import typing
+from bisect import bisect_left
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+from typing import List, Optional as Opt, Sequence, Set, Union
+from ..config import *
+from ..robject import *
+from ..sds import sdslen, sdsnewlen
+from ..db import (
+    lookupKeyRead, lookupKeyWrite, lookupKeyReadOrReply, lookupKeyWriteOrReply, dbAdd, dbDelete, signalModifiedKey,
+    notifyKeyspaceEvent, htNeedsResize, parseScanCursorOrReply, scanGenericCommand,
+)
+from ..rdict import (
+    dictAdd, dictDelete, dictFind, dictSize, dictResize, dictExpand, dictGetIterator, dictNext, dictReleaseIterator,
+    dictGetRandomKey, DICT_OK,
+)
+from ..intset import (
+    intset, intsetAdd, intsetRemove, intsetFind, intsetLen, intsetRandom, intsetValues, intsetArray, intsetFromSorted,
+)
+from ..csix import intptr
+from ..util import get_shared, get_server, string2ll, optionalImport
+from ..networking import (
+    addReply, addReplyLongLong, addReplyMultiBulkLen, addReplyBulkCBuffer, rewriteClientCommandVector,
+)
+
+__all__ = [
+    'saddCommand',
+    'sremCommand',
+    'smoveCommand',
+    'sismemberCommand',
+    'smismemberCommand',
+    'scardCommand',
+    'spopCommand',
+    'srandmemberCommand',
+    'sinterCommand',
+    'sinterstoreCommand',
+    'sunionCommand',
+    'sunionstoreCommand',
+    'sdiffCommand',
+    'sdiffstoreCommand',
+    'sscanCommand',
+]
+
+# 集合类型的实现 (对应 t_set.c)。模块不叫 set.py: commands 包没有 __all__, 子模块会随
+# from .commands import * 导出, 覆盖内置的 set。
+#
+# 集合对象有两种编码:
+# REDIS_ENCODING_INTSET: 所有元素都是 64 位整数, 并且元素数不超过 set_max_intset_entries 时使用,
+#     元素按升序紧凑地保存。
+# REDIS_ENCODING_HT: 一个 rDict (setDictType), 元素是 sds 键。
+#
+# SINTER / SUNION / SDIFF 直接在 intset 的有序数组上计算: 交集从最小的集合开始, 在其他集合中用二分查找
+# 向前推进 (有序归并), 结果仍然有序, 可以直接构建目标 intset。安装了 numpy 并且集合足够大时,
+# 用 intersect1d 等函数在 contents 的 frombuffer 视图上计算, 不需要把元素转换成 Python 整数。
+
+SetElement = Union[bytes, int]
+
+# 最小的 intset 达到这个大小时才使用 numpy, 太小的集合转换的开销比计算本身大
+SET_NUMPY_MIN_SIZE = 256
+# 交集中较大的数组超过较小的数组这么多倍时, 用 searchsorted 代替 intersect1d
+SET_NUMPY_SEARCH_RATIO = 16
+
+SET_OP_UNION = 0
+SET_OP_DIFF = 1
+SET_OP_INTER = 2
+
+def setObjectElement(o: robj) -> SetElement:
+    if sdsEncodedObject(o):
+        return bytes(o.ptr.buf[:sdslen(o.ptr)])
+    return o.ptr
+
+def setElementBytes(value: SetElement) -> bytes:
+    # 整数元素可能来自 numpy 数组, 不一定是 int
+    return value if isinstance(value, bytes) else b'%d' % value
+
+def setElementLongLong(value: SetElement) -> Opt[int]:
+    """元素可以保存在 intset 中时返回它的整数值"""
+    if not isinstance(value, bytes):
+        return int(value)
+    ok, llval = string2ll(value, len(value))
+    return llval if ok else None
+
+def addReplySetElement(c: 'RedisClient', value: SetElement) -> None:
+    value = setElementBytes(value)
+    addReplyBulkCBuffer(c, value, len(value))
+
+def setTypeCreate(value: SetElement) -> robj:
+    if setElementLongLong(value) is not None:
+        return createIntsetObject()
+    return createSetObject()
+
+def setTypeAdd(subject: robj, value: SetElement) -> int:
+    """添加元素, 元素已经存在时返回 0"""
+    if subject.encoding == REDIS_ENCODING_HT:
+        value = setElementBytes(value)
+        return int(dictAdd(subject.ptr, sdsnewlen(value, len(value)), None) == DICT_OK)
+    elif subject.encoding == REDIS_ENCODING_INTSET:
+        llval = setElementLongLong(value)
+        if llval is not None:
+            success = intptr()
+            subject.ptr = intsetAdd(subject.ptr, llval, success)
+            if success.value:
+                # 元素太多时转换成哈希表
+                if intsetLen(subject.ptr) > get_server().set_max_intset_entries:
+                    setTypeConvert(subject, REDIS_ENCODING_HT)
+                return 1
+            return 0
+        # 不能表示为整数的元素只能保存在哈希表中
+        setTypeConvert(subject, REDIS_ENCODING_HT)
+        value = setElementBytes(value)
+        ret = dictAdd(subject.ptr, sdsnewlen(value, len(value)), None)
+        assert ret == DICT_OK
+        return 1
+    raise RuntimeError("Unknown set encoding")
+
+def setTypeRemove(setobj: robj, value: SetElement) -> int:
+    if setobj.encoding == REDIS_ENCODING_HT:
+        value = setElementBytes(value)
+        if dictDelete(setobj.ptr, sdsnewlen(value, len(value))) == DICT_OK:
+            if htNeedsResize(setobj.ptr):
+                dictResize(setobj.ptr)
+            return 1
+        return 0
+    elif setobj.encoding == REDIS_ENCODING_INTSET:
+        llval = setElementLongLong(value)
+        if llval is not None:
+            success = intptr()
+            setobj.ptr = intsetRemove(setobj.ptr, llval, success)
+            return success.value
+        return 0
+    raise RuntimeError("Unknown set encoding")
+
+def setTypeIsMember(setobj: robj, value: SetElement) -> int:
+    if setobj.encoding == REDIS_ENCODING_HT:
+        value = setElementBytes(value)
+        return int(dictFind(setobj.ptr, sdsnewlen(value, len(value))) is not None)
+    elif setobj.encoding == REDIS_ENCODING_INTSET:
+        llval = setElementLongLong(value)
+        return intsetFind(setobj.ptr, llval) if llval is not None else 0
+    raise RuntimeError("Unknown set encoding")
+
+def setTypeSize(subject: robj) -> int:
+    if subject.encoding == REDIS_ENCODING_HT:
+        return dictSize(subject.ptr)
+    elif subject.encoding == REDIS_ENCODING_INTSET:
+        return intsetLen(subject.ptr)
+    raise RuntimeError("Unknown set encoding")
+
+def setTypeElements(subject: robj) -> Sequence[SetElement]:
+    """集合的所有元素, intset 编码时是升序的整数数组"""
+    if subject.encoding == REDIS_ENCODING_INTSET:
+        return intsetValues(subject.ptr)
+    elif subject.encoding == REDIS_ENCODING_HT:
+        elements: List[SetElement] = []
+        di = dictGetIterator(subject.ptr)
+        de = dictNext(di)
+        while de is not None:
+            elements.append(bytes(de.key.buf[:sdslen(de.key)]))
+            de = dictNext(di)
+        dictReleaseIterator(di)
+        return elements
+    raise RuntimeError("Unknown set encoding")
+
+def setTypeRandomElement(setobj: robj) -> SetElement:
+    if setobj.encoding == REDIS_ENCODING_HT:
+        de = dictGetRandomKey(setobj.ptr)
+        assert de is not None
+        return bytes(de.key.buf[:sdslen(de.key)])
+    elif setobj.encoding == REDIS_ENCODING_INTSET:
+        return intsetRandom(setobj.ptr)
+    raise RuntimeError("Unknown set encoding")
+
+def setTypeConvert(setobj: robj, enc: int) -> None:
+    """把 intset 编码的集合转换成哈希表"""
+    assert setobj.type == REDIS_SET and setobj.encoding == REDIS_ENCODING_INTSET
+    if enc != REDIS_ENCODING_HT:
+        raise RuntimeError("Unsupported set conversion")
+    d = createSetObject().ptr
+    # 预先扩展到足够的大小, 转换过程中不需要 rehash
+    dictExpand(d, intsetLen(setobj.ptr))
+    for v in intsetValues(setobj.ptr):
+        value = b'%d' % v
+        dictAdd(d, sdsnewlen(value, len(value)), None)
+    setobj.encoding = REDIS_ENCODING_HT
+    setobj.ptr = d
+
+def setTypeFromElements(elements: Sequence[SetElement], intsorted: bool) -> robj:
+    """
+    由不重复的元素构建集合对象
+    intsorted 为真时 elements 是升序的整数, 直接构建 intset
+    """
+    if len(elements) <= get_server().set_max_intset_entries:
+        if intsorted:
+            return createObject(REDIS_SET, intsetFromSorted(elements), REDIS_ENCODING_INTSET)   # type: ignore
+        values = [setElementLongLong(e) for e in elements]
+        if None not in values:
+            return createObject(REDIS_SET, intsetFromSorted(sorted(values)), REDIS_ENCODING_INTSET)   # type: ignore
+    setobj = createSetObject()
+    dictExpand(setobj.ptr, len(elements))
+    for e in elements:
+        value = setElementBytes(e)
+        dictAdd(setobj.ptr, sdsnewlen(value, len(value)), None)
+    return setobj
+
+def checkSetType(c: 'RedisClient', o: robj) -> bool:
+    if o.type != REDIS_SET:
+        addReply(c, get_shared().wrongtypeerr)
+        return True
+    return False
+
+def saddCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    setobj = lookupKeyWrite(c.db, c.argv[1])
+    if setobj is None:
+        setobj = setTypeCreate(setObjectElement(c.argv[2]))
+        dbAdd(c.db, c.argv[1], setobj)
+    elif checkSetType(c, setobj):
+        return
+    added = 0
+    for j in range(2, c.argc):
+        added += setTypeAdd(setobj, setObjectElement(c.argv[j]))
+    if added:
+        signalModifiedKey(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_SET, "sadd", c.argv[1], c.db.id)
+    server.dirty += added
+    addReplyLongLong(c, added)
+
+def sremCommand(c: 'RedisClient') -> None:
+    setobj = lookupKeyWriteOrReply(c, c.argv[1], get_shared().czero)
+    if setobj is None or checkSetType(c, setobj):
+        return
+    deleted = 0
+    keyremoved = False
+    for j in range(2, c.argc):
+        if setTypeRemove(setobj, setObjectElement(c.argv[j])):
+            deleted += 1
+            if setTypeSize(setobj) == 0:
+                dbDelete(c.db, c.argv[1])
+                keyremoved = True
+                break
+    if deleted:
+        signalModifiedKey(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_SET, "srem", c.argv[1], c.db.id)
+        if keyremoved:
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+        get_server().dirty += deleted
+    addReplyLongLong(c, deleted)
+
+def smoveCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    srcset = lookupKeyWrite(c.db, c.argv[1])
+    dstset = lookupKeyWrite(c.db, c.argv[2])
+    ele = setObjectElement(c.argv[3])
+    if srcset is None:
+        addReply(c, shared.czero)
+        return
+    if checkSetType(c, srcset) or (dstset is not None and checkSetType(c, dstset)):
+        return
+    if srcset is dstset:
+        addReply(c, shared.cone if setTypeIsMember(srcset, ele) else shared.czero)
+        return
+    if not setTypeRemove(srcset, ele):
+        addReply(c, shared.czero)
+        return
+    notifyKeyspaceEvent(REDIS_NOTIFY_SET, "srem", c.argv[1], c.db.id)
+    if setTypeSize(srcset) == 0:
+        dbDelete(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+    signalModifiedKey(c.db, c.argv[1])
+    signalModifiedKey(c.db, c.argv[2])
+    server.dirty += 1
+    if dstset is None:
+        dstset = setTypeCreate(ele)
+        dbAdd(c.db, c.argv[2], dstset)
+    if setTypeAdd(dstset, ele):
+        server.dirty += 1
+        notifyKeyspaceEvent(REDIS_NOTIFY_SET, "sadd", c.argv[2], c.db.id)
+    addReply(c, shared.cone)
+
+def sismemberCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    setobj = lookupKeyReadOrReply(c, c.argv[1], shared.czero)
+    if setobj is None or checkSetType(c, setobj):
+        return
+    addReply(c, shared.cone if setTypeIsMember(setobj, setObjectElement(c.argv[2])) else shared.czero)
+
+def smismemberCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    # 键不存在时每个元素都回复 0
+    setobj = lookupKeyRead(c.db, c.argv[1])
+    if setobj is not None and checkSetType(c, setobj):
+        return
+    addReplyMultiBulkLen(c, c.argc - 2)
+    for j in range(2, c.argc):
+        if setobj is not None and setTypeIsMember(setobj, setObjectElement(c.argv[j])):
+            addReply(c, shared.cone)
+        else:
+            addReply(c, shared.czero)
+
+def scardCommand(c: 'RedisClient') -> None:
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().czero)
+    if o is None or checkSetType(c, o):
+        return
+    addReplyLongLong(c, setTypeSize(o))
+
+def spopWithCountCommand(c: 'RedisClient') -> None:
+    server = get_server()
+    shared = get_shared()
+    status, count = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    if count < 0:
+        addReply(c, shared.outofrangeerr)
+        return
+    setobj = lookupKeyWriteOrReply(c, c.argv[1], shared.emptymultibulk)
+    if setobj is None or checkSetType(c, setobj):
+        return
+    if count == 0:
+        addReply(c, shared.emptymultibulk)
+        return
+    size = setTypeSize(setobj)
+    notifyKeyspaceEvent(REDIS_NOTIFY_SET, "spop", c.argv[1], c.db.id)
+    elements = setTypeElements(setobj)
+    if count >= size:
+        # 弹出整个集合, 以 DEL 传播
+        popped = list(elements)
+        dbDelete(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+        rewriteClientCommandVector(c, [shared.del_, c.argv[1]])
+    else:
+        popped = random.sample(list(elements), count)
+        for ele in popped:
+            setTypeRemove(setobj, ele)
+        # 以一条 SREM 传播实际弹出的元素
+        argv = [shared.srem, c.argv[1]]
+        for ele in popped:
+            value = setElementBytes(ele)
+            argv.append(createStringObject(value, len(value)))
+        rewriteClientCommandVector(c, argv)
+        for o in argv[2:]:
+            decrRefCount(o)
+    addReplyMultiBulkLen(c, len(popped))
+    for ele in popped:
+        addReplySetElement(c, ele)
+    signalModifiedKey(c.db, c.argv[1])
+    server.dirty += len(popped)
+
+def spopCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    if c.argc == 3:
+        spopWithCountCommand(c)
+        return
+    elif c.argc > 3:
+        addReply(c, shared.syntaxerr)
+        return
+    setobj = lookupKeyWriteOrReply(c, c.argv[1], shared.nullbulk)
+    if setobj is None or checkSetType(c, setobj):
+        return
+    ele = setTypeRandomElement(setobj)
+    setTypeRemove(setobj, ele)
+    notifyKeyspaceEvent(REDIS_NOTIFY_SET, "spop", c.argv[1], c.db.id)
+    # 弹出的元素是随机的, 以 SREM 传播
+    value = setElementBytes(ele)
+    eleobj = createStringObject(value, len(value))
+    rewriteClientCommandVector(c, [shared.srem, c.argv[1], eleobj])
+    decrRefCount(eleobj)
+    addReplySetElement(c, ele)
+    if setTypeSize(setobj) == 0:
+        dbDelete(c.db, c.argv[1])
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", c.argv[1], c.db.id)
+    signalModifiedKey(c.db, c.argv[1])
+    get_server().dirty += 1
+
+def srandmemberWithCountCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    status, count = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    setobj = lookupKeyReadOrReply(c, c.argv[1], shared.emptymultibulk)
+    if setobj is None or checkSetType(c, setobj):
+        return
+    if count == 0:
+        addReply(c, shared.emptymultibulk)
+        return
+    if count < 0:
+        # 负数: 返回 -count 个元素, 可以重复
+        addReplyMultiBulkLen(c, -count)
+        for _ in range(-count):
+            addReplySetElement(c, setTypeRandomElement(setobj))
+        return
+    elements = setTypeElements(setobj)
+    if count >= len(elements):
+        chosen = list(elements)
+    else:
+        chosen = random.sample(list(elements), count)
+    addReplyMultiBulkLen(c, len(chosen))
+    for ele in chosen:
+        addReplySetElement(c, ele)
+
+def srandmemberCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    if c.argc == 3:
+        srandmemberWithCountCommand(c)
+        return
+    elif c.argc > 3:
+        addReply(c, shared.syntaxerr)
+        return
+    setobj = lookupKeyReadOrReply(c, c.argv[1], shared.nullbulk)
+    if setobj is None or checkSetType(c, setobj):
+        return
+    addReplySetElement(c, setTypeRandomElement(setobj))
+
+def intsetInter(intsets: List[intset]) -> Sequence[int]:
+    """多个 intset 的交集, intsets 按大小升序排列, 结果是升序的"""
+    np = optionalImport('numpy')
+    if np is not None and intsetLen(intsets[0]) >= SET_NUMPY_MIN_SIZE:
+        result = intsetArray(np, intsets[0])
+        for s in intsets[1:]:
+            other = intsetArray(np, s)
+            if len(result) * SET_NUMPY_SEARCH_RATIO < len(other):
+                # 大小相差很多时在较大的数组中二分查找, 不需要像 intersect1d 一样排序两个数组
+                idx = np.searchsorted(other, result)
+                idx[idx == len(other)] = 0
+                result = result[other[idx] == result]
+            else:
+                result = np.intersect1d(result, other, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+    values: Sequence[int] = intsetValues(intsets[0])
+    for s in intsets[1:]:
+        # 有序归并: 较小的一边的每个元素在另一边用二分查找, 查找的起点只会向后移动
+        other = intsetValues(s)
+        n = len(other)
+        lo = 0
+        inter: List[int] = []
+        for v in values:
+            lo = bisect_left(other, v, lo)
+            if lo == n:
+                break
+            if other[lo] == v:
+                inter.append(v)
+                lo += 1
+        values = inter
+        if not values:
+            break
+    return values
+
+def intsetUnionDiff(intsets: List[intset], op: int) -> Sequence[int]:
+    """多个 intset 的并集或者差集 (第一个集合减去其他集合), 结果是升序的"""
+    np = optionalImport('numpy')
+    if np is not None and sum(intsetLen(s) for s in intsets) >= SET_NUMPY_MIN_SIZE:
+        arrays = [intsetArray(np, s) for s in intsets]
+        if op == SET_OP_UNION:
+            # 不同编码的数组拼接时提升到最宽的类型; 拼接的是几段有序的数组, 归并排序很快,
+            # 去重只需要和前一个元素比较 (np.unique 对这种输入慢得多)
+            merged = np.concatenate(arrays)
+            merged.sort(kind='mergesort')
+            keep = np.empty(len(merged), dtype=bool)
+            keep[0] = True
+            np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+            return merged[keep]
+        result = arrays[0]
+        for a in arrays[1:]:
+            result = np.setdiff1d(result, a, assume_unique=True)
+        return result
+    if op == SET_OP_UNION:
+        union = set(intsetValues(intsets[0]))
+        for s in intsets[1:]:
+            union.update(intsetValues(s))
+        return sorted(union)
+    exclude: Set[int] = set()
+    for s in intsets[1:]:
+        exclude.update(intsetValues(s))
+    # 第一个集合本身有序, 过滤之后仍然有序
+    return [v for v in intsetValues(intsets[0]) if v not in exclude]
+
+def setTypeInter(sets: List[robj]) -> Sequence[SetElement]:
+    """sets 按大小升序排列, 遍历最小的集合, 检查每个元素是否在其他所有集合中"""
+    if all(o.encoding == REDIS_ENCODING_INTSET for o in sets):
+        return intsetInter([o.ptr for o in sets])
+    return [ele for ele in setTypeElements(sets[0]) if all(setTypeIsMember(o, ele) for o in sets[1:])]
+
+def setTypeUnionDiff(sets: List[Opt[robj]], op: int) -> Sequence[SetElement]:
+    present = [o for o in sets if o is not None]
+    if op == SET_OP_DIFF and sets[0] is None:
+        return []
+    if present and all(o.encoding == REDIS_ENCODING_INTSET for o in present):
+        return intsetUnionDiff([o.ptr for o in present], op)
+    # 有哈希表编码的集合时, 整数元素统一转换成字符串比较
+    if op == SET_OP_UNION:
+        union: Set[bytes] = set()
+        for o in present:
+            union.update(setElementBytes(ele) for ele in setTypeElements(o))
+        return list(union)
+    first = sets[0]
+    assert first is not None
+    exclude: Set[bytes] = set()
+    for o in present[1:]:
+        exclude.update(setElementBytes(ele) for ele in setTypeElements(o))
+    return [ele for ele in (setElementBytes(e) for e in setTypeElements(first)) if ele not in exclude]
+
+def storeSetResult(c: 'RedisClient', dstkey: robj, elements: Sequence[SetElement], intsorted: bool,
+                   event: str) -> None:
+    """把计算结果保存到 dstkey, 结果为空时删除 dstkey"""
+    server = get_server()
+    deleted = dbDelete(c.db, dstkey)
+    if len(elements) > 0:
+        dstset = setTypeFromElements(elements, intsorted)
+        dbAdd(c.db, dstkey, dstset)
+        addReplyLongLong(c, setTypeSize(dstset))
+        notifyKeyspaceEvent(REDIS_NOTIFY_SET, event, dstkey, c.db.id)
+    else:
+        addReply(c, get_shared().czero)
+        if deleted:
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", dstkey, c.db.id)
+    signalModifiedKey(c.db, dstkey)
+    server.dirty += 1
+
+def addReplySetElements(c: 'RedisClient', elements: Sequence[SetElement]) -> None:
+    addReplyMultiBulkLen(c, len(elements))
+    for ele in elements:
+        addReplySetElement(c, ele)
+
+def sinterGenericCommand(c: 'RedisClient', setkeys: List[robj], dstkey: Opt[robj]) -> None:
+    shared = get_shared()
+    sets: List[robj] = []
+    for key in setkeys:
+        setobj = lookupKeyWrite(c.db, key) if dstkey is not None else lookupKeyRead(c.db, key)
+        if setobj is None:
+            # 有一个集合不存在, 交集为空
+            if dstkey is not None:
+                if dbDelete(c.db, dstkey):
+                    signalModifiedKey(c.db, dstkey)
+                    notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", dstkey, c.db.id)
+                    get_server().dirty += 1
+                addReply(c, shared.czero)
+            else:
+                addReply(c, shared.emptymultibulk)
+            return
+        if checkSetType(c, setobj):
+            return
+        sets.append(setobj)
+    sets.sort(key=setTypeSize)
+    elements = setTypeInter(sets)
+    if dstkey is None:
+        addReplySetElements(c, elements)
+    else:
+        # 交集中的元素和最小的集合编码相同
+        storeSetResult(c, dstkey, elements, sets[0].encoding == REDIS_ENCODING_INTSET, "sinterstore")
+
+def sinterCommand(c: 'RedisClient') -> None:
+    sinterGenericCommand(c, c.argv[1:], None)
+
+def sinterstoreCommand(c: 'RedisClient') -> None:
+    sinterGenericCommand(c, c.argv[2:], c.argv[1])
+
+def sunionDiffGenericCommand(c: 'RedisClient', setkeys: List[robj], dstkey: Opt[robj], op: int) -> None:
+    sets: List[Opt[robj]] = []
+    for key in setkeys:
+        setobj = lookupKeyWrite(c.db, key) if dstkey is not None else lookupKeyRead(c.db, key)
+        if setobj is not None and checkSetType(c, setobj):
+            return
+        sets.append(setobj)
+    elements = setTypeUnionDiff(sets, op)
+    intsorted = all(o is None or o.encoding == REDIS_ENCODING_INTSET for o in sets)
+    if dstkey is None:
+        addReplySetElements(c, elements)
+    else:
+        storeSetResult(c, dstkey, elements, intsorted, "sunionstore" if op == SET_OP_UNION else "sdiffstore")
+
+def sunionCommand(c: 'RedisClient') -> None:
+    sunionDiffGenericCommand(c, c.argv[1:], None, SET_OP_UNION)
+
+def sunionstoreCommand(c: 'RedisClient') -> None:
+    sunionDiffGenericCommand(c, c.argv[2:], c.argv[1], SET_OP_UNION)
+
+def sdiffCommand(c: 'RedisClient') -> None:
+    sunionDiffGenericCommand(c, c.argv[1:], None, SET_OP_DIFF)
+
+def sdiffstoreCommand(c: 'RedisClient') -> None:
+    sunionDiffGenericCommand(c, c.argv[2:], c.argv[1], SET_OP_DIFF)
+
+def sscanCommand(c: 'RedisClient') -> None:
+    status, cursor = parseScanCursorOrReply(c, c.argv[2])
+    if status != REDIS_OK:
+        return
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().emptyscan)
+    if o is None or checkSetType(c, o):
+        return
+    scanGenericCommand(c, o, cursor)
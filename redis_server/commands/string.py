@@ -3,24 +3,54 @@ import typing
 if typing.TYPE_CHECKING:
     from ..redis import RedisClient
 from typing import Optional as Opt
-from ..db import lookupKeyReadOrReply, lookupKeyWrite, setKey, notifyKeyspaceEvent, setExpire
+from ..db import (
+    lookupKeyReadOrReply, lookupKeyWrite, setKey, dbAdd, dbOverwrite, notifyKeyspaceEvent, setExpire, lookupKeysRead,
+    expireIfNeededWithHash, setKeyWithHash, lookupKeyWriteWithHash, dbAddWithHash, signalModifiedKey,
+    dbUnshareStringValue,
+)
+from ..rdict import dictHashKey, dictFindWithHash, dictGetVal, dictSetVal
 from ..util import get_shared, get_server
 from ..config import *
 from ..robject import *
-from ..networking import addReply, addReplyBulk
-from ..csix import timeval
+from ..networking import (
+    addReply, addReplyBulk, addReplyError, addReplyString, rewriteClientCommandArgument, addReplyLongLong,
+    addReplyBulkCBuffer,
+)
+from ..sds import sdslen, sdscatlen, sdsgrowzero, sdsempty
+from ..csix import timeval, LONG_MIN, LONG_MAX
 
 __all__ = [
     'getGenericCommand',
     'getCommand',
     'setGenericCommand',
     'setCommand',
+    'mgetCommand',
+    'msetCommand',
+    'msetnxCommand',
+    'incrCommand',
+    'decrCommand',
+    'incrbyCommand',
+    'decrbyCommand',
+    'incrbyfloatCommand',
+    'appendCommand',
+    'setrangeCommand',
+    'getrangeCommand',
+    'strlenCommand',
 ]
 
 REDIS_SET_NO_FLAGS = 0
 REDIS_SET_NX = (1<<0)   #  /* Set if key not exists. */
 REDIS_SET_XX = (1<<1)   #  /* Set if key exists. */
 
+# 字符串的最大长度
+REDIS_MAX_STRING_LENGTH = 512*1024*1024
+
+
+def checkStringLength(c: 'RedisClient', size: int) -> int:
+    if size > REDIS_MAX_STRING_LENGTH:
+        addReplyError(c, "string exceeds maximum allowed size (512MB)")
+        return REDIS_ERR
+    return REDIS_OK
 
 def getGenericCommand(c: 'RedisClient') -> int:
     shared = get_shared()
@@ -95,3 +125,246 @@ def setCommand(c: 'RedisClient'):
         j += 1
     c.argv[2] = tryObjectEncoding(c.argv[2])
     setGenericCommand(c, flags, c.argv[1], c.argv[2], expire, unit, None, None)
+
+def mgetCommand(c: 'RedisClient'):
+    # 所有回复先写到一个 buffer 中, 最后一次性加入客户端的回复
+    vals = lookupKeysRead(c.db, c.argv[1:])
+    reply = bytearray(b'*%d\r\n' % len(vals))
+    for o in vals:
+        if o is None or o.type != REDIS_STRING:
+            reply += b'$-1\r\n'
+        elif sdsEncodedObject(o):
+            reply += b'$%d\r\n' % o.ptr.len
+            reply += o.ptr.buf[:o.ptr.len]
+            reply += b'\r\n'
+        else:
+            s = b'%d' % o.ptr
+            reply += b'$%d\r\n%s\r\n' % (len(s), s)
+    addReplyString(c, reply, len(reply))
+
+def msetGenericCommand(c: 'RedisClient', nx: int):
+    shared = get_shared()
+    if c.argc % 2 == 0:
+        addReplyError(c, "wrong number of arguments for MSET")
+        return
+    db = c.db
+    # 每个键的哈希值只计算一次, 检查和写入都使用它
+    hashes = [dictHashKey(db.dict, c.argv[j].ptr) for j in range(1, c.argc, 2)]
+    if nx:
+        for i, j in enumerate(range(1, c.argc, 2)):
+            expireIfNeededWithHash(db, c.argv[j], hashes[i])
+            if dictFindWithHash(db.dict, c.argv[j].ptr, hashes[i]) is not None:
+                addReply(c, shared.czero)
+                return
+    for i, j in enumerate(range(1, c.argc, 2)):
+        c.argv[j+1] = tryObjectEncoding(c.argv[j+1])
+        setKeyWithHash(db, c.argv[j], c.argv[j+1], hashes[i])
+        notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'set', c.argv[j], db.id)
+    get_server().dirty += (c.argc - 1) // 2
+    addReply(c, shared.cone if nx else shared.ok)
+
+def msetCommand(c: 'RedisClient'):
+    msetGenericCommand(c, 0)
+
+def msetnxCommand(c: 'RedisClient'):
+    msetGenericCommand(c, 1)
+
+def incrDecrCommand(c: 'RedisClient', incr: int):
+    shared = get_shared()
+    db = c.db
+    key = c.argv[1]
+    h = dictHashKey(db.dict, key.ptr)
+    de = lookupKeyWriteWithHash(db, key, h)
+    o = dictGetVal(de) if de is not None else None
+    if o is not None and o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    status, value = getLongLongFromObjectOrReply(c, o, None)
+    if status != REDIS_OK:
+        return
+    if (incr < 0 and value < 0 and incr < LONG_MIN - value) or (incr > 0 and value > 0 and incr > LONG_MAX - value):
+        addReplyError(c, "increment or decrement would overflow")
+        return
+    value += incr
+    server = get_server()
+    if (o is not None and o.refcount == 1 and o.encoding == REDIS_ENCODING_INT and
+            (value < 0 or value >= ServerConfig.REDIS_SHARED_INTEGERS or server.maxmemory)):
+        # 只有数据库引用这个对象, 直接修改其中的整数, 不需要创建新对象, 也不需要再次查找键
+        o.ptr = value
+    else:
+        new = createStringObjectFromLongLong(value)
+        if de is None:
+            dbAddWithHash(db, key, new, h)
+        else:
+            dictSetVal(db.dict, de, new)
+    signalModifiedKey(db, key)
+    notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'incrby', key, db.id)
+    server.dirty += 1
+    reply = b':%d\r\n' % value
+    addReplyString(c, reply, len(reply))
+
+def incrCommand(c: 'RedisClient'):
+    incrDecrCommand(c, 1)
+
+def decrCommand(c: 'RedisClient'):
+    incrDecrCommand(c, -1)
+
+def incrbyCommand(c: 'RedisClient'):
+    status, incr = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    incrDecrCommand(c, incr)
+
+def decrbyCommand(c: 'RedisClient'):
+    status, incr = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    # -LONG_MIN 超出范围
+    if incr == LONG_MIN:
+        addReplyError(c, "decrement would overflow")
+        return
+    incrDecrCommand(c, -incr)
+
+def incrbyfloatCommand(c: 'RedisClient'):
+    shared = get_shared()
+    o = lookupKeyWrite(c.db, c.argv[1])
+    if o is not None and o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    status, value = getLongDoubleFromObjectOrReply(c, o, None)
+    if status != REDIS_OK:
+        return
+    status, incr = getLongDoubleFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    value += incr
+    if math.isnan(value) or math.isinf(value):
+        addReplyError(c, "increment would produce NaN or Infinity")
+        return
+    new = createStringObjectFromLongDouble(value)
+    if o is None:
+        dbAdd(c.db, c.argv[1], new)
+    else:
+        dbOverwrite(c.db, c.argv[1], new)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'incrbyfloat', c.argv[1], c.db.id)
+    get_server().dirty += 1
+    addReplyBulk(c, new)
+    # 浮点数运算的结果和平台有关, 以 SET 传播, 保证 AOF 和附属节点得到相同的值
+    aux = createStringObject(b'SET', 3)
+    rewriteClientCommandArgument(c, 0, aux)
+    decrRefCount(aux)
+    rewriteClientCommandArgument(c, 2, new)
+
+def appendCommand(c: 'RedisClient'):
+    shared = get_shared()
+    o = lookupKeyWrite(c.db, c.argv[1])
+    if o is None:
+        # 键不存在时直接使用参数对象, 之后第一次 APPEND 时才复制成 RAW 编码
+        c.argv[2] = tryObjectEncoding(c.argv[2])
+        dbAdd(c.db, c.argv[1], c.argv[2])
+        incrRefCount(c.argv[2])
+        totlen = stringObjectLen(c.argv[2])
+    else:
+        if o.type != REDIS_STRING:
+            addReply(c, shared.wrongtypeerr)
+            return
+        # 参数是 RAW 或 EMBSTR 编码
+        append = c.argv[2]
+        totlen = stringObjectLen(o) + sdslen(append.ptr)
+        if checkStringLength(c, totlen) != REDIS_OK:
+            return
+        o = dbUnshareStringValue(c.db, c.argv[1], o)
+        # sdscatlen 会预分配空间, 连续的 APPEND 大多不需要重新分配 buf
+        o.ptr = sdscatlen(o.ptr, memoryview(append.ptr.buf), sdslen(append.ptr))
+        totlen = sdslen(o.ptr)
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'append', c.argv[1], c.db.id)
+    get_server().dirty += 1
+    addReplyLongLong(c, totlen)
+
+def setrangeCommand(c: 'RedisClient'):
+    shared = get_shared()
+    value = c.argv[3].ptr
+    status, offset = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    if offset < 0:
+        addReplyError(c, "offset is out of range")
+        return
+    o = lookupKeyWrite(c.db, c.argv[1])
+    if o is None:
+        # 值为空时不创建键
+        if sdslen(value) == 0:
+            addReply(c, shared.czero)
+            return
+        if checkStringLength(c, offset + sdslen(value)) != REDIS_OK:
+            return
+        o = createObject(REDIS_STRING, sdsempty())
+        dbAdd(c.db, c.argv[1], o)
+    else:
+        if o.type != REDIS_STRING:
+            addReply(c, shared.wrongtypeerr)
+            return
+        olen = stringObjectLen(o)
+        if sdslen(value) == 0:
+            addReplyLongLong(c, olen)
+            return
+        if checkStringLength(c, offset + sdslen(value)) != REDIS_OK:
+            return
+        o = dbUnshareStringValue(c.db, c.argv[1], o)
+    o.ptr = sdsgrowzero(o.ptr, offset + sdslen(value))
+    o.ptr.buf[offset:offset+sdslen(value)] = memoryview(value.buf)[:sdslen(value)]
+    signalModifiedKey(c.db, c.argv[1])
+    notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'setrange', c.argv[1], c.db.id)
+    get_server().dirty += 1
+    addReplyLongLong(c, sdslen(o.ptr))
+
+def getrangeCommand(c: 'RedisClient'):
+    shared = get_shared()
+    status, start = getLongLongFromObjectOrReply(c, c.argv[2], None)
+    if status != REDIS_OK:
+        return
+    status, end = getLongLongFromObjectOrReply(c, c.argv[3], None)
+    if status != REDIS_OK:
+        return
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.emptybulk)
+    if o is None:
+        return
+    if o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    if o.encoding == REDIS_ENCODING_INT:
+        buf = b'%d' % o.ptr
+    else:
+        buf = o.ptr.buf
+    strlen = stringObjectLen(o)
+    # 转换成非负的下标
+    if start < 0 and end < 0 and start > end:
+        addReply(c, shared.emptybulk)
+        return
+    if start < 0:
+        start = strlen + start
+    if end < 0:
+        end = strlen + end
+    if start < 0:
+        start = 0
+    if end < 0:
+        end = 0
+    if end >= strlen:
+        end = strlen - 1
+    if start > end or strlen == 0:
+        addReply(c, shared.emptybulk)
+    else:
+        # 从 memoryview 的切片直接复制到回复中, 不会先复制出这一段的 bytes
+        addReplyBulkCBuffer(c, memoryview(buf)[start:end+1], end - start + 1)
+
+def strlenCommand(c: 'RedisClient'):
+    shared = get_shared()
+    o = lookupKeyReadOrReply(c, c.argv[1], shared.czero)
+    if o is None:
+        return
+    if o.type != REDIS_STRING:
+        addReply(c, shared.wrongtypeerr)
+        return
+    addReplyLongLong(c, stringObjectLen(o))
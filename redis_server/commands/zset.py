@@ -0,0 +1,1531 @@
+import math
+import typing
+from operator import itemgetter
+
+if typing.TYPE_CHECKING:
+    from ..redis import RedisClient
+    from .core import redisCommand
+from typing import Any, Callable, Dict, List, Optional as Opt, Tuple
+from ..config import *
+from ..robject import *
+from ..sds import sdslen
+from ..db import (
+    lookupKeyRead, lookupKeyWrite, lookupKeyReadOrReply, lookupKeyWriteOrReply, dbAdd, dbDelete, setKey,
+    signalModifiedKey, notifyKeyspaceEvent, htNeedsResize, parseScanCursorOrReply, scanGenericCommand,
+)
+from ..rdict import dictAdd, dictDelete, dictFind, dictResize, dictExpand, dictSetVal, DICT_OK
+from ..ziplist import (
+    ziplist, ziplistNew, ziplistIndex, ziplistNext, ziplistPrev, ziplistFind, ziplistCompare, ziplistGetValue,
+    ziplistPush, ziplistInsert, ziplistDelete, ziplistDeleteRange, ziplistLen, ZIPLIST_TAIL,
+)
+from ..zskiplist import (
+    zset, zskiplist, zskiplistNode, zrangespec, zlexrangespec, zslInsert, zslDelete, zslUpdateScore, zslGetRank,
+    zslGetElementByRank, zslFirstInRange, zslLastInRange, zslFirstInLexRange, zslLastInLexRange, zslValueGteMin,
+    zslValueLteMax, zslLexValueGteMin, zslLexValueLteMax, zslDeleteRangeByScore, zslDeleteRangeByRank,
+    zslDeleteRangeByLex, zslParseRange, zslParseLexRange, compareStringObjectsForLexRange, zslCreateFromSorted,
+)
+from ..zarray import (
+    zarray, zarrInsert, zarrAppend, zarrDelete, zarrUpdateScore, zarrGetRank, zarrRangeByRank, zarrRankRangeByScore,
+    zarrRankRangeByLex, zarrDeleteRangeByRank,
+)
+from ..csix import cstrptr
+from ..util import get_shared, get_server, d2string, optionalImport
+from .sets import (
+    setTypeElements, setTypeIsMember, setTypeSize, setElementBytes, SET_OP_UNION, SET_OP_INTER, SET_OP_DIFF,
+)
+from ..networking import (
+    addReply, addReplyError, addReplyLongLong, addReplyMultiBulkLen, addReplyBulkCBuffer, addReplyDouble,
+)
+
+__all__ = [
+    'zaddCommand',
+    'zincrbyCommand',
+    'zremCommand',
+    'zremrangebyscoreCommand',
+    'zremrangebyrankCommand',
+    'zremrangebylexCommand',
+    'zrangeCommand',
+    'zrevrangeCommand',
+    'zrangebyscoreCommand',
+    'zrevrangebyscoreCommand',
+    'zrangebylexCommand',
+    'zrevrangebylexCommand',
+    'zcountCommand',
+    'zlexcountCommand',
+    'zcardCommand',
+    'zscoreCommand',
+    'zrankCommand',
+    'zrevrankCommand',
+    'zpopminCommand',
+    'zpopmaxCommand',
+    'zscanCommand',
+    'zunionstoreCommand',
+    'zinterstoreCommand',
+    'zdiffstoreCommand',
+    'zunionCommand',
+    'zinterCommand',
+    'zdiffCommand',
+    'zintercardCommand',
+    'zunionInterDiffGetKeys',
+    'zunionInterDiffStoreGetKeys',
+]
+
+# 有序集合类型的实现 (对应 t_zset.c)。有序集合对象有两种编码:
+# REDIS_ENCODING_ZIPLIST: 一个 ziplist, 成员和分值作为相邻的两个节点保存, 按 (分值, 成员) 升序排列。
+#     分值按 "%.17g" 保存为字符串, 整数分值会被 ziplist 编码成整数节点。成员数超过 zset_max_ziplist_entries
+#     或者成员长度超过 zset_max_ziplist_value 时转换成跳跃表编码。
+# REDIS_ENCODING_SKIPLIST: 一个 zset, 字典 (zsetDictType) 保存成员对象到分值的映射, 跳跃表按分值排序,
+#     两者共享同一个成员对象 (引用计数为 2)。
+# REDIS_ENCODING_SORTEDARRAY: 一个 zarray, 字典和跳跃表编码相同, 排序部分是分块的有序数组 (见 zarray.py)。
+#     跳跃表的成员数达到 zset_min_sortedarray_entries 时转换成这种编码, 设置为 0 时不使用。
+#
+# 跳跃表编码时按排名的操作都利用节点的跨度: 定位第 k 个节点或者取得节点的排名是 O(log n),
+# 所以 ZRANGE / ZRANK / ZCOUNT / 带 LIMIT 的范围查询都是 O(log n + m)。有序数组编码先把范围转换成排名,
+# 复杂度相同, 取出范围内的元素时按块切片。
+
+ZsetItem = Tuple[bytes, float]
+
+# zsetAdd 的输入标志
+ZADD_IN_NONE = 0
+ZADD_IN_INCR = (1<<0)   # 增加分值而不是设置分值
+ZADD_IN_NX = (1<<1)     # 成员不存在时才添加
+ZADD_IN_XX = (1<<2)     # 成员存在时才更新
+ZADD_IN_GT = (1<<3)     # 新分值更大时才更新
+ZADD_IN_LT = (1<<4)     # 新分值更小时才更新
+
+# zsetAdd 的输出标志
+ZADD_OUT_NOP = (1<<0)       # 因为 NX / XX / GT / LT 没有执行操作
+ZADD_OUT_NAN = (1<<1)       # 结果分值是 NaN
+ZADD_OUT_ADDED = (1<<2)     # 添加了新成员
+ZADD_OUT_UPDATED = (1<<3)   # 更新了已有成员的分值
+
+ZRANGE_AUTO = 0
+ZRANGE_RANK = 1
+ZRANGE_SCORE = 2
+ZRANGE_LEX = 3
+
+ZRANGE_DIRECTION_AUTO = 0
+ZRANGE_DIRECTION_FORWARD = 1
+ZRANGE_DIRECTION_REVERSE = 2
+
+ZSET_MIN = 0
+ZSET_MAX = 1
+
+# ZUNIONSTORE / ZINTERSTORE 的 AGGREGATE 选项
+REDIS_AGGR_SUM = 1
+REDIS_AGGR_MIN = 2
+REDIS_AGGR_MAX = 3
+
+# 并集的输入元素总数达到这个数量时用 numpy 按成员编号累加分值
+ZSET_NUMPY_MIN_SIZE = 1024
+
+def zsetObjectBytes(o: robj) -> bytes:
+    """成员参数或者跳跃表节点中成员对象的内容"""
+    if sdsEncodedObject(o):
+        return bytes(o.ptr.buf[:sdslen(o.ptr)])
+    return b'%d' % o.ptr
+
+def zsetMemberObject(ele: bytes) -> robj:
+    return createStringObject(ele, len(ele))
+
+# ---------------------------------------------------------------------------
+# ziplist 编码
+# ---------------------------------------------------------------------------
+
+def zzlGetScore(sptr: cstrptr) -> float:
+    return float(ziplistGetValue(sptr))
+
+def zzlGetMember(eptr: cstrptr) -> bytes:
+    value = ziplistGetValue(eptr)
+    return b'%d' % value if isinstance(value, int) else value
+
+def zzlLength(zl: ziplist) -> int:
+    return ziplistLen(zl) // 2
+
+def zzlNext(zl: ziplist, eptr: cstrptr, sptr: cstrptr) -> Tuple[Opt[cstrptr], Opt[cstrptr]]:
+    """下一对成员和分值节点, 没有时返回 (None, None)"""
+    _eptr = ziplistNext(zl, sptr)
+    if _eptr is None:
+        return None, None
+    return _eptr, ziplistNext(zl, _eptr)
+
+def zzlPrev(zl: ziplist, eptr: cstrptr, sptr: cstrptr) -> Tuple[Opt[cstrptr], Opt[cstrptr]]:
+    _sptr = ziplistPrev(zl, eptr)
+    if _sptr is None:
+        return None, None
+    return ziplistPrev(zl, _sptr), _sptr
+
+def zzlIsInRange(zl: ziplist, zrange: zrangespec) -> int:
+    if zrange.min > zrange.max or (zrange.min == zrange.max and (zrange.minex or zrange.maxex)):
+        return 0
+    # 最后一个分值不小于 min, 第一个分值不大于 max
+    p = ziplistIndex(zl, -1)
+    if p is None or not zslValueGteMin(zzlGetScore(p), zrange):
+        return 0
+    p = ziplistIndex(zl, 1)
+    assert p is not None
+    if not zslValueLteMax(zzlGetScore(p), zrange):
+        return 0
+    return 1
+
+def zzlFirstInRange(zl: ziplist, zrange: zrangespec) -> Opt[cstrptr]:
+    if not zzlIsInRange(zl, zrange):
+        return None
+    eptr = ziplistIndex(zl, 0)
+    while eptr is not None:
+        sptr = ziplistNext(zl, eptr)
+        assert sptr is not None
+        score = zzlGetScore(sptr)
+        if zslValueGteMin(score, zrange):
+            return eptr if zslValueLteMax(score, zrange) else None
+        eptr = ziplistNext(zl, sptr)
+    return None
+
+def zzlLastInRange(zl: ziplist, zrange: zrangespec) -> Opt[cstrptr]:
+    if not zzlIsInRange(zl, zrange):
+        return None
+    eptr = ziplistIndex(zl, -2)
+    while eptr is not None:
+        sptr = ziplistNext(zl, eptr)
+        assert sptr is not None
+        score = zzlGetScore(sptr)
+        if zslValueLteMax(score, zrange):
+            return eptr if zslValueGteMin(score, zrange) else None
+        eptr, sptr = zzlPrev(zl, eptr, sptr)   # type: ignore
+    return None
+
+def zzlLexValueGteMin(p: cstrptr, spec: zlexrangespec) -> int:
+    return zslLexValueGteMin(zsetMemberObject(zzlGetMember(p)), spec)
+
+def zzlLexValueLteMax(p: cstrptr, spec: zlexrangespec) -> int:
+    return zslLexValueLteMax(zsetMemberObject(zzlGetMember(p)), spec)
+
+def zzlIsInLexRange(zl: ziplist, zrange: zlexrangespec) -> int:
+    cmp = compareStringObjectsForLexRange(zrange.min, zrange.max)
+    if cmp > 0 or (cmp == 0 and (zrange.minex or zrange.maxex)):
+        return 0
+    p = ziplistIndex(zl, -2)
+    if p is None or not zzlLexValueGteMin(p, zrange):
+        return 0
+    p = ziplistIndex(zl, 0)
+    assert p is not None
+    if not zzlLexValueLteMax(p, zrange):
+        return 0
+    return 1
+
+def zzlFirstInLexRange(zl: ziplist, zrange: zlexrangespec) -> Opt[cstrptr]:
+    if not zzlIsInLexRange(zl, zrange):
+        return None
+    eptr = ziplistIndex(zl, 0)
+    while eptr is not None:
+        if zzlLexValueGteMin(eptr, zrange):
+            return eptr if zzlLexValueLteMax(eptr, zrange) else None
+        sptr = ziplistNext(zl, eptr)
+        assert sptr is not None
+        eptr = ziplistNext(zl, sptr)
+    return None
+
+def zzlLastInLexRange(zl: ziplist, zrange: zlexrangespec) -> Opt[cstrptr]:
+    if not zzlIsInLexRange(zl, zrange):
+        return None
+    eptr = ziplistIndex(zl, -2)
+    while eptr is not None:
+        if zzlLexValueLteMax(eptr, zrange):
+            return eptr if zzlLexValueGteMin(eptr, zrange) else None
+        sptr = ziplistPrev(zl, eptr)
+        eptr = ziplistPrev(zl, sptr) if sptr is not None else None
+    return None
+
+def zzlFind(zl: ziplist, ele: bytes) -> Tuple[Opt[cstrptr], float]:
+    """查找成员, 返回成员节点和分值, 成员不存在时节点为 None"""
+    eptr = ziplistIndex(zl, 0)
+    if eptr is None:
+        return None, 0.0
+    # 跳过分值节点, 只和成员比较
+    eptr = ziplistFind(eptr, ele, len(ele), 1)
+    if eptr is None:
+        return None, 0.0
+    sptr = ziplistNext(zl, eptr)
+    assert sptr is not None
+    return eptr, zzlGetScore(sptr)
+
+def zzlDelete(zl: ziplist, eptr: cstrptr) -> ziplist:
+    # 删除之后 eptr 指向下一个节点, 也就是分值节点
+    zl = ziplistDelete(zl, eptr)
+    return ziplistDelete(zl, eptr)
+
+def zzlInsertAt(zl: ziplist, eptr: Opt[cstrptr], ele: bytes, score: float) -> ziplist:
+    """在 eptr 指向的成员之前插入, eptr 为 None 时插入到末尾"""
+    scorebuf = d2string(score)
+    if eptr is None:
+        zl = ziplistPush(zl, ele, len(ele), ZIPLIST_TAIL)
+        return ziplistPush(zl, scorebuf, len(scorebuf), ZIPLIST_TAIL)
+    # 插入之后 eptr 指向新的成员, 分值插入在它后面
+    zl = ziplistInsert(zl, eptr, ele, len(ele))
+    sptr = ziplistNext(zl, eptr)
+    assert sptr is not None
+    return ziplistInsert(zl, sptr, scorebuf, len(scorebuf))
+
+def zzlInsert(zl: ziplist, ele: bytes, score: float) -> ziplist:
+    """按 (分值, 成员) 的顺序插入, 调用者保证成员不存在"""
+    eptr = ziplistIndex(zl, 0)
+    while eptr is not None:
+        sptr = ziplistNext(zl, eptr)
+        assert sptr is not None
+        s = zzlGetScore(sptr)
+        if s > score or (s == score and zzlGetMember(eptr) > ele):
+            return zzlInsertAt(zl, eptr, ele, score)
+        eptr = ziplistNext(zl, sptr)
+    return zzlInsertAt(zl, None, ele, score)
+
+def zzlDeleteRangeByScore(zl: ziplist, zrange: zrangespec) -> Tuple[ziplist, int]:
+    deleted = 0
+    eptr = zzlFirstInRange(zl, zrange)
+    if eptr is None:
+        return zl, deleted
+    while True:
+        sptr = ziplistNext(zl, eptr)
+        if sptr is None or not zslValueLteMax(zzlGetScore(sptr), zrange):
+            break
+        zl = zzlDelete(zl, eptr)
+        deleted += 1
+    return zl, deleted
+
+def zzlDeleteRangeByLex(zl: ziplist, zrange: zlexrangespec) -> Tuple[ziplist, int]:
+    deleted = 0
+    eptr = zzlFirstInLexRange(zl, zrange)
+    if eptr is None:
+        return zl, deleted
+    while ziplistNext(zl, eptr) is not None:
+        if not zzlLexValueLteMax(eptr, zrange):
+            break
+        zl = zzlDelete(zl, eptr)
+        deleted += 1
+    return zl, deleted
+
+# ---------------------------------------------------------------------------
+# 通用的有序集合 API
+# ---------------------------------------------------------------------------
+
+def zsetTypeEncoding(size_hint: int, value_len_hint: int) -> int:
+    """按预计的成员数和最长成员的长度选择编码"""
+    server = get_server()
+    if size_hint <= server.zset_max_ziplist_entries and value_len_hint <= server.zset_max_ziplist_value:
+        return REDIS_ENCODING_ZIPLIST
+    if server.zset_min_sortedarray_entries and size_hint >= server.zset_min_sortedarray_entries:
+        return REDIS_ENCODING_SORTEDARRAY
+    return REDIS_ENCODING_SKIPLIST
+
+def zsetTypeCreate(size_hint: int, value_len_hint: int) -> robj:
+    """按预计的成员数和最长成员的长度选择编码, 创建空的有序集合"""
+    encoding = zsetTypeEncoding(size_hint, value_len_hint)
+    if encoding == REDIS_ENCODING_ZIPLIST:
+        return createZsetZiplistObject()
+    if encoding == REDIS_ENCODING_SORTEDARRAY:
+        zobj = createZsetSortedArrayObject()
+    else:
+        zobj = createZsetObject()
+    dictExpand(zobj.ptr.dict, size_hint)
+    return zobj
+
+def zsetLength(zobj: robj) -> int:
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        return zzlLength(zobj.ptr)
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        return zobj.ptr.zsl.length
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        return zobj.ptr.length
+    raise RuntimeError("Unknown sorted set encoding")
+
+def zsetCreateFromSorted(items: List[ZsetItem], encoding: int) -> robj:
+    """用按 (分值, 成员) 升序排列的 items 创建指定编码的有序集合, 依次追加而不是逐个查找插入位置"""
+    if encoding == REDIS_ENCODING_ZIPLIST:
+        zobj = createZsetZiplistObject()
+        zl = zobj.ptr
+        for ele, score in items:
+            zl = zzlInsertAt(zl, None, ele, score)
+        zobj.ptr = zl
+    elif encoding == REDIS_ENCODING_SKIPLIST:
+        zobj = createZsetObject()
+        zs: zset = zobj.ptr
+        dictExpand(zs.dict, len(items))
+        objs = [(score, zsetMemberObject(ele)) for ele, score in items]
+        zs.zsl = zslCreateFromSorted(objs)
+        for score, obj in objs:
+            # 成员对象同时被跳跃表和字典引用
+            incrRefCount(obj)
+            ret = dictAdd(zs.dict, obj, score)
+            assert ret == DICT_OK
+    elif encoding == REDIS_ENCODING_SORTEDARRAY:
+        zobj = createZsetSortedArrayObject()
+        za: zarray = zobj.ptr
+        dictExpand(za.dict, len(items))
+        for ele, score in items:
+            zarrAppend(za, score, ele)
+            ret = dictAdd(za.dict, zsetMemberObject(ele), score)
+            assert ret == DICT_OK
+    else:
+        raise RuntimeError("Unknown target encoding")
+    return zobj
+
+def zsetConvert(zobj: robj, encoding: int) -> None:
+    if zobj.encoding == encoding:
+        return
+    # 各种编码都按 (分值, 成员) 的顺序取出, 依次追加到新的编码中
+    items = zsetRangeByRank(zobj, 0, zsetLength(zobj) - 1, 0)
+    zobj.ptr = zsetCreateFromSorted(items, encoding).ptr
+    zobj.encoding = encoding
+
+def zsetScore(zobj: robj, ele: bytes) -> Opt[float]:
+    """成员的分值, 成员不存在时返回 None"""
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        eptr, score = zzlFind(zobj.ptr, ele)
+        return score if eptr is not None else None
+    elif zobj.encoding in (REDIS_ENCODING_SKIPLIST, REDIS_ENCODING_SORTEDARRAY):
+        de = dictFind(zobj.ptr.dict, zsetMemberObject(ele))
+        return de.v.val if de is not None else None
+    raise RuntimeError("Unknown sorted set encoding")
+
+def zsetAdd(zobj: robj, score: float, ele: bytes, in_flags: int) -> Tuple[int, int, float]:
+    """
+    添加成员或者更新成员的分值, 返回 (ok, out_flags, newscore)
+    ok 为 0 表示分值是 NaN (例如 INCR 时 inf 加上 -inf), 此时有序集合没有变化
+    newscore 是成员现在的分值, INCR 时由此得到增加之后的分值
+    """
+    incr = in_flags & ZADD_IN_INCR
+    nx = in_flags & ZADD_IN_NX
+    xx = in_flags & ZADD_IN_XX
+    gt = in_flags & ZADD_IN_GT
+    lt = in_flags & ZADD_IN_LT
+
+    if math.isnan(score):
+        return 0, ZADD_OUT_NAN, score
+
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        eptr, curscore = zzlFind(zobj.ptr, ele)
+        if eptr is not None:
+            if nx:
+                return 1, ZADD_OUT_NOP, curscore
+            if incr:
+                score += curscore
+                if math.isnan(score):
+                    return 0, ZADD_OUT_NAN, score
+            if (lt and score >= curscore) or (gt and score <= curscore):
+                return 1, ZADD_OUT_NOP, curscore
+            if score == curscore:
+                return 1, 0, score
+            # 分值改变时删除之后重新插入, 保持有序
+            zl = zzlDelete(zobj.ptr, eptr)
+            zobj.ptr = zzlInsert(zl, ele, score)
+            return 1, ZADD_OUT_UPDATED, score
+        elif xx:
+            return 1, ZADD_OUT_NOP, score
+        server = get_server()
+        if (zzlLength(zobj.ptr) + 1 <= server.zset_max_ziplist_entries and
+                len(ele) <= server.zset_max_ziplist_value):
+            zobj.ptr = zzlInsert(zobj.ptr, ele, score)
+            return 1, ZADD_OUT_ADDED, score
+        # 添加之后超过限制, 先转换成跳跃表, 在下面添加
+        zsetConvert(zobj, REDIS_ENCODING_SKIPLIST)
+
+    if zobj.encoding in (REDIS_ENCODING_SKIPLIST, REDIS_ENCODING_SORTEDARRAY):
+        # 两种编码的字典相同, 只是排序的结构不同
+        zs = zobj.ptr
+        key = zsetMemberObject(ele)
+        de = dictFind(zs.dict, key)
+        if de is not None:
+            curscore = de.v.val
+            if nx:
+                return 1, ZADD_OUT_NOP, curscore
+            if incr:
+                score += curscore
+                if math.isnan(score):
+                    return 0, ZADD_OUT_NAN, score
+            if (lt and score >= curscore) or (gt and score <= curscore):
+                return 1, ZADD_OUT_NOP, curscore
+            if score == curscore:
+                return 1, 0, score
+            if zobj.encoding == REDIS_ENCODING_SKIPLIST:
+                zslUpdateScore(zs.zsl, curscore, de.key, score)
+            else:
+                zarrUpdateScore(zs, curscore, ele, score)
+            dictSetVal(zs.dict, de, score)
+            return 1, ZADD_OUT_UPDATED, score
+        elif xx:
+            return 1, ZADD_OUT_NOP, score
+        server = get_server()
+        if (zobj.encoding == REDIS_ENCODING_SKIPLIST and server.zset_min_sortedarray_entries and
+                zs.zsl.length + 1 >= server.zset_min_sortedarray_entries):
+            # 添加之后达到有序数组编码的阈值, 先转换, 字典中的成员对象在转换时重新创建
+            zsetConvert(zobj, REDIS_ENCODING_SORTEDARRAY)
+            zs = zobj.ptr
+        if zobj.encoding == REDIS_ENCODING_SKIPLIST:
+            zslInsert(zs.zsl, score, key)
+            incrRefCount(key)
+        else:
+            zarrInsert(zs, score, ele)
+        ret = dictAdd(zs.dict, key, score)
+        assert ret == DICT_OK
+        return 1, ZADD_OUT_ADDED, score
+    raise RuntimeError("Unknown sorted set encoding")
+
+def zsetDel(zobj: robj, ele: bytes) -> int:
+    """删除成员, 成员不存在时返回 0"""
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        eptr, _ = zzlFind(zobj.ptr, ele)
+        if eptr is None:
+            return 0
+        zobj.ptr = zzlDelete(zobj.ptr, eptr)
+        return 1
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zs: zset = zobj.ptr
+        key = zsetMemberObject(ele)
+        de = dictFind(zs.dict, key)
+        if de is None:
+            return 0
+        score = de.v.val
+        # 字典和跳跃表各释放一次共享的成员对象
+        dictDelete(zs.dict, key)
+        ret = zslDelete(zs.zsl, score, key)
+        assert ret
+        if htNeedsResize(zs.dict):
+            dictResize(zs.dict)
+        return 1
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        za: zarray = zobj.ptr
+        key = zsetMemberObject(ele)
+        de = dictFind(za.dict, key)
+        if de is None:
+            return 0
+        score = de.v.val
+        dictDelete(za.dict, key)
+        ret = zarrDelete(za, score, ele)
+        assert ret
+        if htNeedsResize(za.dict):
+            dictResize(za.dict)
+        return 1
+    raise RuntimeError("Unknown sorted set encoding")
+
+def zsetRank(zobj: robj, ele: bytes, reverse: int) -> Opt[int]:
+    """成员从 0 开始的排名, reverse 时按分值从大到小排名, 成员不存在时返回 None"""
+    llen = zsetLength(zobj)
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = zobj.ptr
+        rank = 1
+        eptr = ziplistIndex(zl, 0)
+        while eptr is not None:
+            if ziplistCompare(eptr, ele, len(ele)):
+                return llen - rank if reverse else rank - 1
+            sptr = ziplistNext(zl, eptr)
+            assert sptr is not None
+            eptr = ziplistNext(zl, sptr)
+            rank += 1
+        return None
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zs: zset = zobj.ptr
+        de = dictFind(zs.dict, zsetMemberObject(ele))
+        if de is None:
+            return None
+        rank = zslGetRank(zs.zsl, de.v.val, de.key)
+        assert rank != 0
+        return llen - rank if reverse else rank - 1
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        za: zarray = zobj.ptr
+        de = dictFind(za.dict, zsetMemberObject(ele))
+        if de is None:
+            return None
+        rank0 = zarrGetRank(za, de.v.val, ele)
+        assert rank0 is not None
+        return llen - 1 - rank0 if reverse else rank0
+    raise RuntimeError("Unknown sorted set encoding")
+
+def zsetRankRange(start: int, end: int, llen: int) -> Tuple[int, int]:
+    """把 ZRANGE 风格的排名范围 (可以是负数) 转换成 [start, end], start > end 表示范围为空"""
+    if start < 0:
+        start = llen + start
+    if end < 0:
+        end = llen + end
+    if start < 0:
+        start = 0
+    if start > end or start >= llen:
+        return 0, -1
+    if end >= llen:
+        end = llen - 1
+    return start, end
+
+def zslSkipByRank(zsl: zskiplist, ln: zskiplistNode, offset: int, reverse: int) -> Opt[zskiplistNode]:
+    """从 ln 开始沿遍历方向跳过 offset 个节点, 利用跨度 O(log n) 定位, 不需要逐个访问"""
+    if offset == 0:
+        return ln
+    rank = zslGetRank(zsl, ln.score, ln.obj)
+    rank = rank - offset if reverse else rank + offset
+    if rank < 1 or rank > zsl.length:
+        return None
+    return zslGetElementByRank(zsl, rank)
+
+def zarrRangeWithLimit(za: zarray, first: int, last: int, reverse: int, offset: int, limit: int) -> List[ZsetItem]:
+    """排名在 [first, last] 之间的元素, 沿遍历方向跳过 offset 个之后最多返回 limit 个, limit 为负数时不限制"""
+    if reverse:
+        end = last - offset
+        start = first if limit < 0 else max(first, end - limit + 1)
+        items = zarrRangeByRank(za, start, end)
+        items.reverse()
+        return items
+    start = first + offset
+    end = last if limit < 0 else min(last, start + limit - 1)
+    return zarrRangeByRank(za, start, end)
+
+def zsetRangeByRank(zobj: robj, start: int, end: int, reverse: int) -> List[ZsetItem]:
+    """排名在 [start, end] 之间的成员和分值, 范围已经由 zsetRankRange 处理过"""
+    items: List[ZsetItem] = []
+    rangelen = end - start + 1
+    if rangelen <= 0:
+        return items
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = zobj.ptr
+        eptr = ziplistIndex(zl, -2 - 2 * start) if reverse else ziplistIndex(zl, 2 * start)
+        assert eptr is not None
+        sptr = ziplistNext(zl, eptr)
+        while rangelen:
+            assert eptr is not None and sptr is not None
+            items.append((zzlGetMember(eptr), zzlGetScore(sptr)))
+            eptr, sptr = zzlPrev(zl, eptr, sptr) if reverse else zzlNext(zl, eptr, sptr)
+            rangelen -= 1
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zsl = zobj.ptr.zsl
+        # 按跨度直接定位到起始节点
+        ln = zslGetElementByRank(zsl, zsl.length - start if reverse else start + 1)
+        while rangelen:
+            assert ln is not None
+            items.append((zsetObjectBytes(ln.obj), ln.score))
+            ln = ln.backward if reverse else ln.level[0].forward
+            rangelen -= 1
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        # 反向的排名转换成正向的排名范围
+        llen = zobj.ptr.length
+        if reverse:
+            return zarrRangeWithLimit(zobj.ptr, llen - 1 - end, llen - 1 - start, reverse, 0, -1)
+        return zarrRangeByRank(zobj.ptr, start, end)
+    else:
+        raise RuntimeError("Unknown sorted set encoding")
+    return items
+
+def zsetRangeByScore(zobj: robj, zrange: zrangespec, reverse: int, offset: int, limit: int) -> List[ZsetItem]:
+    """分值在范围内的成员, 跳过 offset 个之后最多返回 limit 个, limit 为负数时不限制"""
+    items: List[ZsetItem] = []
+    if offset < 0:
+        return items
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = zobj.ptr
+        eptr = zzlLastInRange(zl, zrange) if reverse else zzlFirstInRange(zl, zrange)
+        sptr = ziplistNext(zl, eptr) if eptr is not None else None
+        while eptr is not None and offset:
+            eptr, sptr = zzlPrev(zl, eptr, sptr) if reverse else zzlNext(zl, eptr, sptr)   # type: ignore
+            offset -= 1
+        while eptr is not None and limit != 0:
+            assert sptr is not None
+            score = zzlGetScore(sptr)
+            if not (zslValueGteMin(score, zrange) if reverse else zslValueLteMax(score, zrange)):
+                break
+            items.append((zzlGetMember(eptr), score))
+            limit -= 1
+            eptr, sptr = zzlPrev(zl, eptr, sptr) if reverse else zzlNext(zl, eptr, sptr)
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zsl = zobj.ptr.zsl
+        ln = zslLastInRange(zsl, zrange) if reverse else zslFirstInRange(zsl, zrange)
+        if ln is not None:
+            ln = zslSkipByRank(zsl, ln, offset, reverse)
+        while ln is not None and limit != 0:
+            if not (zslValueGteMin(ln.score, zrange) if reverse else zslValueLteMax(ln.score, zrange)):
+                break
+            items.append((zsetObjectBytes(ln.obj), ln.score))
+            limit -= 1
+            ln = ln.backward if reverse else ln.level[0].forward
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        first, last = zarrRankRangeByScore(zobj.ptr, zrange)
+        return zarrRangeWithLimit(zobj.ptr, first, last, reverse, offset, limit)
+    else:
+        raise RuntimeError("Unknown sorted set encoding")
+    return items
+
+def zsetRangeByLex(zobj: robj, zrange: zlexrangespec, reverse: int, offset: int, limit: int) -> List[ZsetItem]:
+    """成员的字典序在范围内的成员, 只在所有分值都相同时有意义"""
+    items: List[ZsetItem] = []
+    if offset < 0:
+        return items
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = zobj.ptr
+        eptr = zzlLastInLexRange(zl, zrange) if reverse else zzlFirstInLexRange(zl, zrange)
+        sptr = ziplistNext(zl, eptr) if eptr is not None else None
+        while eptr is not None and offset:
+            eptr, sptr = zzlPrev(zl, eptr, sptr) if reverse else zzlNext(zl, eptr, sptr)   # type: ignore
+            offset -= 1
+        while eptr is not None and limit != 0:
+            assert sptr is not None
+            if not (zzlLexValueGteMin(eptr, zrange) if reverse else zzlLexValueLteMax(eptr, zrange)):
+                break
+            items.append((zzlGetMember(eptr), zzlGetScore(sptr)))
+            limit -= 1
+            eptr, sptr = zzlPrev(zl, eptr, sptr) if reverse else zzlNext(zl, eptr, sptr)
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zsl = zobj.ptr.zsl
+        ln = zslLastInLexRange(zsl, zrange) if reverse else zslFirstInLexRange(zsl, zrange)
+        if ln is not None:
+            ln = zslSkipByRank(zsl, ln, offset, reverse)
+        while ln is not None and limit != 0:
+            if not (zslLexValueGteMin(ln.obj, zrange) if reverse else zslLexValueLteMax(ln.obj, zrange)):
+                break
+            items.append((zsetObjectBytes(ln.obj), ln.score))
+            limit -= 1
+            ln = ln.backward if reverse else ln.level[0].forward
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        first, last = zarrRankRangeByLex(zobj.ptr, zrange)
+        return zarrRangeWithLimit(zobj.ptr, first, last, reverse, offset, limit)
+    else:
+        raise RuntimeError("Unknown sorted set encoding")
+    return items
+
+def zsetDeleteRangeByRank(zobj: robj, start: int, end: int) -> int:
+    """删除排名在 [start, end] 之间的成员, 范围已经由 zsetRankRange 处理过"""
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zobj.ptr = ziplistDeleteRange(zobj.ptr, 2 * start, 2 * (end - start + 1))
+        return end - start + 1
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zs: zset = zobj.ptr
+        # 跳跃表的排名从 1 开始
+        deleted = zslDeleteRangeByRank(zs.zsl, start + 1, end + 1, zs.dict)
+        if htNeedsResize(zs.dict):
+            dictResize(zs.dict)
+        return deleted
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        za: zarray = zobj.ptr
+        deleted = zarrDeleteRangeByRank(za, start, end, za.dict)
+        if htNeedsResize(za.dict):
+            dictResize(za.dict)
+        return deleted
+    raise RuntimeError("Unknown sorted set encoding")
+
+def addReplyZsetItems(c: 'RedisClient', items: List[ZsetItem], withscores: int) -> None:
+    addReplyMultiBulkLen(c, len(items) * 2 if withscores else len(items))
+    for ele, score in items:
+        addReplyBulkCBuffer(c, ele, len(ele))
+        if withscores:
+            addReplyDouble(c, score)
+
+def checkZsetType(c: 'RedisClient', o: robj) -> bool:
+    if o.type != REDIS_ZSET:
+        addReply(c, get_shared().wrongtypeerr)
+        return True
+    return False
+
+# ---------------------------------------------------------------------------
+# ZUNIONSTORE / ZINTERSTORE / ZDIFFSTORE 及对应的只读命令
+# ---------------------------------------------------------------------------
+# 输入可以是有序集合也可以是集合, 集合的成员分值都是 1。并集按成员累加 (权重 * 分值), 交集从最小的输入开始,
+# 在其他输入中查找每个成员, 差集保留第一个输入中不在其他输入中的成员。结果按 (分值, 成员) 排序之后
+# 直接批量构建目标有序集合。安装了 numpy 并且并集的输入足够多时, 给每个成员分配编号, 用 bincount /
+# minimum.at / maximum.at 一次完成所有输入的聚合。
+
+class zsetopsrc:
+    def __init__(self, obj: Opt[robj], weight: float):
+        self.obj = obj
+        self.weight = weight
+
+def zsetSourceLength(o: Opt[robj]) -> int:
+    if o is None:
+        return 0
+    return setTypeSize(o) if o.type == REDIS_SET else zsetLength(o)
+
+def zsetSourceItems(o: Opt[robj]) -> List[ZsetItem]:
+    """输入的所有成员和分值, 有序集合按 (分值, 成员) 升序"""
+    if o is None:
+        return []
+    if o.type == REDIS_SET:
+        return [(setElementBytes(ele), 1.0) for ele in setTypeElements(o)]
+    return zsetRangeByRank(o, 0, zsetLength(o) - 1, 0)
+
+def zsetSourceLookup(o: Opt[robj]) -> Callable[[bytes], Opt[float]]:
+    """按成员查找分值的函数, 成员不存在时返回 None"""
+    if o is None:
+        return lambda ele: None
+    if o.type == REDIS_SET:
+        return lambda ele: 1.0 if setTypeIsMember(o, ele) else None
+    if o.encoding == REDIS_ENCODING_ZIPLIST:
+        # ziplist 只能顺序查找, 先转换成字典
+        return dict(zsetSourceItems(o)).get
+    return lambda ele: zsetScore(o, ele)
+
+def zunionInterWeighted(score: float, weight: float) -> float:
+    score *= weight
+    # 0 * inf 的结果是 NaN, 按 0 处理
+    return 0.0 if math.isnan(score) else score
+
+def zunionInterAggregate(target: float, val: float, aggregate: int) -> float:
+    if aggregate == REDIS_AGGR_SUM:
+        target += val
+        # inf + -inf 的结果是 NaN, 按 0 处理
+        return 0.0 if math.isnan(target) else target
+    elif aggregate == REDIS_AGGR_MIN:
+        return val if val < target else target
+    elif aggregate == REDIS_AGGR_MAX:
+        return val if val > target else target
+    raise RuntimeError("Unknown ZUNION/INTER aggregate type")
+
+def zsetSortItems(items: List[ZsetItem]) -> List[ZsetItem]:
+    # 排序是稳定的, 先按成员再按分值排序就是按 (分值, 成员) 排序, 而且两次都不需要比较元组
+    items.sort(key=itemgetter(0))
+    items.sort(key=itemgetter(1))
+    return items
+
+def zsetSourceColumns(np: Any, o: robj) -> Tuple[List[bytes], Any]:
+    """输入的成员列表和对应的 float64 分值数组, 有序数组编码直接拼接各个块的分值数组"""
+    if o.encoding == REDIS_ENCODING_SORTEDARRAY:
+        blocks = o.ptr.blocks
+        members = [ele for block in blocks for ele in block.members]
+        return members, np.concatenate([np.frombuffer(block.scores, dtype=np.float64) for block in blocks])
+    if o.encoding == REDIS_ENCODING_SKIPLIST:
+        members = []
+        scores = []
+        ln = o.ptr.zsl.header.level[0].forward
+        while ln is not None:
+            members.append(zsetObjectBytes(ln.obj))
+            scores.append(ln.score)
+            ln = ln.level[0].forward
+        return members, np.array(scores, dtype=np.float64)
+    items = zsetSourceItems(o)
+    return list(map(itemgetter(0), items)), np.fromiter(map(itemgetter(1), items), dtype=np.float64, count=len(items))
+
+def zsetUnionNumpy(np: Any, srcs: List[zsetopsrc], aggregate: int) -> Opt[List[ZsetItem]]:
+    """用 numpy 聚合并集的分值并排序, 加法中出现无穷大时返回 None, 由调用者按顺序逐个累加"""
+    members: List[bytes] = []
+    scores = []
+    for src in srcs:
+        if src.obj is None or zsetSourceLength(src.obj) == 0:
+            continue
+        ele, a = zsetSourceColumns(np, src.obj)
+        members.extend(ele)
+        # 溢出得到的无穷大和 0 * inf 得到的 NaN 在下面处理
+        with np.errstate(invalid='ignore', over='ignore'):
+            a *= src.weight
+        a[np.isnan(a)] = 0.0
+        scores.append(a)
+    if not members:
+        return []
+    values = np.concatenate(scores)
+    if aggregate == REDIS_AGGR_SUM and np.isinf(values).any():
+        # inf + -inf 在累加到一半时就要变成 0, 和最终求和的结果不同
+        return None
+    # 每个成员的编号是它第一次出现的位置, 只需要构建一次字典, 编号不连续也不影响按编号聚合
+    first: Dict[bytes, int] = {}
+    n = len(members)
+    idx = np.fromiter(map(first.setdefault, members, range(n)), dtype=np.intp, count=n)
+    if aggregate == REDIS_AGGR_SUM:
+        result = np.bincount(idx, weights=values, minlength=n)
+    elif aggregate == REDIS_AGGR_MIN:
+        result = np.full(n, np.inf)
+        np.minimum.at(result, idx, values)
+    else:
+        result = np.full(n, -np.inf)
+        np.maximum.at(result, idx, values)
+    zero = values == 0
+    if zero.any():
+        # numpy 不保留 -0.0 和 0.0 的区别, 按逐个聚合的规则修正结果为 0 的符号:
+        # SUM 从 0.0 开始累加, 只有所有分值都是 -0.0 时结果才是 -0.0;
+        # MIN / MAX 只在严格更小 / 更大时替换, 结果是第一个等于它的分值
+        if aggregate == REDIS_AGGR_SUM:
+            negzero = np.bincount(idx, weights=zero & np.signbit(values), minlength=n)
+            result[(negzero > 0) & (negzero == np.bincount(idx, minlength=n))] = -0.0
+        else:
+            tie = zero & (result[idx] == 0)
+            ties, firsttie = np.unique(idx[tie], return_index=True)
+            result[ties] = values[tie][firsttie]
+    # 字典按插入顺序保存, 第一次出现的位置是递增的
+    positions = np.fromiter(first.values(), dtype=np.intp, count=len(first))
+    scores = result[positions]
+    # 按分值排序之后只有分值相同的几段需要再按成员排序
+    keys = list(first)
+    order = np.argsort(scores, kind='stable')
+    scores = scores[order]
+    items = list(zip(map(keys.__getitem__, order.tolist()), scores.tolist()))
+    same = np.concatenate(([False], scores[1:] == scores[:-1], [False])).view(np.int8)
+    edges = np.diff(same)
+    for lo, hi in zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()):
+        items[lo:hi+1] = sorted(items[lo:hi+1])
+    return items
+
+def zsetUnion(srcs: List[zsetopsrc], aggregate: int) -> List[ZsetItem]:
+    np = optionalImport('numpy')
+    if np is not None and sum(zsetSourceLength(src.obj) for src in srcs) >= ZSET_NUMPY_MIN_SIZE:
+        items = zsetUnionNumpy(np, srcs, aggregate)
+        if items is not None:
+            return items
+    accumulator: Dict[bytes, float] = {}
+    for src in srcs:
+        weight = src.weight
+        for ele, score in zsetSourceItems(src.obj):
+            score = zunionInterWeighted(score, weight)
+            cur = accumulator.get(ele)
+            accumulator[ele] = score if cur is None else zunionInterAggregate(cur, score, aggregate)
+    return zsetSortItems(list(accumulator.items()))
+
+def zsetInter(srcs: List[zsetopsrc], aggregate: int) -> List[ZsetItem]:
+    """srcs 按大小升序排列, 遍历最小的输入, 在其他输入中查找每个成员"""
+    if zsetSourceLength(srcs[0].obj) == 0:
+        return []
+    first = zsetSourceItems(srcs[0].obj)
+    lookups = [(zsetSourceLookup(src.obj), src.weight) for src in srcs[1:]]
+    items: List[ZsetItem] = []
+    weight = srcs[0].weight
+    for ele, score in first:
+        score = zunionInterWeighted(score, weight)
+        for lookup, w in lookups:
+            value = lookup(ele)
+            if value is None:
+                break
+            score = zunionInterAggregate(score, zunionInterWeighted(value, w), aggregate)
+        else:
+            items.append((ele, score))
+    return zsetSortItems(items)
+
+def zsetInterCard(srcs: List[zsetopsrc], limit: int) -> int:
+    """交集的成员数, limit 不为 0 时数到 limit 就停止"""
+    if zsetSourceLength(srcs[0].obj) == 0:
+        return 0
+    first = zsetSourceItems(srcs[0].obj)
+    lookups = [zsetSourceLookup(src.obj) for src in srcs[1:]]
+    cardinality = 0
+    for ele, _ in first:
+        if all(lookup(ele) is not None for lookup in lookups):
+            cardinality += 1
+            if cardinality == limit:
+                break
+    return cardinality
+
+def zsetDiff(srcs: List[zsetopsrc]) -> List[ZsetItem]:
+    """第一个输入中不在其他输入中的成员, 分值不变"""
+    first = srcs[0].obj
+    if first is None:
+        return []
+    lookups = [zsetSourceLookup(src.obj) for src in srcs[1:] if src.obj is not None]
+    items = [(ele, score) for ele, score in zsetSourceItems(first)
+             if all(lookup(ele) is None for lookup in lookups)]
+    # 第一个输入是有序集合时已经按 (分值, 成员) 排好序
+    return zsetSortItems(items) if first.type == REDIS_SET else items
+
+def zunionInterDiffGetKeys(cmd: 'redisCommand', argv: List[robj], argc: int) -> List[int]:
+    """ZUNION / ZINTER / ZDIFF / ZINTERCARD numkeys key [key ...] ... 中键的位置"""
+    status, num = getLongLongFromObject(argv[1])
+    if status != REDIS_OK or num < 1 or num > argc - 2:
+        return []
+    return list(range(2, 2 + num))
+
+def zunionInterDiffStoreGetKeys(cmd: 'redisCommand', argv: List[robj], argc: int) -> List[int]:
+    """ZUNIONSTORE / ZINTERSTORE / ZDIFFSTORE dstkey numkeys key [key ...] ... 中键的位置, 目标键在最后"""
+    status, num = getLongLongFromObject(argv[2])
+    if status != REDIS_OK or num < 1 or num > argc - 3:
+        return []
+    return list(range(3, 3 + num)) + [1]
+
+# ---------------------------------------------------------------------------
+# 命令
+# ---------------------------------------------------------------------------
+
+def zaddGenericCommand(c: 'RedisClient', flags: int) -> None:
+    server = get_server()
+    shared = get_shared()
+    key = c.argv[1]
+    ch = 0
+
+    # 解析选项, 第一个不是选项的参数是分值
+    scoreidx = 2
+    while scoreidx < c.argc:
+        opt = c.argv[scoreidx].ptr
+        if opt.lowereq('nx'):
+            flags |= ZADD_IN_NX
+        elif opt.lowereq('xx'):
+            flags |= ZADD_IN_XX
+        elif opt.lowereq('gt'):
+            flags |= ZADD_IN_GT
+        elif opt.lowereq('lt'):
+            flags |= ZADD_IN_LT
+        elif opt.lowereq('ch'):
+            ch = 1
+        elif opt.lowereq('incr'):
+            flags |= ZADD_IN_INCR
+        else:
+            break
+        scoreidx += 1
+
+    incr = flags & ZADD_IN_INCR
+    nx = flags & ZADD_IN_NX
+    xx = flags & ZADD_IN_XX
+    gt = flags & ZADD_IN_GT
+    lt = flags & ZADD_IN_LT
+
+    elements = c.argc - scoreidx
+    if elements % 2 or elements == 0:
+        addReply(c, shared.syntaxerr)
+        return
+    elements //= 2
+
+    if nx and xx:
+        addReplyError(c, "XX and NX options at the same time are not compatible")
+        return
+    if (gt and nx) or (lt and nx) or (gt and lt):
+        addReplyError(c, "GT, LT, and/or NX options at the same time are not compatible")
+        return
+    if incr and elements > 1:
+        addReplyError(c, "INCR option supports a single increment-element pair")
+        return
+
+    # 先解析所有分值, 有错误时不修改有序集合
+    scores: List[float] = []
+    for j in range(elements):
+        status, score = getLongDoubleFromObjectOrReply(c, c.argv[scoreidx + j * 2], None)
+        if status != REDIS_OK:
+            return
+        scores.append(score)
+    members = [zsetObjectBytes(c.argv[scoreidx + 1 + j * 2]) for j in range(elements)]
+
+    zobj = lookupKeyWrite(c.db, key)
+    if zobj is not None and checkZsetType(c, zobj):
+        return
+
+    added = 0
+    updated = 0
+    processed = 0
+    score = 0.0
+    nanerr = False
+    # 键不存在时 XX 不会添加任何成员
+    if zobj is not None or not xx:
+        if zobj is None:
+            zobj = zsetTypeCreate(elements, max(len(ele) for ele in members))
+            dbAdd(c.db, key, zobj)
+        for j in range(elements):
+            ok, retflags, score = zsetAdd(zobj, scores[j], members[j], flags)
+            if not ok:
+                nanerr = True
+                break
+            if retflags & ZADD_OUT_ADDED:
+                added += 1
+            if retflags & ZADD_OUT_UPDATED:
+                updated += 1
+            if not retflags & ZADD_OUT_NOP:
+                processed += 1
+        server.dirty += added + updated
+        if added or updated:
+            signalModifiedKey(c.db, key)
+            notifyKeyspaceEvent(REDIS_NOTIFY_ZSET, "zincr" if incr else "zadd", key, c.db.id)
+
+    if nanerr:
+        addReplyError(c, "resulting score is not a number (NaN)")
+    elif incr:
+        # INCR 因为 NX / XX / GT / LT 没有执行时回复 nil
+        if processed:
+            addReplyDouble(c, score)
+        else:
+            addReply(c, shared.nullbulk)
+    else:
+        addReplyLongLong(c, added + updated if ch else added)
+
+def zaddCommand(c: 'RedisClient') -> None:
+    zaddGenericCommand(c, ZADD_IN_NONE)
+
+def zincrbyCommand(c: 'RedisClient') -> None:
+    zaddGenericCommand(c, ZADD_IN_INCR)
+
+def zremCommand(c: 'RedisClient') -> None:
+    key = c.argv[1]
+    zobj = lookupKeyWriteOrReply(c, key, get_shared().czero)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+    deleted = 0
+    keyremoved = False
+    for j in range(2, c.argc):
+        deleted += zsetDel(zobj, zsetObjectBytes(c.argv[j]))
+        if zsetLength(zobj) == 0:
+            dbDelete(c.db, key)
+            keyremoved = True
+            break
+    if deleted:
+        notifyKeyspaceEvent(REDIS_NOTIFY_ZSET, "zrem", key, c.db.id)
+        if keyremoved:
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", key, c.db.id)
+        signalModifiedKey(c.db, key)
+        get_server().dirty += deleted
+    addReplyLongLong(c, deleted)
+
+def zremrangeGenericCommand(c: 'RedisClient', rangetype: int) -> None:
+    shared = get_shared()
+    key = c.argv[1]
+    start = end = 0
+    zrange: Opt[zrangespec] = None
+    lexrange: Opt[zlexrangespec] = None
+
+    if rangetype == ZRANGE_RANK:
+        status, start = getLongLongFromObjectOrReply(c, c.argv[2], None)
+        if status != REDIS_OK:
+            return
+        status, end = getLongLongFromObjectOrReply(c, c.argv[3], None)
+        if status != REDIS_OK:
+            return
+    elif rangetype == ZRANGE_SCORE:
+        zrange = zslParseRange(c.argv[2], c.argv[3])
+        if zrange is None:
+            addReplyError(c, "min or max is not a float")
+            return
+    elif rangetype == ZRANGE_LEX:
+        lexrange = zslParseLexRange(c.argv[2], c.argv[3])
+        if lexrange is None:
+            addReplyError(c, "min or max not valid string range item")
+            return
+
+    zobj = lookupKeyWriteOrReply(c, key, shared.czero)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+
+    if rangetype == ZRANGE_RANK:
+        start, end = zsetRankRange(start, end, zsetLength(zobj))
+        if start > end:
+            addReply(c, shared.czero)
+            return
+        deleted = zsetDeleteRangeByRank(zobj, start, end)
+    elif zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        if zrange is not None:
+            zobj.ptr, deleted = zzlDeleteRangeByScore(zobj.ptr, zrange)
+        else:
+            zobj.ptr, deleted = zzlDeleteRangeByLex(zobj.ptr, lexrange)   # type: ignore
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zs: zset = zobj.ptr
+        if zrange is not None:
+            deleted = zslDeleteRangeByScore(zs.zsl, zrange, zs.dict)
+        else:
+            deleted = zslDeleteRangeByLex(zs.zsl, lexrange, zs.dict)   # type: ignore
+        if htNeedsResize(zs.dict):
+            dictResize(zs.dict)
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        if zrange is not None:
+            start, end = zarrRankRangeByScore(zobj.ptr, zrange)
+        else:
+            start, end = zarrRankRangeByLex(zobj.ptr, lexrange)   # type: ignore
+        deleted = zsetDeleteRangeByRank(zobj, start, end)
+    else:
+        raise RuntimeError("Unknown sorted set encoding")
+
+    keyremoved = zsetLength(zobj) == 0
+    if keyremoved:
+        dbDelete(c.db, key)
+    if deleted:
+        event = {ZRANGE_RANK: "zremrangebyrank", ZRANGE_SCORE: "zremrangebyscore", ZRANGE_LEX: "zremrangebylex"}
+        signalModifiedKey(c.db, key)
+        notifyKeyspaceEvent(REDIS_NOTIFY_ZSET, event[rangetype], key, c.db.id)
+        if keyremoved:
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", key, c.db.id)
+    get_server().dirty += deleted
+    addReplyLongLong(c, deleted)
+
+def zremrangebyrankCommand(c: 'RedisClient') -> None:
+    zremrangeGenericCommand(c, ZRANGE_RANK)
+
+def zremrangebyscoreCommand(c: 'RedisClient') -> None:
+    zremrangeGenericCommand(c, ZRANGE_SCORE)
+
+def zremrangebylexCommand(c: 'RedisClient') -> None:
+    zremrangeGenericCommand(c, ZRANGE_LEX)
+
+def zrangeGenericCommand(c: 'RedisClient', argc_start: int, rangetype: int, direction: int) -> None:
+    """
+    ZRANGE key min max [BYSCORE | BYLEX] [REV] [LIMIT offset count] [WITHSCORES]
+    ZREVRANGE / ZRANGEBYSCORE 等旧命令固定了 rangetype 和 direction, 不再接受对应的选项
+    """
+    shared = get_shared()
+    key = c.argv[argc_start]
+    minidx = argc_start + 1
+    maxidx = argc_start + 2
+    opt_offset = 0
+    opt_limit = -1
+    opt_withscores = 0
+
+    j = argc_start + 3
+    while j < c.argc:
+        leftargs = c.argc - j - 1
+        opt = c.argv[j].ptr
+        if opt.lowereq('withscores'):
+            opt_withscores = 1
+        elif opt.lowereq('limit') and leftargs >= 2:
+            status, opt_offset = getLongLongFromObjectOrReply(c, c.argv[j+1], None)
+            if status != REDIS_OK:
+                return
+            status, opt_limit = getLongLongFromObjectOrReply(c, c.argv[j+2], None)
+            if status != REDIS_OK:
+                return
+            j += 2
+        elif direction == ZRANGE_DIRECTION_AUTO and opt.lowereq('rev'):
+            direction = ZRANGE_DIRECTION_REVERSE
+        elif rangetype == ZRANGE_AUTO and opt.lowereq('byscore'):
+            rangetype = ZRANGE_SCORE
+        elif rangetype == ZRANGE_AUTO and opt.lowereq('bylex'):
+            rangetype = ZRANGE_LEX
+        else:
+            addReply(c, shared.syntaxerr)
+            return
+        j += 1
+
+    if direction == ZRANGE_DIRECTION_AUTO:
+        direction = ZRANGE_DIRECTION_FORWARD
+    if rangetype == ZRANGE_AUTO:
+        rangetype = ZRANGE_RANK
+
+    if (opt_offset != 0 or opt_limit != -1) and rangetype == ZRANGE_RANK:
+        addReplyError(c, "syntax error, LIMIT is only supported in combination with either BYSCORE or BYLEX")
+        return
+    if opt_withscores and rangetype == ZRANGE_LEX:
+        addReplyError(c, "syntax error, WITHSCORES not supported in combination with BYLEX")
+        return
+
+    reverse = int(direction == ZRANGE_DIRECTION_REVERSE)
+    # 按分值和字典序反向查询时参数的顺序是 max min
+    if reverse and rangetype in (ZRANGE_SCORE, ZRANGE_LEX):
+        minidx, maxidx = maxidx, minidx
+
+    start = end = 0
+    zrange: Opt[zrangespec] = None
+    lexrange: Opt[zlexrangespec] = None
+    if rangetype == ZRANGE_RANK:
+        status, start = getLongLongFromObjectOrReply(c, c.argv[minidx], None)
+        if status != REDIS_OK:
+            return
+        status, end = getLongLongFromObjectOrReply(c, c.argv[maxidx], None)
+        if status != REDIS_OK:
+            return
+    elif rangetype == ZRANGE_SCORE:
+        zrange = zslParseRange(c.argv[minidx], c.argv[maxidx])
+        if zrange is None:
+            addReplyError(c, "min or max is not a float")
+            return
+    else:
+        lexrange = zslParseLexRange(c.argv[minidx], c.argv[maxidx])
+        if lexrange is None:
+            addReplyError(c, "min or max not valid string range item")
+            return
+
+    zobj = lookupKeyReadOrReply(c, key, shared.emptymultibulk)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+
+    if rangetype == ZRANGE_RANK:
+        start, end = zsetRankRange(start, end, zsetLength(zobj))
+        items = zsetRangeByRank(zobj, start, end, reverse)
+    elif rangetype == ZRANGE_SCORE:
+        items = zsetRangeByScore(zobj, zrange, reverse, opt_offset, opt_limit)   # type: ignore
+    else:
+        items = zsetRangeByLex(zobj, lexrange, reverse, opt_offset, opt_limit)   # type: ignore
+    addReplyZsetItems(c, items, opt_withscores)
+
+def zrangeCommand(c: 'RedisClient') -> None:
+    zrangeGenericCommand(c, 1, ZRANGE_AUTO, ZRANGE_DIRECTION_AUTO)
+
+def zrevrangeCommand(c: 'RedisClient') -> None:
+    zrangeGenericCommand(c, 1, ZRANGE_RANK, ZRANGE_DIRECTION_REVERSE)
+
+def zrangebyscoreCommand(c: 'RedisClient') -> None:
+    zrangeGenericCommand(c, 1, ZRANGE_SCORE, ZRANGE_DIRECTION_FORWARD)
+
+def zrevrangebyscoreCommand(c: 'RedisClient') -> None:
+    zrangeGenericCommand(c, 1, ZRANGE_SCORE, ZRANGE_DIRECTION_REVERSE)
+
+def zrangebylexCommand(c: 'RedisClient') -> None:
+    zrangeGenericCommand(c, 1, ZRANGE_LEX, ZRANGE_DIRECTION_FORWARD)
+
+def zrevrangebylexCommand(c: 'RedisClient') -> None:
+    zrangeGenericCommand(c, 1, ZRANGE_LEX, ZRANGE_DIRECTION_REVERSE)
+
+def zcountCommand(c: 'RedisClient') -> None:
+    key = c.argv[1]
+    zrange = zslParseRange(c.argv[2], c.argv[3])
+    if zrange is None:
+        addReplyError(c, "min or max is not a float")
+        return
+    zobj = lookupKeyReadOrReply(c, key, get_shared().czero)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+
+    count = 0
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = zobj.ptr
+        eptr = zzlFirstInRange(zl, zrange)
+        sptr = ziplistNext(zl, eptr) if eptr is not None else None
+        while eptr is not None:
+            if not zslValueLteMax(zzlGetScore(sptr), zrange):   # type: ignore
+                break
+            count += 1
+            eptr, sptr = zzlNext(zl, eptr, sptr)   # type: ignore
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        # 用第一个和最后一个节点的排名计算数量, 不需要遍历范围
+        zsl = zobj.ptr.zsl
+        zn = zslFirstInRange(zsl, zrange)
+        if zn is not None:
+            rank = zslGetRank(zsl, zn.score, zn.obj)
+            count = zsl.length - (rank - 1)
+            zn = zslLastInRange(zsl, zrange)
+            if zn is not None:
+                rank = zslGetRank(zsl, zn.score, zn.obj)
+                count -= zsl.length - rank
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        # 两次二分查找得到范围两端的排名
+        first, last = zarrRankRangeByScore(zobj.ptr, zrange)
+        count = max(0, last - first + 1)
+    else:
+        raise RuntimeError("Unknown sorted set encoding")
+    addReplyLongLong(c, count)
+
+def zlexcountCommand(c: 'RedisClient') -> None:
+    key = c.argv[1]
+    lexrange = zslParseLexRange(c.argv[2], c.argv[3])
+    if lexrange is None:
+        addReplyError(c, "min or max not valid string range item")
+        return
+    zobj = lookupKeyReadOrReply(c, key, get_shared().czero)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+
+    count = 0
+    if zobj.encoding == REDIS_ENCODING_ZIPLIST:
+        zl = zobj.ptr
+        eptr = zzlFirstInLexRange(zl, lexrange)
+        sptr = ziplistNext(zl, eptr) if eptr is not None else None
+        while eptr is not None:
+            if not zzlLexValueLteMax(eptr, lexrange):
+                break
+            count += 1
+            eptr, sptr = zzlNext(zl, eptr, sptr)   # type: ignore
+    elif zobj.encoding == REDIS_ENCODING_SKIPLIST:
+        zsl = zobj.ptr.zsl
+        zn = zslFirstInLexRange(zsl, lexrange)
+        if zn is not None:
+            rank = zslGetRank(zsl, zn.score, zn.obj)
+            count = zsl.length - (rank - 1)
+            zn = zslLastInLexRange(zsl, lexrange)
+            if zn is not None:
+                rank = zslGetRank(zsl, zn.score, zn.obj)
+                count -= zsl.length - rank
+    elif zobj.encoding == REDIS_ENCODING_SORTEDARRAY:
+        first, last = zarrRankRangeByLex(zobj.ptr, lexrange)
+        count = max(0, last - first + 1)
+    else:
+        raise RuntimeError("Unknown sorted set encoding")
+    addReplyLongLong(c, count)
+
+def zcardCommand(c: 'RedisClient') -> None:
+    zobj = lookupKeyReadOrReply(c, c.argv[1], get_shared().czero)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+    addReplyLongLong(c, zsetLength(zobj))
+
+def zscoreCommand(c: 'RedisClient') -> None:
+    shared = get_shared()
+    zobj = lookupKeyReadOrReply(c, c.argv[1], shared.nullbulk)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+    score = zsetScore(zobj, zsetObjectBytes(c.argv[2]))
+    if score is None:
+        addReply(c, shared.nullbulk)
+    else:
+        addReplyDouble(c, score)
+
+def zrankGenericCommand(c: 'RedisClient', reverse: int) -> None:
+    shared = get_shared()
+    zobj = lookupKeyReadOrReply(c, c.argv[1], shared.nullbulk)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+    rank = zsetRank(zobj, zsetObjectBytes(c.argv[2]), reverse)
+    if rank is None:
+        addReply(c, shared.nullbulk)
+    else:
+        addReplyLongLong(c, rank)
+
+def zrankCommand(c: 'RedisClient') -> None:
+    zrankGenericCommand(c, 0)
+
+def zrevrankCommand(c: 'RedisClient') -> None:
+    zrankGenericCommand(c, 1)
+
+def genericZpopCommand(c: 'RedisClient', where: int) -> None:
+    """ZPOPMIN / ZPOPMAX key [count], 结果和 ZRANGE ... WITHSCORES 的格式相同"""
+    shared = get_shared()
+    key = c.argv[1]
+    if c.argc > 3:
+        addReply(c, shared.syntaxerr)
+        return
+    count = 1
+    if c.argc == 3:
+        status, count = getLongLongFromObjectOrReply(c, c.argv[2], None)
+        if status != REDIS_OK:
+            return
+        if count <= 0:
+            addReply(c, shared.emptymultibulk)
+            return
+
+    zobj = lookupKeyWriteOrReply(c, key, shared.emptymultibulk)
+    if zobj is None or checkZsetType(c, zobj):
+        return
+
+    llen = zsetLength(zobj)
+    count = min(count, llen)
+    reverse = int(where == ZSET_MAX)
+    items = zsetRangeByRank(zobj, 0, count - 1, reverse)
+    # 弹出的成员在有序集合的一端, 按排名一次删除
+    if reverse:
+        zsetDeleteRangeByRank(zobj, llen - count, llen - 1)
+    else:
+        zsetDeleteRangeByRank(zobj, 0, count - 1)
+
+    notifyKeyspaceEvent(REDIS_NOTIFY_ZSET, "zpopmax" if reverse else "zpopmin", key, c.db.id)
+    if zsetLength(zobj) == 0:
+        dbDelete(c.db, key)
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", key, c.db.id)
+    signalModifiedKey(c.db, key)
+    get_server().dirty += count
+    addReplyZsetItems(c, items, 1)
+
+def zpopminCommand(c: 'RedisClient') -> None:
+    genericZpopCommand(c, ZSET_MIN)
+
+def zpopmaxCommand(c: 'RedisClient') -> None:
+    genericZpopCommand(c, ZSET_MAX)
+
+def zunionInterDiffGenericCommand(c: 'RedisClient', dstkey: Opt[robj], numkeysIndex: int, op: int,
+                                  cardinality_only: int) -> None:
+    """
+    ZUNIONSTORE / ZINTERSTORE / ZDIFFSTORE dstkey numkeys key [key ...] [WEIGHTS weight ...] [AGGREGATE SUM|MIN|MAX]
+    ZUNION / ZINTER / ZDIFF numkeys key [key ...] [WEIGHTS ...] [AGGREGATE ...] [WITHSCORES]
+    ZINTERCARD numkeys key [key ...] [LIMIT limit]
+    ZDIFF 和 ZINTERCARD 不接受 WEIGHTS 和 AGGREGATE
+    """
+    server = get_server()
+    shared = get_shared()
+    status, setnum = getLongLongFromObjectOrReply(c, c.argv[numkeysIndex], None)
+    if status != REDIS_OK:
+        return
+    if setnum < 1:
+        assert c.cmd is not None
+        addReplyError(c, "at least 1 input key is needed for '%s' command" % c.cmd.name)
+        return
+    # 键的数量超过了参数的数量
+    if setnum > c.argc - (numkeysIndex + 1):
+        addReply(c, shared.syntaxerr)
+        return
+
+    srcs: List[zsetopsrc] = []
+    for key in c.argv[numkeysIndex+1:numkeysIndex+1+setnum]:
+        obj = lookupKeyWrite(c.db, key) if dstkey is not None else lookupKeyRead(c.db, key)
+        if obj is not None and obj.type != REDIS_ZSET and obj.type != REDIS_SET:
+            addReply(c, shared.wrongtypeerr)
+            return
+        srcs.append(zsetopsrc(obj, 1.0))
+
+    aggregate = REDIS_AGGR_SUM
+    withscores = 0
+    limit = 0
+    j = numkeysIndex + 1 + setnum
+    while j < c.argc:
+        remaining = c.argc - j
+        opt = zsetObjectBytes(c.argv[j]).lower()
+        if op != SET_OP_DIFF and not cardinality_only and remaining >= setnum + 1 and opt == b'weights':
+            j += 1
+            for src in srcs:
+                status, src.weight = getLongDoubleFromObjectOrReply(c, c.argv[j], "weight value is not a float")
+                if status != REDIS_OK:
+                    return
+                j += 1
+        elif op != SET_OP_DIFF and not cardinality_only and remaining >= 2 and opt == b'aggregate':
+            name = zsetObjectBytes(c.argv[j+1]).lower()
+            if name == b'sum':
+                aggregate = REDIS_AGGR_SUM
+            elif name == b'min':
+                aggregate = REDIS_AGGR_MIN
+            elif name == b'max':
+                aggregate = REDIS_AGGR_MAX
+            else:
+                addReply(c, shared.syntaxerr)
+                return
+            j += 2
+        elif dstkey is None and not cardinality_only and opt == b'withscores':
+            withscores = 1
+            j += 1
+        elif cardinality_only and remaining >= 2 and opt == b'limit':
+            status, limit = getLongLongFromObjectOrReply(c, c.argv[j+1], None)
+            if status != REDIS_OK:
+                return
+            if limit < 0:
+                addReplyError(c, "LIMIT can't be negative")
+                return
+            j += 2
+        else:
+            addReply(c, shared.syntaxerr)
+            return
+
+    if op != SET_OP_DIFF:
+        # 和 Redis 一样按大小从小到大聚合, 分值的累加顺序 (溢出, -0 和 0) 和 Redis 相同;
+        # 交集从最小的输入开始, 它决定了需要查找的次数, 不存在的键大小为 0, 交集直接为空
+        srcs.sort(key=lambda src: zsetSourceLength(src.obj))
+    if op == SET_OP_INTER:
+        if cardinality_only:
+            addReplyLongLong(c, zsetInterCard(srcs, limit))
+            return
+        items = zsetInter(srcs, aggregate)
+    elif op == SET_OP_UNION:
+        items = zsetUnion(srcs, aggregate)
+    elif op == SET_OP_DIFF:
+        items = zsetDiff(srcs)
+    else:
+        raise RuntimeError("Unknown operator")
+
+    if dstkey is None:
+        addReplyZsetItems(c, items, withscores)
+        return
+    if items:
+        maxelelen = max(len(ele) for ele, _ in items)
+        dstobj = zsetCreateFromSorted(items, zsetTypeEncoding(len(items), maxelelen))
+        setKey(c.db, dstkey, dstobj)
+        decrRefCount(dstobj)
+        addReplyLongLong(c, len(items))
+        event = "zunionstore" if op == SET_OP_UNION else "zinterstore" if op == SET_OP_INTER else "zdiffstore"
+        notifyKeyspaceEvent(REDIS_NOTIFY_ZSET, event, dstkey, c.db.id)
+        server.dirty += 1
+    else:
+        addReply(c, shared.czero)
+        if dbDelete(c.db, dstkey):
+            signalModifiedKey(c.db, dstkey)
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, "del", dstkey, c.db.id)
+            server.dirty += 1
+
+def zunionstoreCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, c.argv[1], 2, SET_OP_UNION, 0)
+
+def zinterstoreCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, c.argv[1], 2, SET_OP_INTER, 0)
+
+def zdiffstoreCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, c.argv[1], 2, SET_OP_DIFF, 0)
+
+def zunionCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, None, 1, SET_OP_UNION, 0)
+
+def zinterCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, None, 1, SET_OP_INTER, 0)
+
+def zdiffCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, None, 1, SET_OP_DIFF, 0)
+
+def zintercardCommand(c: 'RedisClient') -> None:
+    zunionInterDiffGenericCommand(c, None, 1, SET_OP_INTER, 1)
+
+def zscanCommand(c: 'RedisClient') -> None:
+    status, cursor = parseScanCursorOrReply(c, c.argv[2])
+    if status != REDIS_OK:
+        return
+    o = lookupKeyReadOrReply(c, c.argv[1], get_shared().emptyscan)
+    if o is None or checkZsetType(c, o):
+        return
+    scanGenericCommand(c, o, cursor)
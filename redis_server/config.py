@@ -94,6 +94,7 @@ REDIS_LIST_MAX_ZIPLIST_VALUE = 64
 REDIS_SET_MAX_INTSET_ENTRIES = 512
 REDIS_ZSET_MAX_ZIPLIST_ENTRIES = 128
 REDIS_ZSET_MAX_ZIPLIST_VALUE = 64
+REDIS_ZSET_MIN_SORTEDARRAY_ENTRIES = 1024
 
 # /* HyperLogLog defines */
 REDIS_DEFAULT_HLL_SPARSE_MAX_BYTES = 3000
@@ -164,6 +165,7 @@ REDIS_FORCE_AOF = (1<<14)   #  /* Force AOF propagation of current cmd. */
 REDIS_FORCE_REPL = (1<<15)  # /* Force replication of current cmd. */
 REDIS_PRE_PSYNC = (1<<16)   #  /* Instance don't understand PSYNC. */
 REDIS_READONLY = (1<<17)    #   /* Cluster client is in read-only state. */
+REDIS_PREVENT_PROP = (1<<18)    # 当前命令本身不传播, 只传播它通过 alsoPropagate() 记录的效果
 
 # /* Log levels */
 REDIS_DEBUG = 0
@@ -193,6 +195,9 @@ REDIS_CMD_LOADING = 512         # /* "l" flag */
 REDIS_CMD_STALE = 1024          # /* "t" flag */
 REDIS_CMD_SKIP_MONITOR = 2048       # /* "M" flag */
 REDIS_CMD_ASKING = 4096         # /* "k" flag */
+# 以下标志没有对应的字符, 由 populateCommandTable() 根据命令名设置
+REDIS_CMD_NOQUEUE = 8192        # 在 MULTI 上下文中也立即执行, 不进入事务队列
+REDIS_CMD_NOAUTH = 16384        # 客户端未通过认证时也可以执行
 
 # /* Command call flags, see call() function */
 REDIS_CALL_NONE = 0
@@ -201,6 +206,14 @@ REDIS_CALL_STATS = 2
 REDIS_CALL_PROPAGATE = 4
 REDIS_CALL_FULL = (REDIS_CALL_SLOWLOG | REDIS_CALL_STATS | REDIS_CALL_PROPAGATE)
 
+# /* Command propagation flags, see propagate() function */
+REDIS_PROPAGATE_NONE = 0
+REDIS_PROPAGATE_AOF = 1
+REDIS_PROPAGATE_REPL = 2
+
+# /* Command latency histogram, bucket i holds calls <= 2**i microseconds */
+REDIS_LATENCY_HIST_BUCKETS = 24
+
 # /* Units */
 UNIT_SECONDS = 0
 UNIT_MILLISECONDS = 1
@@ -220,6 +233,8 @@ class ServerConfig:
     REDIS_SHARED_SELECT_CMDS = 10
     REDIS_SHARED_INTEGERS = 10000
     REDIS_SHARED_BULKHDR_LEN = 32
+    REDIS_FUNCTION_TIME_LIMIT = 5000   # FCALL 执行时间的上限, 毫秒
+    REDIS_COMMAND_LOOKUP_CACHE = 256   # 命令查找缓存中最多保存的大小写混合的命令名数量
     REDIS_MAX_LOGMSG_LEN =    1024  # /* Default maximum length of syslog messages */
     REDIS_AOF_REWRITE_PERC =  100
     REDIS_AOF_REWRITE_MIN_SIZE = (64*1024*1024)
@@ -1,12 +1,19 @@
 import typing
-from typing import List, Callable, Optional as Opt, Tuple
-from .rdict import rDict, dictGenHashFunction, dictType
+from typing import List, Callable, Optional as Opt, Tuple, Dict, Set
+from .rdict import rDict, dictGenHashFunction, dictType, dictEntry
 from .sds import sds, sdslen, sdsdup
-from .csix import memcmp, timeval
-from .robject import redisObject, dictRedisObjectDestructor
+from .csix import memcmp, timeval, ULONG_MASK
+from .robject import (
+    redisObject, dictRedisObjectDestructor, getDecodedObject, createRawStringObject, decrRefCount, sdsEncodedObject,
+    equalStringObjects, REDIS_ENCODING_RAW, REDIS_ENCODING_HT, REDIS_ENCODING_ZIPLIST, REDIS_ENCODING_INTSET,
+    REDIS_ENCODING_SKIPLIST, REDIS_ENCODING_SORTEDARRAY, REDIS_LIST, REDIS_HASH, REDIS_ZSET,
+)
 from .config import *
 from .rdict import *
-from .util import get_server
+from .util import get_server, get_shared, stringmatchlen, d2string
+from .multi import watchedKey, touchWatchedKey
+from .adlist import rList
+from .blocked import signalListAsReady
 
 if typing.TYPE_CHECKING:
     from .redis import RedisClient
@@ -31,13 +38,17 @@ def dictSdsDestructor(privdata, val):
 def dictObjKeyCompare(*args):
     pass
 
-def dictListDestructor(*args):
-    pass
+def dictEncObjHash(key: redisObject) -> int:
+    # 整数编码的对象按字符串形式计算哈希值, 和内容相同的 sds 对象落在同一个桶
+    if sdsEncodedObject(key):
+        return dictGenHashFunction(key.ptr, sdslen(key.ptr))
+    buf = b'%d' % key.ptr
+    return dictGenHashFunction(buf, len(buf))
 
-def dictEncObjHash(*args):
-    pass
+def dictEncObjKeyCompare(privdata, key1: redisObject, key2: redisObject) -> int:
+    return equalStringObjects(key1, key2)
 
-def dictEncObjKeyCompare(*args):
+def dictListDestructor(*args):
     pass
 
 dbDictType = dictType()
@@ -64,14 +75,41 @@ keylistDictType.keyCompare = dictObjKeyCompare
 keylistDictType.keyDestructor = dictRedisObjectDestructor
 keylistDictType.valDestructor = dictListDestructor
 
+# 集合对象使用哈希表编码时, 元素是 sds 键, 值总是 None
 setDictType = dictType()
-setDictType.hashFunction = dictEncObjHash
+setDictType.hashFunction = dictSdsHash
 setDictType.keyDup = None
 setDictType.valDup = None
-setDictType.keyCompare = dictEncObjKeyCompare
-setDictType.keyDestructor = dictRedisObjectDestructor
+setDictType.keyCompare = dictSdsKeyCompare
+setDictType.keyDestructor = dictSdsDestructor
 setDictType.valDestructor = None
 
+# 哈希对象使用哈希表编码时, 字段和值都是 sds
+# 有序集合的字典: 成员对象 -> 分值, 成员对象和跳跃表节点共享
+zsetDictType = dictType()
+zsetDictType.hashFunction = dictEncObjHash
+zsetDictType.keyDup = None
+zsetDictType.valDup = None
+zsetDictType.keyCompare = dictEncObjKeyCompare
+zsetDictType.keyDestructor = dictRedisObjectDestructor
+zsetDictType.valDestructor = None
+
+hashDictType = dictType()
+hashDictType.hashFunction = dictSdsHash
+hashDictType.keyDup = None
+hashDictType.valDup = None
+hashDictType.keyCompare = dictSdsKeyCompare
+hashDictType.keyDestructor = dictSdsDestructor
+hashDictType.valDestructor = dictSdsDestructor
+
+# 哈希表的填充率低于这个百分比时收缩
+REDIS_HT_MINFILL = 10
+
+def htNeedsResize(d: rDict) -> bool:
+    size = d.ht[0].size + d.ht[1].size
+    used = d.ht[0].used + d.ht[1].used
+    return size > DICT_HT_INITIAL_SIZE and used * 100 // size < REDIS_HT_MINFILL
+
 REDIS_EVICTION_POOL_SIZE = 16
 class evictionPoolEntry:
     def __init__(self):
@@ -87,12 +125,12 @@ class RedisDB:
         self.dict: rDict = None
         # // 键的过期时间，字典的键为键，字典的值为过期事件 UNIX 时间戳
         self.expires: rDict = None
-        # // 正处于阻塞状态的键
-        self.blocking_keys: rDict = None
+        # // 正处于阻塞状态的键, 值为阻塞在这个键上的客户端链表, 见 blocked.py
+        self.blocking_keys: Dict[bytes, rList] = {}
         # // 可以解除阻塞的键
-        self.ready_keys: rDict = None
+        self.ready_keys: Set[bytes] = set()
         # // 正在被 WATCH 命令监视的键
-        self.watched_keys: rDict = None
+        self.watched_keys: Dict[bytes, watchedKey] = {}
         # /* Eviction pool of keys */
         self.eviction_pool: List[evictionPoolEntry] = None
         self.id: int = 0
@@ -118,8 +156,8 @@ def notifyKeyspaceEvent(type: int, event: str, key: redisObject, dbid: int) -> N
     pass
 
 def signalModifiedKey(db: RedisDB, key: redisObject):
-    # NOTE: 暂不实现
-    pass
+    """每次修改数据库中的键时调用, 让监视这个键的事务失败"""
+    touchWatchedKey(db, key)
 
 def dbDelete(db: RedisDB, key: redisObject) -> int:
     if dictSize(db.expires) > 0:
@@ -170,6 +208,51 @@ def lookupKeyRead(db: RedisDB, key: redisObject) -> Opt[redisObject]:
         server.stat_keyspace_hits += 1
     return val
 
+def expireIfNeededWithHash(db: RedisDB, key: redisObject, h: int) -> None:
+    """和 expireIfNeeded 相同, h 是 key 的哈希值, dict 和 expires 的哈希函数相同"""
+    if dictSize(db.expires) == 0:
+        return
+    de = dictFindWithHash(db.expires, key.ptr, h)
+    if de is not None and dictGetSignedIntegerVal(de) < timeval.from_datetime().mstime:
+        expireIfNeeded(db, key)
+
+def lookupKeyWriteWithHash(db: RedisDB, key: redisObject, h: int) -> Opt[dictEntry]:
+    """
+    和 lookupKeyWrite 相同, 但是返回键所在的 dictEntry, h 是 key 的哈希值
+    调用者可以直接用 dictSetVal 替换值, 或者用 dbAddWithHash 添加, 不需要再次查找
+    """
+    from .redis import LRUClock
+    server = get_server()
+    expireIfNeededWithHash(db, key, h)
+    de = dictFindWithHash(db.dict, key.ptr, h)
+    if de is not None and server.rdb_child_pid == -1 and server.aof_child_pid == -1:
+        dictGetVal(de).lru = LRUClock()
+    return de
+
+def lookupKeysRead(db: RedisDB, keys: List[redisObject]) -> List[Opt[redisObject]]:
+    """多键命令的批量查找, 每个键只计算一次哈希值"""
+    from .redis import LRUClock
+    server = get_server()
+    update_lru = server.rdb_child_pid == -1 and server.aof_child_pid == -1
+    lru = LRUClock()
+    vals: List[Opt[redisObject]] = []
+    hits = 0
+    for key in keys:
+        h = dictHashKey(db.dict, key.ptr)
+        expireIfNeededWithHash(db, key, h)
+        de = dictFindWithHash(db.dict, key.ptr, h)
+        if de is None:
+            vals.append(None)
+            continue
+        val = dictGetVal(de)
+        if update_lru:
+            val.lru = lru
+        vals.append(val)
+        hits += 1
+    server.stat_keyspace_hits += hits
+    server.stat_keyspace_misses += len(keys) - hits
+    return vals
+
 def lookupKeyReadOrReply(c: 'RedisClient', key: redisObject, reply: redisObject) -> Opt[redisObject]:
     from .networking import addReply
     o = lookupKeyRead(c.db, key)
@@ -177,16 +260,41 @@ def lookupKeyReadOrReply(c: 'RedisClient', key: redisObject, reply: redisObject)
         addReply(c, reply)
     return o
 
+def lookupKeyWriteOrReply(c: 'RedisClient', key: redisObject, reply: redisObject) -> Opt[redisObject]:
+    from .networking import addReply
+    o = lookupKeyWrite(c.db, key)
+    if not o:
+        addReply(c, reply)
+    return o
+
 def dbAdd(db: RedisDB, key: redisObject, val: redisObject):
     copy = sdsdup(key.ptr)
     retval = dictAdd(db.dict, copy, val)
     assert retval == REDIS_OK
+    if val.type == REDIS_LIST:
+        signalListAsReady(db, key)
+
+def dbAddWithHash(db: RedisDB, key: redisObject, val: redisObject, h: int):
+    retval = dictAddWithHash(db.dict, sdsdup(key.ptr), val, h)
+    assert retval == DICT_OK
 
 def dbOverwrite(db: RedisDB, key: redisObject, val: redisObject):
     de = dictFind(db.dict, key.ptr)
     assert de != None
     dictReplace(db.dict, key.ptr, val)
 
+def dbUnshareStringValue(db: RedisDB, key: redisObject, o: redisObject) -> redisObject:
+    """
+    原地修改字符串之前调用: o 被共享, 或者不是 RAW 编码时, 复制出一个 RAW 编码的对象代替它
+    之后的修改都在这个对象的 sds 上进行, 预分配的空间可以一直使用
+    """
+    if o.refcount != 1 or o.encoding != REDIS_ENCODING_RAW:
+        decoded = getDecodedObject(o)
+        o = createRawStringObject(decoded.ptr, sdslen(decoded.ptr))
+        decrRefCount(decoded)
+        dbOverwrite(db, key, o)
+    return o
+
 def removeExpire(db: RedisDB, key: redisObject) -> int:
     assert dictFind(db.dict, key.ptr) != None
     return dictDelete(db.expires, key.ptr) == DICT_OK
@@ -199,11 +307,113 @@ def setExpire(db: RedisDB, key: redisObject, when: int):
     dictSetSignedIntegerVal(de, when)
 
 def setKey(db: RedisDB, key: redisObject, val: redisObject):
+    setKeyWithHash(db, key, val, dictHashKey(db.dict, key.ptr))
+
+def setKeyWithHash(db: RedisDB, key: redisObject, val: redisObject, h: int):
+    """和 setKey 相同, h 是 key 的哈希值; 查找, 添加或覆盖都使用同一个哈希值"""
     from .robject import incrRefCount
-    if lookupKeyWrite(db, key) == None:
-        dbAdd(db, key, val)
+    expireIfNeededWithHash(db, key, h)
+    de = dictFindWithHash(db.dict, key.ptr, h)
+    if de is None:
+        retval = dictAddWithHash(db.dict, sdsdup(key.ptr), val, h)
+        assert retval == DICT_OK
     else:
-        dbOverwrite(db, key, val)
+        dictSetVal(db.dict, de, val)
     incrRefCount(val)
-    removeExpire(db, key)
+    if dictSize(db.expires) > 0:
+        dictDelete(db.expires, key.ptr)
     signalModifiedKey(db, key)
+
+def parseScanCursorOrReply(c: 'RedisClient', o: redisObject) -> Tuple[int, int]:
+    """解析 SCAN 系列命令的游标, 游标是 64 位无符号整数"""
+    from .networking import addReplyError
+    buf = bytes(o.ptr.buf[:sdslen(o.ptr)]) if sdsEncodedObject(o) else b'%d' % o.ptr
+    if not buf.isdigit() or int(buf) > ULONG_MASK:
+        addReplyError(c, "invalid cursor")
+        return REDIS_ERR, 0
+    return REDIS_OK, int(buf)
+
+def scanGenericCommand(c: 'RedisClient', o: redisObject, cursor: int) -> None:
+    """
+    HSCAN / SSCAN 等命令的实现, o 是被遍历的对象, c.argv[3:] 是 COUNT 和 MATCH 选项
+    哈希表编码的对象用 dictScan 遍历, 每次最多访问 COUNT * 10 个桶; 紧凑编码的对象元素不多, 一次返回全部元素
+    """
+    from .networking import addReply, addReplyMultiBulkLen, addReplyBulkCBuffer
+    from .robject import getLongLongFromObjectOrReply
+    from .ziplist import ziplistIndex, ziplistNext, ziplistGetValue
+    from .intset import intsetValues
+    shared = get_shared()
+    count = 10
+    pat: Opt[bytes] = None
+    i = 3
+    while i < c.argc:
+        remaining = c.argc - i
+        if c.argv[i].ptr.lowereq('count') and remaining >= 2:
+            status, count = getLongLongFromObjectOrReply(c, c.argv[i+1], None)
+            if status != REDIS_OK:
+                return
+            if count < 1:
+                addReply(c, shared.syntaxerr)
+                return
+            i += 2
+        elif c.argv[i].ptr.lowereq('match') and remaining >= 2:
+            pat = bytes(c.argv[i+1].ptr.buf[:sdslen(c.argv[i+1].ptr)])
+            # 模式 "*" 匹配所有元素, 不需要逐个检查
+            if pat == b'*':
+                pat = None
+            i += 2
+        else:
+            addReply(c, shared.syntaxerr)
+            return
+
+    # 哈希对象的元素是字段和值交替排列的, 有序集合是成员和分值
+    pairs = o.type in (REDIS_HASH, REDIS_ZSET)
+    items: List[bytes] = []
+    if o.encoding in (REDIS_ENCODING_HT, REDIS_ENCODING_SKIPLIST, REDIS_ENCODING_SORTEDARRAY):
+        def scanCallback(privdata: List[bytes], de: dictEntry) -> None:
+            if o.type == REDIS_ZSET:
+                # 有序集合的字典: 成员对象 -> 分值
+                key = de.key
+                privdata.append(bytes(key.ptr.buf[:sdslen(key.ptr)]) if sdsEncodedObject(key) else b'%d' % key.ptr)
+                privdata.append(d2string(de.v.val))
+                return
+            privdata.append(bytes(de.key.buf[:sdslen(de.key)]))
+            if pairs:
+                privdata.append(bytes(de.v.val.buf[:sdslen(de.v.val)]))
+
+        d = o.ptr if o.encoding == REDIS_ENCODING_HT else o.ptr.dict
+        # 空桶很多时限制访问的桶数, 避免一次调用阻塞太久
+        maxiterations = count * 10
+        while True:
+            cursor = dictScan(d, cursor, scanCallback, items)
+            maxiterations -= 1
+            if not (cursor and maxiterations and len(items) < count * (2 if pairs else 1)):
+                break
+    elif o.encoding == REDIS_ENCODING_INTSET:
+        items = [b'%d' % v for v in intsetValues(o.ptr)]
+        cursor = 0
+    elif o.encoding == REDIS_ENCODING_ZIPLIST:
+        p = ziplistIndex(o.ptr, 0)
+        while p is not None:
+            value = ziplistGetValue(p)
+            items.append(b'%d' % value if isinstance(value, int) else value)
+            p = ziplistNext(o.ptr, p)
+        cursor = 0
+    else:
+        raise RuntimeError("Not handled encoding in SCAN.")
+
+    # 按 MATCH 过滤, 哈希对象只匹配字段, 值和字段一起保留或者去掉 (有序集合的分值也一样)
+    if pat is not None:
+        step = 2 if pairs else 1
+        matched: List[bytes] = []
+        for j in range(0, len(items), step):
+            if stringmatchlen(pat, len(pat), items[j], len(items[j]), 0):
+                matched.extend(items[j:j+step])
+        items = matched
+
+    addReplyMultiBulkLen(c, 2)
+    reply = b'%d' % cursor
+    addReplyBulkCBuffer(c, reply, len(reply))
+    addReplyMultiBulkLen(c, len(items))
+    for item in items:
+        addReplyBulkCBuffer(c, item, len(item))
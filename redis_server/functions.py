@@ -0,0 +1,277 @@
+"""
+服务器端 Python 函数, 由 FUNCTION LOAD / FCALL 使用
+
+    FUNCTION LOAD "def main(redis, keys, args):\n    return redis.incr(keys[0], int(args[0]))"
+    FCALL <sha1> 1 counter 5
+
+函数代码必须定义 main(redis, keys, args), keys 和 args 是 bytes 的列表,
+redis 是 functionContext, 提供 get/set/incr/expire 操作当前数据库。
+函数在 call() 中执行, 执行期间不会处理其他客户端的命令, 所以一次 FCALL 中的读写是原子的。
+
+限制:
+    - 代码经过 AST 检查: 不能 import, 不能访问以 _ 开头的名字或属性, 模块顶层只能定义函数和常量,
+      内置函数只有 SAFE_BUILTINS 中的这些。这只是防止误用, 不是安全沙箱, 不要对不可信的客户端开放。
+    - 执行时间超过 function-time-limit 毫秒时函数被中止, 已经执行的写操作不会回滚。
+      时间只在函数自己的代码行之间检查, 一次耗时很长的内置函数调用无法被中止。
+"""
+
+import ast
+import builtins
+import hashlib
+import sys
+import time
+import typing
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional as Opt, Union
+
+from .config import *
+from .robject import (
+    redisObject, createStringObject, decrRefCount, tryObjectEncoding, sdsEncodedObject, getLongLongFromObject,
+    REDIS_STRING,
+)
+from .db import lookupKeyRead, lookupKeyWrite, setKey, dbAdd, dbOverwrite, dbDelete, setExpire, signalModifiedKey
+from .db import notifyKeyspaceEvent
+from .csix import timeval, LONG_MIN, LONG_MAX
+from .util import get_server
+
+if typing.TYPE_CHECKING:
+    from .redis import RedisClient
+
+FUNCTION_FILENAME = '<redis function>'
+# 函数返回值嵌套的最大深度
+FUNCTION_MAX_REPLY_DEPTH = 32
+
+SAFE_BUILTINS = {name: getattr(builtins, name) for name in (
+    'abs', 'all', 'any', 'bool', 'bytes', 'dict', 'divmod', 'enumerate', 'float', 'int', 'isinstance',
+    'len', 'list', 'max', 'min', 'range', 'reversed', 'round', 'set', 'sorted', 'str', 'sum', 'tuple',
+    'zip', 'Exception', 'ValueError', 'KeyError', 'IndexError', 'TypeError',
+)}
+
+# 不以 _ 开头, 但是可以拿到解释器内部对象的属性
+DENIED_ATTRIBUTES = {
+    'format', 'format_map', 'mro', 'gi_frame', 'gi_code', 'cr_frame', 'cr_code', 'ag_frame', 'ag_code',
+    'f_globals', 'f_locals', 'f_builtins', 'f_back', 'f_code', 'tb_frame', 'tb_next',
+}
+
+DENIED_NODES = (
+    ast.Import, ast.ImportFrom, ast.Global, ast.Nonlocal, ast.ClassDef, ast.AsyncFunctionDef,
+    ast.Await, ast.Yield, ast.YieldFrom, ast.AsyncFor, ast.AsyncWith,
+)
+
+class functionError(Exception):
+    """函数代码不合法, 或者函数通过 functionContext 执行的操作出错"""
+
+class functionTimeout(BaseException):
+    """执行时间超过 function-time-limit, 继承 BaseException, 函数代码中的 except Exception 捕获不到"""
+
+class redisFunction:
+    def __init__(self, sha1: str, source: str, main: Callable) -> None:
+        self.sha1 = sha1
+        self.source = source
+        self.main = main
+
+def checkFunctionNode(node: ast.AST) -> None:
+    if isinstance(node, DENIED_NODES):
+        raise functionError("%s is not allowed in functions" % type(node).__name__)
+    if isinstance(node, ast.ExceptHandler) and node.type is None:
+        raise functionError("bare except is not allowed in functions")
+    name = None
+    if isinstance(node, ast.Name):
+        name = node.id
+    elif isinstance(node, ast.Attribute):
+        name = node.attr
+        if name in DENIED_ATTRIBUTES:
+            raise functionError("access to attribute '%s' is not allowed in functions" % name)
+    elif isinstance(node, (ast.FunctionDef, ast.Lambda)):
+        for arg in node.args.args + node.args.kwonlyargs:
+            if arg.arg.startswith('_'):
+                raise functionError("names starting with '_' are not allowed in functions")
+        name = getattr(node, 'name', None)
+    elif isinstance(node, ast.keyword):
+        name = node.arg
+    if name and name.startswith('_'):
+        raise functionError("names starting with '_' are not allowed in functions")
+
+def checkFunctionSource(tree: ast.Module) -> None:
+    for stmt in tree.body:
+        # 顶层只允许函数定义, 常量赋值和文档字符串, 加载时不会执行任何逻辑
+        if isinstance(stmt, ast.FunctionDef):
+            continue
+        value = None
+        if isinstance(stmt, (ast.Assign, ast.AnnAssign, ast.Expr)):
+            value = stmt.value
+        try:
+            if value is None:
+                raise ValueError
+            ast.literal_eval(value)
+        except ValueError:
+            raise functionError("only function definitions and constants are allowed at the top level")
+    for node in ast.walk(tree):
+        checkFunctionNode(node)
+
+def functionCreate(body: bytes) -> redisFunction:
+    """检查并编译函数代码, 代码不合法时抛出 functionError"""
+    sha1 = hashlib.sha1(body).hexdigest()
+    try:
+        source = body.decode('utf8')
+        tree = ast.parse(source, FUNCTION_FILENAME)
+    except (UnicodeDecodeError, SyntaxError) as e:
+        raise functionError("Error compiling function: %s" % e)
+    checkFunctionSource(tree)
+    env: Dict[str, Any] = {'__builtins__': SAFE_BUILTINS}
+    exec(compile(tree, FUNCTION_FILENAME, 'exec'), env)
+    main = env.get('main')
+    if not callable(main):
+        raise functionError("Function code must define main(redis, keys, args)")
+    return redisFunction(sha1, source, main)
+
+def functionValue(v: Any) -> bytes:
+    if isinstance(v, bytes):
+        return v
+    if isinstance(v, (bytearray, memoryview)):
+        return bytes(v)
+    if isinstance(v, str):
+        return v.encode('utf8')
+    if isinstance(v, int) and not isinstance(v, bool):
+        return b'%d' % v
+    if isinstance(v, float):
+        return repr(v).encode()
+    raise functionError("unsupported value type '%s'" % type(v).__name__)
+
+def functionObjectValue(o: redisObject) -> bytes:
+    if sdsEncodedObject(o):
+        return bytes(o.ptr.buf[:o.ptr.len])
+    return b'%d' % o.ptr
+
+class functionContext:
+    """FCALL 执行时传给 main 的第一个参数, 在客户端当前的数据库上读写"""
+    __slots__ = ('_c',)
+
+    def __init__(self, c: 'RedisClient') -> None:
+        self._c = c
+
+    def _key(self, key: Any) -> redisObject:
+        k = functionValue(key)
+        return createStringObject(k, len(k))
+
+    def _propagate(self, *argv: bytes) -> None:
+        from .redis import alsoPropagate
+        server = get_server()
+        cmd = server.orig_commands.get(argv[0].decode().lower())
+        alsoPropagate(cmd, self._c.db.id, [createStringObject(a, len(a)) for a in argv],
+                      REDIS_PROPAGATE_AOF|REDIS_PROPAGATE_REPL)
+
+    def get(self, key: Any) -> Opt[bytes]:
+        o = lookupKeyRead(self._c.db, self._key(key))
+        if o is None:
+            return None
+        if o.type != REDIS_STRING:
+            raise functionError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return functionObjectValue(o)
+
+    def set(self, key: Any, value: Any) -> None:
+        k = self._key(key)
+        v = functionValue(value)
+        val = tryObjectEncoding(createStringObject(v, len(v)))
+        setKey(self._c.db, k, val)
+        decrRefCount(val)
+        get_server().dirty += 1
+        notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'set', k, self._c.db.id)
+        self._propagate(b'SET', functionObjectValue(k), v)
+
+    def incr(self, key: Any, increment: int = 1) -> int:
+        if not isinstance(increment, int) or isinstance(increment, bool):
+            raise functionError("increment must be an integer")
+        db = self._c.db
+        k = self._key(key)
+        o = lookupKeyWrite(db, k)
+        if o is not None and o.type != REDIS_STRING:
+            raise functionError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        status, value = getLongLongFromObject(o)
+        if status != REDIS_OK:
+            raise functionError("value is not an integer or out of range")
+        value += increment
+        if not (LONG_MIN <= value <= LONG_MAX):
+            raise functionError("increment or decrement would overflow")
+        s = b'%d' % value
+        new = tryObjectEncoding(createStringObject(s, len(s)))
+        # 和 INCR 一样保留键的过期时间, 所以不使用 setKey
+        if o is None:
+            dbAdd(db, k, new)
+        else:
+            dbOverwrite(db, k, new)
+        signalModifiedKey(db, k)
+        get_server().dirty += 1
+        notifyKeyspaceEvent(REDIS_NOTIFY_STRING, 'incrby', k, db.id)
+        self._propagate(b'INCRBY', functionObjectValue(k), b'%d' % increment)
+        return value
+
+    def expire(self, key: Any, seconds: Union[int, float]) -> bool:
+        db = self._c.db
+        k = self._key(key)
+        if lookupKeyWrite(db, k) is None:
+            return False
+        server = get_server()
+        if seconds <= 0:
+            dbDelete(db, k)
+            signalModifiedKey(db, k)
+            server.dirty += 1
+            notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, 'del', k, db.id)
+            self._propagate(b'DEL', functionObjectValue(k))
+            return True
+        when = timeval.from_datetime().mstime + int(seconds * 1000)
+        setExpire(db, k, when)
+        signalModifiedKey(db, k)
+        server.dirty += 1
+        notifyKeyspaceEvent(REDIS_NOTIFY_GENERIC, 'expire', k, db.id)
+        # 传播绝对时间, 重放时不受延迟影响
+        self._propagate(b'PEXPIREAT', functionObjectValue(k), b'%d' % when)
+        return True
+
+def functionRun(c: 'RedisClient', fn: redisFunction, keys: List[bytes], args: List[bytes],
+                time_limit: int) -> Any:
+    """执行函数, 返回 main 的返回值; 超时抛出 functionTimeout"""
+    ctx = functionContext(c)
+    if time_limit <= 0:
+        return fn.main(ctx, keys, args)
+    deadline = time.perf_counter() + time_limit / 1000
+
+    def traceLine(frame: FrameType, event: str, arg: Any) -> Opt[Callable]:
+        if time.perf_counter() > deadline:
+            raise functionTimeout()
+        return traceLine
+
+    def traceCall(frame: FrameType, event: str, arg: Any) -> Opt[Callable]:
+        # 只跟踪函数自己的代码, functionContext 等服务器代码执行到一半时不会被中止
+        if frame.f_code.co_filename != FUNCTION_FILENAME:
+            return None
+        # 写在一行里的循环 (例如 while True: pass) 不会产生 'line' 事件, 按字节码检查超时
+        frame.f_trace_opcodes = True
+        return traceLine(frame, event, arg)
+
+    old = sys.gettrace()
+    sys.settrace(traceCall)
+    try:
+        return fn.main(ctx, keys, args)
+    finally:
+        sys.settrace(old)
+
+def encodeFunctionReply(value: Any, out: bytearray, depth: int = 0) -> None:
+    """把函数的返回值编码成协议格式, 不支持的类型抛出 functionError"""
+    if depth > FUNCTION_MAX_REPLY_DEPTH:
+        raise functionError("reply is nested too deeply")
+    if value is None:
+        out += b'$-1\r\n'
+    elif isinstance(value, bool):
+        out += b':1\r\n' if value else b':0\r\n'
+    elif isinstance(value, int):
+        out += b':%d\r\n' % value
+    elif isinstance(value, (list, tuple)):
+        out += b'*%d\r\n' % len(value)
+        for item in value:
+            encodeFunctionReply(item, out, depth + 1)
+    else:
+        v = functionValue(value)
+        out += b'$%d\r\n' % len(v)
+        out += v
+        out += b'\r\n'
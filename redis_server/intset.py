@@ -1,6 +1,7 @@
 # TODO(ruan.lj@foxmail.com): can use memoryview to speed up buf operation.
 
-from typing import Any, Union, Callable, Optional as Opt, List
+from array import array
+from typing import Any, Union, Callable, Optional as Opt, List, Sequence
 from .csix import *
 from .endianconv import intrev32ifbe
 
@@ -28,26 +29,24 @@ def _intsetValueEncoding(v: int) -> int:
     else:
         return INTSET_ENC_INT16
 
+_intset_int_type = {
+    INTSET_ENC_INT16: 'int16',
+    INTSET_ENC_INT32: 'int32',
+    INTSET_ENC_INT64: 'int64',
+}
+
 def _intsetGetEncoded(s: intset, pos: int, enc: int) -> int:
     assert enc in INTSET_ENCS
-    if enc == INTSET_ENC_INT64:
-        return cstr2int(s.contents[pos:pos+8], 'int64')
-    elif enc == INTSET_ENC_INT32:
-        return cstr2int(s.contents[pos:pos+4], 'int32')
-    else:
-        return cstr2int(s.contents[pos:pos+2], 'int16')
+    offset = pos * enc
+    return cstr2int(s.contents[offset:offset+enc], _intset_int_type[enc])
 
 def _intsetGet(s: intset, pos: int) -> int:
     return _intsetGetEncoded(s, pos, intrev32ifbe(s.encoding))
 
 def _intsetSet(s: intset, pos: int, value: int) -> None:
     encoding = intrev32ifbe(s.encoding)
-    if encoding == INTSET_ENC_INT64:
-        s.contents[pos:pos+8] = int2cstr(value, 'int64')
-    elif encoding == INTSET_ENC_INT32:
-        s.contents[pos:pos+4] = int2cstr(value, 'int32')
-    else:
-        s.contents[pos:pos+2] = int2cstr(value, 'int16')
+    offset = pos * encoding
+    s.contents[offset:offset+encoding] = int2cstr(value, _intset_int_type[encoding])
 
 def intsetNew() -> intset:
     s = intset()
@@ -58,7 +57,10 @@ def intsetNew() -> intset:
 def intsetResize(s: intset, length: int) -> intset:
     size = length * intrev32ifbe(s.encoding)
     # zrealloc to new size
-    s.contents.extend(NUL for _ in range(size-len(s.contents)))
+    if size > len(s.contents):
+        s.contents.extend(bytes(size - len(s.contents)))
+    else:
+        del s.contents[size:]
     return s
 
 def intsetSearch(s: intset, value: int, pos: Opt[intptr]) -> int:
@@ -108,6 +110,7 @@ def intsetUpgradeAndAdd(s: intset, value: int) -> intset:
 
     prepend = value < 0 and 1 or 0
     s.encoding = intrev32ifbe(newenc)
+    s = intsetResize(s, length+1)
 
     while length:
         length -= 1
@@ -122,19 +125,11 @@ def intsetUpgradeAndAdd(s: intset, value: int) -> intset:
 
 
 def intsetMoveTail(s: intset, from_: int, to: int) -> None:
-    bytes_count = intrev32ifbe(s.length) - from_
     encoding = intrev32ifbe(s.encoding)
     assert encoding in INTSET_ENCS
 
-    src = from_
-    dst = to
-    if encoding == INTSET_ENC_INT64:
-        bytes_count *= 8
-    elif encoding == INTSET_ENC_INT32:
-        bytes_count *= 4
-    else:
-        bytes_count *= 2
-    memmove(s.contents, dst, src, bytes_count)
+    bytes_count = (intrev32ifbe(s.length) - from_) * encoding
+    memmove(s.contents, to * encoding, from_ * encoding, bytes_count)
 
 
 def intsetAdd(s: intset, value: int, success: intptr) -> intset:
@@ -176,7 +171,7 @@ def intsetRemove(s: intset, value: int, success: intptr) -> intset:
 
 def intsetFind(s: intset, value: int) -> int:
     valenc = _intsetValueEncoding(value)
-    return valenc <= intrev32ifbe(s.encoding) and intsetSearch(s, value, None)
+    return int(valenc <= intrev32ifbe(s.encoding) and intsetSearch(s, value, None))
 
 
 def intsetRandom(s: intset) -> int:
@@ -198,3 +193,42 @@ def intsetBlobLen(s: intset) -> int:
     # sizeof(intset)+intrev32ifbe(is->length)*intrev32ifbe(is->encoding);
     # TODO(ruan.lj@foxmail.com): 检查Python中这个地方的实现.
     return intrev32ifbe(s.length) * intrev32ifbe(s.encoding)
+
+
+# array / struct / numpy 共用的类型码, 按本机字节序, 和 contents 的布局一致
+_intset_type_code = {
+    INTSET_ENC_INT16: 'h',
+    INTSET_ENC_INT32: 'i',
+    INTSET_ENC_INT64: 'q',
+}
+
+def intsetValues(s: intset) -> 'array[int]':
+    """一次解码出所有元素, 按升序排列"""
+    encoding = intrev32ifbe(s.encoding)
+    values = array(_intset_type_code[encoding])
+    values.frombytes(s.contents[:intrev32ifbe(s.length) * encoding])
+    return values
+
+def intsetArray(np: Any, s: intset) -> Any:
+    """contents 上的 numpy 只读视图, 不复制数据"""
+    code = _intset_type_code[intrev32ifbe(s.encoding)]
+    return np.frombuffer(s.contents, dtype='=' + code, count=intrev32ifbe(s.length))
+
+def intsetFromSorted(values: Sequence[int]) -> intset:
+    """
+    由升序且不重复的整数序列 (list, array 或 numpy 数组) 直接构建 intset,
+    不需要逐个 intsetAdd 移动元素
+    """
+    s = intsetNew()
+    length = len(values)
+    if length == 0:
+        return s
+    encoding = max(_intsetValueEncoding(int(values[0])), _intsetValueEncoding(int(values[-1])))
+    code = _intset_type_code[encoding]
+    if hasattr(values, 'astype'):
+        s.contents = bytearray(values.astype('=' + code).tobytes())   # type: ignore
+    else:
+        s.contents = bytearray(array(code, values).tobytes())
+    s.encoding = intrev32ifbe(encoding)
+    s.length = intrev32ifbe(length)
+    return s
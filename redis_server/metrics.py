@@ -0,0 +1,227 @@
+"""
+Prometheus / OpenMetrics 导出
+
+监听 metrics-port, 在主事件循环中处理 HTTP GET /metrics 请求。
+连接使用独立的 metricsConn 结构, 不经过 RedisClient 的命令处理流程;
+响应内容每个 serverCron 周期最多生成一次, 之后的抓取直接复用缓存。
+"""
+
+import errno
+import socket
+import typing
+from logging import getLogger
+from typing import List, Optional as Opt, Tuple
+
+from .ae import aeEventLoop, aeCreateFileEvent, aeDeleteFileEvent, AE_READABLE, AE_WRITABLE, AE_ERR
+from .anet import anetTcpServer, anetTcpAccept, anetNonBlock
+from .rdict import dictSize
+from .config import *
+from .util import SocketCache, get_server, zmalloc_used_memory
+
+if typing.TYPE_CHECKING:
+    from .redis import RedisServer
+
+logger = getLogger(__name__)
+
+METRICS_MAX_REQUEST = 8192
+METRICS_CONTENT_TYPE = b"application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+class metricsConn:
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        # 已读取的请求内容
+        self.querybuf = bytearray()
+        # 待发送的响应, 以及已发送的字节数
+        self.reply: Opt[bytes] = None
+        self.sentlen: int = 0
+
+# (生成时的 cronloops, 响应内容)
+metrics_cache: Opt[Tuple[int, bytes]] = None
+
+def metricsEscape(v: str) -> str:
+    return v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def addMetric(lines: List[str], name: str, mtype: str, mhelp: str, value) -> None:
+    lines.append("# TYPE %s %s\n# HELP %s %s\n" % (name, mtype, name, mhelp))
+    if mtype == 'counter':
+        lines.append("%s_total %s\n" % (name, value))
+    else:
+        lines.append("%s %s\n" % (name, value))
+
+def genServerMetrics(server: 'RedisServer', lines: List[str]) -> None:
+    from .redis import getOperationsPerSecond
+    addMetric(lines, "redis_uptime_seconds", "gauge", "Seconds since the server started.",
+              server.unixtime - server.stat_starttime)
+    addMetric(lines, "redis_connected_clients", "gauge", "Number of client connections.",
+              len(server.clients))
+    addMetric(lines, "redis_blocked_clients", "gauge", "Clients blocked in a blocking call.",
+              server.bpop_blocked_clients)
+    addMetric(lines, "redis_memory_used_bytes", "gauge", "Memory used by the allocator.",
+              zmalloc_used_memory())
+    addMetric(lines, "redis_memory_rss_bytes", "gauge", "Resident set size sampled by serverCron.",
+              server.resident_set_size)
+    addMetric(lines, "redis_memory_peak_bytes", "gauge", "Peak memory used by the allocator.",
+              server.stat_peak_memory)
+    addMetric(lines, "redis_rdb_changes_since_last_save", "gauge", "Changes since the last save.",
+              server.dirty)
+    addMetric(lines, "redis_connections_received", "counter", "Connections accepted by the server.",
+              server.stat_numconnections)
+    addMetric(lines, "redis_rejected_connections", "counter", "Connections rejected because of maxclients.",
+              server.stat_rejected_conn)
+    addMetric(lines, "redis_commands_processed", "counter", "Commands processed by the server.",
+              server.stat_numcommands)
+    addMetric(lines, "redis_instantaneous_ops_per_sec", "gauge", "Commands per second, sampled.",
+              getOperationsPerSecond())
+    addMetric(lines, "redis_net_input_bytes", "counter", "Bytes read from the network.",
+              server.stat_net_input_bytes)
+    addMetric(lines, "redis_net_output_bytes", "counter", "Bytes written to the network.",
+              server.stat_net_output_bytes)
+    addMetric(lines, "redis_expired_keys", "counter", "Keys removed because they expired.",
+              server.stat_expiredkeys)
+    addMetric(lines, "redis_evicted_keys", "counter", "Keys evicted because of maxmemory.",
+              server.stat_evictedkeys)
+    addMetric(lines, "redis_keyspace_hits", "counter", "Successful key lookups.",
+              server.stat_keyspace_hits)
+    addMetric(lines, "redis_keyspace_misses", "counter", "Failed key lookups.",
+              server.stat_keyspace_misses)
+
+def genCommandMetrics(server: 'RedisServer', lines: List[str]) -> None:
+    cmds = [cmd for cmd in server.commands.values() if cmd.calls]
+
+    lines.append("# TYPE redis_command_calls counter\n"
+                 "# HELP redis_command_calls Calls per command.\n")
+    for cmd in cmds:
+        lines.append('redis_command_calls_total{cmd="%s"} %d\n' % (metricsEscape(cmd.name), cmd.calls))
+
+    lines.append("# TYPE redis_command_latency_seconds histogram\n"
+                 "# HELP redis_command_latency_seconds Command execution time.\n")
+    for cmd in cmds:
+        name = metricsEscape(cmd.name)
+        cumulative = 0
+        for i in range(REDIS_LATENCY_HIST_BUCKETS):
+            cumulative += cmd.latency[i]
+            lines.append('redis_command_latency_seconds_bucket{cmd="%s",le="%g"} %d\n' % (
+                name, (1 << i) / 1000000, cumulative))
+        lines.append('redis_command_latency_seconds_bucket{cmd="%s",le="+Inf"} %d\n' % (name, cmd.calls))
+        lines.append('redis_command_latency_seconds_count{cmd="%s"} %d\n' % (name, cmd.calls))
+        lines.append('redis_command_latency_seconds_sum{cmd="%s"} %g\n' % (name, cmd.microseconds / 1000000))
+
+def genKeyspaceMetrics(server: 'RedisServer', lines: List[str]) -> None:
+    keys: List[str] = []
+    expires: List[str] = []
+    avg_ttl: List[str] = []
+    for j in range(server.dbnum):
+        db = server.db[j]
+        if not (dictSize(db.dict) or dictSize(db.expires)):
+            continue
+        keys.append('redis_db_keys{db="db%d"} %d\n' % (j, dictSize(db.dict)))
+        expires.append('redis_db_keys_expiring{db="db%d"} %d\n' % (j, dictSize(db.expires)))
+        avg_ttl.append('redis_db_avg_ttl_seconds{db="db%d"} %g\n' % (j, db.avg_ttl / 1000))
+    lines.append("# TYPE redis_db_keys gauge\n# HELP redis_db_keys Keys per database.\n")
+    lines.extend(keys)
+    lines.append("# TYPE redis_db_keys_expiring gauge\n"
+                 "# HELP redis_db_keys_expiring Keys with an expire set per database.\n")
+    lines.extend(expires)
+    lines.append("# TYPE redis_db_avg_ttl_seconds gauge\n"
+                 "# HELP redis_db_avg_ttl_seconds Estimated average TTL of keys with an expire.\n")
+    lines.extend(avg_ttl)
+
+def genMetricsPayload() -> bytes:
+    """生成 OpenMetrics 文本, 同一个 serverCron 周期内直接返回缓存"""
+    global metrics_cache
+    server = get_server()
+    if metrics_cache and metrics_cache[0] == server.cronloops:
+        return metrics_cache[1]
+    lines: List[str] = []
+    genServerMetrics(server, lines)
+    genCommandMetrics(server, lines)
+    genKeyspaceMetrics(server, lines)
+    lines.append("# EOF\n")
+    payload = "".join(lines).encode()
+    metrics_cache = (server.cronloops, payload)
+    return payload
+
+def genMetricsResponse(status: bytes, content_type: bytes, body: bytes) -> bytes:
+    return b"HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s" % (
+        status, content_type, len(body), body)
+
+def processMetricsRequest(request: bytes) -> bytes:
+    line = request.split(b"\r\n", 1)[0].split()
+    if len(line) < 2:
+        return genMetricsResponse(b"400 Bad Request", b"text/plain", b"bad request\n")
+    method, path = line[0], line[1].split(b"?", 1)[0]
+    if method != b"GET":
+        return genMetricsResponse(b"405 Method Not Allowed", b"text/plain", b"method not allowed\n")
+    if path not in (b"/metrics", b"/"):
+        return genMetricsResponse(b"404 Not Found", b"text/plain", b"not found\n")
+    return genMetricsResponse(b"200 OK", METRICS_CONTENT_TYPE, genMetricsPayload())
+
+def freeMetricsConn(conn: metricsConn) -> None:
+    server = get_server()
+    fd = conn.sock.fileno()
+    aeDeleteFileEvent(server.el, fd, AE_READABLE)
+    aeDeleteFileEvent(server.el, fd, AE_WRITABLE)
+    SocketCache.remove(fd)
+    conn.sock.close()
+
+def sendMetricsReply(el: aeEventLoop, fd: int, conn: metricsConn, mask: int) -> None:
+    assert conn.reply is not None
+    try:
+        nwritten = conn.sock.send(memoryview(conn.reply)[conn.sentlen:])
+    except OSError as e:
+        if e.errno == errno.EAGAIN:
+            return
+        freeMetricsConn(conn)
+        return
+    conn.sentlen += nwritten
+    if conn.sentlen == len(conn.reply):
+        freeMetricsConn(conn)
+
+def readMetricsRequest(el: aeEventLoop, fd: int, conn: metricsConn, mask: int) -> None:
+    try:
+        chunk = conn.sock.recv(METRICS_MAX_REQUEST)
+    except BlockingIOError:
+        return
+    except OSError:
+        freeMetricsConn(conn)
+        return
+    if not chunk:
+        freeMetricsConn(conn)
+        return
+    conn.querybuf += chunk
+    if b"\r\n\r\n" not in conn.querybuf:
+        if len(conn.querybuf) > METRICS_MAX_REQUEST:
+            freeMetricsConn(conn)
+        return
+    conn.reply = processMetricsRequest(bytes(conn.querybuf))
+    aeDeleteFileEvent(el, fd, AE_READABLE)
+    if aeCreateFileEvent(el, fd, AE_WRITABLE, sendMetricsReply, conn) == AE_ERR:   # type: ignore
+        freeMetricsConn(conn)
+        return
+    # 大多数情况下一次就能写完, 不必等下一轮事件循环
+    sendMetricsReply(el, fd, conn, AE_WRITABLE)
+
+def acceptMetricsHandler(el: aeEventLoop, fd: int, privdata, mask: int) -> None:
+    sfd = SocketCache.get(fd)
+    try:
+        cfd, _ = anetTcpAccept(sfd)
+    except OSError as e:
+        if e.errno != errno.EWOULDBLOCK:
+            logger.warning("Accepting metrics connection: %s", e)
+        return
+    anetNonBlock(cfd)
+    conn = metricsConn(cfd)
+    if aeCreateFileEvent(el, cfd.fileno(), AE_READABLE, readMetricsRequest, conn) == AE_ERR:   # type: ignore
+        freeMetricsConn(conn)
+
+def listenToMetricsPort(server: 'RedisServer') -> int:
+    bindaddr = server.bindaddr[0] if server.bindaddr else None
+    try:
+        server.metrics_fd = anetTcpServer(server.metrics_port, bindaddr, server.tcp_backlog)
+    except OSError as e:
+        logger.warning("Creating metrics listener on port %s: %s", server.metrics_port, e)
+        return REDIS_ERR
+    anetNonBlock(server.metrics_fd)
+    if aeCreateFileEvent(server.el, server.metrics_fd.fileno(), AE_READABLE, acceptMetricsHandler, None) == AE_ERR:
+        return REDIS_ERR
+    return REDIS_OK
@@ -1,11 +1,107 @@
 import typing
+from typing import List
+
+from .robject import redisObject, incrRefCount, decrRefCount, sdsEncodedObject
+from .config import REDIS_MULTI, REDIS_DIRTY_CAS, REDIS_DIRTY_EXEC
 
 if typing.TYPE_CHECKING:
     from .redis import RedisClient
+    from .db import RedisDB
+
+
+# WATCH 的实现:
+# db.watched_keys 以键的内容 (bytes) 为键, 值为 watchedKey, 保存这个键的修改版本号,
+# signalModifiedKey() 每次修改键时只需要把版本号加一, 不需要遍历监视这个键的客户端。
+# 客户端 WATCH 时记下当时的版本号, EXEC 时逐个比较, 有任何一个变化过事务就会失败。
+
+class watchedKey:
+    __slots__ = ('version', 'refcount')
+
+    def __init__(self) -> None:
+        # 键被修改的次数
+        self.version = 0
+        # 正在监视这个键的客户端数量, 为 0 时从 db.watched_keys 中删除
+        self.refcount = 0
 
+class watchedKeyRef:
+    """客户端 watched_keys 中的元素"""
+    __slots__ = ('db', 'key', 'wk', 'version')
+
+    def __init__(self, db: 'RedisDB', key: bytes, wk: watchedKey) -> None:
+        self.db = db
+        self.key = key
+        self.wk = wk
+        # WATCH 时的版本号
+        self.version = wk.version
+
+
+def watchedKeyName(key: redisObject) -> bytes:
+    if sdsEncodedObject(key):
+        return bytes(key.ptr.buf[:key.ptr.len])
+    return b'%d' % key.ptr
 
 def initClientMultiState(c: 'RedisClient'):
     # // 命令队列
     c.mstate.commands = []
     # // 命令计数
     c.mstate.count = 0
+
+def freeClientMultiState(c: 'RedisClient'):
+    for mc in c.mstate.commands:
+        for o in mc.argv:
+            decrRefCount(o)
+    c.mstate.commands = []
+    c.mstate.count = 0
+
+def queueMultiCommand(c: 'RedisClient'):
+    from .redis import multiCmd
+    mc = multiCmd()
+    mc.cmd = c.cmd   # type: ignore
+    mc.argv = list(c.argv)
+    for o in mc.argv:
+        incrRefCount(o)
+    c.mstate.commands.append(mc)
+    c.mstate.count += 1
+
+def discardTransaction(c: 'RedisClient'):
+    freeClientMultiState(c)
+    initClientMultiState(c)
+    c.flags &= ~(REDIS_MULTI|REDIS_DIRTY_CAS|REDIS_DIRTY_EXEC)
+    unwatchAllKeys(c)
+
+def flagTransaction(c: 'RedisClient'):
+    """在 MULTI 中排队的命令出错时调用, 之后的 EXEC 会失败"""
+    if c.flags & REDIS_MULTI:
+        c.flags |= REDIS_DIRTY_EXEC
+
+def watchForKey(c: 'RedisClient', key: redisObject):
+    name = watchedKeyName(key)
+    for ref in c.watched_keys:
+        if ref.db is c.db and ref.key == name:
+            return
+    wk = c.db.watched_keys.get(name)
+    if wk is None:
+        wk = c.db.watched_keys[name] = watchedKey()
+    wk.refcount += 1
+    c.watched_keys.append(watchedKeyRef(c.db, name, wk))
+
+def unwatchAllKeys(c: 'RedisClient'):
+    for ref in c.watched_keys:
+        ref.wk.refcount -= 1
+        if ref.wk.refcount == 0:
+            del ref.db.watched_keys[ref.key]
+    c.watched_keys = []
+
+def watchedKeysModified(c: 'RedisClient') -> bool:
+    for ref in c.watched_keys:
+        if ref.wk.version != ref.version:
+            return True
+    return False
+
+def touchWatchedKey(db: 'RedisDB', key: redisObject):
+    # 绝大多数时候没有键被监视, 不需要计算键名
+    if not db.watched_keys:
+        return
+    wk = db.watched_keys.get(watchedKeyName(key))
+    if wk is not None:
+        wk.version += 1
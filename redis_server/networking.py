@@ -4,7 +4,7 @@ import typing
 from logging import getLogger
 
 from .ae import aeDeleteFileEvent, aeEventLoop, aeCreateFileEvent, AE_WRITABLE, AE_ERR
-from .anet import anetTcpAccept
+from .anet import anetTcpAccept, anetUnixAccept
 from .robject import (
     redisObject, incrRefCount, equalStringObjects, createObject, createStringObject,
     decrRefCount, dupStringObject, sdsEncodedObject, getDecodedObject,
@@ -47,6 +47,20 @@ def freeClientArgv(c: 'RedisClient') -> None:
     c.argv = []
     c.cmd = None
 
+def rewriteClientCommandArgument(c: 'RedisClient', i: int, newval: redisObject) -> None:
+    """替换第 i 个参数, 传播的命令和执行的命令不同时使用, 例如 INCRBYFLOAT 以 SET 传播"""
+    incrRefCount(newval)
+    decrRefCount(c.argv[i])
+    c.argv[i] = newval
+
+def rewriteClientCommandVector(c: 'RedisClient', argv: typing.List[redisObject]) -> None:
+    """替换整个命令, 例如 BLPOP 不需要阻塞时以 LPOP 传播"""
+    for o in argv:
+        incrRefCount(o)
+    for o in c.argv:
+        decrRefCount(o)
+    c.argv = list(argv)
+
 def setProtocolError(c: 'RedisClient', pos: int) -> None:
     server = get_server()
     if server.verbosity >= REDIS_VERBOSE:
@@ -101,6 +115,7 @@ def prepareClientToWrite(c: 'RedisClient') -> int:
 
 
 def dupLastObjectIfNeeded(reply: rList):
+    """回复链表的最后一个对象被共享 (例如 shared.crlf 或者数据库中的值) 时换成它的副本, 返回可以追加的对象"""
     assert listLength(reply) > 0
     ln = listLast(reply)
     cur = listNodeValue(ln)   # type: ignore
@@ -127,7 +142,7 @@ def _addReplySdsToList(c: 'RedisClient', s: sds) -> None:
         tail: redisObject = listNodeValue(listLast(c.reply))   # type: ignore
         if (tail.ptr != None and tail.encoding == REDIS_ENCODING_RAW and
             sdslen(tail.ptr) + sdslen(s) <= REDIS_REPLY_CHUNK_BYTES):
-            tail.ptr = dupLastObjectIfNeeded(c.reply).ptr
+            tail = dupLastObjectIfNeeded(c.reply)
             sdscatlen(tail.ptr, s, sdslen(s))
         else:
             listAddNodeTail(c.reply, createObject(REDIS_STRING, s))
@@ -135,7 +150,7 @@ def _addReplySdsToList(c: 'RedisClient', s: sds) -> None:
     asyncCloseClientOnOutputBufferLimitReached(c)
 
 
-def _addReplyStringToList(c: 'RedisClient', s: cstr, length: int) -> None:
+def _addReplyStringToList(c: 'RedisClient', s: Union[cstr, memoryview], length: int) -> None:
     if c.flags & REDIS_CLOSE_AFTER_REPLY:
         return
     if listLength(c.reply) == 0:
@@ -146,7 +161,7 @@ def _addReplyStringToList(c: 'RedisClient', s: cstr, length: int) -> None:
         tail: redisObject = listNodeValue(listLast(c.reply))   # type: ignore
         if (tail.ptr != None and tail.encoding == REDIS_ENCODING_RAW and
             sdslen(tail.ptr) + length <= REDIS_REPLY_CHUNK_BYTES):
-            tail.ptr = dupLastObjectIfNeeded(c.reply).ptr
+            tail = dupLastObjectIfNeeded(c.reply)
             sdscatlen(tail.ptr, s, length)
         else:
             o = createStringObject(s, length)
@@ -167,7 +182,7 @@ def _addReplyObjectToList(c: 'RedisClient', o: redisObject) -> None:
         if (tail.ptr != None and tail.encoding == REDIS_ENCODING_RAW and
             sdslen(tail.ptr) + sdslen(o.ptr) <= REDIS_REPLY_CHUNK_BYTES):
             c.reply_bytes -= sdslen(tail.ptr)
-            tail.ptr = dupLastObjectIfNeeded(c.reply).ptr
+            tail = dupLastObjectIfNeeded(c.reply)
             sdscatlen(tail.ptr, o.ptr, sdslen(o.ptr))
             c.reply_bytes += sdslen(tail.ptr)
         else:
@@ -176,7 +191,7 @@ def _addReplyObjectToList(c: 'RedisClient', o: redisObject) -> None:
             c.reply_bytes += getStringObjectSdsUsedMemory(o)
     asyncCloseClientOnOutputBufferLimitReached(c)
 
-def _addReplyToBuffer(c: 'RedisClient', s: cstr, length: int) -> int:
+def _addReplyToBuffer(c: 'RedisClient', s: Union[cstr, memoryview], length: int) -> int:
     available = len(c.buf) - c.bufpos
     if c.flags & REDIS_CLOSE_AFTER_REPLY:
         return REDIS_OK
@@ -188,7 +203,7 @@ def _addReplyToBuffer(c: 'RedisClient', s: cstr, length: int) -> int:
     c.bufpos += length
     return REDIS_OK
 
-def addReplyString(c: 'RedisClient', s: cstr, length: int) -> None:
+def addReplyString(c: 'RedisClient', s: Union[cstr, memoryview], length: int) -> None:
     if prepareClientToWrite(c) != REDIS_OK:
         return
     if _addReplyToBuffer(c, s, length) != REDIS_OK:
@@ -239,6 +254,18 @@ def addReplyLongLongWithPrefix(c: 'RedisClient', ll: int, prefix: str) -> None:
     buf[length+2] = ord('\n')
     addReplyString(c, buf, length+3)
 
+def addReplyLongLong(c: 'RedisClient', ll: int) -> None:
+    shared = get_shared()
+    if ll == 0:
+        addReply(c, shared.czero)
+    elif ll == 1:
+        addReply(c, shared.cone)
+    else:
+        addReplyLongLongWithPrefix(c, ll, ':')
+
+def addReplyMultiBulkLen(c: 'RedisClient', length: int) -> None:
+    addReplyLongLongWithPrefix(c, length, '*')
+
 def addReplyBulkLen(c: 'RedisClient', obj: redisObject) -> None:
     if sdsEncodedObject(obj):
         length = sdslen(obj.ptr)
@@ -255,6 +282,17 @@ def addReplyBulk(c: 'RedisClient', obj: redisObject) -> None:
     addReply(c, obj)
     addReply(c, shared.crlf)
 
+def addReplyBulkCBuffer(c: 'RedisClient', p: Union[cstr, memoryview], length: int) -> None:
+    """p 可以是 memoryview, 内容直接复制到回复中, 不需要先创建对象"""
+    addReplyLongLongWithPrefix(c, length, '$')
+    addReplyString(c, p, length)
+    addReply(c, get_shared().crlf)
+
+def addReplyDouble(c: 'RedisClient', d: float) -> None:
+    # 无穷大输出为 inf / -inf
+    buf = d2string(d)
+    addReplyBulkCBuffer(c, buf, len(buf))
+
 def processInlineBuffer(c: 'RedisClient') -> int:
     server = get_server()
     idx = c.querybuf.buf.find(b'\n')
@@ -393,18 +431,33 @@ def readQueryFromClient(el: aeEventLoop, fd: int, privdata: 'RedisClient', mask:
         c.querybuf_peak = qlen
     c.querybuf = sdsMakeRoomFor(c.querybuf, readlen)
     sock = SocketCache.get(fd)
-    chunk = sock.recv(readlen)
+    try:
+        chunk = sock.recv(readlen)
+    except BlockingIOError:
+        server.current_client = None
+        return
+    except OSError as e:
+        logger.info("Reading from client: %s", e)
+        freeClient(c)
+        server.current_client = None
+        return
     nread = len(chunk)
     if nread:
         c.querybuf[qlen:qlen+nread] = chunk
         sdsIncrLen(c.querybuf, nread)
         c.lastinteraction = server.unixtime
+        server.stat_net_input_bytes += nread
     else:
+        if server.verbosity <= REDIS_VERBOSE:
+            logger.info("Client closed connection")
+        freeClient(c)
         server.current_client = None
         return
     if sdslen(c.querybuf) > server.client_max_querybuf_len:
         logger.warning('Closing client that reached max query buffer length: %s', c)
         freeClient(c)
+        server.current_client = None
+        return
     processInputBuffer(c)
     server.current_client = None
 
@@ -417,15 +470,17 @@ def sendReplyToClient(ae: aeEventLoop, fd: int, privdata: 'RedisClient', mask: i
     err = None
     while c.bufpos > 0 or listLength(c.reply):
         if c.bufpos > 0:
+            # 非阻塞 socket 可能只写入一部分, 用 sentlen 记录已经写入的长度
             try:
-                sock.sendall(memoryview(c.buf)[:c.bufpos])
+                nwritten = sock.send(memoryview(c.buf)[c.sentlen:c.bufpos])
             except OSError as e:
                 err = e
                 break
-            totwritten += len(c.buf)
-            c.sentlen += len(c.buf)
-            c.bufpos = 0
-            c.sentlen = 0
+            totwritten += nwritten
+            c.sentlen += nwritten
+            if c.sentlen == c.bufpos:
+                c.bufpos = 0
+                c.sentlen = 0
         else:
             o = listNodeValue(listFirst(c.reply))  # type: ignore
             objlen = sdslen(o.ptr)
@@ -435,12 +490,12 @@ def sendReplyToClient(ae: aeEventLoop, fd: int, privdata: 'RedisClient', mask: i
                 c.reply_bytes -= objmem
                 continue
             try:
-                sock.sendall(o.ptr.content)
+                nwritten = sock.send(memoryview(o.ptr.buf)[c.sentlen:objlen])
             except OSError as e:
                 err = e
                 break
-            totwritten += objlen
-            c.sentlen += objlen
+            totwritten += nwritten
+            c.sentlen += nwritten
             if c.sentlen == objlen:
                 listDelNode(c.reply, listFirst(c.reply))  # type: ignore
                 c.sentlen = 0
@@ -448,9 +503,11 @@ def sendReplyToClient(ae: aeEventLoop, fd: int, privdata: 'RedisClient', mask: i
         if (totwritten > ServerConfig.REDIS_MAX_WRITE_PER_EVENT and
             (server.maxmemory == 0 or zmalloc_used_memory() < server.maxmemory)):
             break
+    server.stat_net_output_bytes += totwritten
     if err and err.errno != errno.EAGAIN:
         logger.info("Error writing to client: %s", err)
         freeClient(c)
+        return
     if totwritten > 0 and not (c.flags & REDIS_MASTER):
         c.lastinteraction = server.unixtime
     if c.bufpos == 0 and listLength(c.reply) == 0:
@@ -482,7 +539,7 @@ def acceptCommonHandler(fd: socket.socket, flags: int) -> None:
         server.stat_rejected_conn += 1
         freeClient(c)
         return
-    server.stat_numcommands += 1
+    server.stat_numconnections += 1
     c.flags |= flags
     # fd.sendall(b'Hello world!\r\n')   # NOTE: test
 
@@ -495,11 +552,23 @@ def acceptTcpHandler(el: aeEventLoop, fd: int, privdata, mask: int):
         try:
             cfd, addr = anetTcpAccept(sfd)
         except OSError as e:
-            if e.errno == errno.EWOULDBLOCK:
+            if e.errno != errno.EWOULDBLOCK:
                 logger.warning("Accepting client connection: %s", e)
             return
         logger.info('Accepted %s:%s', *addr)
         acceptCommonHandler(cfd, 0)
 
-def acceptUnixHandler(*args):
-    pass
+def acceptUnixHandler(el: aeEventLoop, fd: int, privdata, mask: int):
+    max_ = MAX_ACCEPTS_PER_CALL
+
+    while max_:
+        max_ -= 1
+        sfd = SocketCache.get(fd)
+        try:
+            cfd, _ = anetUnixAccept(sfd)
+        except OSError as e:
+            if e.errno != errno.EWOULDBLOCK:
+                logger.warning("Accepting client connection: %s", e)
+            return
+        logger.info('Accepted connection to %s', sfd.getsockname())
+        acceptCommonHandler(cfd, REDIS_UNIX_SOCKET)
@@ -0,0 +1,148 @@
+"""
+进程内 profiler, 由 DEBUG PROFILE 控制
+
+sampling:      定时采样主线程的调用栈, 聚合成 collapsed stack 格式
+               (每行 "frame;frame;frame count"), 可以直接交给 flamegraph.pl
+deterministic: 用 cProfile 记录事件循环中的所有函数调用, 导出为 pstats 格式
+
+关闭时不安装任何 hook, 没有额外开销; 导出文件在后台线程中写入, 不阻塞事件循环。
+"""
+
+import cProfile
+import marshal
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from logging import getLogger
+from types import CodeType, FrameType
+from typing import Dict, List, Optional as Opt
+
+logger = getLogger(__name__)
+
+PROFILE_MODE_SAMPLING = 'sampling'
+PROFILE_MODE_DETERMINISTIC = 'deterministic'
+
+# 采样间隔, 单位秒
+PROFILE_SAMPLE_INTERVAL = 0.005
+# 调用栈的最大深度, 超出部分被截断
+PROFILE_MAX_STACK_DEPTH = 128
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.mode: Opt[str] = None
+        self.running: bool = False
+        # sampling 模式的结果: collapsed stack -> 采样次数
+        self.stacks: Counter = Counter()
+        self.samples: int = 0
+        # deterministic 模式的 cProfile 对象
+        self.cprofile: Opt[cProfile.Profile] = None
+        # 采样线程, 只在无法使用 SIGPROF 时使用
+        self.thread: Opt[threading.Thread] = None
+        self.thread_stop = threading.Event()
+        self.target_thread_id: int = 0
+        self.frame_names: Dict[CodeType, str] = {}
+
+    def frameName(self, code: CodeType) -> str:
+        name = self.frame_names.get(code)
+        if name is None:
+            name = "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            self.frame_names[code] = name
+        return name
+
+    def sample(self, frame: Opt[FrameType]) -> None:
+        names: List[str] = []
+        while frame is not None and len(names) < PROFILE_MAX_STACK_DEPTH:
+            names.append(self.frameName(frame.f_code))
+            frame = frame.f_back
+        if names:
+            names.reverse()
+            self.stacks[";".join(names)] += 1
+            self.samples += 1
+
+    def sigprofHandler(self, signum: int, frame: Opt[FrameType]) -> None:
+        self.sample(frame)
+
+    def samplerThread(self) -> None:
+        while not self.thread_stop.wait(PROFILE_SAMPLE_INTERVAL):
+            self.sample(sys._current_frames().get(self.target_thread_id))
+
+    def start(self, mode: str) -> None:
+        self.mode = mode
+        self.running = True
+        self.stacks = Counter()
+        self.samples = 0
+        self.cprofile = None
+        if mode == PROFILE_MODE_DETERMINISTIC:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        elif hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+            # ITIMER_PROF 只在进程消耗 CPU 时计时, 阻塞在 select() 中的时间不会被采样
+            signal.signal(signal.SIGPROF, self.sigprofHandler)
+            signal.setitimer(signal.ITIMER_PROF, PROFILE_SAMPLE_INTERVAL, PROFILE_SAMPLE_INTERVAL)
+        else:
+            self.target_thread_id = threading.get_ident()
+            self.thread_stop.clear()
+            self.thread = threading.Thread(target=self.samplerThread, name='redis-profiler', daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        elif self.thread is not None:
+            self.thread_stop.set()
+            self.thread.join()
+            self.thread = None
+        else:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        self.running = False
+
+    def snapshot(self) -> Opt[bytes]:
+        """在主线程中生成导出内容的快照, 没有数据时返回 None"""
+        if self.mode is None:
+            return None
+        if self.cprofile is not None:
+            # 和 cProfile.Profile.dump_stats() 的格式相同, 可以用 pstats 读取
+            self.cprofile.snapshot_stats()
+            return marshal.dumps(self.cprofile.stats)   # type: ignore
+        stacks = list(self.stacks.items())
+        return "".join("%s %d\n" % item for item in stacks).encode()
+
+
+profiler = Profiler()
+
+def profileWriteFile(path: str, data: bytes) -> None:
+    start = time.time()
+    tmpfile = "%s.tmp-%d" % (path, os.getpid())
+    try:
+        with open(tmpfile, 'wb') as f:
+            f.write(data)
+        os.replace(tmpfile, path)
+    except OSError as e:
+        logger.warning("Error writing profile to %s: %s", path, e)
+        return
+    logger.info("Profile written to %s in %.2f ms", path, (time.time() - start) * 1000)
+
+def profileStart(mode: str) -> bool:
+    if profiler.running:
+        return False
+    profiler.start(mode)
+    return True
+
+def profileStop() -> bool:
+    if not profiler.running:
+        return False
+    profiler.stop()
+    return True
+
+def profileDump(path: str) -> bool:
+    """把当前结果交给后台线程写入 path, 没有可导出的数据时返回 False"""
+    data = profiler.snapshot()
+    if data is None:
+        return False
+    threading.Thread(target=profileWriteFile, args=(path, data), name='redis-profile-dump', daemon=True).start()
+    return True
@@ -0,0 +1,304 @@
+from typing import Optional as Opt, Union
+
+from .adlist import (
+    rList, listNode, listCreate, listAddNodeHead, listAddNodeTail, listInsertNode, listDelNode, listLength,
+)
+from .csix import cstr, cstrptr
+from .ziplist import (
+    ziplist, ziplistNew, ziplistPush, ziplistIndex, ziplistNext, ziplistPrev, ziplistGetValue, ziplistInsert,
+    ziplistDelete, ziplistDeleteRange, ziplistLen, ziplistBlobLen, ziplist_entry_end,
+    ZIPLIST_HEAD, ZIPLIST_TAIL, ZIP_END,
+)
+from .util import get_server
+
+# quicklist: 由 ziplist 组成的双端链表, 链表的每个节点 (adlist 的 listNode) 的值是一个 ziplist。
+# 两端的 push/pop 只操作头尾节点的 ziplist, 是 O(1) 的; 元素紧凑地保存在 ziplist 中,
+# 每个元素只有几个字节的额外开销, 很短的列表只有一个节点。
+# 每个 ziplist 最多 list-max-ziplist-entries 个元素, 长度不超过 QUICKLIST_SIZE_SAFETY_LIMIT,
+# 插入和删除时移动的字节数有上限。长度超过 list-max-ziplist-value 的元素总是放在一个新节点中,
+# 不会插入到已有的 ziplist 中间。
+
+QUICKLIST_HEAD = 0
+QUICKLIST_TAIL = -1
+
+# 单个 ziplist 的最大字节数
+QUICKLIST_SIZE_SAFETY_LIMIT = 8192
+# 估计插入一个元素时 ziplist 头部信息的长度
+QUICKLIST_ENTRY_OVERHEAD = 11
+
+AL_START_HEAD = 0
+AL_START_TAIL = 1
+
+class quicklist:
+    __slots__ = ('nodes', 'count')
+
+    def __init__(self) -> None:
+        # 节点的值是 ziplist
+        self.nodes: rList = listCreate()
+        # 所有 ziplist 中元素的总数
+        self.count = 0
+
+class quicklistEntry:
+    """quicklistIndex 和 quicklistNext 返回的元素位置"""
+    __slots__ = ('node', 'zi', 'offset', 'value')
+
+    def __init__(self) -> None:
+        self.node: listNode = None   # type: ignore
+        # 元素在 ziplist 中的位置
+        self.zi: cstrptr = None   # type: ignore
+        # 元素是 ziplist 中的第几个, 从 0 开始
+        self.offset = 0
+        self.value: Union[bytes, int] = b''
+
+class quicklistIter:
+    __slots__ = ('ql', 'current', 'zi', 'offset', 'direction')
+
+    def __init__(self, ql: quicklist, direction: int) -> None:
+        self.ql = ql
+        self.current: Opt[listNode] = None
+        # 下一个返回的元素, 为 None 时从 current 的第一个 (或最后一个) 元素开始
+        self.zi: Opt[cstrptr] = None
+        self.offset = 0
+        self.direction = direction
+
+def quicklistCreate() -> quicklist:
+    return quicklist()
+
+def quicklistCount(ql: quicklist) -> int:
+    return ql.count
+
+def quicklistGetValue(p: cstrptr) -> Union[bytes, int]:
+    """ziplist 中 p 位置的元素, 字符串返回 bytes, 整数编码的元素返回 int"""
+    return ziplistGetValue(p)
+
+def _quicklistNodeAllowInsert(zl: ziplist, sz: int) -> bool:
+    server = get_server()
+    if sz > server.list_max_ziplist_value:
+        return False
+    return (ziplistLen(zl) < server.list_max_ziplist_entries and
+            ziplistBlobLen(zl) + sz + QUICKLIST_ENTRY_OVERHEAD <= QUICKLIST_SIZE_SAFETY_LIMIT)
+
+def _quicklistNewNodeValue(value: cstr, sz: int) -> ziplist:
+    return ziplistPush(ziplistNew(), value, sz, ZIPLIST_TAIL)
+
+def quicklistPushHead(ql: quicklist, value: cstr, sz: int) -> None:
+    head = ql.nodes.head
+    if head is not None and _quicklistNodeAllowInsert(head.value, sz):
+        head.value = ziplistPush(head.value, value, sz, ZIPLIST_HEAD)
+    else:
+        listAddNodeHead(ql.nodes, _quicklistNewNodeValue(value, sz))
+    ql.count += 1
+
+def quicklistPushTail(ql: quicklist, value: cstr, sz: int) -> None:
+    tail = ql.nodes.tail
+    if tail is not None and _quicklistNodeAllowInsert(tail.value, sz):
+        tail.value = ziplistPush(tail.value, value, sz, ZIPLIST_TAIL)
+    else:
+        listAddNodeTail(ql.nodes, _quicklistNewNodeValue(value, sz))
+    ql.count += 1
+
+def quicklistPush(ql: quicklist, value: cstr, sz: int, where: int) -> None:
+    if where == QUICKLIST_HEAD:
+        quicklistPushHead(ql, value, sz)
+    else:
+        quicklistPushTail(ql, value, sz)
+
+def quicklistDelIndex(ql: quicklist, node: listNode, p: cstrptr) -> bool:
+    """删除 node 中 p 位置的元素, 节点变空时从链表中删除并返回 True"""
+    node.value = ziplistDelete(node.value, p)
+    ql.count -= 1
+    if ziplistLen(node.value) == 0:
+        listDelNode(ql.nodes, node)
+        return True
+    return False
+
+def quicklistPop(ql: quicklist, where: int) -> Opt[Union[bytes, int]]:
+    """弹出头部或尾部的元素, 列表为空时返回 None"""
+    if ql.count == 0:
+        return None
+    node = ql.nodes.head if where == QUICKLIST_HEAD else ql.nodes.tail
+    assert node is not None
+    p = ziplistIndex(node.value, 0 if where == QUICKLIST_HEAD else -1)
+    assert p is not None
+    value = quicklistGetValue(p)
+    quicklistDelIndex(ql, node, p)
+    return value
+
+def quicklistIndex(ql: quicklist, index: int) -> Opt[quicklistEntry]:
+    """查找第 index 个元素, 负数从尾部开始; 从离得较近的一端开始逐个节点查找"""
+    if index < 0:
+        index += ql.count
+    if index < 0 or index >= ql.count:
+        return None
+    forward = index < ql.count // 2
+    n = ql.nodes.head if forward else ql.nodes.tail
+    # 从尾部查找时 index 是到尾部的距离
+    target = index if forward else ql.count - 1 - index
+    accum = 0
+    while n is not None:
+        cnt = ziplistLen(n.value)
+        if accum + cnt > target:
+            break
+        accum += cnt
+        n = n.next if forward else n.prev
+    assert n is not None
+    offset = target - accum
+    if not forward:
+        offset = ziplistLen(n.value) - 1 - offset
+    p = ziplistIndex(n.value, offset)
+    assert p is not None
+    entry = quicklistEntry()
+    entry.node = n
+    entry.zi = p
+    entry.offset = offset
+    entry.value = quicklistGetValue(p)
+    return entry
+
+def quicklistGetIterator(ql: quicklist, direction: int) -> quicklistIter:
+    it = quicklistIter(ql, direction)
+    it.current = ql.nodes.head if direction == AL_START_HEAD else ql.nodes.tail
+    return it
+
+def quicklistGetIteratorAtIdx(ql: quicklist, direction: int, idx: int) -> Opt[quicklistIter]:
+    """从第 idx 个元素开始的迭代器, idx 超出范围时返回 None"""
+    entry = quicklistIndex(ql, idx)
+    if entry is None:
+        return None
+    it = quicklistIter(ql, direction)
+    it.current = entry.node
+    it.zi = entry.zi
+    it.offset = entry.offset
+    return it
+
+def quicklistNext(it: quicklistIter, entry: quicklistEntry) -> bool:
+    forward = it.direction == AL_START_HEAD
+    while it.current is not None:
+        zl = it.current.value
+        if it.zi is None:
+            it.zi = ziplistIndex(zl, 0 if forward else -1)
+            it.offset = 0 if forward else ziplistLen(zl) - 1
+        p = it.zi
+        if p is not None and p.buf[p.pos] != ZIP_END:
+            entry.node = it.current
+            entry.zi = p
+            entry.offset = it.offset
+            entry.value = quicklistGetValue(p)
+            it.zi = ziplistNext(zl, p) if forward else ziplistPrev(zl, p)
+            it.offset += 1 if forward else -1
+            if it.zi is None:
+                it.current = it.current.next if forward else it.current.prev
+            return True
+        it.current = it.current.next if forward else it.current.prev
+        it.zi = None
+    return False
+
+def quicklistDelEntry(it: quicklistIter, entry: quicklistEntry) -> None:
+    """删除 quicklistNext 刚返回的元素, 迭代器可以继续使用"""
+    node = entry.node
+    forward = it.direction == AL_START_HEAD
+    quicklistDelIndex(it.ql, node, entry.zi)
+    if forward and it.current is node:
+        # 后面的元素移动到了被删除元素的位置, 它的头部长度可能变化, 所以重新定位
+        it.zi = entry.zi.new(entry.zi.pos)
+        it.offset -= 1
+    # 反向迭代时下一个元素在被删除元素之前, 位置不受影响; 节点被删除时迭代器已经指向其他节点
+
+def quicklistReplaceEntry(ql: quicklist, entry: quicklistEntry, value: cstr, sz: int) -> None:
+    node = entry.node
+    zl = ziplistDelete(node.value, entry.zi)
+    # 删除后 zi 指向下一个元素 (或者 ZIP_END), 在这个位置插入新的值
+    node.value = ziplistInsert(zl, entry.zi, value, sz)
+
+def quicklistReplaceAtIndex(ql: quicklist, index: int, value: cstr, sz: int) -> bool:
+    entry = quicklistIndex(ql, index)
+    if entry is None:
+        return False
+    quicklistReplaceEntry(ql, entry, value, sz)
+    return True
+
+def _quicklistSplitNode(ql: quicklist, node: listNode, offset: int) -> listNode:
+    """把 node 中第 offset 个及之后的元素移动到新节点中, 新节点插入在 node 之后"""
+    zl = node.value
+    new = ziplistNew()
+    p = ziplistIndex(zl, offset)
+    while p is not None:
+        value = quicklistGetValue(p)
+        if isinstance(value, int):
+            value = b'%d' % value
+        new = ziplistPush(new, value, len(value), ZIPLIST_TAIL)
+        p = ziplistNext(zl, p)
+    node.value = ziplistDeleteRange(zl, offset, ziplistLen(new))
+    listInsertNode(ql.nodes, node, new, 1)
+    assert node.next is not None
+    return node.next
+
+def _quicklistInsert(ql: quicklist, entry: quicklistEntry, value: cstr, sz: int, after: int) -> None:
+    node = entry.node
+    zl = node.value
+    if _quicklistNodeAllowInsert(zl, sz):
+        p = entry.zi
+        if after:
+            p = ziplistNext(zl, p) or ziplist_entry_end(zl)
+        node.value = ziplistInsert(zl, p, value, sz)
+        ql.count += 1
+        return
+
+    # 节点已满: 插入位置在节点边界上时尝试相邻的节点, 否则在插入位置分裂节点
+    pos = entry.offset + (1 if after else 0)
+    if 0 < pos < ziplistLen(zl):
+        _quicklistSplitNode(ql, node, pos)
+        pos = ziplistLen(node.value)
+    prev = node if pos > 0 else node.prev
+    next_ = node.next if pos > 0 else node
+    if prev is not None and _quicklistNodeAllowInsert(prev.value, sz):
+        prev.value = ziplistPush(prev.value, value, sz, ZIPLIST_TAIL)
+    elif next_ is not None and _quicklistNodeAllowInsert(next_.value, sz):
+        next_.value = ziplistPush(next_.value, value, sz, ZIPLIST_HEAD)
+    elif prev is not None:
+        listInsertNode(ql.nodes, prev, _quicklistNewNodeValue(value, sz), 1)
+    else:
+        listAddNodeHead(ql.nodes, _quicklistNewNodeValue(value, sz))
+    ql.count += 1
+
+def quicklistInsertBefore(ql: quicklist, entry: quicklistEntry, value: cstr, sz: int) -> None:
+    _quicklistInsert(ql, entry, value, sz, 0)
+
+def quicklistInsertAfter(ql: quicklist, entry: quicklistEntry, value: cstr, sz: int) -> None:
+    _quicklistInsert(ql, entry, value, sz, 1)
+
+def quicklistDelRange(ql: quicklist, start: int, count: int) -> int:
+    """从第 start 个元素开始删除 count 个, 整个节点被删除时不需要修改 ziplist; 返回删除的个数"""
+    if count <= 0:
+        return 0
+    if start < 0:
+        start += ql.count
+    entry = quicklistIndex(ql, start)
+    if entry is None:
+        return 0
+    extent = min(count, ql.count - start)
+    deleted = extent
+    node: Opt[listNode] = entry.node
+    offset = entry.offset
+    while extent:
+        assert node is not None
+        next_ = node.next
+        zl = node.value
+        nlen = ziplistLen(zl)
+        if offset == 0 and extent >= nlen:
+            listDelNode(ql.nodes, node)
+            n = nlen
+        else:
+            n = min(nlen - offset, extent)
+            node.value = ziplistDeleteRange(zl, offset, n)
+        extent -= n
+        ql.count -= n
+        node = next_
+        offset = 0
+    return deleted
+
+def quicklistRelease(ql: quicklist) -> None:
+    ql.nodes = listCreate()
+    ql.count = 0
+
+def quicklistNodeCount(ql: quicklist) -> int:
+    return listLength(ql.nodes)
@@ -15,13 +15,18 @@ __all__ = [
     'dictCreate',
     'dictExpand',
     'dictAdd',
+    'dictAddWithHash',
     'dictAddRaw',
+    'dictAddRawWithHash',
     'dictReplace',
     'dictReplaceRaw',
     'dictDelete',
     'dictDeleteNoFree',
     'dictRelease',
     'dictFind',
+    'dictFindWithHash',
+    'dictHashKey',
+    'dictSetVal',
     'dictFetchValue',
     'dictResize',
     'dictGetIterator',
@@ -215,7 +220,7 @@ def dictResize(d: rDict) -> int:
     if not dict_can_resize or dictIsRehashing(d):
         return DICT_ERR
 
-    minimal = min(d.ht[0].used, DICT_HT_INITIAL_SIZE)
+    minimal = max(d.ht[0].used, DICT_HT_INITIAL_SIZE)
     return dictExpand(d, minimal)
 
 def dictExpand(d: rDict, size: int) -> int:
@@ -296,11 +301,23 @@ def dictAdd(d: rDict, key, val) -> int:
     dictSetVal(d, entry, val)
     return DICT_OK
 
+def dictAddWithHash(d: rDict, key, val, h: int) -> int:
+    """和 dictAdd 相同, h 是调用者已经算好的 dictHashKey(d, key)"""
+    entry = dictAddRawWithHash(d, key, h)
+    if not entry:
+        return DICT_ERR
+
+    dictSetVal(d, entry, val)
+    return DICT_OK
+
 def dictAddRaw(d: rDict, key) -> Opt[dictEntry]:
+    return dictAddRawWithHash(d, key, dictHashKey(d, key))
+
+def dictAddRawWithHash(d: rDict, key, h: int) -> Opt[dictEntry]:
     if dictIsRehashing(d):
         _dictRehashStep(d)
 
-    index = _dictKeyIndex(d, key)
+    index = _dictKeyIndex(d, key, h)
     if index == -1:
         return None
 
@@ -402,13 +419,19 @@ def dictRelease(d: rDict) -> None:
 
 
 def dictFind(d: rDict, key) -> Opt[dictEntry]:
+    if d.ht[0].size == 0:
+        return None
+    return dictFindWithHash(d, key, dictHashKey(d, key))
+
+def dictFindWithHash(d: rDict, key, h: int) -> Opt[dictEntry]:
+    """和 dictFind 相同, h 是调用者已经算好的 dictHashKey(d, key)
+    数据库的 dict 和 expires 使用相同的哈希函数, 多键命令可以只计算一次哈希值"""
     if d.ht[0].size == 0:
         return None
 
     if dictIsRehashing(d):
         _dictRehashStep(d)
 
-    h = dictHashKey(d, key)
     for table in range(2):
         idx = h & d.ht[table].sizemask
         he = d.ht[table].table[idx]
@@ -472,7 +495,7 @@ def dictNext(it: dictIterator) -> Opt[dictEntry]:
                     it.fingerprint = dictFingerprint(it.d)
 
             it.index += 1
-            if it.index > ht.size:
+            if it.index >= ht.size:
                 if dictIsRehashing(it.d) and it.table == 0:
                     it.table += 1
                     it.index = 0
@@ -554,12 +577,15 @@ def dictGetRandomKeys(d: rDict, des: List[dictEntry], count: int) -> int:
 
 
 def rev(v: int) -> int:
-    bits = '{:0>64b}'.format(v)
-    return int(bits[::-1], 2)
+    """反转 64 位无符号整数的二进制位"""
+    return int('{:0>64b}'.format(v)[::-1], 2)
 
 
 def dictScan(d: rDict, v: int, fn: Callable, privdata) -> int:
-    v = MutableUInt32(v)
+    """
+    遍历游标 v 对应的桶, 对其中每个节点调用 fn(privdata, de), 返回下一个游标, 返回 0 表示遍历结束
+    游标按反转的二进制位递增, 遍历过程中字典扩展或收缩也不会漏掉元素
+    """
     if dictSize(d) == 0:
         return 0
     if not dictIsRehashing(d):
@@ -567,31 +593,38 @@ def dictScan(d: rDict, v: int, fn: Callable, privdata) -> int:
         m0 = t0.sizemask
         de = t0.table[v & m0]
         while de:
+            nextde = de.next
             fn(privdata, de)
-            de = de.next
+            de = nextde
     else:
         t0 = d.ht[0]
         t1 = d.ht[1]
+        # t0 是较小的哈希表
         if t0.size > t1.size:
             t0, t1 = t1, t0
         m0 = t0.sizemask
         m1 = t1.sizemask
+        de = t0.table[v & m0]
         while de:
+            nextde = de.next
             fn(privdata, de)
-            de = de.next
+            de = nextde
+        # 遍历较大的表中由 t0 的这个桶扩展出来的所有桶
         while True:
             de = t1.table[v & m1]
             while de:
+                nextde = de.next
                 fn(privdata, de)
-                de = de.next
+                de = nextde
             v = (((v | m0) + 1) & ~m0) | (v & m0)
             if not (v & (m0 ^ m1)):
                 break
-    v |= ~m0
+    # 设置未被掩码覆盖的高位, 反转后加一再反转回来, 即对反转的游标加一
+    v |= ~m0 & ULONG_MASK
     v = rev(v)
-    v += 1
+    v = (v + 1) & ULONG_MASK
     v = rev(v)
-    return int(v)
+    return v
 
 
 def _dictExpandIfNeeded(d: rDict) -> int:
@@ -615,12 +648,11 @@ def _dictNextPower(size: int) -> int:
         i *= 2
 
 
-def _dictKeyIndex(d: rDict, key) -> int:
-    """返回空闲的索引位置"""
+def _dictKeyIndex(d: rDict, key, h: int) -> int:
+    """返回空闲的索引位置, h 为 key 的哈希值"""
 
     if _dictExpandIfNeeded(d) == DICT_ERR:
         return -1
-    h = dictHashKey(d, key)
     for table in range(2):
         idx = h & d.ht[table].sizemask
         he = d.ht[table].table[idx]
@@ -1,19 +1,16 @@
 import locale
+import typing
 from logging import NOTSET
 import random
 from sys import argv
 import time
 import logging
 import os
-import uuid
 import socket
 import sys
-import platform
-import argparse
-from typing import List, Callable, Optional as Opt, Tuple, BinaryIO, Dict
-from dataclasses import dataclass
+from typing import List, Callable, Optional as Opt, Tuple, BinaryIO, Dict, Deque
 from io import BufferedWriter
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from itertools import chain
 
 from .csix import timeval, int2cstr, zfree
@@ -26,21 +23,33 @@ from .config import ServerConfig as Conf
 from .config import *
 from .adlist import (
     listDelNode, listRelease, listSearchKey, rList, listCreate, listSetFreeMethod, listSetDupMethod, listSetMatchMethod,
-    listLength,
+    listLength, listNode,
 )
 from .rdict import *
-from .sds import sds, sdsempty, sdsfree, sdsnew
+from .rdict import dictEntry
+from .sds import sds, sdsempty, sdsfree, sdsnew, sdslen
 from .robject import *
-from .db import RedisDB, dbDictType, keyptrDictType, keylistDictType, setDictType, evictionPoolAlloc
+from .db import (
+    RedisDB, dbDictType, keyptrDictType, keylistDictType, setDictType, evictionPoolAlloc, dbDelete,
+    propagateExpire, notifyKeyspaceEvent,
+)
 from .pubsub import freePubsubPattern, listMatchPubsubPattern
 from .aof import aofRewriteBufferReset
 from .networking import (
     acceptTcpHandler, acceptUnixHandler, freeClientArgv, readQueryFromClient, dupClientReplyValue,
     listMatchObjects,
 )
-from .multi import initClientMultiState
-from .util import Singleton, ll2string, get_server
+from .multi import (
+    initClientMultiState, freeClientMultiState, queueMultiCommand, flagTransaction, unwatchAllKeys, watchedKeyRef
+)
+from .blocked import unblockClient, processUnblockedClients
+from .capture import Capture, captureStart, captureCommand, captureFlush
+from .util import Singleton, SocketCache, ll2string, get_server, zmalloc_used_memory, zmalloc_get_rss
 from .commands import *
+from .commands.list import handleClientsBlockedOnLists
+
+if typing.TYPE_CHECKING:
+    from .functions import redisFunction
 
 __version__ = '0.0.1'
 
@@ -64,9 +73,17 @@ class multiState:
 
 class blockingState:
     def __init__(self):
+        # // 到期的毫秒时间戳, 0 表示永久阻塞
         self.timeout: int = 0
-        self.keys: rDict = None
-        self.target: redisObject = None
+        # // 造成阻塞的键, 值为客户端在 db.blocking_keys 链表中的节点
+        self.keys: Dict[bytes, listNode] = {}
+        # // BRPOPLPUSH / BLMOVE 的目标键
+        self.target: Opt[redisObject] = None
+        # // 从哪一端弹出, 推入 target 的哪一端
+        self.wherefrom: int = 0
+        self.whereto: int = 0
+        # // 在 server.bpop_timeouts 中的记录
+        self.timeout_entry: Opt[Tuple[int, int, 'RedisClient']] = None
         # // 等待 ACK 的复制节点数量
         self.numreplicas: int = 0
         # // 复制偏移量
@@ -81,27 +98,32 @@ class clientBufferLimitsConfig:
         # 软限制时限
         self.soft_limit_seconds: int = 0
 
-@dataclass
 class redisOp:
-    argv: List[robj] = None
-    dbid: int = 0
-    target: int = 0
+    def __init__(self, argv: List[robj] = None, dbid: int = 0, target: int = 0,   # type: ignore
+                 cmd: Opt[redisCommand] = None) -> None:
+        self.argv = argv
+        self.dbid = dbid
+        self.target = target
+        self.cmd = cmd
 
     @property
     def argc(self):
         return len(self.argv)
 
-@dataclass
 class redisOpArray:
-    ops: redisOp = redisOp()
-    numops: int = 0
+    def __init__(self) -> None:
+        self.ops: List[redisOp] = []
+
+    @property
+    def numops(self) -> int:
+        return len(self.ops)
 
-@dataclass
 class saveparam:
-    # 多少秒之内
-    seconds: int = 0
-    # 发生多少次修改
-    changes: int = 0
+    def __init__(self, seconds: int = 0, changes: int = 0) -> None:
+        # 多少秒之内
+        self.seconds = seconds
+        # 发生多少次修改
+        self.changes = changes
 
 class RedisServer(Singleton):
     def __init__(self):
@@ -110,6 +132,9 @@ class RedisServer(Singleton):
         self.db: List[RedisDB] = []
         self.commands: dict = {}   # 命令表（受到 rename 配置选项的作用）
         self.orig_commands: dict = {}   # 命令表（无 rename 配置选项的作用）
+        # 以客户端发送的原始字节为键的命令查找缓存, 由 commands 生成, 见 lookupCommand()
+        self.command_lookup: Dict[bytes, redisCommand] = {}
+        self.command_lookup_max: int = 0
         self.el: aeEventLoop = None   # 事件状态
         self.lruclock: int = 0   # /* Clock for LRU eviction */
         # 关闭服务器的标识
@@ -144,6 +169,15 @@ class RedisServer(Singleton):
         self.sofd: socket.socket = None                       # /* Unix socket file descriptor */
         self.cfd: List[int] = []    # /* Cluster bus listening socket */
         self.cfd_count = 0                  # /* Used slots in cfd[] */
+        # OpenMetrics 导出端口, 0 表示不开启
+        self.metrics_port: int = 0
+        self.metrics_fd: Opt[socket.socket] = None
+        # 命令录制文件, 为空表示启动时不录制
+        self.capture_file: str = ''
+        # 正在进行的录制, 由 capture-file 或 CLIENT CAPTURE START 开启
+        self.capture: Opt[Capture] = None
+        # 下一个客户端的 id
+        self.next_client_id: int = 1
         # 一个链表，保存了所有客户端状态结构
         self.clients: list = []                  # /* List of active clients */
         # 链表，保存了所有待关闭的客户端
@@ -180,8 +214,9 @@ class RedisServer(Singleton):
         self.delCommand: redisCommand = None
         self.multiCommand: redisCommand = None
         self.lpushCommand: redisCommand = None
-        self.lpopCommand: redisCommand = None
-        self.rpopCommand: redisCommand = None
+        self.lpopCommand: Opt[redisCommand] = None
+        self.rpopCommand: Opt[redisCommand] = None
+        self.lmoveCommand: Opt[redisCommand] = None
 
         #  Fields used only for stats
         #  服务器启动时间
@@ -250,6 +285,19 @@ class RedisServer(Singleton):
         self.ops_sec_samples: List[int] = []
         # 数组索引，用于保存抽样结果，并在需要时回绕到 0
         self.ops_sec_idx = 0
+        # 抽样结果之和, INFO 直接用它求平均值, 不需要遍历抽样数组
+        self.ops_sec_samples_sum: int = 0
+        # 网络流量统计, 和 ops_sec_* 在同一次抽样中更新
+        #  Bytes read from / written to network.
+        self.stat_net_input_bytes: int = 0
+        self.stat_net_output_bytes: int = 0
+        self.ops_sec_last_sample_net_input: int = 0
+        self.ops_sec_last_sample_net_output: int = 0
+        # 每秒读写的字节数抽样结果, 以及它们的和
+        self.net_input_sec_samples: List[int] = []
+        self.net_output_sec_samples: List[int] = []
+        self.net_input_sec_samples_sum: int = 0
+        self.net_output_sec_samples_sum: int = 0
 
         #  Configuration
         # 日志可见性
@@ -391,9 +439,14 @@ class RedisServer(Singleton):
         #  Number of clients blocked by lists
         self.bpop_blocked_clients: int = 0
         #  list of clients to unblock before next loop
-        self.unblocked_clients: list = []
+        self.unblocked_clients: Deque['RedisClient'] = deque()
         #  List of readyList structures for BLPOP & co
         self.ready_keys: rList = listCreate()
+        # 有超时时间的阻塞客户端, 按到期时间排列的最小堆, 见 blocked.py
+        self.bpop_timeouts: List[Tuple[int, int, 'RedisClient']] = []
+        # 处理阻塞超时的时间事件, 没有时为 -1
+        self.bpop_timer_id: int = -1
+        self.bpop_timer_when: int = 0
         #  Sort parameters - qsort_r() is only available under BSD so we* have to take this state global, in order to pass it to sortCompare()
         self.sort_desc: int = 0
         self.sort_alpha: int = 0
@@ -407,6 +460,7 @@ class RedisServer(Singleton):
         self.set_max_intset_entries: int = 0
         self.zset_max_ziplist_entries: int = 0
         self.zset_max_ziplist_value: int = 0
+        self.zset_min_sortedarray_entries: int = 0
         self.hll_sparse_max_bytes: int = 0
         #  Unix time sampled every cron cycle.
         self.unixtime: int = 0
@@ -436,6 +490,10 @@ class RedisServer(Singleton):
         #  Software watchdog period in ms. 0 = off
         self.watchdog_period: int = 0
         self.lua_caller = None   # NOTE: not support lua
+        # FUNCTION LOAD 加载的函数, 以代码的 SHA1 为键
+        self.functions: Dict[str, 'redisFunction'] = {}
+        # FCALL 执行时间的上限, 毫秒, 0 表示不限制
+        self.function_time_limit: int = 0
 
     @property
     def saveparamslen(self):
@@ -452,6 +510,8 @@ class RedisServer(Singleton):
 
 class RedisClient(object):   # pylint: disable=all
     def __init__(self):
+        # // 客户端的唯一 id, 递增分配
+        self.id: int = 0
         # // 套接字描述符
         self.fd: Opt[socket.socket] = None
         # // 当前正在使用的数据库
@@ -524,7 +584,7 @@ class RedisClient(object):   # pylint: disable=all
         # // 最后被写入的全局复制偏移量
         self.woff: int = 0
         # // 被监视的键
-        self.watched_keys: rList = None
+        self.watched_keys: List[watchedKeyRef] = []
         # // 这个字典记录了客户端所有订阅的频道
         # // 键为频道名字，值为 NULL
         # // 也即是，一个频道的集合
@@ -545,6 +605,24 @@ class RedisClient(object):   # pylint: disable=all
         return len(self.argv)
 
 
+class sharedIntegers:
+    """
+    共享的整数对象 0 ~ REDIS_SHARED_INTEGERS-1
+    一次创建 10000 个对象会明显拖慢启动, 所以每个对象在第一次被使用时才创建
+    """
+    def __init__(self, size: int) -> None:
+        self.objs: List[Opt[redisObject]] = [None] * size
+
+    def __len__(self) -> int:
+        return len(self.objs)
+
+    def __getitem__(self, i: int) -> redisObject:
+        o = self.objs[i]
+        if o is None:
+            o = self.objs[i] = createObject(REDIS_STRING, i, REDIS_ENCODING_INT)
+        return o
+
+
 class sharedObjects(Singleton):
     def __init__(self):
         # # 常用回复
@@ -613,75 +691,128 @@ class sharedObjects(Singleton):
         self.rpop: redisObject = createStringObject("RPOP", 4)
         self.lpop: redisObject = createStringObject("LPOP", 4)
         self.lpush: redisObject = createStringObject("LPUSH", 5)
+        self.srem: redisObject = createStringObject("SREM", 4)
+        self.lmove: redisObject = createStringObject("LMOVE", 5)
+        self.left: redisObject = createStringObject("LEFT", 4)
+        self.right: redisObject = createStringObject("RIGHT", 5)
         # 常用整数
-        self.integers: List[redisObject] = [createObject(REDIS_STRING, i, REDIS_ENCODING_INT)
-                                            for i in range(Conf.REDIS_SHARED_INTEGERS)]
-        # 常用长度 bulk 或者 multi bulk 回复
+        self.integers = sharedIntegers(Conf.REDIS_SHARED_INTEGERS)
+        # 常用长度 bulk 或者 multi bulk 回复, 只有长度小于 REDIS_SHARED_BULKHDR_LEN 的才会用到
         self.mbulkhdr: List[redisObject] = [createObject(
-            REDIS_STRING, sdsnew("*%d\r\n" % i)) for i in range(Conf.REDIS_SHARED_INTEGERS)]
+            REDIS_STRING, sdsnew("*%d\r\n" % i)) for i in range(Conf.REDIS_SHARED_BULKHDR_LEN)]
         self.bulkhdr: List[redisObject] = [createObject(
-            REDIS_STRING, sdsnew("$%d\r\n" % i)) for i in range(Conf.REDIS_SHARED_INTEGERS)]
+            REDIS_STRING, sdsnew("$%d\r\n" % i)) for i in range(Conf.REDIS_SHARED_BULKHDR_LEN)]
         self.minstring: redisObject = createStringObject("minstring", 9)
         self.maxstring: redisObject = createStringObject("maxstring", 9)
 
-def queueMultiCommand(c: 'RedisClient'):
-    pass
-
 def lookupCommand(s: sds) -> Opt[redisCommand]:
     server = get_server()
-    return server.commands.get(s.text.lower())
+    name = bytes(s.buf[:s.len])
+    cmd = server.command_lookup.get(name)
+    if cmd is None:
+        # 全小写和全大写的命令名已经在表中, 其他写法折叠成小写后再查找一次,
+        # 找到的话缓存起来, 不存在的命令不缓存, 避免表被随意的输入撑大
+        cmd = server.command_lookup.get(name.lower())
+        if cmd is not None and len(server.command_lookup) < server.command_lookup_max:
+            server.command_lookup[name] = cmd
+    return cmd
+
+def buildCommandLookup(server: RedisServer) -> None:
+    """commands 发生变化后 (启动, rename-command) 重建查找缓存"""
+    lookup: Dict[bytes, redisCommand] = {}
+    for name, cmd in server.commands.items():
+        name = name.encode()
+        lookup[name] = cmd
+        lookup[name.upper()] = cmd
+    server.command_lookup = lookup
+    server.command_lookup_max = len(lookup) + Conf.REDIS_COMMAND_LOOKUP_CACHE
+
+def renameServerCommand(server: RedisServer, name: str, newname: str) -> bool:
+    """rename-command 配置项, newname 为空时禁用该命令; orig_commands 不受影响"""
+    cmd = server.commands.pop(name.lower(), None)
+    if cmd is None:
+        return False
+    if newname:
+        server.commands[newname.lower()] = cmd
+    buildCommandLookup(server)
+    return True
 
 def freeMemoryIfNeeded() -> int:
     # TODO(rlj): something to do.
     return REDIS_OK
 
+def propagate(cmd: Opt[redisCommand], dbid: int, argv: List[robj], flags: int) -> None:
+    """把命令写入 AOF 和复制流"""
+    # NOTE: 还没有实现 AOF 和复制
+    pass
+
+def alsoPropagate(cmd: Opt[redisCommand], dbid: int, argv: List[robj], target: int) -> None:
+    """在当前命令执行完之后额外传播一个命令, 用来传播 FCALL 等命令实际产生的效果"""
+    server = get_server()
+    server.also_propagate.ops.append(redisOp(argv, dbid, target, cmd))
+
+def latencyHistBucket(duration: int) -> int:
+    """耗时 duration 微秒的调用所在的直方图桶, 第 i 个桶是 (2**(i-1), 2**i], 0 和 1 微秒都在第 0 个桶"""
+    return min(max(duration - 1, 0).bit_length(), REDIS_LATENCY_HIST_BUCKETS)
+
 def call(c: RedisClient, flag: int):
     server = get_server()
     client_old_flags = c.flags
     c.flags &= ~(REDIS_FORCE_AOF|REDIS_FORCE_REPL)
     dirty = server.dirty
     start = timeval.from_datetime().ustime
+    if (server.capture is not None and not (c.cmd.flags & REDIS_CMD_ADMIN) and   # type: ignore
+            (not (c.flags & REDIS_MULTI) or (c.cmd.flags & REDIS_CMD_NOQUEUE))):   # type: ignore
+        captureCommand(server, c, start)
     c.cmd.proc(c)
     duration = timeval.from_datetime().ustime - start
     dirty = server.dirty - dirty
-    c.flags &= ~(REDIS_FORCE_AOF|REDIS_FORCE_REPL)
-    c.flags |= client_old_flags & (REDIS_FORCE_AOF|REDIS_FORCE_REPL)
+    if flag & REDIS_CALL_STATS:
+        c.cmd.microseconds += duration   # type: ignore
+        c.cmd.calls += 1   # type: ignore
+        c.cmd.latency[latencyHistBucket(duration)] += 1   # type: ignore
+    if flag & REDIS_CALL_PROPAGATE:
+        if dirty and not (c.flags & REDIS_PREVENT_PROP):
+            propagate(c.cmd, c.db.id, c.argv, REDIS_PROPAGATE_AOF|REDIS_PROPAGATE_REPL)
+        for op in server.also_propagate.ops:
+            propagate(op.cmd, op.dbid, op.argv, op.target)
+    if server.also_propagate.ops:
+        server.also_propagate.ops = []
+    c.flags &= ~(REDIS_FORCE_AOF|REDIS_FORCE_REPL|REDIS_PREVENT_PROP)
+    c.flags |= client_old_flags & (REDIS_FORCE_AOF|REDIS_FORCE_REPL|REDIS_PREVENT_PROP)
     server.stat_numcommands += 1
 
-def handleClientsBlockedOnLists():
-    # TODO(rlj): something to do.
-    pass
-
 def processCommand(c: RedisClient) -> int:
     from .networking import addReply, addReplyError
     server = get_server()
     shared = sharedObjects()
-    if c.argv[0].ptr.lowereq('quit'):
-        addReply(c, shared.ok)
-        c.flags |= REDIS_CLOSE_AFTER_REPLY
-        return REDIS_ERR
-
     c.cmd = c.lastcmd = lookupCommand(c.argv[0].ptr)
     if not c.cmd:
+        flagTransaction(c)
         addReplyError(c, "unknown command '%s'" % c.argv[0].ptr.text)
         return REDIS_OK
     elif (c.cmd.arity > 0 and (c.cmd.arity != c.argc)) or (c.argc < -c.cmd.arity):
+        flagTransaction(c)
         addReplyError(c, "wrong number of arguments for '%s' command" % c.cmd.name)
         return REDIS_OK
-    if server.requirepass and (not c.authenticated) and c.cmd.proc != authCommand:
+    if server.requirepass and (not c.authenticated) and not (c.cmd.flags & REDIS_CMD_NOAUTH):
+        flagTransaction(c)
         addReply(c, shared.noautherr)
         return REDIS_OK
     if server.maxmemory:
         retval = freeMemoryIfNeeded()
         if (c.cmd.flags & REDIS_CMD_DENYOOM) and retval == REDIS_ERR:
+            flagTransaction(c)
             addReply(c, shared.oomerr)
             return REDIS_OK
     if server.loading and (not (c.cmd.flags & REDIS_CMD_LOADING)):
         addReply(c, shared.loadingerr)
         return REDIS_OK
-    if ((c.flags & REDIS_MULTI) and
-        c.cmd.proc not in [execCommand, discardCommand, multiCommand, watchCommand]):
+    if (c.flags & REDIS_MULTI) and not (c.cmd.flags & REDIS_CMD_NOQUEUE):
         # 在事务上下文中
+        # 排队的命令按收到的顺序录制, EXEC 执行它们时不会再录制一次
+        if server.capture is not None and not (c.cmd.flags & REDIS_CMD_ADMIN):
+            captureCommand(server, c, timeval.from_datetime().ustime)
         queueMultiCommand(c)
         addReply(c, shared.queued)
     else:
@@ -701,15 +832,19 @@ def createClient(server: RedisServer, fd: Opt[socket.socket]) -> Opt[RedisClient
     c = RedisClient()
     if fd:
         anetNonBlock(fd)
-        anetEnableTcpNoDelay(fd)
-        if server.tcpkeepalive:
-            anetKeepAlive(fd, server.tcpkeepalive)
+        # unix socket 不支持 TCP 选项
+        if fd.family != socket.AF_UNIX:
+            anetEnableTcpNoDelay(fd)
+            if server.tcpkeepalive:
+                anetKeepAlive(fd, server.tcpkeepalive)
         if (aeCreateFileEvent(server.el, fd.fileno(), AE_READABLE, readQueryFromClient, c) == AE_ERR):
             fd.close()
             return None
 
     # 默认数据库
     selectDb(c, 0)
+    c.id = server.next_client_id
+    server.next_client_id += 1
     c.fd = fd
     c.bulklen = -1
     # // 创建时间和最后一次互动时间
@@ -723,11 +858,11 @@ def createClient(server: RedisServer, fd: Opt[socket.socket]) -> Opt[RedisClient
     # // 阻塞类型
     c.btype = REDIS_BLOCKED_NONE
     # // 造成客户端阻塞的列表键
-    c.bpop.keys = dictCreate(setDictType, None)
+    c.bpop.keys = {}
     # // 在解除阻塞时将元素推入到 target 指定的键中
     # // BRPOPLPUSH 命令时使用
     # // 进行事务时监视的键
-    c.watched_keys = listCreate()
+    c.watched_keys = []
     # // 订阅的频道和模式
     c.pubsub_channels = dictCreate(setDictType, None)
     c.pubsub_patterns = listCreate()
@@ -740,14 +875,6 @@ def createClient(server: RedisServer, fd: Opt[socket.socket]) -> Opt[RedisClient
     initClientMultiState(c)
     return c
 
-def unblockClient(c: RedisClient):
-    # TODO(rlj): something to do.
-    pass
-
-def freeClientMultiState(c: RedisClient):
-    # TODO(rlj): something to do.
-    pass
-
 def freeClient(c: RedisClient):
     server = get_server()
     if server.current_client == c:
@@ -755,10 +882,10 @@ def freeClient(c: RedisClient):
     c.querybuf = None   # type: ignore
     if c.flags & REDIS_BLOCKED:
         unblockClient(c)
-    dictRelease(c.bpop.keys)
     if c.fd:
         aeDeleteFileEvent(server.el, c.fd.fileno(), AE_READABLE)
         aeDeleteFileEvent(server.el, c.fd.fileno(), AE_WRITABLE)
+        SocketCache.remove(c.fd.fileno())
         c.fd.close()
     listRelease(c.reply)
     freeClientArgv(c)
@@ -774,10 +901,14 @@ def freeClient(c: RedisClient):
         decrRefCount(c.name)
     c.argv = []
     c.peerid = ''
+    unwatchAllKeys(c)
     freeClientMultiState(c)
     del c
 
 
+def lookupCommandByCString(s: str) -> Opt[redisCommand]:
+    return get_server().commands.get(s)
+
 def populateCommandTable() -> None:
     flags_map = {
         'w': REDIS_CMD_WRITE,
@@ -793,12 +924,20 @@ def populateCommandTable() -> None:
         'M': REDIS_CMD_SKIP_MONITOR,
         'k': REDIS_CMD_ASKING,
     }
+    # 这些命令在 MULTI 中不排队, 或者不需要认证, 预先计算成标志, processCommand 只需要检查位
+    noqueue = {'exec', 'discard', 'multi', 'watch', 'quit'}
+    noauth = {'auth', 'quit'}
+    server = get_server()
     for c in redisCommandTable:
         for i in c.sflags:
             c.flags |= flags_map[i]
-        server = get_server()
+        if c.name in noqueue:
+            c.flags |= REDIS_CMD_NOQUEUE
+        if c.name in noauth:
+            c.flags |= REDIS_CMD_NOAUTH
         server.commands[c.name] = c
         server.orig_commands[c.name] = c
+    buildCommandLookup(server)
 
 def getClientLimitClassByName(name: str) -> int:
     mapping = {
@@ -854,13 +993,13 @@ def LRUClock() -> int:
 def initServerConfig(server: RedisServer):
     ## 服务器状态
     # 设置服务器的运行 ID
-    server.runid = str(uuid.uuid4())
+    server.runid = os.urandom(Conf.REDIS_RUN_ID_SIZE // 2).hex()
     # 设置默认配置文件路径
     server.configfile = "";
     # 设置默认服务器频率
     server.hz = Conf.REDIS_DEFAULT_HZ;
     # 设置服务器的运行架构
-    server.arch_bits = (platform.architecture()[0] == '64bit') and 64 or 32
+    server.arch_bits = 64 if sys.maxsize > 2**32 else 32
     # 设置默认服务器端口号
     server.port = Conf.REDIS_SERVERPORT
     server.tcp_backlog = Conf.REDIS_TCP_BACKLOG
@@ -915,6 +1054,7 @@ def initServerConfig(server: RedisServer):
     server.set_max_intset_entries = REDIS_SET_MAX_INTSET_ENTRIES
     server.zset_max_ziplist_entries = REDIS_ZSET_MAX_ZIPLIST_ENTRIES
     server.zset_max_ziplist_value = REDIS_ZSET_MAX_ZIPLIST_VALUE
+    server.zset_min_sortedarray_entries = REDIS_ZSET_MIN_SORTEDARRAY_ENTRIES
     server.hll_sparse_max_bytes = REDIS_DEFAULT_HLL_SPARSE_MAX_BYTES
     server.shutdown_asap = 0
     # server.repl_ping_slave_period = Conf.REDIS_REPL_PING_SLAVE_PERIOD
@@ -926,6 +1066,7 @@ def initServerConfig(server: RedisServer):
     # server.cluster_migration_barrier = Conf.REDIS_CLUSTER_DEFAULT_MIGRATION_BARRIER
     # server.cluster_configfile = Conf.REDIS_DEFAULT_CLUSTER_CONFIG_FILE
     # server.lua_caller = NULL
+    server.function_time_limit = Conf.REDIS_FUNCTION_TIME_LIMIT
     # server.lua_time_limit = Conf.REDIS_LUA_TIME_LIMIT
     # server.lua_client = NULL
     # server.lua_timedout = 0
@@ -946,8 +1087,9 @@ def initServerConfig(server: RedisServer):
     # server.delCommand = lookupCommandByCString("del");
     # server.multiCommand = lookupCommandByCString("multi");
     # server.lpushCommand = lookupCommandByCString("lpush");
-    # server.lpopCommand = lookupCommandByCString("lpop");
-    # server.rpopCommand = lookupCommandByCString("rpop");
+    server.lpopCommand = lookupCommandByCString("lpop")
+    server.rpopCommand = lookupCommandByCString("rpop")
+    server.lmoveCommand = lookupCommandByCString("lmove")
 
     # /* Slow log */
     # 初始化慢查询日志
@@ -997,17 +1139,155 @@ def resetServerStats(server: RedisServer):
     server.stat_sync_full = 0
     server.stat_sync_partial_ok = 0
     server.stat_sync_partial_err = 0
+    server.stat_net_input_bytes = 0
+    server.stat_net_output_bytes = 0
     server.ops_sec_samples = [0 for _ in range(Conf.REDIS_OPS_SEC_SAMPLES)]
+    server.net_input_sec_samples = [0 for _ in range(Conf.REDIS_OPS_SEC_SAMPLES)]
+    server.net_output_sec_samples = [0 for _ in range(Conf.REDIS_OPS_SEC_SAMPLES)]
+    server.ops_sec_samples_sum = 0
+    server.net_input_sec_samples_sum = 0
+    server.net_output_sec_samples_sum = 0
     server.ops_sec_idx = 0
     server.ops_sec_last_sample_time = int(time.time() * 1000)
     server.ops_sec_last_sample_ops = 0
+    server.ops_sec_last_sample_net_input = 0
+    server.ops_sec_last_sample_net_output = 0
+
+def trackOperationsPerSecond() -> None:
+    """对每秒执行的命令数以及每秒读写的字节数进行一次抽样, 放入环形数组"""
+    server = get_server()
+    now = int(time.time() * 1000)
+    t = now - server.ops_sec_last_sample_time
+    if t <= 0:
+        return
+    ops = server.stat_numcommands - server.ops_sec_last_sample_ops
+    net_input = server.stat_net_input_bytes - server.ops_sec_last_sample_net_input
+    net_output = server.stat_net_output_bytes - server.ops_sec_last_sample_net_output
+    ops_sec = ops * 1000 // t
+    input_sec = net_input * 1000 // t
+    output_sec = net_output * 1000 // t
+
+    idx = server.ops_sec_idx
+    server.ops_sec_samples_sum += ops_sec - server.ops_sec_samples[idx]
+    server.net_input_sec_samples_sum += input_sec - server.net_input_sec_samples[idx]
+    server.net_output_sec_samples_sum += output_sec - server.net_output_sec_samples[idx]
+    server.ops_sec_samples[idx] = ops_sec
+    server.net_input_sec_samples[idx] = input_sec
+    server.net_output_sec_samples[idx] = output_sec
+    server.ops_sec_idx = (idx + 1) % Conf.REDIS_OPS_SEC_SAMPLES
+
+    server.ops_sec_last_sample_time = now
+    server.ops_sec_last_sample_ops = server.stat_numcommands
+    server.ops_sec_last_sample_net_input = server.stat_net_input_bytes
+    server.ops_sec_last_sample_net_output = server.stat_net_output_bytes
+
+def getOperationsPerSecond() -> int:
+    server = get_server()
+    return server.ops_sec_samples_sum // Conf.REDIS_OPS_SEC_SAMPLES
+
+def getInstantaneousKbps() -> Tuple[float, float]:
+    """返回 (input_kbps, output_kbps)"""
+    server = get_server()
+    return (server.net_input_sec_samples_sum / Conf.REDIS_OPS_SEC_SAMPLES / 1024,
+            server.net_output_sec_samples_sum / Conf.REDIS_OPS_SEC_SAMPLES / 1024)
 
 def updateCachedTime(server: RedisServer):
     server.unixtime = int(time.time())
     server.mstime = int(time.time() * 1000)
 
-def serverCron(*args):
-    pass
+ACTIVE_EXPIRE_CYCLE_LOOKUPS_PER_LOOP = 20   # /* Loopkups per loop. */
+ACTIVE_EXPIRE_CYCLE_SLOW_TIME_PERC = 25     # /* CPU max % for keys collection */
+
+def activeExpireCycleTryExpire(db: RedisDB, de: dictEntry, now: int) -> int:
+    t = dictGetSignedIntegerVal(de)
+    if now > t:
+        server = get_server()
+        key = dictGetKey(de)
+        keyobj = createStringObject(key.buf, sdslen(key))
+        propagateExpire(db, keyobj)
+        dbDelete(db, keyobj)
+        notifyKeyspaceEvent(REDIS_NOTIFY_EXPIRED, "expired", keyobj, db.id)
+        decrRefCount(keyobj)
+        server.stat_expiredkeys += 1
+        return 1
+    return 0
+
+# 下一次 activeExpireCycle() 开始检查的数据库
+expire_current_db = 0
+
+def activeExpireCycle() -> None:
+    """随机抽样带过期时间的键, 删除已过期的键, 并顺带估算 db.avg_ttl"""
+    global expire_current_db
+    server = get_server()
+    start = timeval.from_datetime().ustime
+    timelimit = 1000000 * ACTIVE_EXPIRE_CYCLE_SLOW_TIME_PERC // server.hz // 100
+    dbs_per_call = min(Conf.REDIS_DBCRON_DBS_PER_CALL, server.dbnum)
+
+    for _ in range(dbs_per_call):
+        db = server.db[expire_current_db % server.dbnum]
+        expire_current_db += 1
+        while True:
+            num = dictSize(db.expires)
+            if num == 0:
+                db.avg_ttl = 0
+                break
+            slots = db.expires.ht[0].size + db.expires.ht[1].size
+            # 太稀疏的字典抽样代价太高, 留给下一次
+            if slots > DICT_HT_INITIAL_SIZE and (num * 100 // slots < 1):
+                break
+            now = timeval.from_datetime().mstime
+            expired = 0
+            ttl_sum = 0
+            ttl_samples = 0
+            num = min(num, ACTIVE_EXPIRE_CYCLE_LOOKUPS_PER_LOOP)
+            while num:
+                num -= 1
+                de = dictGetRandomKey(db.expires)
+                if de is None:
+                    break
+                ttl = dictGetSignedIntegerVal(de) - now
+                if activeExpireCycleTryExpire(db, de, now):
+                    expired += 1
+                elif ttl > 0:
+                    ttl_sum += ttl
+                    ttl_samples += 1
+            if ttl_samples:
+                avg_ttl = ttl_sum // ttl_samples
+                if db.avg_ttl == 0:
+                    db.avg_ttl = avg_ttl
+                # 只保留最近几次抽样的影响
+                db.avg_ttl = (db.avg_ttl // 50) * 49 + (avg_ttl // 50)
+            if timeval.from_datetime().ustime - start > timelimit:
+                return
+            if expired <= ACTIVE_EXPIRE_CYCLE_LOOKUPS_PER_LOOP // 4:
+                break
+
+def databasesCron() -> None:
+    server = get_server()
+    if server.active_expire_enabled:
+        activeExpireCycle()
+
+def run_with_period(ms: int) -> bool:
+    """serverCron() 中每 ms 毫秒执行一次的代码块使用"""
+    server = get_server()
+    period = 1000 // server.hz
+    return ms <= period or server.cronloops % (ms // period) == 0
+
+def serverCron(eventLoop: aeEventLoop, ident: int, clientData) -> int:
+    server = get_server()
+    updateCachedTime(server)
+    if run_with_period(100):
+        trackOperationsPerSecond()
+    server.lruclock = getLRUClock()
+    # 记录内存峰值, RSS 的采样也放在这里, INFO 只读取采样值
+    if zmalloc_used_memory() > server.stat_peak_memory:
+        server.stat_peak_memory = zmalloc_used_memory()
+    server.resident_set_size = zmalloc_get_rss()
+    databasesCron()
+    if server.capture is not None:
+        captureFlush(server)
+    server.cronloops += 1
+    return 1000 // server.hz
 
 def initServer(server: RedisServer):
     # // 设置信号处理函数
@@ -1027,12 +1307,21 @@ def initServer(server: RedisServer):
         server.sofd = anetUnixServer(server.unixsocket, server.unixsocketperm, server.tcp_backlog)
         anetNonBlock(server.sofd)
     assert server.ipfd_count > 0 or server.sofd
+    if server.metrics_port:
+        from .metrics import listenToMetricsPort
+        if listenToMetricsPort(server) == REDIS_ERR:
+            logger.warning("Metrics listener disabled.")
+    if server.capture_file:
+        try:
+            captureStart(server, server.capture_file)
+        except OSError as e:
+            logger.warning("Can't open the capture file %s: %s", server.capture_file, e)
     for i in range(server.dbnum):
         server.db[i].dict = dictCreate(dbDictType, None)
         server.db[i].expires = dictCreate(keyptrDictType, None)
-        server.db[i].blocking_keys = dictCreate(keylistDictType, None)
-        server.db[i].ready_keys = dictCreate(setDictType, None)
-        server.db[i].watched_keys = dictCreate(keylistDictType, None)
+        server.db[i].blocking_keys = {}
+        server.db[i].ready_keys = set()
+        server.db[i].watched_keys = {}
         server.db[i].eviction_pool = evictionPoolAlloc()
         server.db[i].id = i
         server.db[i].avg_ttl = 0
@@ -1086,7 +1375,7 @@ def initSentinelConfig():
 def initSentinel():
     pass
 
-def loadServerConfig(server: RedisServer, filename: str, options: dict) -> None:
+def loadServerConfig(server: RedisServer, filename: Opt[str], options: dict) -> None:
     config_list = []
     if filename:
         with open(filename) as fp:
@@ -1117,12 +1406,28 @@ def loadServerConfig(server: RedisServer, filename: str, options: dict) -> None:
             server.unixsocket = val
         elif key == 'unixsocketperm':
             server.unixsocketperm = int(val)
+        elif key == 'metrics-port':
+            server.metrics_port = int(val)
+        elif key == 'capture-file':
+            server.capture_file = val
+        elif key == 'function-time-limit':
+            server.function_time_limit = int(val)
+        elif key == 'rename-command':
+            args = val.split()
+            if len(args) == 1:
+                # rename-command NAME "" 两端的引号已经在上面被去掉了
+                args.append('')
+            if len(args) != 2:
+                print('wrong number of arguments for rename-command {!r}'.format(val))
+                continue
+            if not renameServerCommand(server, args[0], args[1].strip('"')):
+                print('no such command in rename-command {!r}'.format(args[0]))
         elif key == 'save':
             if val == '':
                 server.saveparams = []
             else:
                 args = val.split()
-                server.saveparams.append(saveparam(int(args[0], int(args[1]))))
+                server.saveparams.append(saveparam(int(args[0]), int(args[1])))
         elif key == 'dir':
             os.chdir(val)
         elif key == 'databases':
@@ -1141,8 +1446,8 @@ def loadServerConfig(server: RedisServer, filename: str, options: dict) -> None:
             server.daemonize = int(val)
         elif key == 'hz':
             server.hz = int(val)
-            server.hz = min(server.hz, Conf.REDIS_MIN_HZ)
-            server.hz = max(server.hz, Conf.REDIS_MAX_HZ)
+            server.hz = max(server.hz, Conf.REDIS_MIN_HZ)
+            server.hz = min(server.hz, Conf.REDIS_MAX_HZ)
         elif key == 'appendonly':
             server.aof_state = int(val) and REDIS_AOF_ON or REDIS_AOF_OFF
         elif key == 'appendfilename':
@@ -1188,6 +1493,8 @@ def loadServerConfig(server: RedisServer, filename: str, options: dict) -> None:
             server.zset_max_ziplist_entries = int(val)
         elif key == 'zset-max-ziplist-value':
             server.zset_max_ziplist_value = int(val)
+        elif key == 'zset-min-sortedarray-entries':
+            server.zset_min_sortedarray_entries = int(val)
         elif key == 'hll-sparse-max-bytes':
             server.hll_sparse_max_bytes = int(val)
         elif key == 'slowlog-log-slower-than':
@@ -1209,34 +1516,53 @@ def loadServerConfig(server: RedisServer, filename: str, options: dict) -> None:
             assert server.notify_keyspace_events != -1
 
 
-def parse_server_args(server: RedisServer) -> Tuple[str, dict]:
-    def handle_version(args):
+def usage() -> None:
+    print("Usage: python -m redis_server [/path/to/redis.conf] [options]", file=sys.stderr)
+    print("       python -m redis_server -v or --version", file=sys.stderr)
+    print("       python -m redis_server -h or --help", file=sys.stderr)
+    print("Examples:", file=sys.stderr)
+    print("       python -m redis_server /etc/redis/6379.conf", file=sys.stderr)
+    print("       python -m redis_server --port 7777", file=sys.stderr)
+    print("       python -m redis_server /etc/myredis.conf --loglevel verbose", file=sys.stderr)
+    sys.exit(1)
+
+def parse_server_args(server: RedisServer, argv: Opt[List[str]] = None) -> Tuple[Opt[str], dict]:
+    """
+    和 redis.c 的 main() 一样手动解析命令行, 不使用 argparse (创建 ArgumentParser 会拖慢启动)
+    第一个参数如果不以 - 开头则是配置文件路径, 之后的 --name value [value ...] 都是配置项,
+    多个值用空格连接, 也支持 --name=value 的写法
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in ('-v', '--version'):
         print('Redis server v={}'.format(__version__))
+        sys.exit(0)
+    if argv and argv[0] in ('-h', '--help'):
+        usage()
+
+    conf = None
+    j = 0
+    if argv and not argv[0].startswith('-'):
+        conf = argv[0]
+        j = 1
+    options: Dict[str, str] = {}
+    name = None
+    for arg in argv[j:]:
+        if arg.startswith('--'):
+            name, sep, val = arg[2:].partition('=')
+            options[name] = val
+        elif name is not None:
+            options[name] = options[name] + ' ' + arg if options[name] else arg
+        else:
+            print("Invalid argument '%s', options must start with --" % arg, file=sys.stderr)
+            usage()
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-v', '--version', help='show version info and exit', action='store_true')
-    parser.add_argument('conf', help='config file path', nargs='?')
-    parsed, unknown = parser.parse_known_args()
-    options = {}
-    for arg in unknown:
-        if arg.startswith(("-", "--")):
-            tmp = arg.split('=')[0]
-            parser.add_argument(tmp)
-            options[tmp.strip('-')] = ''
-    args = parser.parse_args()
-
-    if args.version:
-        handle_version(args)
-        exit()
-
-    for key in options:
-        options[key] = getattr(args, key, '')
-    loadServerConfig(server, args.conf, options)
-    if args.conf:
-        server.configfile = os.path.abspath(args.conf)
-    if not (args.conf or options):
+    loadServerConfig(server, conf, options)
+    if conf:
+        server.configfile = os.path.abspath(conf)
+    if not (conf or options):
         print("Warning: no config file specified, using the default config")
-    return args.conf, options
+    return conf, options
 
 def daemonize():
     if os.fork() != 0:
@@ -1287,8 +1613,9 @@ def loadDataFromDisk():
     pass
 
 def beforeSleep(eventLoop: aeEventLoop) -> None:
-    # TODO(ruan.lj@foxmail.com): something to do.
-    pass
+    # 处理被解除阻塞的客户端在阻塞期间发来的命令
+    if get_server().unblocked_clients:
+        processUnblockedClients()
 
 def main():
     server = RedisServer()
@@ -0,0 +1,251 @@
+"""
+重放 CLIENT CAPTURE / capture-file 录制的命令流
+
+    python -m redis_server.replay capture.rcap -p 6379             # 按录制时的速度重放
+    python -m redis_server.replay capture.rcap -p 6379 --speed 10  # 10 倍速
+    python -m redis_server.replay capture.rcap -p 6379 --speed 0   # 尽可能快
+    python -m redis_server.replay capture.rcap --json report.json
+
+录制中的每个客户端对应一个连接: 同一个客户端的命令按录制的顺序发送, 一个命令要等上一个命令的回复
+读取完毕, 并且到达它 (按 --speed 缩放后的) 录制时间之后才会发出; 不同客户端的命令并发执行。
+所有连接在同一个线程中用非阻塞 socket + selectors 驱动。
+
+延迟从命令发出开始计算, 到回复被完整读取为止。
+lag 是命令实际发出的时间比计划时间晚了多少, lag 持续增大说明服务器跟不上录制时的负载。
+"""
+
+import argparse
+import heapq
+import json
+import selectors
+import socket
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional as Opt, Sequence, Tuple
+
+from .benchmark import encodeCommand, skipReply, latencySummary
+from .capture import captureEntry, readCapture
+
+__all__ = [
+    'loadCapture',
+    'runReplay',
+    'main',
+]
+
+class replayClient:
+    def __init__(self, client_id: int) -> None:
+        self.client_id = client_id
+        self.sock: Opt[socket.socket] = None
+        self.pending: Deque[captureEntry] = deque()
+        self.db = 0
+        self.outbuf = bytearray()
+        self.inbuf = bytearray()
+        self.writing = False
+        # 为了切换数据库插入的 SELECT, 它们的回复不计入统计
+        self.skip_replies = 0
+        # 正在等待回复的命令的发送时间, 没有时为 None
+        self.sent_at: Opt[float] = None
+
+def loadCapture(path: str) -> Tuple[Dict[int, replayClient], int, float]:
+    """按客户端分组读取录制文件, 返回 (clients, 命令数, 录制时长)"""
+    clients: Dict[int, replayClient] = {}
+    count = 0
+    last_us = 0
+    with open(path, 'rb') as f:
+        for entry in readCapture(f):
+            c = clients.get(entry.client_id)
+            if c is None:
+                c = clients[entry.client_id] = replayClient(entry.client_id)
+            c.pending.append(entry)
+            count += 1
+            last_us = max(last_us, entry.time_us)
+    return clients, count, last_us / 1000000
+
+class ReplayRunner:
+    def __init__(self, opts: argparse.Namespace) -> None:
+        self.opts = opts
+        self.clients, self.total, self.capture_duration = loadCapture(opts.capture)
+        self.sel = selectors.DefaultSelector()
+        # (计划发送时间, client id), 只包含没有等待回复的客户端
+        self.schedule: List[Tuple[float, int]] = []
+        self.latencies: List[float] = []
+        self.lags: List[float] = []
+        self.per_command: Dict[str, int] = {}
+        self.errors = 0
+        self.inflight = 0
+        self.start = 0.0
+
+    def connect(self) -> socket.socket:
+        if self.opts.socket:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.opts.socket)
+        else:
+            sock = socket.create_connection((self.opts.host, self.opts.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        return sock
+
+    def dueTime(self, entry: captureEntry) -> float:
+        if self.opts.speed <= 0:
+            return self.start
+        return self.start + entry.time_us / 1000000 / self.opts.speed
+
+    def scheduleNext(self, c: replayClient) -> None:
+        if c.pending:
+            heapq.heappush(self.schedule, (self.dueTime(c.pending[0]), c.client_id))
+        elif c.sock is not None:
+            # 这个客户端的命令已经全部重放完毕
+            self.sel.unregister(c.sock)
+            c.sock.close()
+            c.sock = None
+
+    def sendNext(self, c: replayClient, due: float) -> None:
+        entry = c.pending.popleft()
+        if c.sock is None:
+            c.sock = self.connect()
+            self.sel.register(c.sock, selectors.EVENT_READ, c)
+        if entry.db != c.db:
+            c.outbuf += encodeCommand([b'SELECT', b'%d' % entry.db])
+            c.skip_replies += 1
+            c.db = entry.db
+        name = entry.argv[0].decode(errors='replace').lower()
+        if name == 'select' and len(entry.argv) == 2 and entry.argv[1].isdigit():
+            c.db = int(entry.argv[1])
+        self.per_command[name] = self.per_command.get(name, 0) + 1
+        c.outbuf += encodeCommand(entry.argv)
+        now = time.perf_counter()
+        c.sent_at = now
+        if self.opts.speed > 0:
+            self.lags.append(max(now - due, 0.0))
+        self.inflight += 1
+        self.flush(c)
+
+    def flush(self, c: replayClient) -> None:
+        assert c.sock is not None
+        try:
+            n = c.sock.send(c.outbuf)
+        except BlockingIOError:
+            n = 0
+        del c.outbuf[:n]
+        want_write = bool(c.outbuf)
+        if want_write != c.writing:
+            c.writing = want_write
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if want_write else 0)
+            self.sel.modify(c.sock, events, c)
+
+    def readReplies(self, c: replayClient) -> None:
+        assert c.sock is not None
+        try:
+            chunk = c.sock.recv(1 << 16)
+        except BlockingIOError:
+            return
+        if not chunk:
+            raise ConnectionError("server closed the connection of client %d" % c.client_id)
+        c.inbuf += chunk
+        pos = 0
+        while c.sent_at is not None:
+            end = skipReply(c.inbuf, pos)
+            if end < 0:
+                break
+            if c.skip_replies:
+                c.skip_replies -= 1
+            else:
+                if c.inbuf[pos] == 0x2d:   # '-'
+                    self.errors += 1
+                self.latencies.append(time.perf_counter() - c.sent_at)
+                c.sent_at = None
+                self.inflight -= 1
+            pos = end
+        del c.inbuf[:pos]
+        if c.sent_at is None:
+            self.scheduleNext(c)
+
+    def run(self) -> dict:
+        self.start = time.perf_counter()
+        for c in self.clients.values():
+            self.scheduleNext(c)
+        while self.schedule or self.inflight:
+            now = time.perf_counter()
+            while self.schedule and self.schedule[0][0] <= now:
+                due, client_id = heapq.heappop(self.schedule)
+                self.sendNext(self.clients[client_id], due)
+            if self.schedule:
+                timeout = max(self.schedule[0][0] - time.perf_counter(), 0)
+            else:
+                timeout = 0.1
+            for key, mask in self.sel.select(timeout=timeout):
+                c = key.data
+                if mask & selectors.EVENT_WRITE:
+                    self.flush(c)
+                if mask & selectors.EVENT_READ:
+                    self.readReplies(c)
+        return self.report(time.perf_counter() - self.start)
+
+    def report(self, elapsed: float) -> dict:
+        lat = sorted(self.latencies)
+        lags = sorted(self.lags)
+        return {
+            'config': {
+                'capture': self.opts.capture,
+                'speed': self.opts.speed,
+            },
+            'clients': len(self.clients),
+            'requests': len(lat),
+            'errors': self.errors,
+            'capture_duration_sec': self.capture_duration,
+            'elapsed_sec': elapsed,
+            'ops_per_sec': len(lat) / elapsed if elapsed else 0.0,
+            'commands': self.per_command,
+            'latency_ms': latencySummary(lat),
+            'lag_ms': latencySummary(lags),
+        }
+
+def runReplay(argv: Opt[Sequence[str]] = None) -> dict:
+    return ReplayRunner(parseArgs(argv)).run()
+
+def parseArgs(argv: Opt[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m redis_server.replay', description='Replay a command capture')
+    parser.add_argument('capture', help='capture file written by CLIENT CAPTURE or capture-file')
+    parser.add_argument('-H', '--host', default='127.0.0.1', help='server hostname (default 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=6379, help='server port (default 6379)')
+    parser.add_argument('-s', '--socket', default=None, help='server unix socket (overrides host and port)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed multiplier, 0 replays as fast as possible (default 1)')
+    parser.add_argument('--json', default=None, help='write the report as JSON to this path ("-" for stdout)')
+    return parser.parse_args(argv)
+
+def printReport(report: dict) -> None:
+    speed = report['config']['speed']
+    print("====== %s ======" % report['config']['capture'])
+    print("  %d requests from %d clients replayed in %.2f seconds (captured in %.2f seconds, speed %s)" % (
+        report['requests'], report['clients'], report['elapsed_sec'], report['capture_duration_sec'],
+        '%gx' % speed if speed > 0 else 'max'))
+    print("  %d errors" % report['errors'])
+    print()
+    print("throughput: %.2f requests per second" % report['ops_per_sec'])
+    for name, key in (('latency', 'latency_ms'), ('lag', 'lag_ms')):
+        lat = report[key]
+        if name == 'lag' and speed <= 0:
+            continue
+        print("%s (msec): min=%.3f avg=%.3f p50=%.3f p90=%.3f p99=%.3f p99.9=%.3f max=%.3f" % (
+            name, lat['min'], lat['avg'], lat['p50'], lat['p90'], lat['p99'], lat['p99.9'], lat['max']))
+
+def main(argv: Opt[Sequence[str]] = None) -> None:
+    opts = parseArgs(argv)
+    try:
+        report = ReplayRunner(opts).run()
+    except (OSError, ValueError) as e:
+        print("replay failed: %s" % e, file=sys.stderr)
+        sys.exit(1)
+    if opts.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    printReport(report)
+    if opts.json:
+        with open(opts.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
+import math
 import typing
 from typing import List, Callable, Optional as Opt, Tuple, Union, ByteString
 from .sds import sdslen, sdsnewlen, sds, sdsfree, sdsavail, sdsRemoveFreeSpace, sdsnew
-from .util import ll2string, string2l, get_shared, get_server
-from .csix import ptr2long, strcoll, memcmp, cstr, int2cstr
+from .util import ll2string, string2l, string2ld, ld2string, get_shared, get_server
+from .csix import strcoll, cstr, int2cstr, LONG_MIN, LONG_MAX
+from .quicklist import quicklistCreate
+from .ziplist import ziplistNew
+from .intset import intsetNew
 from .config import *
 
 if typing.TYPE_CHECKING:
@@ -27,6 +31,8 @@ REDIS_ENCODING_ZIPLIST = 5   # /* Encoded as ziplist */
 REDIS_ENCODING_INTSET = 6   #  /* Encoded as intset */
 REDIS_ENCODING_SKIPLIST = 7   #  /* Encoded as skiplist */
 REDIS_ENCODING_EMBSTR = 8   #  /* Embedded sds string encoding */
+REDIS_ENCODING_QUICKLIST = 9   # /* Encoded as linked list of ziplists */
+REDIS_ENCODING_SORTEDARRAY = 10   # /* Encoded as blocks of sorted arrays */
 
 class redisObject:
     def __init__(self):
@@ -55,16 +61,16 @@ def createObject(obj_type: int, ptr, encoding: int = REDIS_ENCODING_RAW) -> robj
     return o
 
 
-def createRawStringObject(ptr: cstr, length: int) -> robj:
+def createRawStringObject(ptr: Union[cstr, memoryview], length: int) -> robj:
     return createObject(REDIS_STRING, sdsnewlen(ptr, length))
 
-def createEmbeddedStringObject(ptr: cstr, length: int) -> robj:
+def createEmbeddedStringObject(ptr: Union[cstr, memoryview], length: int) -> robj:
     o = createRawStringObject(ptr, length)
     o.encoding = REDIS_ENCODING_EMBSTR
     return o
 
 REDIS_ENCODING_EMBSTR_SIZE_LIMIT = 39
-def createStringObject(ptr: Union[cstr, str], length: int) -> robj:
+def createStringObject(ptr: Union[cstr, str, memoryview], length: int) -> robj:
     if isinstance(ptr, str):
         ptr = ptr.encode('utf8')
     if (length <= REDIS_ENCODING_EMBSTR_SIZE_LIMIT):
@@ -95,34 +101,18 @@ REDIS_COMPARE_COLL = (1<<1)
 def compareStringObjectsWithFlags(a: 'robj', b: 'robj', flags: int) -> int:
     assert a.type == REDIS_STRING and b.type == REDIS_STRING
 
-    bufa = bytearray(128)
-    bufb = bytearray(128)
-
     if a is b:
         return 0
 
-    if sdsEncodedObject(a):
-        astr = a.ptr
-        alen = sdslen(astr)
-    else:
-        alen = ll2string(bufa, len(bufa), ptr2long(a.ptr))
-        astr = bufa
-
-    if sdsEncodedObject(b):
-        bstr = b.ptr
-        blen = sdslen(bstr)
-    else:
-        blen = ll2string(bufb, len(bufb), ptr2long(b.ptr))
-        bstr = bufb
+    # INT 编码的对象先转换成字符串再比较
+    astr = a.ptr.content if sdsEncodedObject(a) else b'%d' % a.ptr
+    bstr = b.ptr.content if sdsEncodedObject(b) else b'%d' % b.ptr
 
     if flags & REDIS_COMPARE_COLL:
         return strcoll(astr, bstr)
     else:
-        minlen = min(alen, blen)
-        cmp = memcmp(astr, bstr, minlen)
-        if cmp == 0:
-            return alen - blen
-        return cmp
+        # 等价于 memcmp() 之后再比较长度
+        return (astr > bstr) - (astr < bstr)
 
 def compareStringObjects(a: robj, b: robj) -> int:
     return compareStringObjectsWithFlags(a, b, REDIS_COMPARE_BINARY)
@@ -163,8 +153,8 @@ def getDecodedObject(o: robj) -> robj:
         return o
     if o.type == REDIS_STRING and o.encoding == REDIS_ENCODING_INT:
         buf = bytearray(32)
-        ll2string(buf, 32, o.ptr)
-        dec = createStringObject(buf, len(buf))
+        length = ll2string(buf, 32, o.ptr)
+        dec = createStringObject(buf, length)
         return dec
     else:
         raise ValueError("Unknown encoding type")
@@ -203,24 +193,36 @@ def tryObjectEncoding(o: robj) -> robj:
         o.ptr = sdsRemoveFreeSpace(o.ptr)
     return o
 
-def getLongLongFromObject(o: robj) -> Tuple[int, int]:
+def stringObjectLen(o: robj) -> int:
+    assert o.type == REDIS_STRING
+    if sdsEncodedObject(o):
+        return sdslen(o.ptr)
+    return len(b'%d' % o.ptr)
+
+def getLongLongFromObject(o: Opt[robj]) -> Tuple[int, int]:
     value = 0
     if o == None:
         value = 0
     else:
         assert o.type == REDIS_STRING
         if sdsEncodedObject(o):
+            s = bytes(o.ptr.buf[:o.ptr.len])
+            # int() 会忽略两端的空白和数字中的 _, strtoll 不接受这些
+            if not s or s[:1].isspace() or s[-1:].isspace() or b'_' in s:
+                return REDIS_ERR, value
             try:
-                value = int(o.ptr.content, 10)
+                value = int(s, 10)
             except ValueError:
                 return REDIS_ERR, value
+            if value < LONG_MIN or value > LONG_MAX:
+                return REDIS_ERR, 0
         elif o.encoding == REDIS_ENCODING_INT:
             value = o.ptr
         else:
             raise RuntimeError("Unknown string encoding")
     return REDIS_OK, value
 
-def getLongLongFromObjectOrReply(c: 'RedisClient', o: robj, msg: Opt[str]) -> Tuple[int, int]:
+def getLongLongFromObjectOrReply(c: 'RedisClient', o: Opt[robj], msg: Opt[str]) -> Tuple[int, int]:
     from .networking import addReplyError
     status, value = getLongLongFromObject(o)
     if status != REDIS_OK:
@@ -230,3 +232,75 @@ def getLongLongFromObjectOrReply(c: 'RedisClient', o: robj, msg: Opt[str]) -> Tu
             addReplyError(c, "value is not an integer or out of range")
         return REDIS_ERR, 0
     return REDIS_OK, value
+
+def getLongDoubleFromObject(o: Opt[robj]) -> Tuple[int, float]:
+    value = 0.0
+    if o == None:
+        return REDIS_OK, value
+    assert o.type == REDIS_STRING
+    if sdsEncodedObject(o):
+        ok, value = string2ld(o.ptr.buf, o.ptr.len)
+        if not ok:
+            return REDIS_ERR, 0.0
+    elif o.encoding == REDIS_ENCODING_INT:
+        value = float(o.ptr)
+    else:
+        raise RuntimeError("Unknown string encoding")
+    return REDIS_OK, value
+
+def getLongDoubleFromObjectOrReply(c: 'RedisClient', o: Opt[robj], msg: Opt[str]) -> Tuple[int, float]:
+    from .networking import addReplyError
+    status, value = getLongDoubleFromObject(o)
+    if status != REDIS_OK:
+        if msg:
+            addReplyError(c, msg)
+        else:
+            addReplyError(c, "value is not a valid float")
+        return REDIS_ERR, 0.0
+    return REDIS_OK, value
+
+def createQuicklistObject() -> robj:
+    return createObject(REDIS_LIST, quicklistCreate(), REDIS_ENCODING_QUICKLIST)
+
+def createSetObject() -> robj:
+    from .db import setDictType
+    from .rdict import dictCreate
+    return createObject(REDIS_SET, dictCreate(setDictType, None), REDIS_ENCODING_HT)
+
+def createIntsetObject() -> robj:
+    return createObject(REDIS_SET, intsetNew(), REDIS_ENCODING_INTSET)
+
+def createHashObject() -> robj:
+    return createObject(REDIS_HASH, ziplistNew(), REDIS_ENCODING_ZIPLIST)
+
+def createZsetObject() -> robj:
+    from .db import zsetDictType
+    from .rdict import dictCreate
+    from .zskiplist import zset, zslCreate
+    zs = zset()
+    zs.dict = dictCreate(zsetDictType, None)
+    zs.zsl = zslCreate()
+    return createObject(REDIS_ZSET, zs, REDIS_ENCODING_SKIPLIST)
+
+def createZsetSortedArrayObject() -> robj:
+    from .db import zsetDictType
+    from .rdict import dictCreate
+    from .zarray import zarrCreate
+    za = zarrCreate()
+    za.dict = dictCreate(zsetDictType, None)
+    return createObject(REDIS_ZSET, za, REDIS_ENCODING_SORTEDARRAY)
+
+def createZsetZiplistObject() -> robj:
+    return createObject(REDIS_ZSET, ziplistNew(), REDIS_ENCODING_ZIPLIST)
+
+def createStringObjectFromLongLong(value: int) -> robj:
+    # 和 tryObjectEncoding 一样, 设置了 maxmemory 时不使用共享对象, 每个键需要自己的 LRU 时间
+    if get_server().maxmemory == 0 and value >= 0 and value < ServerConfig.REDIS_SHARED_INTEGERS:
+        o = get_shared().integers[value]
+        incrRefCount(o)
+        return o
+    return createObject(REDIS_STRING, value, REDIS_ENCODING_INT)
+
+def createStringObjectFromLongDouble(value: float) -> robj:
+    s = ld2string(value)
+    return createStringObject(s, len(s))
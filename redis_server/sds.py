@@ -48,7 +48,7 @@ class Sdshdr(object):
 
 sds = Sdshdr
 
-def sdsnewlen(init: cstr, initlen: int) -> sds:
+def sdsnewlen(init: Union[cstr, memoryview], initlen: int) -> sds:
     buf = bytearray(init[:initlen])
     buf.append(NUL)
     sh = sds(initlen, 0, buf)
@@ -90,7 +90,8 @@ def sdsMakeRoomFor(s: sds, addlen: int) -> sds:
         newlen *= 2
     else:
         newlen += SDS_MAX_PREALLOC
-    s.buf.extend((NUL for _ in range(newlen - lenght)))  # NOTE 默认填错NUL, 和c实现有所不同
+    # buf 的长度总是 len + free + 1, 扩展到 newlen + 1
+    s.buf.extend(bytes(newlen - lenght - free))  # NOTE 默认填充NUL, 和c实现有所不同
     s.free = newlen - lenght
     return s
 
@@ -112,12 +113,24 @@ def sdsIncrLen(s: sds, incr: int) -> None:
     s[s.len] = NUL
 
 
-sdsgrowzero = sdsMakeRoomFor
+def sdsgrowzero(s: sds, length: int) -> sds:
+    """把 s 的长度扩展到 length, 新增的部分填充 0; length 不大于当前长度时什么也不做"""
+    curlen = sdslen(s)
+    if length <= curlen:
+        return s
+    # 原来的 free 部分可能残留着之前的内容, 需要清零, 切片长度不变, 不会重新分配 buf;
+    # sdsMakeRoomFor 新扩展的部分本来就是 0, 不需要再写一遍, 大幅增长时只复制一次
+    oldend = min(length + 1, curlen + s.free + 1)
+    s.buf[curlen:oldend] = bytes(oldend - curlen)
+    s = sdsMakeRoomFor(s, length - curlen)
+    s.free -= length - curlen
+    s.len = length
+    return s
 
-def sdscatlen(s: sds, t: Union[cstr, sds], lenght: int):
+def sdscatlen(s: sds, t: Union[cstr, sds, memoryview], lenght: int):
     curlen = sdslen(s)
     s = sdsMakeRoomFor(s, lenght)
-    s[curlen:lenght] = t[:lenght]
+    s[curlen:curlen+lenght] = t[:lenght]
     s.len = curlen + lenght
     s.free = s.free - lenght
     s[curlen+lenght] = NUL
@@ -1,5 +1,10 @@
+import os
+import sys
+import math
 import socket
 import typing
+import resource
+import importlib
 from .csix import cstr, memcpy, NUL, LONG_MIN, LONG_MAX
 from typing import Dict, Any, Union, ByteString, Tuple
 
@@ -36,11 +41,15 @@ def string2l(s: cstr, slen: int) -> Tuple[int, int]:
         flag: 1 -> succ, 0 -> fail
         val: int value
     """
-    val = 0
-    try:
-        val = int(s[:slen].strip(b'\0'))
-    except ValueError:
+    # 和 Redis 的 string2ll 一样只接受 [-]数字, 不能有前导 0, 空白, + 号或 _,
+    # 这样转换成功的字符串和 ll2string 的结果完全相同, 整数编码不会改变字符串的内容
+    b = bytes(s[:slen]).strip(b'\0')
+    digits = b[1:] if b[:1] == b'-' else b
+    if not digits.isdigit() or len(b) > 20:
         return 0, 0
+    if digits[0] == 0x30 and (len(digits) > 1 or len(b) > 1):
+        return 0, 0
+    val = int(b)
     if val < LONG_MIN:
         return 0, 0
     elif val > LONG_MAX:
@@ -50,6 +59,121 @@ def string2l(s: cstr, slen: int) -> Tuple[int, int]:
 
 string2ll = string2l
 
+def string2ld(s: cstr, slen: int) -> Tuple[int, float]:
+    """
+    convert bytes to float
+    和 strtold 一样整个字符串都必须是数字, 不接受前后的空白和 nan, Python 额外支持的 _ 写法也不接受
+    """
+    b = bytes(s[:slen])
+    if not b or b[:1].isspace() or b[-1:].isspace() or b'_' in b:
+        return 0, 0.0
+    try:
+        value = float(b)
+    except ValueError:
+        return 0, 0.0
+    if math.isnan(value):
+        return 0, 0.0
+    return 1, value
+
+def stringmatchlen(pattern: cstr, patternLen: int, string: cstr, stringLen: int, nocase: int) -> int:
+    """glob 风格的模式匹配, 支持 *, ?, [...] (可以用 ^ 取反和 a-z 表示范围) 和 \\ 转义"""
+    p = 0
+    s = 0
+
+    def lower(ch: int) -> int:
+        return ch + 32 if nocase and 65 <= ch <= 90 else ch
+
+    while patternLen and stringLen:
+        ch = pattern[p]
+        if ch == 0x2a:      # '*'
+            while patternLen > 1 and pattern[p+1] == 0x2a:
+                p += 1
+                patternLen -= 1
+            if patternLen == 1:
+                return 1
+            while stringLen:
+                if stringmatchlen(pattern[p+1:p+patternLen], patternLen-1, string[s:s+stringLen], stringLen, nocase):
+                    return 1
+                s += 1
+                stringLen -= 1
+            return 0
+        elif ch == 0x3f:    # '?'
+            s += 1
+            stringLen -= 1
+        elif ch == 0x5b:    # '['
+            p += 1
+            patternLen -= 1
+            negate = patternLen > 0 and pattern[p] == 0x5e   # '^'
+            if negate:
+                p += 1
+                patternLen -= 1
+            match = False
+            while True:
+                if patternLen == 0:
+                    # 没有闭合的 '[', 最后一个字符当作 ']'
+                    p -= 1
+                    patternLen += 1
+                    break
+                if pattern[p] == 0x5c and patternLen >= 2:      # '\'
+                    p += 1
+                    patternLen -= 1
+                    if pattern[p] == string[s]:
+                        match = True
+                elif pattern[p] == 0x5d:    # ']'
+                    break
+                elif patternLen >= 3 and pattern[p+1] == 0x2d:     # '-'
+                    start = lower(pattern[p])
+                    end = lower(pattern[p+2])
+                    if start > end:
+                        start, end = end, start
+                    c = lower(string[s])
+                    p += 2
+                    patternLen -= 2
+                    if start <= c <= end:
+                        match = True
+                elif lower(pattern[p]) == lower(string[s]):
+                    match = True
+                p += 1
+                patternLen -= 1
+            if negate:
+                match = not match
+            if not match:
+                return 0
+            s += 1
+            stringLen -= 1
+        else:
+            if ch == 0x5c and patternLen >= 2:     # '\'
+                p += 1
+                patternLen -= 1
+            if lower(pattern[p]) != lower(string[s]):
+                return 0
+            s += 1
+            stringLen -= 1
+        p += 1
+        patternLen -= 1
+        if stringLen == 0:
+            while patternLen and pattern[p] == 0x2a:
+                p += 1
+                patternLen -= 1
+            break
+    return int(patternLen == 0 and stringLen == 0)
+
+def ld2string(value: float) -> bytes:
+    """
+    浮点数转换为字符串, 和 Redis 的 "%.17Lf" 一样总是使用定点表示并去掉小数部分末尾的 0
+    Python 没有 long double, 数字部分使用能还原出 value 的最短表示, 10.2 不会输出为 10.199999999999999
+    """
+    from decimal import Decimal
+    s = format(Decimal(repr(value)), 'f')
+    if '.' in s:
+        s = s.rstrip('0').rstrip('.')
+    return s.encode()
+
+
+def d2string(value: float) -> bytes:
+    """双精度浮点数转换为字符串, 和 C 版本一样使用 "%.17g", 有序集合的分值按这个格式保存和回复"""
+    return b'%.17g' % value
+
 
 class _SingletonMeta(type):
     _instances: Dict[Any, Any]  = {}
@@ -75,10 +199,26 @@ class SocketCache:
         assert sock.fileno() not in cls._cache
         cls._cache[sock.fileno()] = sock
 
+    @classmethod
+    def remove(cls, fileno: int):
+        cls._cache.pop(fileno, None)
+
 def zmalloc_used_memory() -> int:
     # TODO(rlj): something to do.
     return 0
 
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def zmalloc_get_rss() -> int:
+    """进程的常驻内存大小 (RSS), 单位为字节"""
+    try:
+        with open('/proc/self/statm', 'rb') as fp:
+            return int(fp.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # NOTE: 没有 proc 文件系统时只能拿到峰值, macOS 的单位是字节, 其余是 KB
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
 def get_server() -> 'RedisServer':
     from .redis import RedisServer
     return RedisServer()
@@ -86,3 +226,18 @@ def get_server() -> 'RedisServer':
 def get_shared() -> 'sharedObjects':
     from .redis import sharedObjects
     return sharedObjects()
+
+# 可选依赖的模块名 -> 模块对象, 没有安装时为 None
+_optional_modules: Dict[str, Any] = {}
+
+def optionalImport(name: str) -> Any:
+    """
+    导入可选的依赖 (例如 numpy), 没有安装时返回 None, 调用者使用纯 Python 的实现
+    第一次使用时才导入并缓存结果, 不影响服务器的启动时间
+    """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
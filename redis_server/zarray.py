@@ -0,0 +1,273 @@
+# -*- coding:utf-8 -*-
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Optional as Opt, Tuple
+from .robject import robj, createStringObject, sdsEncodedObject
+from .rdict import rDict, dictDelete
+from .util import get_shared
+from .zskiplist import zrangespec, zlexrangespec
+
+# 有序数组编码 (REDIS_ENCODING_SORTEDARRAY) 的有序集合, 用于成员很多并且主要按分值范围读取的场景。
+# 元素按 (分值, 成员) 升序分块保存, 每个块是一个 float64 数组 (array('d')) 和一个成员列表,
+# 各个块的最大分值保存在 index 中, 相当于只有两层的 B 树: 先在 index 上二分找到块, 再在块内二分,
+# 插入和删除只移动一个块内的元素。和跳跃表编码一样, 字典 (zsetDictType) 保存成员对象到分值的映射。
+#
+# 每个块第一个元素的排名 (offsets) 在修改之后按需重新计算, 所以按排名定位和 ZRANK / ZCOUNT 都是 O(log n),
+# 范围查询是 O(log n + m), 并且按块切片批量取出。每个元素只占用 8 字节的分值和成员列表中的一个指针,
+# 而跳跃表的每个节点是一个 Python 对象加上每层一个 zskiplistLevel 对象。
+
+ZARRAY_BLOCK_MAX = 1024                     # 块内元素超过这个数量时分成两半
+ZARRAY_BLOCK_MIN = ZARRAY_BLOCK_MAX // 4    # 块内元素少于这个数量时尝试和相邻的块合并
+ZARRAY_BLOCK_FILL = ZARRAY_BLOCK_MAX // 2   # 按顺序追加时每个块填充的数量, 给之后的插入留出空间
+
+ZarrayItem = Tuple[bytes, float]
+
+class zarrayBlock:
+    def __init__(self):
+        self.scores: array = array('d')
+        self.members: List[bytes] = []
+
+class zarray:
+    """REDIS_ENCODING_SORTEDARRAY 编码的有序集合: 字典按成员查分值, 分块的有序数组按分值排序"""
+    def __init__(self):
+        self.dict: rDict = None
+        self.blocks: List[zarrayBlock] = []
+        # 每个块的最大分值
+        self.index: array = array('d')
+        # 每个块第一个元素的排名, 最后一项是元素总数; None 表示修改之后还没有重新计算
+        self.offsets: Opt[List[int]] = None
+        self.length: int = 0
+
+
+def zarrCreate() -> zarray:
+    return zarray()
+
+def zarrOffsets(za: zarray) -> List[int]:
+    if za.offsets is None:
+        offsets = [0]
+        offsets.extend(accumulate(len(block.members) for block in za.blocks))
+        za.offsets = offsets
+    return za.offsets
+
+def _blockLastMember(block: zarrayBlock) -> bytes:
+    return block.members[-1]
+
+def _zarrFindBlock(za: zarray, score: float, ele: bytes) -> int:
+    """第一个最大元素不小于 (score, ele) 的块, 也就是 (score, ele) 所在或者应该插入的块"""
+    lo = bisect_left(za.index, score)
+    hi = bisect_right(za.index, score, lo)
+    if lo < hi:
+        # 最大分值相同的块 (例如所有分值都相同) 再按最大成员二分
+        lo = bisect_left(za.blocks, ele, lo, hi, key=_blockLastMember)
+    return lo
+
+def _zarrBlockPos(block: zarrayBlock, score: float, ele: bytes) -> int:
+    lo = bisect_left(block.scores, score)
+    hi = bisect_right(block.scores, score, lo)
+    return bisect_left(block.members, ele, lo, hi)
+
+def _zarrSplitBlock(za: zarray, bi: int) -> None:
+    block = za.blocks[bi]
+    half = len(block.members) // 2
+    new = zarrayBlock()
+    new.scores = block.scores[half:]
+    new.members = block.members[half:]
+    del block.scores[half:]
+    del block.members[half:]
+    za.blocks.insert(bi + 1, new)
+    za.index[bi] = block.scores[-1]
+    za.index.insert(bi + 1, new.scores[-1])
+
+def _zarrMergeBlocks(za: zarray, bi: int) -> None:
+    """把第 bi + 1 个块合并到第 bi 个块"""
+    block, nxt = za.blocks[bi], za.blocks[bi+1]
+    block.scores.extend(nxt.scores)
+    block.members.extend(nxt.members)
+    za.index[bi] = za.index[bi+1]
+    del za.blocks[bi+1]
+    del za.index[bi+1]
+
+def _zarrBlockShrunk(za: zarray, bi: int) -> None:
+    """块内删除了元素之后更新 index, 删除空块, 合并过小的相邻块"""
+    block = za.blocks[bi]
+    if not block.members:
+        del za.blocks[bi]
+        del za.index[bi]
+        return
+    za.index[bi] = block.scores[-1]
+    size = len(block.members)
+    if size >= ZARRAY_BLOCK_MIN:
+        return
+    if bi + 1 < len(za.blocks) and size + len(za.blocks[bi+1].members) <= ZARRAY_BLOCK_MAX:
+        _zarrMergeBlocks(za, bi)
+    elif bi > 0 and size + len(za.blocks[bi-1].members) <= ZARRAY_BLOCK_MAX:
+        _zarrMergeBlocks(za, bi - 1)
+
+def zarrInsert(za: zarray, score: float, ele: bytes) -> None:
+    """插入新成员, 调用者保证成员不存在"""
+    za.length += 1
+    za.offsets = None
+    if not za.blocks:
+        block = zarrayBlock()
+        block.scores.append(score)
+        block.members.append(ele)
+        za.blocks.append(block)
+        za.index.append(score)
+        return
+    bi = _zarrFindBlock(za, score, ele)
+    if bi == len(za.blocks):
+        # 比所有元素都大, 追加到最后一个块
+        bi -= 1
+    block = za.blocks[bi]
+    pos = _zarrBlockPos(block, score, ele)
+    block.scores.insert(pos, score)
+    block.members.insert(pos, ele)
+    za.index[bi] = block.scores[-1]
+    if len(block.members) > ZARRAY_BLOCK_MAX:
+        _zarrSplitBlock(za, bi)
+
+def zarrAppend(za: zarray, score: float, ele: bytes) -> None:
+    """追加比所有元素都大的成员, 用于从有序的数据批量创建"""
+    if not za.blocks or len(za.blocks[-1].members) >= ZARRAY_BLOCK_FILL:
+        za.blocks.append(zarrayBlock())
+        za.index.append(score)
+    block = za.blocks[-1]
+    block.scores.append(score)
+    block.members.append(ele)
+    za.index[-1] = score
+    za.length += 1
+    za.offsets = None
+
+def zarrDelete(za: zarray, score: float, ele: bytes) -> int:
+    """删除成员, 不存在时返回 0"""
+    bi = _zarrFindBlock(za, score, ele)
+    if bi == len(za.blocks):
+        return 0
+    block = za.blocks[bi]
+    pos = _zarrBlockPos(block, score, ele)
+    if pos == len(block.members) or block.members[pos] != ele or block.scores[pos] != score:
+        return 0
+    del block.scores[pos]
+    del block.members[pos]
+    za.length -= 1
+    za.offsets = None
+    _zarrBlockShrunk(za, bi)
+    return 1
+
+def zarrUpdateScore(za: zarray, curscore: float, ele: bytes, newscore: float) -> None:
+    """修改已有成员的分值, 顺序不变时在原位置修改, 否则删除之后重新插入"""
+    bi = _zarrFindBlock(za, curscore, ele)
+    assert bi < len(za.blocks)
+    block = za.blocks[bi]
+    scores, members = block.scores, block.members
+    pos = _zarrBlockPos(block, curscore, ele)
+    assert pos < len(members) and members[pos] == ele
+    # 只处理块内部的位置, 块的第一个和最后一个元素还需要和相邻的块比较
+    if (0 < pos < len(members) - 1 and
+            (scores[pos-1] < newscore or (scores[pos-1] == newscore and members[pos-1] < ele)) and
+            (scores[pos+1] > newscore or (scores[pos+1] == newscore and members[pos+1] > ele))):
+        scores[pos] = newscore
+        return
+    zarrDelete(za, curscore, ele)
+    zarrInsert(za, newscore, ele)
+
+def zarrGetRank(za: zarray, score: float, ele: bytes) -> Opt[int]:
+    """成员从 0 开始的排名, 不存在时返回 None"""
+    bi = _zarrFindBlock(za, score, ele)
+    if bi == len(za.blocks):
+        return None
+    block = za.blocks[bi]
+    pos = _zarrBlockPos(block, score, ele)
+    if pos == len(block.members) or block.members[pos] != ele:
+        return None
+    return zarrOffsets(za)[bi] + pos
+
+def zarrGetElementByRank(za: zarray, rank: int) -> ZarrayItem:
+    offsets = zarrOffsets(za)
+    bi = bisect_right(offsets, rank) - 1
+    block = za.blocks[bi]
+    pos = rank - offsets[bi]
+    return block.members[pos], block.scores[pos]
+
+def zarrRangeByRank(za: zarray, start: int, end: int) -> List[ZarrayItem]:
+    """排名在 [start, end] 之间的成员和分值, 按排名升序, 每个块切片一次"""
+    items: List[ZarrayItem] = []
+    if start > end:
+        return items
+    offsets = zarrOffsets(za)
+    bi = bisect_right(offsets, start) - 1
+    while start <= end:
+        block = za.blocks[bi]
+        lo = start - offsets[bi]
+        hi = min(end - offsets[bi] + 1, len(block.members))
+        items.extend(zip(block.members[lo:hi], block.scores[lo:hi].tolist()))
+        start = offsets[bi] + hi
+        bi += 1
+    return items
+
+def zarrScoreRank(za: zarray, value: float, right: int) -> int:
+    """分值小于 value 的元素个数, right 为真时是分值小于等于 value 的元素个数"""
+    find = bisect_right if right else bisect_left
+    bi = find(za.index, value)
+    if bi == len(za.blocks):
+        return za.length
+    return zarrOffsets(za)[bi] + find(za.blocks[bi].scores, value)
+
+def zarrRankRangeByScore(za: zarray, zrange: zrangespec) -> Tuple[int, int]:
+    """分值在范围内的元素的排名范围 [first, last], first > last 表示范围内没有元素"""
+    first = zarrScoreRank(za, zrange.min, zrange.minex)
+    last = zarrScoreRank(za, zrange.max, not zrange.maxex) - 1
+    return first, last
+
+def zarrLexRank(za: zarray, value: robj, right: int) -> int:
+    """成员小于 value 的元素个数, right 为真时是小于等于, 和跳跃表一样只在所有分值都相同时有意义"""
+    shared = get_shared()
+    if value is shared.minstring:
+        return 0
+    if value is shared.maxstring:
+        return za.length
+    ele = value.ptr.content if sdsEncodedObject(value) else b'%d' % value.ptr
+    find = bisect_right if right else bisect_left
+    bi = find(za.blocks, ele, key=_blockLastMember)
+    if bi == len(za.blocks):
+        return za.length
+    return zarrOffsets(za)[bi] + find(za.blocks[bi].members, ele)
+
+def zarrRankRangeByLex(za: zarray, zrange: zlexrangespec) -> Tuple[int, int]:
+    first = zarrLexRank(za, zrange.min, zrange.minex)
+    last = zarrLexRank(za, zrange.max, not zrange.maxex) - 1
+    return first, last
+
+def zarrDeleteRangeByRank(za: zarray, start: int, end: int, d: rDict) -> int:
+    """删除排名在 [start, end] (从 0 开始) 之间的元素, 同时从字典中删除成员"""
+    if start > end:
+        return 0
+    offsets = zarrOffsets(za)
+    first = bi = bisect_right(offsets, start) - 1
+    lo = start - offsets[bi]
+    todelete = deleted = end - start + 1
+    while todelete:
+        block = za.blocks[bi]
+        hi = min(lo + todelete, len(block.members))
+        for ele in block.members[lo:hi]:
+            dictDelete(d, createStringObject(ele, len(ele)))
+        del block.scores[lo:hi]
+        del block.members[lo:hi]
+        todelete -= hi - lo
+        if block.members:
+            za.index[bi] = block.scores[-1]
+            bi += 1
+        else:
+            del za.blocks[bi]
+            del za.index[bi]
+        lo = 0
+    za.length -= deleted
+    za.offsets = None
+    # 中间的块已经整个删除, 范围两端剩下的部分是相邻的两个块
+    if first + 1 < len(za.blocks):
+        _zarrBlockShrunk(za, first + 1)
+    if first < len(za.blocks):
+        _zarrBlockShrunk(za, first)
+    return deleted
@@ -1,4 +1,4 @@
-from typing import NewType, Tuple, Optional as Opt
+from typing import NewType, Tuple, Union, Optional as Opt
 from .csix import *
 from .endianconv import intrev32ifbe, memrev16ifbe, memrev32ifbe, memrev64ifbe
 
@@ -67,13 +67,13 @@ ZIPLIST_HEADER_SIZE = 4 + 4 + 2
 #     return zl.zllen
 
 def ziplist_entry_tail(zl: 'ziplist') -> cstrptr:
-    return cstrptr(zl, pos=zl.zltail)
+    return cstrptr(zl, pos=intrev32ifbe(zl.zltail))
 
 def ziplist_entry_head(zl: 'ziplist') -> cstrptr:
     return cstrptr(zl, pos=ZIPLIST_HEADER_SIZE)
 
 def ziplist_entry_end(zl: 'ziplist') -> cstrptr:
-    return cstrptr(zl, pos=zl.zlbytes-1)
+    return cstrptr(zl, pos=intrev32ifbe(zl.zlbytes)-1)
 
 def ziplist_incr_length(zl: 'ziplist', incr: int):
     if zl.zllen < UINT16_MAX:
@@ -92,12 +92,19 @@ class zlentry:
         self.p = None
 
 class ziplist(bytearray):
+    """
+    表头的 zlbytes, zltail, zllen 保存为属性, 缓冲区中保留同样大小的表头空间,
+    这样节点的偏移量和 C 版本完全一致。zlbytes 总是等于缓冲区的长度。
+    """
     def __init__(self):
-        super().__init__([0 for _ in range(4 + 4 + 2 + 1)])
-        self.zlbytes: int = intrev32ifbe(len(self))
-        self.zltail: int = intrev32ifbe(self.zlbytes-1)
+        super().__init__(ZIPLIST_HEADER_SIZE + 1)
+        self.zltail: int = intrev32ifbe(ZIPLIST_HEADER_SIZE)
         self.zllen: int = 0
-        self[-1] = 255
+        self[-1] = ZIP_END
+
+    @property
+    def zlbytes(self) -> int:
+        return len(self)
 
     @property
     def zlend(self):
@@ -120,36 +127,29 @@ def zip_decode_prevlensize(p: cstrptr) -> int:
         return 5
 
 def zip_decode_prevlen(p: cstrptr) -> Tuple[int, int]:
-    prevlensize = zip_decode_prevlensize(p)
-    prevlen = 0
-    if prevlensize == 1:
-        prevlen = p.buf[p.pos]
-    elif prevlensize == 5:
-        prevlen = cstr2uint32(p.buf[p.pos+1: p.pos+5])
-        prevlen = intrev32ifbe(prevlen)
-    else:
-        raise ValueError
-    return prevlensize, prevlen
+    if p.buf[p.pos] < ZIP_BIGLEN:
+        return 1, p.buf[p.pos]
+    prevlen = cstr2uint32(p.buf[p.pos+1: p.pos+5])
+    return 5, intrev32ifbe(prevlen)
 
 def zip_entry_encoding(p: cstrptr) -> int:
-    encoding = cstr2int(p.buf[p.pos: p.pos+1], 'uint8')
-    assert encoding < ZIP_STR_MASK
-    return encoding & ZIP_STR_MASK
+    encoding = p.buf[p.pos]
+    if encoding < ZIP_STR_MASK:
+        encoding &= ZIP_STR_MASK
+    return encoding
 
 def zip_decode_length(p: cstrptr) -> Tuple[int, int, int]:
     encoding = zip_entry_encoding(p)
-    lensize = 0
-    length = 0
     if encoding < ZIP_STR_MASK:
         if encoding == ZIP_STR_06B:
             lensize = 1
             length = p.buf[p.pos] & 0x3f
         elif encoding == ZIP_STR_14B:
             lensize = 2
-            length = cstr2int(p.buf[p.pos:p.pos+2], 'uint16')
+            length = ((p.buf[p.pos] & 0x3f) << 8) | p.buf[p.pos+1]
         elif encoding == ZIP_STR_32B:
             lensize = 5
-            length = cstr2int(p.buf[p.pos+1:p.pos+5], 'uint32')
+            length = int.from_bytes(p.buf[p.pos+1:p.pos+5], 'big')
         else:
             raise ValueError
     else:
@@ -157,15 +157,17 @@ def zip_decode_length(p: cstrptr) -> Tuple[int, int, int]:
         length = zipIntSize(encoding)
     return encoding, lensize, length
 
+_zip_int_size = {
+    ZIP_INT_8B:  1,
+    ZIP_INT_16B: 2,
+    ZIP_INT_24B: 3,
+    ZIP_INT_32B: 4,
+    ZIP_INT_64B: 8,
+}
+
 def zipIntSize(encoding: int) -> int:
-    mapping = {
-        ZIP_INT_8B:  1,
-        ZIP_INT_16B: 2,
-        ZIP_INT_24B: 3,
-        ZIP_INT_32B: 4,
-        ZIP_INT_64B: 8,
-    }
-    return mapping[encoding]
+    # 4 位整数直接保存在编码中, 不占用额外空间
+    return _zip_int_size.get(encoding, 0)
 
 def ziplistNew() -> ziplist:
     return ziplist()
@@ -173,9 +175,10 @@ def ziplistNew() -> ziplist:
 def zipEntry(p: cstrptr) -> zlentry:
     e = zlentry()
     e.prevrawlensize, e.prevrawlen = zip_decode_prevlen(p)
-    e.encoding, e.lensize, e.len = zip_decode_length(p)
+    e.encoding, e.lensize, e.len = zip_decode_length(p.new(p.pos+e.prevrawlensize))
     e.headersize = e.prevrawlensize + e.lensize
-    e.p = c_assignment(p)
+    # cstrptr 只有 buf 和 pos 两个成员, 不需要通过 copy 复制
+    e.p = p.new(p.pos)
     return e
 
 def zipRawEntryLength(p: cstrptr):
@@ -184,14 +187,17 @@ def zipRawEntryLength(p: cstrptr):
     return prevlensize + lensize + length
 
 def zipTryEncoding(entry: cstr, entrylen: int, v: intptr, encoding: intptr) -> int:
-    if entrylen >= 32 or encoding == 0:
+    if entrylen >= 32 or entrylen == 0:
         return 0
 
-    value = 0
+    s = bytes(entry[:entrylen])
     try:
-        value = int(entry[:entrylen])
+        value = int(s)
     except ValueError:
         return 0
+    # 和 string2ll 一样, 只接受没有前导零, 空格, 正号和下划线的十进制表示
+    if b'%d' % value != s or not (INT64_MIN <= value <= INT64_MAX):
+        return 0
 
     if 0 <= value <= 12:
         enc = ZIP_INT_IMM_MIN + value
@@ -199,6 +205,8 @@ def zipTryEncoding(entry: cstr, entrylen: int, v: intptr, encoding: intptr) -> i
         enc = ZIP_INT_8B
     elif INT16_MIN <= value <= INT16_MAX:
         enc = ZIP_INT_16B
+    elif INT24_MIN <= value <= INT24_MAX:
+        enc = ZIP_INT_24B
     elif INT32_MIN <= value <= INT32_MAX:
         enc = ZIP_INT_32B
     else:
@@ -262,14 +270,17 @@ def zipPrevLenByteDiff(p: cstrptr, length: int) -> int:
     return zipPrevEncodeLength(None, length) - prevlensize
 
 def ziplistResize(zl: ziplist, length: int) -> ziplist:
-    zl.extend(0 for _ in range(length - len(zl)))
-    zl.zlbytes = intrev32ifbe(length)
-    zl.zltail = ZIP_END
+    # 原地 realloc, 保证已有的 cstrptr 仍然指向同一个缓冲区
+    if length > len(zl):
+        zl.extend(bytes(length - len(zl)))
+    else:
+        del zl[length:]
+    zl[length-1] = ZIP_END
     return zl
 
 def __ziplistCascadeUpdate(zl: ziplist, p: cstrptr) -> ziplist:
-    curlen = zl.zlbytes
-    next_ = zlentry()
+    curlen = intrev32ifbe(zl.zlbytes)
+    p = p.new(p.pos)
 
     while p.buf[p.pos] != ZIP_END:
         cur = zipEntry(p)
@@ -287,10 +298,10 @@ def __ziplistCascadeUpdate(zl: ziplist, p: cstrptr) -> ziplist:
 
             np = p.new(p.pos+rawlen)
             noffset = np.pos
-            if zl.zltail != np.pos:
-                zl.zltail += extra
-            mv_len = curlen-noffset-next_.prevrawlensize-1
-            np.buf[np.pos+rawlensize:mv_len] = np.buf[np.pos+next_.prevrawlensize:mv_len]
+            if intrev32ifbe(zl.zltail) != noffset:
+                zl.zltail = intrev32ifbe(intrev32ifbe(zl.zltail) + extra)
+            memmove(zl, noffset+rawlensize, noffset+next_.prevrawlensize,
+                    curlen-noffset-next_.prevrawlensize-1)
             zipPrevEncodeLength(np, rawlen)
             p.pos += rawlen
             curlen += extra
@@ -303,46 +314,49 @@ def __ziplistCascadeUpdate(zl: ziplist, p: cstrptr) -> ziplist:
     return zl
 
 def __ziplistDelete(zl: ziplist, p: cstrptr, num: int) -> ziplist:
+    p = p.new(p.pos)
     deleted = 0
+    nextdiff = 0
     first = zipEntry(p)
-    for i in range(num):
+    while p.buf[p.pos] != ZIP_END and deleted < num:
         p.pos += zipRawEntryLength(p)
         deleted += 1
     totlen = p.pos - first.p.pos
     if totlen > 0:
         if p.buf[p.pos] != ZIP_END:
+            # 后一个节点的 prevlen 需要改为被删除的第一个节点的 prevlen
             nextdiff = zipPrevLenByteDiff(p, first.prevrawlen)
             p.pos -= nextdiff
             zipPrevEncodeLength(p, first.prevrawlen)
-            zl.zltail -= totlen
+            zl.zltail = intrev32ifbe(intrev32ifbe(zl.zltail) - totlen)
             tail = zipEntry(p)
             if p.buf[p.pos+tail.headersize+tail.len] != ZIP_END:
-                zl.zltail += nextdiff
-            mv_len = zl.zlbytes - p.pos - 1
-            first.p.buf[first.p.pos:first.p.pos+mv_len] = p.buf[p.pos:p.pos+mv_len]
+                zl.zltail = intrev32ifbe(intrev32ifbe(zl.zltail) + nextdiff)
+            memmove(zl, first.p.pos, p.pos, intrev32ifbe(zl.zlbytes) - p.pos - 1)
         else:
-            zl.zltail = first.p.pos - first.prevrawlen
-        zl = ziplistResize(zl, zl.zlbytes - totlen + nextdiff)
+            zl.zltail = intrev32ifbe(first.p.pos - first.prevrawlen)
+        zl = ziplistResize(zl, intrev32ifbe(zl.zlbytes) - totlen + nextdiff)
         ziplist_incr_length(zl, -deleted)
         if nextdiff != 0:
-            zl = __ziplistCascadeUpdate(zl, p)
+            zl = __ziplistCascadeUpdate(zl, first.p)
     return zl
 
 def zipSaveInteger(p: cstrptr, value: int, encoding: int) -> None:
     if encoding == ZIP_INT_8B:
-        p.buf[p.pos] = int2cstr(value, 'int8')
+        p.buf[p.pos:p.pos+1] = int2cstr(value, 'int8')
     elif encoding == ZIP_INT_16B:
-        p.buf[p.pos: p.pos+2] = int2cstr(value, 'int16')
+        p.buf[p.pos:p.pos+2] = int2cstr(value, 'int16')
         memrev16ifbe(p.buf, p.pos)
     elif encoding == ZIP_INT_24B:
-        tmp = bytearray(int2cstr((value << 8) & INT32_MAX, 'int32'))
+        # 保存 value << 8 的高 3 个字节
+        tmp = bytearray(int2cstr(value << 8, 'int32'))
         memrev32ifbe(tmp)
-        p.buf[p.pos: p.pos+3] = tmp
+        p.buf[p.pos:p.pos+3] = tmp[1:]
     elif encoding == ZIP_INT_32B:
-        p.buf[p.pos: p.pos+4] = int2cstr(value, 'int32')
+        p.buf[p.pos:p.pos+4] = int2cstr(value, 'int32')
         memrev32ifbe(p.buf, p.pos)
     elif encoding == ZIP_INT_64B:
-        p.buf[p.pos: p.pos+8] = int2cstr(value, 'int64')
+        p.buf[p.pos:p.pos+8] = int2cstr(value, 'int64')
         memrev64ifbe(p.buf, p.pos)
     elif ZIP_INT_IMM_MIN <= encoding <= ZIP_INT_IMM_MAX:
         pass
@@ -377,6 +391,7 @@ def zipLoadInteger(p: cstrptr, encoding: int) -> int:
     return ret
 
 def __ziplistInsert(zl: ziplist, p: cstrptr, s: cstr, slen: int) -> ziplist:
+    p = p.new(p.pos)
     curlen = intrev32ifbe(zl.zlbytes)
     reqlen = 0
     prevlen = 0
@@ -387,9 +402,9 @@ def __ziplistInsert(zl: ziplist, p: cstrptr, s: cstr, slen: int) -> ziplist:
         entry = zipEntry(p)
         prevlen = entry.prevrawlen
     else:
-        ptail = p.new(ziplist_entry_tail(zl))
-        if ptail.buf[p.pos] != ZIP_END:
-            prevlen = zipRawEntryLength(p)
+        ptail = ziplist_entry_tail(zl)
+        if ptail.buf[ptail.pos] != ZIP_END:
+            prevlen = zipRawEntryLength(ptail)
 
     if zipTryEncoding(s, slen, value_p, encoding_p):
         reqlen = zipIntSize(encoding_p.value)
@@ -401,10 +416,10 @@ def __ziplistInsert(zl: ziplist, p: cstrptr, s: cstr, slen: int) -> ziplist:
     nextdiff = (p.buf[p.pos] != ZIP_END) and zipPrevLenByteDiff(p, reqlen) or 0
     zl = ziplistResize(zl, curlen + reqlen + nextdiff)
     if p.buf[p.pos] != ZIP_END:
-        memmove(p.buf, p.pos + reqlen, p.pos - nextdiff, curlen - p.pos - 1 + nextdiff)
-        zipPrevEncodeLength(p.pos + reqlen, reqlen)
+        memmove(zl, p.pos + reqlen, p.pos - nextdiff, curlen - p.pos - 1 + nextdiff)
+        zipPrevEncodeLength(p.new(p.pos + reqlen), reqlen)
         zl.zltail = intrev32ifbe(intrev32ifbe(zl.zltail) + reqlen)
-        tail = zipEntry(p)
+        tail = zipEntry(p.new(p.pos + reqlen))
         if p.buf[p.pos + reqlen + tail.headersize + tail.len] != ZIP_END:
             zl.zltail = intrev32ifbe(intrev32ifbe(zl.zltail) + nextdiff)
     else:
@@ -426,10 +441,9 @@ def ziplistPush(zl: ziplist, s: cstr, slen: int, where: int):
     return __ziplistInsert(zl, p, s, slen)
 
 def ziplistIndex(zl: ziplist, index: int) -> Opt[cstrptr]:
-    p = cstrptr(zl)
     if index < 0:
         index = (-index) - 1
-        p = cstrptr(zl, zl.zltail)
+        p = ziplist_entry_tail(zl)
         if p.buf[p.pos] != ZIP_END:
             entry = zipEntry(p)
             while entry.prevrawlen > 0 and index:
@@ -451,7 +465,7 @@ def ziplistNext(zl: ziplist, p: cstrptr) -> Opt[cstrptr]:
     if p.buf[p.pos] == ZIP_END:
         return None
 
-    p.pos += zipRawEntryLength(p)
+    p = p.new(p.pos + zipRawEntryLength(p))
     if p.buf[p.pos] == ZIP_END:
         return None
     return p
@@ -468,6 +482,10 @@ def ziplistPrev(zl: ziplist, p: cstrptr) -> Opt[cstrptr]:
         return p.new(p.pos - entry.prevrawlen)
 
 def ziplistGet(p: Opt[cstrptr], sstr: cstrptr, slen: intptr, sval: intptr) -> int:
+    """
+    取出 p 指向的节点的值。字符串节点的值通过 sstr/slen 返回,
+    整数节点的值通过 sval 返回, 此时 sstr.buf 被置为 None (对应 C 中的 *sstr = NULL)。
+    """
     if p is None or p.buf[p.pos] == ZIP_END:
         return 0
     entry = zipEntry(p)
@@ -476,13 +494,25 @@ def ziplistGet(p: Opt[cstrptr], sstr: cstrptr, slen: intptr, sval: intptr) -> in
         sstr.buf = p.buf
         sstr.pos = p.pos + entry.headersize
     else:
+        sstr.buf = None   # type: ignore
         sval.value = zipLoadInteger(p.new(p.pos+entry.headersize), entry.encoding)
     return 1
 
+def ziplistGetValue(p: cstrptr) -> Union[bytes, int]:
+    """p 指向的节点的值, 字符串返回 bytes, 整数编码的节点返回 int"""
+    sstr = cstrptr(bytearray())
+    slen = intptr()
+    sval = intptr()
+    ziplistGet(p, sstr, slen, sval)
+    if sstr.buf is None:
+        return sval.value
+    return bytes(sstr.buf[sstr.pos:sstr.pos+slen.value])
+
 def ziplistInsert(zl: ziplist, p: cstrptr, s: cstr, slen: int) -> ziplist:
     return __ziplistInsert(zl, p, s, slen)
 
 def ziplistDelete(zl: ziplist, p: cstrptr) -> ziplist:
+    """删除 p 指向的节点, p 保持原来的偏移量, 即指向被删除节点的下一个节点"""
     return __ziplistDelete(zl, p, 1)
 
 def ziplistDeleteRange(zl: ziplist, index: int, num: int) -> ziplist:
@@ -492,51 +522,52 @@ def ziplistDeleteRange(zl: ziplist, index: int, num: int) -> ziplist:
     else:
         return __ziplistDelete(zl, p, num)
 
-def ziplistCompare(p: cstrptr, sstr: cstrptr, slen: int) -> int:
+def ziplistCompare(p: cstrptr, sstr: cstr, slen: int) -> int:
     if p.buf[p.pos] == ZIP_END:
         return 0
     entry = zipEntry(p)
     if ZIP_IS_STR(entry.encoding):
         if entry.len == slen:
             tmp_pos = p.pos+entry.headersize
-            return int(memcmp(p.buf[tmp_pos:tmp_pos+slen],
-                sstr.buf[sstr.pos:sstr.pos+slen], slen) == 0)
+            return int(p.buf[tmp_pos:tmp_pos+slen] == sstr[:slen])
         else:
             return 0
     else:
         sval = intptr()
         sencoding = intptr()
-        if zipTryEncoding(sstr.buf[sstr.pos:sstr.pos+slen], slen, sval, sencoding):
+        if zipTryEncoding(sstr, slen, sval, sencoding):
             zval = zipLoadInteger(p.new(p.pos+entry.headersize), entry.encoding)
-            return int(zval == sval)
+            return int(zval == sval.value)
     return 0
 
 def ziplistFind(p: cstrptr, vstr: cstr, vlen: int, skip: int) -> Opt[cstrptr]:
     skipcnt = 0
     vll = intptr()
-    vencoding = intptr()
-    while p.buf[p.pos] != ZIP_END:
-        prevlensize = zip_decode_prevlensize(p)
-        encoding, lensize, length = zip_decode_length(p.new(p.pos+prevlensize))
-        q = p.new(p.pos + prevlensize + lensize)
+    vencoding = intptr(0)
+    buf = p.buf
+    pos = p.pos
+    while buf[pos] != ZIP_END:
+        prevlensize = 1 if buf[pos] < ZIP_BIGLEN else 5
+        encoding, lensize, length = zip_decode_length(p.new(pos+prevlensize))
+        q = pos + prevlensize + lensize
         if skipcnt == 0:
             if ZIP_IS_STR(encoding):
-                if length == vlen and (
-                    memcmp(q.buf[q.pos:q.pos+vlen], vstr[:vlen], vlen) == 0):
-                    return p
+                if length == vlen and buf[q:q+vlen] == vstr[:vlen]:
+                    return p.new(pos)
             else:
-                if encoding == 0:
+                # 只在第一次遇到整数节点时尝试把 vstr 编码成整数
+                if vencoding.value == 0:
                     if not zipTryEncoding(vstr, vlen, vll, vencoding):
                         vencoding.value = UCHAR_MAX
                     assert vencoding.value
                 if vencoding.value != UCHAR_MAX:
-                    ll = zipLoadInteger(q, encoding)
+                    ll = zipLoadInteger(p.new(q), encoding)
                     if ll == vll.value:
-                        return p
+                        return p.new(pos)
             skipcnt = skip
         else:
             skipcnt -= 1
-        p.pos = q.pos + length
+        pos = q + length
     return None
 
 def ziplistLen(zl: ziplist) -> int:
@@ -553,4 +584,4 @@ def ziplistLen(zl: ziplist) -> int:
     return length
 
 def ziplistBlobLen(zl: ziplist) -> int:
-    return zl.zlbytes
+    return intrev32ifbe(zl.zlbytes)
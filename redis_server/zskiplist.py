@@ -1,10 +1,11 @@
 # -*- coding:utf-8 -*-
 
 from math import isnan
-from typing import Any, Union, Callable, Optional as Opt, List
-from .robject import decrRefCount, robj, compareStringObjects, equalStringObjects
+from typing import Any, Union, Callable, Optional as Opt, List, Tuple
+from .robject import decrRefCount, robj, compareStringObjects, equalStringObjects, createStringObject, sdsEncodedObject
 from .csix import *
 from .rdict import rDict, dictDelete
+from .util import get_shared, string2ld
 
 ZSKIPLIST_MAXLEVEL = 32
 ZSKIPLIST_P = 0.25
@@ -28,6 +29,12 @@ class zskiplist:
         self.length: int = 0
         self.level: int = 0
 
+class zset:
+    """REDIS_ENCODING_SKIPLIST 编码的有序集合: 字典按成员查分值, 跳跃表按分值排序"""
+    def __init__(self):
+        self.dict: rDict = None
+        self.zsl: zskiplist = None
+
 class zrangespec:
     def __init__(self):
         self.min: float = 0
@@ -35,6 +42,14 @@ class zrangespec:
         self.minex: int = 0
         self.maxex: int = 0
 
+class zlexrangespec:
+    # min / max 可以是 shared.minstring / shared.maxstring, 表示 "-" 和 "+"
+    def __init__(self):
+        self.min: robj = None
+        self.max: robj = None
+        self.minex: int = 0
+        self.maxex: int = 0
+
 
 def zslCreate() -> zskiplist:
     zsl = zskiplist()
@@ -117,6 +132,36 @@ def zslInsert(zsl: zskiplist, score: float, obj: robj) -> zskiplistNode:
     return x
 
 
+def zslCreateFromSorted(items: List[Tuple[float, robj]]) -> zskiplist:
+    """
+    由按 (分值, 成员) 升序排列的元素直接构建跳跃表, 用于保存 ZUNIONSTORE 等命令的结果。
+    新节点总是追加在末尾, 不需要像 zslInsert 一样从头查找: 每层只需要记录最后一个节点和它的排名。
+    """
+    zsl = zslCreate()
+    last: List[zskiplistNode] = [zsl.header] * ZSKIPLIST_MAXLEVEL
+    lastrank = [0] * ZSKIPLIST_MAXLEVEL
+    prev: Opt[zskiplistNode] = None
+    for rank, (score, obj) in enumerate(items, 1):
+        assert not isnan(score)
+        level = zslRandomLevel()
+        x = zslCreateNode(level, score, obj)
+        for i in range(level):
+            last[i].level[i].forward = x
+            last[i].level[i].span = rank - lastrank[i]
+            last[i] = x
+            lastrank[i] = rank
+        x.backward = prev
+        prev = x
+        if level > zsl.level:
+            zsl.level = level
+    # 每层最后一个节点的跨度是它之后的节点数, 和逐个 zslInsert 的结果相同
+    for i in range(zsl.level):
+        last[i].level[i].span = len(items) - lastrank[i]
+    zsl.tail = prev   # type: ignore
+    zsl.length = len(items)
+    return zsl
+
+
 def zslDeleteNode(zsl: zskiplist, x: zskiplistNode, update: List[Opt[zskiplistNode]]) -> None:
     for i in range(zsl.level):
         if update[i].level[i].forward == x:  # type: ignore
@@ -157,11 +202,38 @@ def zslDelete(zsl: zskiplist, score: float, obj: robj) -> int:
     return 0
 
 
+def zslUpdateScore(zsl: zskiplist, curscore: float, obj: robj, newscore: float) -> zskiplistNode:
+    """
+    修改节点的分值, 返回修改后的节点
+    新的分值不改变节点的位置时 (ZINCRBY 很常见的情况) 直接修改, 否则删除之后重新插入, 节点的 obj 不释放
+    """
+    update: List[Opt[zskiplistNode]] = [None for _ in range(ZSKIPLIST_MAXLEVEL)]
+    x = zsl.header
+    for i in range(zsl.level-1, -1, -1):
+        while x.level[i].forward and _node_lt(x.level[i].forward, curscore, obj):
+            x = x.level[i].forward
+        update[i] = x
+
+    x = x.level[0].forward
+    assert x and curscore == x.score and equalStringObjects(x.obj, obj)
+    if ((x.backward is None or x.backward.score < newscore) and
+            (x.level[0].forward is None or x.level[0].forward.score > newscore)):
+        x.score = newscore
+        return x
+
+    zslDeleteNode(zsl, x, update)
+    return zslInsert(zsl, newscore, x.obj)
+
+
 def zslGetRank(zsl: zskiplist, score: float, obj: robj) -> int:
     rank = 0
     x = zsl.header
     for i in range(zsl.level-1, -1, -1):
-        while x.level[i].forward and _node_lt(x.level[i].forward, score, obj):
+        # 和插入时不同, 这里要停在等于 (score, obj) 的节点上
+        while x.level[i].forward and (
+                x.level[i].forward.score < score or (
+                    x.level[i].forward.score == score and
+                    compareStringObjects(x.level[i].forward.obj, obj) <= 0)):
             rank += x.level[i].span
             x = x.level[i].forward
         if x.obj and equalStringObjects(x.obj, obj):
@@ -188,10 +260,10 @@ def zslRandomLevel() -> int:
     return level if level < ZSKIPLIST_MAXLEVEL else ZSKIPLIST_MAXLEVEL
 
 def zslValueGteMin(value: float, spec: zrangespec) -> int:
-    return spec.minex and (value > spec.min) or (value >= spec.min)
+    return (value > spec.min) if spec.minex else (value >= spec.min)
 
 def zslValueLteMax(value: float, spec: zrangespec) -> int:
-    return spec.maxex and (value > spec.max) or (value >= spec.max)
+    return (value < spec.max) if spec.maxex else (value <= spec.max)
 
 def zslIsInRange(zsl: zskiplist, zrange: zrangespec) -> int:
     if zrange.min > zrange.max or (
@@ -238,7 +310,7 @@ def zslLastInRange(zsl: zskiplist, zrange: zrangespec) -> Opt[zskiplistNode]:
 
 def zslDeleteRangeByScore(zsl: zskiplist, zrange: zrangespec, d: rDict) -> int:
     def cond(n: zskiplistNode, r: zrangespec):
-        return n and (r.minex and (n.score <= r.min) or (n.score < r.min))
+        return n and ((n.score <= r.min) if r.minex else (n.score < r.min))
 
     removed = 0
     update: List[Opt[zskiplistNode]] = [None for _ in range(ZSKIPLIST_MAXLEVEL)]
@@ -250,10 +322,11 @@ def zslDeleteRangeByScore(zsl: zskiplist, zrange: zrangespec, d: rDict) -> int:
         update[i] = x
 
     x = x.level[0].forward
-    while x and (zrange.maxex and x.score < zrange.max or x.score <= zrange.max):
+    while x and zslValueLteMax(x.score, zrange):
         tmp = x.level[0].forward
         zslDeleteNode(zsl, x, update)
         dictDelete(d, x.obj)
+        zslFreeNode(x)
         removed += 1
         x = tmp
     return removed
@@ -281,3 +354,133 @@ def zslDeleteRangeByRank(zsl: zskiplist, start: int, end: int, d: rDict) -> int:
         traversed += 1
         x = tmp
     return removed
+
+def zslParseRangeItem(o: robj) -> Tuple[int, float, int]:
+    """解析分值范围的一端, "(" 开头表示不包含, 返回 (ok, value, exclusive)"""
+    buf = o.ptr.buf[:o.ptr.len] if sdsEncodedObject(o) else b'%d' % o.ptr
+    if buf[:1] == b'(':
+        ok, value = string2ld(buf[1:], len(buf) - 1)
+        return ok, value, 1
+    ok, value = string2ld(buf, len(buf))
+    return ok, value, 0
+
+def zslParseRange(min_: robj, max_: robj) -> Opt[zrangespec]:
+    """解析 ZRANGEBYSCORE 等命令的 min / max 参数, 格式错误时返回 None"""
+    spec = zrangespec()
+    ok, spec.min, spec.minex = zslParseRangeItem(min_)
+    if not ok:
+        return None
+    ok, spec.max, spec.maxex = zslParseRangeItem(max_)
+    if not ok:
+        return None
+    return spec
+
+def zslParseLexRangeItem(o: robj) -> Tuple[int, Opt[robj], int]:
+    """
+    解析字典序范围的一端: "+" 和 "-" 表示正负无穷, "(" 开头表示不包含, "[" 开头表示包含
+    返回 (ok, obj, exclusive)
+    """
+    shared = get_shared()
+    buf = bytes(o.ptr.buf[:o.ptr.len]) if sdsEncodedObject(o) else b'%d' % o.ptr
+    if buf == b'+':
+        return 1, shared.maxstring, 0
+    elif buf == b'-':
+        return 1, shared.minstring, 0
+    elif buf[:1] == b'(':
+        return 1, createStringObject(buf[1:], len(buf) - 1), 1
+    elif buf[:1] == b'[':
+        return 1, createStringObject(buf[1:], len(buf) - 1), 0
+    return 0, None, 0
+
+def zslParseLexRange(min_: robj, max_: robj) -> Opt[zlexrangespec]:
+    spec = zlexrangespec()
+    ok, spec.min, spec.minex = zslParseLexRangeItem(min_)   # type: ignore
+    if not ok:
+        return None
+    ok, spec.max, spec.maxex = zslParseLexRangeItem(max_)   # type: ignore
+    if not ok:
+        return None
+    return spec
+
+def compareStringObjectsForLexRange(a: robj, b: robj) -> int:
+    """和 compareStringObjects 一样, 另外 shared.minstring 小于所有字符串, shared.maxstring 大于所有字符串"""
+    shared = get_shared()
+    if a is b:
+        return 0
+    if a is shared.minstring or b is shared.maxstring:
+        return -1
+    if a is shared.maxstring or b is shared.minstring:
+        return 1
+    return compareStringObjects(a, b)
+
+def zslLexValueGteMin(value: robj, spec: zlexrangespec) -> int:
+    if spec.minex:
+        return compareStringObjectsForLexRange(value, spec.min) > 0
+    return compareStringObjectsForLexRange(value, spec.min) >= 0
+
+def zslLexValueLteMax(value: robj, spec: zlexrangespec) -> int:
+    if spec.maxex:
+        return compareStringObjectsForLexRange(value, spec.max) < 0
+    return compareStringObjectsForLexRange(value, spec.max) <= 0
+
+def zslIsInLexRange(zsl: zskiplist, zrange: zlexrangespec) -> int:
+    cmp = compareStringObjectsForLexRange(zrange.min, zrange.max)
+    if cmp > 0 or (cmp == 0 and (zrange.minex or zrange.maxex)):
+        return 0
+    x = zsl.tail
+    if x is None or not zslLexValueGteMin(x.obj, zrange):
+        return 0
+    x = zsl.header.level[0].forward
+    if x is None or not zslLexValueLteMax(x.obj, zrange):
+        return 0
+    return 1
+
+def zslFirstInLexRange(zsl: zskiplist, zrange: zlexrangespec) -> Opt[zskiplistNode]:
+    if not zslIsInLexRange(zsl, zrange):
+        return None
+    x = zsl.header
+    for i in range(zsl.level-1, -1, -1):
+        while (x.level[i].forward and
+            not zslLexValueGteMin(x.level[i].forward.obj, zrange)):
+            x = x.level[i].forward
+    x = x.level[0].forward
+    assert x != None
+
+    if not zslLexValueLteMax(x.obj, zrange):
+        return None
+    return x
+
+def zslLastInLexRange(zsl: zskiplist, zrange: zlexrangespec) -> Opt[zskiplistNode]:
+    if not zslIsInLexRange(zsl, zrange):
+        return None
+    x = zsl.header
+    for i in range(zsl.level-1, -1, -1):
+        while (x.level[i].forward and
+            zslLexValueLteMax(x.level[i].forward.obj, zrange)):
+            x = x.level[i].forward
+
+    assert x != None
+    if not zslLexValueGteMin(x.obj, zrange):
+        return None
+    return x
+
+def zslDeleteRangeByLex(zsl: zskiplist, zrange: zlexrangespec, d: rDict) -> int:
+    removed = 0
+    update: List[Opt[zskiplistNode]] = [None for _ in range(ZSKIPLIST_MAXLEVEL)]
+
+    x = zsl.header
+    for i in range(zsl.level-1, -1, -1):
+        while (x.level[i].forward and
+            not zslLexValueGteMin(x.level[i].forward.obj, zrange)):
+            x = x.level[i].forward
+        update[i] = x
+
+    x = x.level[0].forward
+    while x and zslLexValueLteMax(x.obj, zrange):
+        tmp = x.level[0].forward
+        zslDeleteNode(zsl, x, update)
+        dictDelete(d, x.obj)
+        zslFreeNode(x)
+        removed += 1
+        x = tmp
+    return removed
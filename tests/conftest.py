@@ -0,0 +1,102 @@
+import socket
+from typing import List, Union
+
+import pytest
+
+from redis_server.ae import AE_READABLE, AE_WRITABLE
+from redis_server.networking import readQueryFromClient, sendReplyToClient
+from redis_server.rdict import dictCreate
+from redis_server.db import dbDictType, keyptrDictType
+from redis_server.util import SocketCache, optionalImport
+
+
+def tcp_pair():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    peer = socket.create_connection(listener.getsockname())
+    sock, _ = listener.accept()
+    listener.close()
+    return sock, peer
+
+
+class FakeClient:
+    """通过一对 TCP 连接和服务器交互的客户端, 请求和回复都走完整的协议处理流程"""
+
+    def __init__(self, server, c, peer: socket.socket) -> None:
+        self.server = server
+        self.c = c
+        self.peer = peer
+
+    def send(self, raw: bytes) -> bytes:
+        self.peer.sendall(raw)
+        fd = self.c.fd.fileno()
+        readQueryFromClient(self.server.el, fd, self.c, AE_READABLE)
+        self.peer.setblocking(False)
+        chunks: List[bytes] = []
+        # 一次写事件最多写出 REDIS_MAX_WRITE_PER_EVENT 字节, 较大的回复需要多次写事件
+        while True:
+            writable = self.server.el.events[fd].mask & AE_WRITABLE
+            if writable:
+                sendReplyToClient(self.server.el, fd, self.c, AE_WRITABLE)
+            while True:
+                try:
+                    chunk = self.peer.recv(1 << 20)
+                except BlockingIOError:
+                    break
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            if not writable or self.c.fd is None:
+                break
+        self.peer.setblocking(True)
+        return b''.join(chunks)
+
+    def call(self, *args: Union[str, bytes, int, float]) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for a in args:
+            if not isinstance(a, bytes):
+                a = str(a).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(a), a))
+        return self.send(b''.join(parts))
+
+
+@pytest.fixture(scope='session')
+def server():
+    from redis_server.redis import RedisServer, initServerConfig, initServer
+    server = RedisServer()
+    initServerConfig(server)
+    server.port = 0
+    server.bindaddr = ['127.0.0.1']
+    initServer(server)
+    return server
+
+
+@pytest.fixture
+def client(server):
+    from redis_server.redis import createClient, freeClient
+    for db in server.db:
+        db.dict = dictCreate(dbDictType, None)
+        db.expires = dictCreate(keyptrDictType, None)
+    a, b = tcp_pair()
+    SocketCache.set(a)
+    c = createClient(server, a)
+    yield FakeClient(server, c, b)
+    if c in server.clients:
+        freeClient(c)
+    b.close()
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def implementation(request, monkeypatch):
+    """
+    测试分别使用 numpy 和纯 Python 的实现运行, 没有安装 numpy 时跳过 numpy 的一组
+    需要调低 numpy 阈值的测试模块覆盖这个 fixture, 在 numpy 的一组里修改自己模块的阈值
+    """
+    import redis_server.util
+    if request.param == 'numpy':
+        if optionalImport('numpy') is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setitem(redis_server.util._optional_modules, 'numpy', None)
+    return request.param
@@ -0,0 +1,60 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from redis_server.benchmark import encodeCommand, skipReply, percentile, parseMix, runBenchmark
+
+
+def test_encodeCommand():
+    assert encodeCommand([b'SET', b'k', b'']) == b'*3\r\n$3\r\nSET\r\n$1\r\nk\r\n$0\r\n\r\n'
+
+
+def test_skipReply():
+    buf = bytearray(b'+OK\r\n$3\r\nfoo\r\n$-1\r\n*2\r\n:1\r\n*1\r\n$1\r\na\r\n-ERR x\r\n')
+    ends = []
+    pos = 0
+    while pos < len(buf):
+        pos = skipReply(buf, pos)
+        ends.append(pos)
+    assert ends == [5, 14, 19, 38, len(buf)]
+    assert skipReply(bytearray(b'$3\r\nfo'), 0) == -1
+    assert skipReply(bytearray(b'*2\r\n:1\r\n'), 0) == -1
+    assert skipReply(bytearray(b'+O'), 0) == -1
+
+
+def test_percentile_and_mix():
+    values = [float(i) for i in range(100)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99.9) == 99.0
+    assert percentile([], 50) == 0.0
+    assert parseMix('get=3,SET') == [('get', 3), ('set', 1)]
+    with pytest.raises(ValueError):
+        parseMix('nosuchcommand=1')
+
+
+def test_benchmark_against_server():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    proc = subprocess.Popen([sys.executable, '-m', 'redis_server', '--port', str(port), '--bind', '127.0.0.1'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        report = runBenchmark(['-p', str(port), '-c', '4', '-P', '4', '-t', '0.5', '--mix', 'get=1,set=1'])
+    finally:
+        proc.terminate()
+        proc.wait()
+    assert report['requests'] > 0
+    assert report['requests'] % 4 == 0
+    assert report['errors'] == 0
+    assert report['commands']['get'] + report['commands']['set'] == report['requests']
+    assert 0 < report['latency_ms']['p50'] <= report['latency_ms']['p99'] <= report['latency_ms']['max']
@@ -0,0 +1,224 @@
+import time
+
+import pytest
+
+from redis_server.rdict import dictFind
+from redis_server.sds import sdsnew
+
+
+# 每个测试分别使用 numpy 和纯 Python 的实现运行
+pytestmark = pytest.mark.usefixtures('implementation')
+
+
+def test_setbit_getbit(client):
+    assert client.call('SETBIT', 'b', '7', '1') == b':0\r\n'
+    assert client.call('SETBIT', 'b', '7', '1') == b':1\r\n'
+    assert client.call('GET', 'b') == b'$1\r\n\x01\r\n'
+    assert client.call('SETBIT', 'b', '100', '1') == b':0\r\n'
+    assert client.call('STRLEN', 'b') == b':13\r\n'
+    assert client.call('GETBIT', 'b', '100') == b':1\r\n'
+    assert client.call('GETBIT', 'b', '101') == b':0\r\n'
+    assert client.call('GETBIT', 'b', '100000') == b':0\r\n'
+    assert client.call('GETBIT', 'missing', '0') == b':0\r\n'
+    assert client.call('SETBIT', 'b', '7', '0') == b':1\r\n'
+    assert client.call('GETBIT', 'b', '7') == b':0\r\n'
+
+
+def test_setbit_errors(client):
+    assert client.call('SETBIT', 'b', '-1', '1') == b'-ERR bit offset is not an integer or out of range\r\n'
+    assert client.call('SETBIT', 'b', '4294967296', '1') == (
+        b'-ERR bit offset is not an integer or out of range\r\n')
+    assert client.call('SETBIT', 'b', '0', '2') == b'-ERR bit is not an integer or out of range\r\n'
+
+
+def test_setbit_unshares_value(client):
+    from redis_server.util import get_shared
+    client.call('SET', 'n', '1')
+    # '1' 是 0x31, 第 7 位置 0 之后为 '0'
+    assert client.call('SETBIT', 'n', '7', '0') == b':1\r\n'
+    assert client.call('GET', 'n') == b'$1\r\n0\r\n'
+    assert get_shared().integers[1].ptr == 1
+
+
+def test_getbit_int_encoded(client):
+    client.call('SET', 'n', '1')
+    assert client.call('GETBIT', 'n', '2') == b':1\r\n'
+    assert client.call('GETBIT', 'n', '1') == b':0\r\n'
+
+
+def test_bitcount(client):
+    client.call('SET', 'k', 'foobar')
+    assert client.call('BITCOUNT', 'k') == b':26\r\n'
+    assert client.call('BITCOUNT', 'k', '0', '0') == b':4\r\n'
+    assert client.call('BITCOUNT', 'k', '1', '1') == b':6\r\n'
+    assert client.call('BITCOUNT', 'k', '-2', '-1') == b':7\r\n'
+    assert client.call('BITCOUNT', 'k', '3', '1') == b':0\r\n'
+    assert client.call('BITCOUNT', 'missing') == b':0\r\n'
+    assert client.call('BITCOUNT', 'k', '1') == b'-ERR syntax error\r\n'
+
+
+def test_bitpos(client):
+    client.call('SET', 'k', b'\xff\xf0\x00')
+    assert client.call('BITPOS', 'k', '0') == b':12\r\n'
+    client.call('SET', 'k', b'\x00\xff\xf0')
+    assert client.call('BITPOS', 'k', '1', '0') == b':8\r\n'
+    assert client.call('BITPOS', 'k', '1', '2') == b':16\r\n'
+    assert client.call('BITPOS', 'k', '1', '2', '-1') == b':16\r\n'
+    client.call('SET', 'k', b'\xff\xff\xff')
+    # 没有指定结束位置时, 值的右边看作 0
+    assert client.call('BITPOS', 'k', '0') == b':24\r\n'
+    assert client.call('BITPOS', 'k', '0', '0', '-1') == b':-1\r\n'
+    client.call('SET', 'k', b'\x00\x00')
+    assert client.call('BITPOS', 'k', '1') == b':-1\r\n'
+    assert client.call('BITPOS', 'missing', '1') == b':-1\r\n'
+    assert client.call('BITPOS', 'missing', '0') == b':0\r\n'
+    assert client.call('BITPOS', 'k', '2') == b'-ERR The bit argument must be 1 or 0.\r\n'
+
+
+def test_bitpos_across_chunks(client, monkeypatch):
+    import redis_server.commands.bitops as bitops
+    monkeypatch.setattr(bitops, 'BITOPS_CHUNK_BYTES', 4)
+    monkeypatch.setattr(bitops, 'BITOPS_INT_CHUNK_BYTES', 4)
+    client.call('SETBIT', 'b', '83', '1')
+    assert client.call('BITPOS', 'b', '1') == b':83\r\n'
+    assert client.call('BITCOUNT', 'b') == b':1\r\n'
+    client.call('SET', 'k', b'\xff' * 9 + b'\xfe')
+    assert client.call('BITPOS', 'k', '0') == b':79\r\n'
+
+
+def test_bitop(client, server):
+    client.call('SET', 'a', b'\x0f\xf0')
+    client.call('SET', 'b', b'\xff')
+    assert client.call('BITOP', 'AND', 'dest', 'a', 'b') == b':2\r\n'
+    assert client.call('GET', 'dest') == b'$2\r\n\x0f\x00\r\n'
+    assert client.call('BITOP', 'OR', 'dest', 'a', 'b') == b':2\r\n'
+    assert client.call('GET', 'dest') == b'$2\r\n\xff\xf0\r\n'
+    assert client.call('BITOP', 'XOR', 'dest', 'a', 'b', 'missing') == b':2\r\n'
+    assert client.call('GET', 'dest') == b'$2\r\n\xf0\xf0\r\n'
+    assert client.call('BITOP', 'NOT', 'dest', 'a') == b':2\r\n'
+    assert client.call('GET', 'dest') == b'$2\r\n\xf0\x0f\r\n'
+    o = dictFind(server.db[0].dict, sdsnew('dest')).v.val
+    assert o.ptr.buf == bytearray(b'\xf0\x0f\x00')
+    # 所有的源键都不存在时删除目标键
+    assert client.call('BITOP', 'AND', 'dest', 'missing') == b':0\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('dest')) is None
+
+
+def test_bitop_chunks(client, monkeypatch):
+    import redis_server.commands.bitops as bitops
+    monkeypatch.setattr(bitops, 'BITOPS_INT_CHUNK_BYTES', 3)
+    client.call('SET', 'a', b'\x01\x02\x03\x04\x05\x06\x07')
+    client.call('SET', 'b', b'\xff\xff\xff\xff')
+    client.call('BITOP', 'AND', 'dest', 'a', 'b')
+    assert client.call('GET', 'dest') == b'$7\r\n\x01\x02\x03\x04\x00\x00\x00\r\n'
+    client.call('BITOP', 'XOR', 'dest', 'a', 'b')
+    assert client.call('GET', 'dest') == b'$7\r\n\xfe\xfd\xfc\xfb\x05\x06\x07\r\n'
+    client.call('BITOP', 'NOT', 'dest', 'a')
+    assert client.call('GET', 'dest') == b'$7\r\n\xfe\xfd\xfc\xfb\xfa\xf9\xf8\r\n'
+
+
+def test_bitop_source_can_be_modified(client):
+    # BITOP 之后不再持有源键 buf 的引用, 源键可以继续原地增长
+    client.call('SET', 'a', 'x' * 100)
+    client.call('APPEND', 'a', 'y')
+    client.call('BITOP', 'OR', 'dest', 'a')
+    client.call('APPEND', 'a', 'z' * 1000)
+    client.call('SETBIT', 'a', '100000', '1')
+    assert client.call('STRLEN', 'a') == b':12501\r\n'
+
+
+def test_bitop_errors(client):
+    assert client.call('BITOP', 'NOT', 'dest', 'a', 'b') == (
+        b'-ERR BITOP NOT must be called with a single source key.\r\n')
+    assert client.call('BITOP', 'NAND', 'dest', 'a') == b'-ERR syntax error\r\n'
+
+
+def test_bitop_large(client, server):
+    size = 8 * 1024 * 1024
+    client.call('SETBIT', 'a', str(size * 8 - 1), '1')
+    client.call('SETBIT', 'b', str(size * 8 - 1), '1')
+    client.call('SETBIT', 'b', '0', '1')
+    start = time.perf_counter()
+    assert client.call('BITOP', 'OR', 'dest', 'a', 'b') == b':%d\r\n' % size
+    assert client.call('BITCOUNT', 'dest') == b':2\r\n'
+    assert client.call('BITPOS', 'dest', '1', '1') == b':%d\r\n' % (size * 8 - 1)
+    assert time.perf_counter() - start < 2
+
+
+def test_bitfield_get_set(client):
+    assert client.call('BITFIELD', 'b', 'SET', 'u8', '0', '255', 'GET', 'u8', '0', 'GET', 'i8', '0') == (
+        b'*3\r\n:0\r\n:255\r\n:-1\r\n')
+    assert client.call('GET', 'b') == b'$1\r\n\xff\r\n'
+    # #N 表示第 N 个字段
+    assert client.call('BITFIELD', 'b', 'SET', 'u4', '#1', '3', 'GET', 'u4', '4', 'GET', 'u16', '0') == (
+        b'*3\r\n:15\r\n:3\r\n:62208\r\n')
+    assert client.call('BITFIELD', 'b', 'SET', 'i5', '100', '-3', 'GET', 'i5', '100') == b'*2\r\n:0\r\n:-3\r\n'
+    assert client.call('STRLEN', 'b') == b':14\r\n'
+    assert client.call('BITFIELD', 'missing', 'GET', 'u8', '0') == b'*1\r\n:0\r\n'
+    assert client.call('BITFIELD', 'b') == b'*0\r\n'
+
+
+def test_bitfield_incrby_overflow(client):
+    assert client.call('BITFIELD', 'b', 'INCRBY', 'u2', '100', '1', 'OVERFLOW', 'SAT', 'INCRBY', 'u2', '102', '1') == (
+        b'*2\r\n:1\r\n:1\r\n')
+    replies = [client.call('BITFIELD', 'b', 'INCRBY', 'u2', '100', '1', 'OVERFLOW', 'SAT', 'INCRBY', 'u2', '102', '1')
+               for _ in range(3)]
+    assert replies == [b'*2\r\n:2\r\n:2\r\n', b'*2\r\n:3\r\n:3\r\n', b'*2\r\n:0\r\n:3\r\n']
+    assert client.call('BITFIELD', 'b', 'OVERFLOW', 'FAIL', 'INCRBY', 'u2', '102', '1') == b'*1\r\n$-1\r\n'
+    assert client.call('BITFIELD', 'b', 'INCRBY', 'i8', '0', '-200', 'OVERFLOW', 'SAT', 'INCRBY', 'i8', '8', '-200') == (
+        b'*2\r\n:56\r\n:-128\r\n')
+    assert client.call('BITFIELD', 'b', 'SET', 'i8', '0', '200') == b'*1\r\n:56\r\n'
+    assert client.call('BITFIELD', 'b', 'GET', 'i8', '0') == b'*1\r\n:-56\r\n'
+    # 无符号字段的 SET 按 uint64 解释负数
+    assert client.call('BITFIELD', 'b', 'OVERFLOW', 'SAT', 'SET', 'u8', '16', '-1', 'GET', 'u8', '16') == (
+        b'*2\r\n:0\r\n:255\r\n')
+    assert client.call('BITFIELD', 'e', 'SET', 'i64', '0', '9223372036854775807',
+                       'INCRBY', 'i64', '0', '1') == b'*2\r\n:0\r\n:-9223372036854775808\r\n'
+
+
+def test_bitfield_errors(client):
+    assert client.call('BITFIELD', 'b', 'GET', 'u64', '0').startswith(b'-ERR Invalid bitfield type')
+    assert client.call('BITFIELD', 'b', 'GET', 'i65', '0').startswith(b'-ERR Invalid bitfield type')
+    assert client.call('BITFIELD', 'b', 'GET', 'x8', '0').startswith(b'-ERR Invalid bitfield type')
+    assert client.call('BITFIELD', 'b', 'GET', 'u8', '-1') == (
+        b'-ERR bit offset is not an integer or out of range\r\n')
+    assert client.call('BITFIELD', 'b', 'OVERFLOW', 'NONE') == b'-ERR Invalid OVERFLOW type specified\r\n'
+    assert client.call('BITFIELD', 'b', 'SET', 'u8', '0') == b'-ERR syntax error\r\n'
+    # 出错时不执行任何子命令
+    assert client.call('BITFIELD', 'b', 'SET', 'u8', '0', '1', 'GET', 'u99', '0').startswith(b'-ERR')
+    assert client.call('BITFIELD', 'b', 'GET', 'u8', '0') == b'*1\r\n:0\r\n'
+    assert client.call('BITFIELD_RO', 'b', 'SET', 'u8', '0', '1') == (
+        b'-ERR BITFIELD_RO only supports the GET subcommand\r\n')
+    assert client.call('BITFIELD_RO', 'b', 'GET', 'u8', '0') == b'*1\r\n:0\r\n'
+
+
+def test_bitfield_contiguous_fields(client):
+    # 连续的同类型字段在 numpy 可用时一次处理, 结果必须和逐个处理相同
+    n = 20
+    args = []
+    for i in range(n):
+        args += ['SET', 'u16', '#%d' % i, str(i * 1000)]
+    assert client.call('BITFIELD', 'c', *args) == b'*%d\r\n' % n + b':0\r\n' * n
+    args = []
+    for i in range(n):
+        args += ['INCRBY', 'u16', '#%d' % i, '60000']
+    assert client.call('BITFIELD', 'c', *args) == b'*%d\r\n' % n + b''.join(
+        b':%d\r\n' % ((i * 1000 + 60000) % 65536) for i in range(n))
+    args = []
+    for i in range(n):
+        args += ['GET', 'i16', '#%d' % i]
+    expected = []
+    for i in range(n):
+        v = (i * 1000 + 60000) % 65536
+        expected.append(b':%d\r\n' % (v - 65536 if v >= 32768 else v))
+    assert client.call('BITFIELD_RO', 'c', *args) == b'*%d\r\n' % n + b''.join(expected)
+    # 读超出字符串结尾的字段
+    args = []
+    for i in range(n + 5):
+        args += ['GET', 'u16', '#%d' % i]
+    assert client.call('BITFIELD', 'c', *args).endswith(b':0\r\n' * 5)
+    args = []
+    for i in range(n):
+        args += ['SET', 'i64', '#%d' % i, '-1']
+    assert client.call('BITFIELD', 'd', *args) == b'*%d\r\n' % n + b':0\r\n' * n
+    assert client.call('BITFIELD', 'd', 'GET', 'u8', '0', *args[:40]) == b'*11\r\n:255\r\n' + b':-1\r\n' * 10
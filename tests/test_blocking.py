@@ -0,0 +1,193 @@
+import time
+
+import pytest
+
+from .conftest import FakeClient, tcp_pair
+from redis_server.ae import AE_WRITABLE
+from redis_server.networking import sendReplyToClient
+from redis_server.util import SocketCache
+
+
+@pytest.fixture
+def connect(server, client):
+    from redis_server.redis import createClient, freeClient
+    created = []
+
+    def connect() -> FakeClient:
+        a, b = tcp_pair()
+        SocketCache.set(a)
+        c = createClient(server, a)
+        created.append((c, b))
+        return FakeClient(server, c, b)
+
+    yield connect
+    for c, b in created:
+        if c in server.clients:
+            freeClient(c)
+        b.close()
+
+
+def pending(fc: FakeClient) -> bytes:
+    """读出客户端在没有发送命令时收到的回复"""
+    fd = fc.c.fd.fileno()
+    if fc.server.el.events[fd].mask & AE_WRITABLE:
+        sendReplyToClient(fc.server.el, fd, fc.c, AE_WRITABLE)
+    fc.peer.setblocking(False)
+    try:
+        return fc.peer.recv(1 << 20)
+    except BlockingIOError:
+        return b''
+    finally:
+        fc.peer.setblocking(True)
+
+
+def test_blpop_with_data_does_not_block(client, monkeypatch):
+    import redis_server.redis
+    propagated = []
+    monkeypatch.setattr(redis_server.redis, 'propagate',
+                        lambda cmd, dbid, argv, flags: propagated.append([bytes(o.ptr.buf[:o.ptr.len]) for o in argv]))
+    client.call('RPUSH', 'b', 'x', 'y')
+    assert client.call('BLPOP', 'a', 'b', '0') == b'*2\r\n$1\r\nb\r\n$1\r\nx\r\n'
+    assert client.call('BRPOP', 'a', 'b', '0') == b'*2\r\n$1\r\nb\r\n$1\r\ny\r\n'
+    assert client.call('LLEN', 'b') == b':0\r\n'
+    assert propagated == [[b'RPUSH', b'b', b'x', b'y'], [b'LPOP', b'b'], [b'RPOP', b'b']]
+
+
+def test_blpop_wakes_clients_in_order(server, client, connect):
+    w1, w2, w3 = connect(), connect(), connect()
+    assert w1.call('BLPOP', 'q', '0') == b''
+    assert w2.call('BLPOP', 'other', 'q', '0') == b''
+    assert w3.call('BRPOP', 'q', '0') == b''
+    assert server.bpop_blocked_clients == 3
+    assert client.call('RPUSH', 'q', 'a', 'b') == b':2\r\n'
+    assert pending(w1) == b'*2\r\n$1\r\nq\r\n$1\r\na\r\n'
+    assert pending(w2) == b'*2\r\n$1\r\nq\r\n$1\r\nb\r\n'
+    assert pending(w3) == b''
+    # 被唤醒的客户端不再阻塞在其他键上
+    assert server.bpop_blocked_clients == 1
+    assert list(server.db[0].blocking_keys) == [b'q']
+    assert client.call('LLEN', 'q') == b':0\r\n'
+    client.call('LPUSH', 'q', 'c')
+    assert pending(w3) == b'*2\r\n$1\r\nq\r\n$1\r\nc\r\n'
+    assert server.bpop_blocked_clients == 0
+    assert not server.db[0].blocking_keys and not server.db[0].ready_keys
+
+
+def test_unblocked_client_runs_pipelined_commands(server, client, connect):
+    from redis_server.redis import beforeSleep
+    w = connect()
+    assert w.send(b'*3\r\n$5\r\nBLPOP\r\n$1\r\nq\r\n$1\r\n0\r\n*2\r\n$4\r\nLLEN\r\n$1\r\nq\r\n') == b''
+    client.call('RPUSH', 'q', 'a', 'b')
+    beforeSleep(server.el)
+    assert pending(w) == b'*2\r\n$1\r\nq\r\n$1\r\na\r\n:1\r\n'
+
+
+def test_brpoplpush_and_blmove(server, client, connect):
+    w1, w2 = connect(), connect()
+    assert w1.call('BRPOPLPUSH', 'src', 'dst', '0') == b''
+    assert w2.call('BLMOVE', 'dst', 'final', 'LEFT', 'RIGHT', '0') == b''
+    client.call('RPUSH', 'src', 'a', 'b')
+    # w1 推入 dst 之后 dst 就绪, w2 在同一轮中被唤醒
+    assert pending(w1) == b'$1\r\nb\r\n'
+    assert pending(w2) == b'$1\r\nb\r\n'
+    assert client.call('LRANGE', 'src', '0', '-1') == b'*1\r\n$1\r\na\r\n'
+    assert client.call('LLEN', 'dst') == b':0\r\n'
+    assert client.call('LRANGE', 'final', '0', '-1') == b'*1\r\n$1\r\nb\r\n'
+    # 不需要阻塞时和 RPOPLPUSH / LMOVE 一样
+    assert client.call('BRPOPLPUSH', 'src', 'final', '0') == b'$1\r\na\r\n'
+    assert client.call('BLMOVE', 'final', 'final', 'RIGHT', 'LEFT', '0') == b'$1\r\nb\r\n'
+    assert client.call('LRANGE', 'final', '0', '-1') == b'*2\r\n$1\r\nb\r\n$1\r\na\r\n'
+
+
+def test_blmove_wrong_type_destination(server, client, connect):
+    w1, w2 = connect(), connect()
+    client.call('SET', 'str', 'v')
+    w1.call('BRPOPLPUSH', 'q', 'str', '0')
+    w2.call('BLPOP', 'q', '0')
+    client.call('RPUSH', 'q', 'a')
+    # 弹出的元素放回列表, 交给下一个客户端
+    assert pending(w1) == b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    assert pending(w2) == b'*2\r\n$1\r\nq\r\n$1\r\na\r\n'
+    assert client.call('LLEN', 'q') == b':0\r\n'
+
+
+def test_lmove_and_rpoplpush(client):
+    client.call('RPUSH', 'a', '1', '2', '3')
+    assert client.call('RPOPLPUSH', 'a', 'b') == b'$1\r\n3\r\n'
+    assert client.call('LMOVE', 'a', 'b', 'left', 'RIGHT') == b'$1\r\n1\r\n'
+    assert client.call('LMOVE', 'a', 'a', 'LEFT', 'RIGHT') == b'$1\r\n2\r\n'
+    assert client.call('LMOVE', 'a', 'b', 'LEFT', 'LEFT') == b'$1\r\n2\r\n'
+    assert client.call('LLEN', 'a') == b':0\r\n'
+    assert client.call('LRANGE', 'b', '0', '-1') == b'*3\r\n$1\r\n2\r\n$1\r\n3\r\n$1\r\n1\r\n'
+    assert client.call('RPOPLPUSH', 'missing', 'b') == b'$-1\r\n'
+    assert client.call('LMOVE', 'b', 'b', 'UP', 'LEFT') == b'-ERR syntax error\r\n'
+    client.call('SET', 's', 'v')
+    err = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    assert client.call('RPOPLPUSH', 'b', 's') == err
+    assert client.call('RPOPLPUSH', 's', 'b') == err
+    assert client.call('LLEN', 'b') == b':3\r\n'
+
+
+def test_blocking_timeout(server, client, connect):
+    from redis_server.ae import processTimeEvents
+    w1, w2, w3 = connect(), connect(), connect()
+    assert w1.call('BLPOP', 'q', '0.05') == b''
+    assert w2.call('BRPOPLPUSH', 'q', 'dst', '0.05') == b''
+    assert w3.call('BLPOP', 'q', '10') == b''
+    assert len(server.bpop_timeouts) == 3 and server.bpop_timer_id != -1
+    processTimeEvents(server.el)
+    assert pending(w1) == b''
+    time.sleep(0.06)
+    processTimeEvents(server.el)
+    assert pending(w1) == b'*-1\r\n'
+    assert pending(w2) == b'*-1\r\n'
+    assert server.bpop_blocked_clients == 1
+    # 被推入的元素唤醒之后, 超时记录失效
+    client.call('RPUSH', 'q', 'a')
+    assert pending(w3) == b'*2\r\n$1\r\nq\r\n$1\r\na\r\n'
+    from redis_server.blocked import blockedClientsTimeoutProc
+    from redis_server.ae import AE_NOMORE
+    assert blockedClientsTimeoutProc(server.el, server.bpop_timer_id, None) == AE_NOMORE
+    assert server.bpop_timeouts == [] and server.bpop_timer_id == -1
+
+
+def test_blocking_errors_and_multi(server, client, connect):
+    assert client.call('BLPOP', 'q', 'x') == b'-ERR timeout is not a float or out of range\r\n'
+    assert client.call('BLPOP', 'q', '-1') == b'-ERR timeout is negative\r\n'
+    client.call('SET', 's', 'v')
+    err = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    assert client.call('BLPOP', 'q', 's', '0') == err
+    assert client.call('BRPOPLPUSH', 's', 'q', '0') == err
+    assert client.call('BLMOVE', 'q', 'd', 'LEFT', 'MIDDLE', '0') == b'-ERR syntax error\r\n'
+    # 事务中的阻塞命令立即返回
+    client.call('MULTI')
+    client.call('BLPOP', 'q', '0')
+    client.call('BRPOPLPUSH', 'q', 'd', '0')
+    assert client.call('EXEC') == b'*2\r\n*-1\r\n$-1\r\n'
+    assert server.bpop_blocked_clients == 0
+
+
+def test_free_blocked_client(server, client, connect):
+    from redis_server.redis import freeClient
+    w1, w2 = connect(), connect()
+    w1.call('BLPOP', 'q', '5')
+    w2.call('BLPOP', 'q', '0')
+    freeClient(w1.c)
+    assert server.bpop_blocked_clients == 1
+    client.call('RPUSH', 'q', 'a')
+    assert pending(w2) == b'*2\r\n$1\r\nq\r\n$1\r\na\r\n'
+    assert w1.c not in server.unblocked_clients
+
+
+def test_wakeup_cost_independent_of_blocked_clients(server, client, connect):
+    # 大量客户端阻塞在其他键上时, 唤醒一个客户端不访问它们
+    waiters = [connect() for _ in range(200)]
+    for i, w in enumerate(waiters):
+        w.call('BLPOP', 'idle:%d' % (i % 10), 'shared', '0')
+    first = waiters[0].c
+    node = first.bpop.keys[b'shared']
+    assert node is server.db[0].blocking_keys[b'shared'].head
+    client.call('RPUSH', 'shared', 'job')
+    assert pending(waiters[0]) == b'*2\r\n$6\r\nshared\r\n$3\r\njob\r\n'
+    assert server.bpop_blocked_clients == 199
+    assert server.db[0].blocking_keys[b'shared'].len == 199
@@ -0,0 +1,99 @@
+import socket
+import subprocess
+import sys
+import time
+
+from redis_server.benchmark import encodeCommand
+from redis_server.capture import readCapture
+from redis_server.replay import runReplay
+
+
+def test_client_capture(server, client, tmp_path):
+    path = str(tmp_path / 'traffic.rcap')
+    assert client.call('CLIENT', 'CAPTURE', 'STOP') == b'-ERR Capture not running\r\n'
+    assert client.call('CLIENT', 'CAPTURE', 'START', path) == b'+OK\r\n'
+    assert client.call('CLIENT', 'CAPTURE', 'START', path) == b'-ERR Capture already running\r\n'
+    client.call('SET', 'foo', 'bar')
+    client.call('GET', 'foo')
+    client.call('SET', 'big', b'x' * 10000)
+    assert client.call('CLIENT', 'CAPTURE', 'STOP') == b'+OK\r\n'
+    client.call('GET', 'foo')
+
+    with open(path, 'rb') as f:
+        entries = list(readCapture(f))
+    # CLIENT 等管理命令不会被录制
+    assert [e.argv for e in entries] == [[b'SET', b'foo', b'bar'], [b'GET', b'foo'], [b'SET', b'big', b'x' * 10000]]
+    assert {e.client_id for e in entries} == {client.c.id}
+    assert {e.db for e in entries} == {0}
+    assert entries[0].time_us <= entries[1].time_us <= entries[2].time_us
+
+
+def test_client_capture_errors(server, client, tmp_path):
+    assert client.call('CLIENT', 'CAPTURE', 'START', str(tmp_path / 'nodir' / 'x.rcap')).startswith(
+        b"-ERR Can't open the capture file")
+    assert client.call('CLIENT', 'CAPTURE', 'BOGUS').startswith(b'-ERR Syntax error')
+    assert client.call('CLIENT', 'LIST').startswith(b'-ERR Syntax error')
+
+
+def test_readCapture_truncated(server, client, tmp_path):
+    path = tmp_path / 'traffic.rcap'
+    client.call('CLIENT', 'CAPTURE', 'START', str(path))
+    client.call('SET', 'a', '1')
+    client.call('SET', 'b', '2')
+    client.call('CLIENT', 'CAPTURE', 'STOP')
+    data = path.read_bytes()
+    path.write_bytes(data[:-1])
+    with open(path, 'rb') as f:
+        assert [e.argv for e in readCapture(f)] == [[b'SET', b'a', b'1']]
+
+
+def test_capture_and_replay(tmp_path):
+    path = str(tmp_path / 'traffic.rcap')
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    proc = subprocess.Popen([sys.executable, '-m', 'redis_server', '--port', str(port), '--bind', '127.0.0.1',
+                             '--capture-file', path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                a = socket.create_connection(('127.0.0.1', port))
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        b = socket.create_connection(('127.0.0.1', port))
+        for i in range(20):
+            for sock, cmd in ((a, [b'SET', b'key:%d' % i, b'%d' % i]), (b, [b'GET', b'key:%d' % i])):
+                sock.sendall(encodeCommand(cmd))
+                sock.recv(100)
+        a.sendall(encodeCommand([b'CLIENT', b'CAPTURE', b'STOP']))
+        assert a.recv(100) == b'+OK\r\n'
+        a.close()
+        b.close()
+        report = runReplay([path, '-p', str(port), '--speed', '0'])
+        timed = runReplay([path, '-p', str(port), '--speed', '4'])
+    finally:
+        proc.terminate()
+        proc.wait()
+    assert report['clients'] == 2
+    assert report['requests'] == 40
+    assert report['errors'] == 0
+    assert report['commands'] == {'set': 20, 'get': 20}
+    assert 0 < report['latency_ms']['p50'] <= report['latency_ms']['max']
+    # 按 4 倍速重放, 耗时不会少于录制时长的 1/4
+    assert timed['requests'] == 40
+    assert timed['elapsed_sec'] >= timed['capture_duration_sec'] / 4
+
+
+def test_capture_multi_order(server, client, tmp_path):
+    path = str(tmp_path / 'traffic.rcap')
+    client.call('CLIENT', 'CAPTURE', 'START', path)
+    client.call('MULTI')
+    client.call('SET', 'a', '1')
+    client.call('EXEC')
+    client.call('CLIENT', 'CAPTURE', 'STOP')
+    with open(path, 'rb') as f:
+        # 事务中的命令按收到的顺序录制, EXEC 执行时不会重复录制
+        assert [e.argv for e in readCapture(f)] == [[b'MULTI'], [b'SET', b'a', b'1'], [b'EXEC']]
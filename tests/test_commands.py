@@ -0,0 +1,62 @@
+from redis_server.config import REDIS_CMD_NOAUTH, REDIS_CMD_NOQUEUE, REDIS_CMD_READONLY
+from redis_server.redis import lookupCommand, renameServerCommand, loadServerConfig
+from redis_server.sds import sdsnew
+
+
+def test_lookupCommand_case_insensitive(server):
+    get = server.commands['get']
+    for name in ['get', 'GET', 'Get', 'gEt']:
+        assert lookupCommand(sdsnew(name)) is get
+    assert lookupCommand(sdsnew('nosuchcommand')) is None
+    # 不存在的命令不会进入缓存
+    assert b'nosuchcommand' not in server.command_lookup
+    assert b'Get' in server.command_lookup
+
+
+def test_lookupCommand_cache_limit(server):
+    server.command_lookup.pop(b'Get', None)
+    size = len(server.command_lookup)
+    saved = server.command_lookup_max
+    server.command_lookup_max = size
+    try:
+        assert lookupCommand(sdsnew('Get')) is server.commands['get']
+        assert len(server.command_lookup) == size
+    finally:
+        server.command_lookup_max = saved
+
+
+def test_command_flags(server):
+    assert server.commands['quit'].flags & REDIS_CMD_NOQUEUE
+    assert server.commands['quit'].flags & REDIS_CMD_NOAUTH
+    assert not server.commands['get'].flags & (REDIS_CMD_NOQUEUE | REDIS_CMD_NOAUTH)
+    assert server.commands['get'].flags & REDIS_CMD_READONLY
+
+
+def test_quit(client):
+    assert client.call('QUIT') == b'+OK\r\n'
+    assert client.c not in client.server.clients
+
+
+def test_rename_command(server, client):
+    client.call('SET', 'foo', 'bar')
+    assert renameServerCommand(server, 'GET', 'fetch')
+    try:
+        assert client.call('get', 'foo') == b"-ERR unknown command 'get'\r\n"
+        assert client.call('FETCH', 'foo') == b'$3\r\nbar\r\n'
+        assert server.orig_commands['get'] is server.commands['fetch']
+        assert not renameServerCommand(server, 'nosuchcommand', 'x')
+    finally:
+        renameServerCommand(server, 'fetch', 'get')
+    assert client.call('get', 'foo') == b'$3\r\nbar\r\n'
+
+
+def test_rename_command_config(server, client, tmp_path):
+    conf = tmp_path / 'redis.conf'
+    conf.write_text('rename-command info ""\n')
+    loadServerConfig(server, str(conf), {})
+    try:
+        assert 'info' not in server.commands
+        assert client.call('INFO').startswith(b"-ERR unknown command")
+    finally:
+        server.commands['info'] = server.orig_commands['info']
+        renameServerCommand(server, 'info', 'info')
@@ -0,0 +1,18 @@
+import pytest
+
+from benchmarks.counters import parseArgs, runCounters, main
+
+
+def test_runCounters():
+    opts = parseArgs(['--rounds', '1', '-t', '0.3', '-r', '50', '-c', '2'])
+    results = runCounters(opts)
+    assert results['ops_per_sec.get'] > 0
+    assert results['ops_per_sec.incr'] > 0
+    assert results['ratio.incr_get'] > 0
+
+
+def test_ratio_below_minimum_fails(capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        main(['--rounds', '1', '-t', '0.2', '-r', '10', '-c', '1', '--min-ratio', '1000'])
+    assert excinfo.value.code == 1
+    assert 'PERFORMANCE REGRESSION' in capsys.readouterr().err
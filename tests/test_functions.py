@@ -0,0 +1,134 @@
+import hashlib
+
+import pytest
+
+from redis_server.functions import functionCreate, functionError
+from redis_server.rdict import dictSize
+
+INCR_BY_ARG = b'def main(redis, keys, args):\n    return redis.incr(keys[0], int(args[0]))\n'
+
+CHECK_AND_SET = b'''
+def main(redis, keys, args):
+    current = redis.get(keys[0])
+    if current != args[0]:
+        return [0, current]
+    redis.set(keys[0], args[1])
+    redis.expire(keys[0], 100)
+    return [1, args[1], None, 1.5]
+'''
+
+
+def load(client, code):
+    reply = client.call('FUNCTION', 'LOAD', code)
+    assert reply.startswith(b'$40\r\n'), reply
+    return reply[5:45].decode()
+
+
+def test_function_load_and_call(client, server):
+    sha1 = load(client, INCR_BY_ARG)
+    assert sha1 == hashlib.sha1(INCR_BY_ARG).hexdigest()
+    assert load(client, INCR_BY_ARG) == sha1
+    assert client.call('FCALL', sha1, 1, 'counter', 5) == b':5\r\n'
+    assert client.call('FCALL', sha1.upper(), 1, 'counter', 2) == b':7\r\n'
+    assert client.call('GET', 'counter') == b'$1\r\n7\r\n'
+    assert sha1.encode() in client.call('FUNCTION', 'LIST')
+
+
+def test_function_reply_conversion(client, server):
+    sha1 = load(client, CHECK_AND_SET)
+    client.call('SET', 'k', 'old')
+    assert client.call('FCALL', sha1, 1, 'k', 'wrong', 'new') == b'*2\r\n:0\r\n$3\r\nold\r\n'
+    assert client.call('FCALL', sha1, 1, 'k', 'old', 'new') == b'*4\r\n:1\r\n$3\r\nnew\r\n$-1\r\n$3\r\n1.5\r\n'
+    assert client.call('GET', 'k') == b'$3\r\nnew\r\n'
+    assert dictSize(server.db[0].expires) == 1
+
+
+def test_fcall_errors(client):
+    sha1 = load(client, INCR_BY_ARG)
+    assert client.call('FCALL', 'f' * 40, 0) == b'-ERR No matching function. Use FUNCTION LOAD.\r\n'
+    assert client.call('FCALL', sha1, 2, 'a') == b"-ERR Number of keys can't be greater than number of args\r\n"
+    assert client.call('FCALL', sha1, -1) == b"-ERR Number of keys can't be negative\r\n"
+    client.call('SET', 'counter', 'abc')
+    reply = client.call('FCALL', sha1, 1, 'counter', '1')
+    assert reply.startswith(b'-ERR Error running function') and b'not an integer' in reply
+    reply = client.call('FCALL', sha1, 1, 'counter', 'x\r\ny')
+    assert reply.startswith(b'-ERR Error running function') and reply.count(b'\r\n') == 1
+    assert client.call('FUNCTION', 'BOGUS').startswith(b'-ERR Syntax error')
+
+
+def test_fcall_time_limit(client, server):
+    sha1 = load(client, b'def main(redis, keys, args):\n'
+                        b'    redis.set("before", 1)\n'
+                        b'    while True:\n'
+                        b'        try:\n'
+                        b'            pass\n'
+                        b'        except Exception:\n'
+                        b'            pass\n')
+    saved = server.function_time_limit
+    server.function_time_limit = 50
+    try:
+        assert client.call('FCALL', sha1, 0) == (
+            b'-ERR Function %s killed after running for more than 50 milliseconds\r\n' % sha1.encode())
+    finally:
+        server.function_time_limit = saved
+    # 已经执行的写操作不会回滚
+    assert client.call('GET', 'before') == b'$1\r\n1\r\n'
+    # 只有一行的循环不产生 'line' 事件
+    sha1 = load(client, b'def main(redis, keys, args):\n'
+                        b'    while True: pass\n')
+    server.function_time_limit = 50
+    try:
+        assert client.call('FCALL', sha1, 0) == (
+            b'-ERR Function %s killed after running for more than 50 milliseconds\r\n' % sha1.encode())
+    finally:
+        server.function_time_limit = saved
+
+
+def test_function_flush(client):
+    sha1 = load(client, INCR_BY_ARG)
+    assert client.call('FUNCTION', 'FLUSH') == b'+OK\r\n'
+    assert client.call('FUNCTION', 'LIST') == b'*0\r\n'
+    assert client.call('FCALL', sha1, 1, 'x', 1).startswith(b'-ERR No matching function')
+
+
+def test_fcall_in_multi(client):
+    sha1 = load(client, INCR_BY_ARG)
+    client.call('MULTI')
+    client.call('FCALL', sha1, 1, 'n', 1)
+    client.call('FCALL', sha1, 1, 'n', 1)
+    assert client.call('EXEC') == b'*2\r\n:1\r\n:2\r\n'
+
+
+def test_fcall_propagates_effects(client, server, monkeypatch):
+    import redis_server.redis as redis_mod
+    propagated = []
+    monkeypatch.setattr(redis_mod, 'propagate',
+                        lambda cmd, dbid, argv, flags: propagated.append([bytes(o.ptr.content) for o in argv]))
+    sha1 = load(client, CHECK_AND_SET)
+    client.call('SET', 'k', 'old')
+    client.call('FCALL', sha1, 1, 'k', 'old', 'new')
+    assert propagated[0] == [b'SET', b'k', b'old']
+    assert propagated[1] == [b'SET', b'k', b'new']
+    assert propagated[2][:2] == [b'PEXPIREAT', b'k']
+    assert len(propagated) == 3
+
+
+@pytest.mark.parametrize('code', [
+    b'import os\ndef main(redis, keys, args):\n    pass\n',
+    b'def main(redis, keys, args):\n    return ().__class__\n',
+    b'def main(redis, keys, args):\n    return "{0.x}".format(keys)\n',
+    b'def main(redis, keys, args):\n    return open("/etc/passwd")\n',
+    b'x = sum(range(10))\ndef main(redis, keys, args):\n    pass\n',
+    b'def main(redis, keys, args):\n    try:\n        pass\n    except:\n        pass\n',
+    b'def helper():\n    pass\n',
+    b'def main(redis, keys, args)\n',
+])
+def test_function_rejected(code):
+    if b'open(' in code:
+        # open 不在内置函数中, 代码可以加载, 执行时才会出错
+        fn = functionCreate(code)
+        with pytest.raises(NameError):
+            fn.main(None, [], [])
+        return
+    with pytest.raises(functionError):
+        functionCreate(code)
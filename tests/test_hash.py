@@ -0,0 +1,158 @@
+import pytest
+
+from redis_server.rdict import dictFind, dictScan
+from redis_server.sds import sdsnew
+from redis_server.robject import REDIS_ENCODING_HT, REDIS_ENCODING_ZIPLIST
+
+
+def hashObject(server, key):
+    return dictFind(server.db[0].dict, sdsnew(key)).v.val
+
+
+def multibulk(reply):
+    assert reply.startswith(b'*'), reply
+    return reply.split(b'\r\n')[2:-1:2]
+
+
+def test_hset_hget(client, server):
+    assert client.call('HSET', 'h', 'a', '1', 'b', '2') == b':2\r\n'
+    assert client.call('HSET', 'h', 'a', '10', 'c', '3') == b':1\r\n'
+    assert client.call('HGET', 'h', 'a') == b'$2\r\n10\r\n'
+    assert client.call('HGET', 'h', 'missing') == b'$-1\r\n'
+    assert client.call('HGET', 'nokey', 'a') == b'$-1\r\n'
+    assert client.call('HMGET', 'h', 'a', 'x', 'c') == b'*3\r\n$2\r\n10\r\n$-1\r\n$1\r\n3\r\n'
+    assert client.call('HMGET', 'nokey', 'a') == b'*1\r\n$-1\r\n'
+    assert client.call('HLEN', 'h') == b':3\r\n'
+    assert client.call('HEXISTS', 'h', 'b') == b':1\r\n'
+    assert client.call('HEXISTS', 'h', 'x') == b':0\r\n'
+    assert client.call('HSETNX', 'h', 'b', 'no') == b':0\r\n'
+    assert client.call('HSETNX', 'h', 'd', '4') == b':1\r\n'
+    assert client.call('HMSET', 'h', 'e', '5') == b'+OK\r\n'
+    assert multibulk(client.call('HGETALL', 'h')) == [b'a', b'10', b'b', b'2', b'c', b'3', b'd', b'4', b'e', b'5']
+    assert multibulk(client.call('HKEYS', 'h')) == [b'a', b'b', b'c', b'd', b'e']
+    assert multibulk(client.call('HVALS', 'h')) == [b'10', b'2', b'3', b'4', b'5']
+    assert hashObject(server, 'h').encoding == REDIS_ENCODING_ZIPLIST
+    assert client.call('HSET', 'h', 'a') == b"-ERR wrong number of arguments for 'hset' command\r\n"
+
+
+def test_hdel(client, server):
+    client.call('HSET', 'h', 'a', '1', 'b', '2', 'c', '3')
+    assert client.call('HDEL', 'h', 'b', 'x') == b':1\r\n'
+    assert multibulk(client.call('HGETALL', 'h')) == [b'a', b'1', b'c', b'3']
+    # 最后一个字段删除后键被删除
+    assert client.call('HDEL', 'h', 'a', 'c') == b':2\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('h')) is None
+    assert client.call('HDEL', 'h', 'a') == b':0\r\n'
+    assert client.call('HGETALL', 'h') == b'*0\r\n'
+
+
+@pytest.mark.parametrize('trigger', ['entries', 'value', 'field'])
+def test_ziplist_converts_to_hashtable(client, server, monkeypatch, trigger):
+    monkeypatch.setattr(server, 'hash_max_ziplist_entries', 4)
+    monkeypatch.setattr(server, 'hash_max_ziplist_value', 8)
+    for i in range(4):
+        client.call('HSET', 'h', 'f%d' % i, i)
+    assert hashObject(server, 'h').encoding == REDIS_ENCODING_ZIPLIST
+    if trigger == 'entries':
+        client.call('HSET', 'h', 'f4', '4')
+    elif trigger == 'value':
+        client.call('HSET', 'h', 'f0', 'x' * 9)
+    else:
+        client.call('HSETNX', 'h', 'y' * 9, '4')
+    assert hashObject(server, 'h').encoding == REDIS_ENCODING_HT
+    assert client.call('HLEN', 'h') == (b':4\r\n' if trigger == 'value' else b':5\r\n')
+    assert client.call('HGET', 'h', 'f3') == b'$1\r\n3\r\n'
+    assert client.call('HDEL', 'h', 'f3') == b':1\r\n'
+    assert client.call('HEXISTS', 'h', 'f3') == b':0\r\n'
+    assert client.call('HINCRBY', 'h', 'f2', '5') == b':7\r\n'
+    fields = multibulk(client.call('HKEYS', 'h'))
+    assert len(fields) == len(set(fields)) == int(client.call('HLEN', 'h')[1:-2])
+
+
+def test_hincrby(client, server, monkeypatch):
+    assert client.call('HINCRBY', 'h', 'n', '5') == b':5\r\n'
+    assert client.call('HINCRBY', 'h', 'n', '-7') == b':-2\r\n'
+    client.call('HSET', 'h', 's', 'abc', 'big', str(2 ** 63 - 1))
+    assert client.call('HINCRBY', 'h', 's', '1') == b'-ERR hash value is not an integer\r\n'
+    assert client.call('HINCRBY', 'h', 'big', '1') == b'-ERR increment or decrement would overflow\r\n'
+    assert client.call('HINCRBY', 'h', 'n', 'x') == b'-ERR value is not an integer or out of range\r\n'
+    assert client.call('HINCRBYFLOAT', 'h', 'f', '1.5') == b'$3\r\n1.5\r\n'
+    assert client.call('HINCRBYFLOAT', 'h', 'n', '0.25') == b'$5\r\n-1.75\r\n'
+    assert client.call('HINCRBYFLOAT', 'h', 's', '1') == b'-ERR hash value is not a float\r\n'
+    monkeypatch.setattr(server, 'hash_max_ziplist_entries', 0)
+    client.call('HSET', 'ht', 'n', '41')
+    assert hashObject(server, 'ht').encoding == REDIS_ENCODING_HT
+    assert client.call('HINCRBY', 'ht', 'n', '1') == b':42\r\n'
+    assert client.call('HINCRBYFLOAT', 'ht', 'n', '0.5') == b'$4\r\n42.5\r\n'
+
+
+def test_hincrbyfloat_propagates_hset(client, monkeypatch):
+    import redis_server.redis
+    propagated = []
+    monkeypatch.setattr(redis_server.redis, 'propagate',
+                        lambda cmd, dbid, argv, flags: propagated.append([bytes(o.ptr.buf[:o.ptr.len]) for o in argv]))
+    client.call('HINCRBYFLOAT', 'h', 'f', '10.5')
+    assert propagated == [[b'HSET', b'h', b'f', b'10.5']]
+
+
+def test_wrong_type(client):
+    client.call('SET', 's', 'v')
+    err = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    for args in (['HSET', 's', 'a', '1'], ['HGET', 's', 'a'], ['HMGET', 's', 'a'], ['HDEL', 's', 'a'],
+                 ['HLEN', 's'], ['HEXISTS', 's', 'a'], ['HGETALL', 's'], ['HINCRBY', 's', 'a', '1'],
+                 ['HSCAN', 's', '0']):
+        assert client.call(*args) == err, args
+    client.call('HSET', 'h', 'a', '1')
+    assert client.call('GET', 'h') == err
+
+
+def hscan(client, key, *args):
+    cursor, fields = b'0', {}
+    while True:
+        reply = client.call('HSCAN', key, cursor, *args)
+        lines = reply.split(b'\r\n')
+        cursor = lines[2]
+        items = lines[5:-1:2]
+        for j in range(0, len(items), 2):
+            fields[items[j]] = items[j+1]
+        if cursor == b'0':
+            return fields
+
+
+def test_hscan(client, server, monkeypatch):
+    client.call('HSET', 'small', 'a', '1', 'b', '2')
+    assert client.call('HSCAN', 'small', '0') == b'*2\r\n$1\r\n0\r\n*4\r\n$1\r\na\r\n$1\r\n1\r\n$1\r\nb\r\n$1\r\n2\r\n'
+    assert client.call('HSCAN', 'missing', '0') == b'*2\r\n$1\r\n0\r\n*0\r\n'
+    assert client.call('HSCAN', 'small', 'x') == b'-ERR invalid cursor\r\n'
+    assert client.call('HSCAN', 'small', '0', 'COUNT', '0') == b'-ERR syntax error\r\n'
+    assert client.call('HSCAN', 'small', '0', 'LIMIT', '1') == b'-ERR syntax error\r\n'
+
+    monkeypatch.setattr(server, 'hash_max_ziplist_entries', 16)
+    expected = {}
+    for i in range(0, 300, 50):
+        args = []
+        for j in range(i, i + 50):
+            args += ['field:%d' % j, 'v%d' % j]
+            expected[b'field:%d' % j] = b'v%d' % j
+        client.call('HSET', 'big', *args)
+    assert hashObject(server, 'big').encoding == REDIS_ENCODING_HT
+    assert hscan(client, 'big', 'COUNT', '7') == expected
+    matched = hscan(client, 'big', 'MATCH', 'field:1?')
+    assert matched == {b'field:%d' % j: b'v%d' % j for j in range(10, 20)}
+
+
+def test_dict_scan_during_rehash(server, monkeypatch):
+    from redis_server.db import hashDictType
+    from redis_server.rdict import dictCreate, dictAdd, dictIsRehashing
+    d = dictCreate(hashDictType, None)
+    for i in range(100):
+        dictAdd(d, sdsnew('k%d' % i), sdsnew('v'))
+    seen = set()
+    cursor = dictScan(d, 0, lambda privdata, de: seen.add(bytes(de.key.buf[:de.key.len])), None)
+    # 遍历过程中字典扩展, 之前已经存在的元素都不会漏掉
+    for i in range(100, 400):
+        dictAdd(d, sdsnew('k%d' % i), sdsnew('v'))
+    assert dictIsRehashing(d)
+    while cursor:
+        cursor = dictScan(d, cursor, lambda privdata, de: seen.add(bytes(de.key.buf[:de.key.len])), None)
+    assert {b'k%d' % i for i in range(100)} <= seen
@@ -0,0 +1,115 @@
+import pytest
+
+from redis_server.rdict import dictFind
+from redis_server.sds import sdsnew
+
+
+# 每个测试分别使用 numpy 和纯 Python 的实现运行
+pytestmark = pytest.mark.usefixtures('implementation')
+
+
+def hllValue(server, key):
+    return dictFind(server.db[0].dict, sdsnew(key)).v.val.ptr
+
+
+def pfadd(client, key, elements, batch=500):
+    for i in range(0, len(elements), batch):
+        client.call('PFADD', key, *elements[i:i+batch])
+
+
+def count(client, *keys):
+    reply = client.call('PFCOUNT', *keys)
+    assert reply.startswith(b':'), reply
+    return int(reply[1:-2])
+
+
+def test_pfadd_pfcount(client, server):
+    from redis_server.commands.hyperloglog import HLL_SPARSE
+    assert client.call('PFCOUNT', 'hll') == b':0\r\n'
+    assert client.call('PFADD', 'hll') == b':1\r\n'
+    assert client.call('PFCOUNT', 'hll') == b':0\r\n'
+    assert client.call('PFADD', 'hll', 'a', 'b', 'c') == b':1\r\n'
+    assert client.call('PFADD', 'hll', 'a', 'b') == b':0\r\n'
+    assert client.call('PFCOUNT', 'hll') == b':3\r\n'
+    s = hllValue(server, 'hll')
+    assert s.buf[:4] == b'HYLL' and s.buf[4] == HLL_SPARSE
+    assert client.call('GETRANGE', 'hll', '0', '3') == b'$4\r\nHYLL\r\n'
+
+
+def test_pfcount_accuracy_and_promotion(client, server):
+    from redis_server.commands.hyperloglog import HLL_DENSE, HLL_DENSE_SIZE
+    n = 20000
+    pfadd(client, 'hll', ['element:%d' % i for i in range(n)])
+    s = hllValue(server, 'hll')
+    assert s.buf[4] == HLL_DENSE
+    assert s.len == HLL_DENSE_SIZE
+    assert abs(count(client, 'hll') - n) < n * 0.03
+
+
+def test_sparse_and_dense_agree(client, server, monkeypatch):
+    from redis_server.commands.hyperloglog import hllRegisters, HLL_SPARSE, HLL_DENSE
+    elements = ['%d' % i for i in range(800)]
+    pfadd(client, 'sparse', elements, batch=7)
+    monkeypatch.setattr(server, 'hll_sparse_max_bytes', 0)
+    pfadd(client, 'dense', elements, batch=7)
+    sparse, dense = hllValue(server, 'sparse'), hllValue(server, 'dense')
+    assert sparse.buf[4] == HLL_SPARSE and dense.buf[4] == HLL_DENSE
+    assert hllRegisters(sparse) == hllRegisters(dense)
+    assert count(client, 'sparse') == count(client, 'dense')
+
+
+def test_pfcount_cache(client, server):
+    from redis_server.commands.hyperloglog import hllHistoCache, hllRegisters, hllRawRegHisto
+    pfadd(client, 'hll', ['x%d' % i for i in range(3000)])
+    first = count(client, 'hll')
+    s = hllValue(server, 'hll')
+    # 基数缓存有效, 直方图已经建立
+    assert s.buf[15] & 0x80 == 0
+    assert int.from_bytes(s.buf[8:16], 'little') == first
+    assert s in hllHistoCache
+    assert count(client, 'hll') == first
+    # PFADD 使基数缓存失效, 同时更新直方图
+    assert client.call('PFADD', 'hll', *['y%d' % i for i in range(100)]) == b':1\r\n'
+    assert s.buf[15] & 0x80
+    assert hllHistoCache[s] == hllRawRegHisto(hllRegisters(s))
+    assert count(client, 'hll') > first
+
+
+def test_pfcount_multiple_keys_and_pfmerge(client, server):
+    from redis_server.commands.hyperloglog import HLL_DENSE
+    pfadd(client, 'a', ['%d' % i for i in range(0, 6000)])
+    pfadd(client, 'b', ['%d' % i for i in range(4000, 10000)])
+    client.call('PFADD', 'c', 'only-one')
+    union = count(client, 'a', 'b', 'c', 'missing')
+    assert abs(union - 10001) < 10001 * 0.03
+    assert client.call('PFMERGE', 'dest', 'a', 'b', 'c') == b'+OK\r\n'
+    assert hllValue(server, 'dest').buf[4] == HLL_DENSE
+    assert count(client, 'dest') == union
+    # 目标键已有的元素也参与合并
+    client.call('PFADD', 'd', 'z')
+    assert client.call('PFMERGE', 'd', 'c') == b'+OK\r\n'
+    assert client.call('PFCOUNT', 'd') == b':2\r\n'
+    assert client.call('PFADD', 'd', 'z', 'only-one') == b':0\r\n'
+
+
+def test_pfmerge_sparse_sources(client):
+    client.call('PFADD', 'a', 'foo', 'bar')
+    client.call('PFADD', 'b', 'bar', 'baz')
+    assert client.call('PFCOUNT', 'a', 'b') == b':3\r\n'
+    assert client.call('PFMERGE', 'dest', 'a', 'b', 'missing') == b'+OK\r\n'
+    assert client.call('PFCOUNT', 'dest') == b':3\r\n'
+
+
+def test_hll_errors(client):
+    client.call('SET', 'str', 'not an hll')
+    err = b'-WRONGTYPE Key is not a valid HyperLogLog string value.\r\n'
+    assert client.call('PFADD', 'str', 'a') == err
+    assert client.call('PFCOUNT', 'str') == err
+    assert client.call('PFCOUNT', 'missing', 'str') == err
+    assert client.call('PFMERGE', 'dest', 'str') == err
+    # 稀疏编码只描述了 64 个寄存器
+    client.call('SET', 'bad', b'HYLL\x01' + b'\x80' * 11 + b'\x3f')
+    assert client.call('PFCOUNT', 'bad') == b'-INVALIDOBJ Corrupted HLL object detected\r\n'
+    assert client.call('PFCOUNT', 'bad', 'bad') == b'-INVALIDOBJ Corrupted HLL object detected\r\n'
+    client.call('SET', 'dense', b'HYLL\x00' + b'\x00' * 11)
+    assert client.call('PFCOUNT', 'dense') == err
@@ -0,0 +1,83 @@
+from redis_server.commands.server import bytesToHuman, genRedisInfoString
+
+
+def parse_info(reply: bytes) -> dict:
+    header, body = reply.split(b'\r\n', 1)
+    assert header[:1] == b'$'
+    assert len(body) == int(header[1:]) + 2
+    res = {}
+    for line in body.decode().split('\r\n'):
+        if not line or line.startswith('#'):
+            continue
+        key, val = line.split(':', 1)
+        res[key] = val
+    return res
+
+
+def test_bytesToHuman():
+    assert bytesToHuman(100) == '100B'
+    assert bytesToHuman(2048) == '2.00K'
+    assert bytesToHuman(3 * 1024 * 1024) == '3.00M'
+
+
+def test_info_default(client):
+    info = parse_info(client.call('info'))
+    assert info['redis_mode'] == 'standalone'
+    assert info['connected_clients'] == '1'
+    assert 'used_memory_rss' in info
+    assert 'rdb_changes_since_last_save' in info
+    assert not any(k.startswith('cmdstat_') for k in info)
+
+
+def test_info_section(client):
+    reply = client.call('info', 'stats')
+    assert b'# Stats' in reply
+    assert b'# Server' not in reply
+    assert b'# Keyspace' not in client.call('info', 'STATS')
+
+
+def test_info_keyspace_and_commandstats(client):
+    before = parse_info(client.call('info', 'stats'))
+    assert client.call('set', 'foo', 'bar') == b'+OK\r\n'
+    client.call('get', 'foo')
+    client.call('get', 'nokey')
+    info = parse_info(client.call('info', 'all'))
+    assert info['db0'] == 'keys=1,expires=0,avg_ttl=0'
+    assert int(info['keyspace_hits']) == int(before['keyspace_hits']) + 1
+    assert int(info['keyspace_misses']) == int(before['keyspace_misses']) + 1
+    assert info['cmdstat_get'].startswith('calls=')
+    assert int(info['total_commands_processed']) >= int(before['total_commands_processed']) + 3
+
+
+def test_info_syntax_error(client):
+    assert client.call('info', 'a', 'b') == b'-ERR syntax error\r\n'
+    assert genRedisInfoString('nosuchsection') == ''
+
+
+def test_trackOperationsPerSecond(server):
+    from redis_server.redis import (
+        trackOperationsPerSecond, getOperationsPerSecond, getInstantaneousKbps, resetServerStats,
+    )
+    from redis_server.config import ServerConfig
+    resetServerStats(server)
+    for _ in range(ServerConfig.REDIS_OPS_SEC_SAMPLES):
+        server.ops_sec_last_sample_time -= 1000
+        server.stat_numcommands += 320
+        server.stat_net_input_bytes += 2048
+        server.stat_net_output_bytes += 4096
+        trackOperationsPerSecond()
+    assert 300 <= getOperationsPerSecond() <= 320
+    input_kbps, output_kbps = getInstantaneousKbps()
+    assert 1.9 <= input_kbps <= 2.0
+    assert 3.8 <= output_kbps <= 4.0
+    assert server.ops_sec_samples_sum == sum(server.ops_sec_samples)
+
+
+def test_info_net_stats(client):
+    before = parse_info(client.call('info', 'stats'))
+    client.call('set', 'foo', 'bar')
+    info = parse_info(client.call('info', 'stats'))
+    assert int(info['total_net_input_bytes']) > int(before['total_net_input_bytes'])
+    assert int(info['total_net_output_bytes']) > int(before['total_net_output_bytes'])
+    assert 'instantaneous_ops_per_sec' in info
+    assert 'instantaneous_output_kbps' in info
@@ -0,0 +1,61 @@
+import random
+
+from redis_server.csix import intptr
+from redis_server.intset import *
+
+
+def intset2list(s: intset) -> list:
+    res = []
+    v = intptr()
+    for i in range(intsetLen(s)):
+        assert intsetGet(s, i, v)
+        res.append(v.value)
+    assert intsetBlobLen(s) == len(s.contents)
+    return res
+
+
+def test_intsetAdd_and_upgrade():
+    s = intsetNew()
+    success = intptr()
+    for v in [5, 1, 3, 3]:
+        s = intsetAdd(s, v, success)
+    assert success.value == 0
+    assert intset2list(s) == [1, 3, 5]
+    assert s.encoding == INTSET_ENC_INT16
+    s = intsetAdd(s, 70000, success)
+    assert s.encoding == INTSET_ENC_INT32
+    s = intsetAdd(s, -2**40, success)
+    assert s.encoding == INTSET_ENC_INT64
+    assert intset2list(s) == [-2**40, 1, 3, 5, 70000]
+    assert intsetFind(s, 70000) and not intsetFind(s, 4)
+
+
+def test_intsetRemove():
+    s = intsetNew()
+    success = intptr()
+    for v in range(10):
+        s = intsetAdd(s, v, success)
+    s = intsetRemove(s, 3, success)
+    assert success.value == 1
+    s = intsetRemove(s, 2**40, success)
+    assert success.value == 0
+    assert intset2list(s) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+
+
+def test_random_operations():
+    rand = random.Random(2)
+    for _ in range(30):
+        s = intsetNew()
+        model = set()
+        success = intptr()
+        for _ in range(60):
+            v = rand.choice([rand.randint(-50, 50), rand.randint(-2**31, 2**31), rand.randint(-2**63, 2**63 - 1)])
+            if rand.random() < 0.7:
+                s = intsetAdd(s, v, success)
+                assert success.value == (v not in model)
+                model.add(v)
+            else:
+                s = intsetRemove(s, v, success)
+                assert success.value == (v in model)
+                model.discard(v)
+            assert intset2list(s) == sorted(model)
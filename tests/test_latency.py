@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from benchmarks.common import compareResults
+from benchmarks.latency import parseArgs, parseTolerances, runWorkload, main, DEFAULT_TOLERANCES
+
+
+def test_parseTolerances():
+    tolerances = parseTolerances(['p99_us.get=2', 'rss_kb.=0.1'])
+    assert tolerances['p99_us.get'] == 2.0
+    assert tolerances['rss_kb.'] == 0.1
+    assert tolerances['p50_us.'] == DEFAULT_TOLERANCES['p50_us.']
+    with pytest.raises(ValueError):
+        parseTolerances(['p99_us.'])
+
+
+def test_compareResults_prefix_tolerance():
+    baseline = {'p99_us.get': 100.0, 'p99_us.large_value': 100.0, 'rss_kb.get': 1000.0}
+    results = {'p99_us.get': 250.0, 'p99_us.large_value': 250.0, 'rss_kb.get': 1100.0}
+    tolerances = parseTolerances(['p99_us.get=2'])
+    regressions = compareResults(results, baseline, tolerances, 0.5)
+    assert [name for name, _, _, _ in regressions] == ['p99_us.large_value']
+
+
+@pytest.mark.parametrize('unix', [False, True])
+def test_runWorkload(unix):
+    argv = ['--quick', '--idle-clients', '50'] + (['--unix'] if unix else [])
+    opts = parseArgs(argv)
+    for name in ['get', 'pipeline_set', 'large_value', 'idle_clients']:
+        results = runWorkload(name, opts)
+        assert 0 < results['p50_us.' + name] <= results['p99_us.' + name]
+        assert results['rss_kb.' + name] > 0
+
+
+def test_regression_fails_loudly(tmp_path, capsys):
+    path = tmp_path / 'latency.json'
+    path.write_text(json.dumps({'meta': {}, 'results': {'p50_us.get': 0.001, 'p99_us.get': 0.001}}))
+    with pytest.raises(SystemExit) as excinfo:
+        main(['--quick', '-w', 'get', '--baseline', str(path)])
+    assert excinfo.value.code == 1
+    assert 'PERFORMANCE REGRESSION' in capsys.readouterr().err
@@ -0,0 +1,148 @@
+import pytest
+
+from redis_server.rdict import dictFind
+from redis_server.sds import sdsnew
+
+
+@pytest.fixture
+def small_nodes(server, monkeypatch):
+    monkeypatch.setattr(server, 'list_max_ziplist_entries', 3)
+
+
+def lrange(client, key, start=0, end=-1):
+    reply = client.call('LRANGE', key, start, end)
+    assert reply.startswith(b'*'), reply
+    lines = reply.split(b'\r\n')
+    return lines[2:-1:2]
+
+
+def test_push_pop(client, small_nodes):
+    assert client.call('RPUSH', 'q', 'a', 'b', 'c') == b':3\r\n'
+    assert client.call('LPUSH', 'q', 'x', 'y') == b':5\r\n'
+    assert lrange(client, 'q') == [b'y', b'x', b'a', b'b', b'c']
+    assert client.call('LPOP', 'q') == b'$1\r\ny\r\n'
+    assert client.call('RPOP', 'q') == b'$1\r\nc\r\n'
+    assert client.call('LLEN', 'q') == b':3\r\n'
+    assert client.call('RPUSH', 'q', '12', '-7') == b':5\r\n'
+    assert client.call('RPOP', 'q') == b'$2\r\n-7\r\n'
+    for _ in range(4):
+        client.call('LPOP', 'q')
+    # 最后一个元素弹出后键被删除
+    assert client.call('LPOP', 'q') == b'$-1\r\n'
+    assert client.call('LLEN', 'q') == b':0\r\n'
+    assert client.call('SET', 'q', 'v') == b'+OK\r\n'
+
+
+def test_pushx(client):
+    assert client.call('LPUSHX', 'q', 'a') == b':0\r\n'
+    assert client.call('LLEN', 'q') == b':0\r\n'
+    client.call('RPUSH', 'q', 'a')
+    assert client.call('RPUSHX', 'q', 'b') == b':2\r\n'
+    assert client.call('LPUSHX', 'q', 'c') == b':3\r\n'
+    assert lrange(client, 'q') == [b'c', b'a', b'b']
+
+
+def test_lindex_lset(client, small_nodes):
+    client.call('RPUSH', 'l', *['v%d' % i for i in range(10)])
+    assert client.call('LINDEX', 'l', '0') == b'$2\r\nv0\r\n'
+    assert client.call('LINDEX', 'l', '-1') == b'$2\r\nv9\r\n'
+    assert client.call('LINDEX', 'l', '7') == b'$2\r\nv7\r\n'
+    assert client.call('LINDEX', 'l', '10') == b'$-1\r\n'
+    assert client.call('LINDEX', 'missing', '0') == b'$-1\r\n'
+    assert client.call('LSET', 'l', '4', 'four') == b'+OK\r\n'
+    assert client.call('LSET', 'l', '-1', '99') == b'+OK\r\n'
+    assert client.call('LINDEX', 'l', '4') == b'$4\r\nfour\r\n'
+    assert client.call('LINDEX', 'l', '9') == b'$2\r\n99\r\n'
+    assert client.call('LSET', 'l', '10', 'x') == b'-ERR index out of range\r\n'
+    assert client.call('LSET', 'missing', '0', 'x') == b'-ERR no such key\r\n'
+    assert client.call('LINDEX', 'l', 'x') == b'-ERR value is not an integer or out of range\r\n'
+
+
+def test_lrange(client, small_nodes):
+    client.call('RPUSH', 'l', *[str(i) for i in range(10)])
+    assert lrange(client, 'l', 2, 4) == [b'2', b'3', b'4']
+    assert lrange(client, 'l', -3, -1) == [b'7', b'8', b'9']
+    assert lrange(client, 'l', -100, 1) == [b'0', b'1']
+    assert lrange(client, 'l', 8, 100) == [b'8', b'9']
+    assert client.call('LRANGE', 'l', '5', '2') == b'*0\r\n'
+    assert client.call('LRANGE', 'l', '10', '20') == b'*0\r\n'
+    assert client.call('LRANGE', 'missing', '0', '-1') == b'*0\r\n'
+
+
+def test_ltrim(client, small_nodes, server):
+    client.call('RPUSH', 'l', *[str(i) for i in range(10)])
+    assert client.call('LTRIM', 'l', '2', '-3') == b'+OK\r\n'
+    assert lrange(client, 'l') == [b'2', b'3', b'4', b'5', b'6', b'7']
+    assert client.call('LTRIM', 'l', '-2', '100') == b'+OK\r\n'
+    assert lrange(client, 'l') == [b'6', b'7']
+    assert client.call('LTRIM', 'l', '5', '1') == b'+OK\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('l')) is None
+    assert client.call('LTRIM', 'missing', '0', '1') == b'+OK\r\n'
+
+
+def test_linsert(client, small_nodes):
+    client.call('RPUSH', 'l', 'a', 'b', 'c', '5')
+    assert client.call('LINSERT', 'l', 'BEFORE', 'b', 'x') == b':5\r\n'
+    assert client.call('LINSERT', 'l', 'after', 'c', 'y') == b':6\r\n'
+    # 整数编码的元素也能作为 pivot
+    assert client.call('LINSERT', 'l', 'AFTER', '5', 'z') == b':7\r\n'
+    assert lrange(client, 'l') == [b'a', b'x', b'b', b'c', b'y', b'5', b'z']
+    assert client.call('LINSERT', 'l', 'BEFORE', 'nope', 'x') == b':-1\r\n'
+    assert client.call('LINSERT', 'missing', 'BEFORE', 'a', 'x') == b':0\r\n'
+    assert client.call('LINSERT', 'l', 'MIDDLE', 'a', 'x') == b'-ERR syntax error\r\n'
+
+
+def test_lrem(client, small_nodes):
+    client.call('RPUSH', 'l', 'a', 'b', 'a', 'c', 'a', 'b', 'a')
+    assert client.call('LREM', 'l', '2', 'a') == b':2\r\n'
+    assert lrange(client, 'l') == [b'b', b'c', b'a', b'b', b'a']
+    assert client.call('LREM', 'l', '-1', 'b') == b':1\r\n'
+    assert lrange(client, 'l') == [b'b', b'c', b'a', b'a']
+    assert client.call('LREM', 'l', '0', 'a') == b':2\r\n'
+    assert lrange(client, 'l') == [b'b', b'c']
+    assert client.call('LREM', 'l', '0', 'x') == b':0\r\n'
+    assert client.call('LREM', 'l', '0', 'b') == b':1\r\n'
+    assert client.call('LREM', 'l', '0', 'c') == b':1\r\n'
+    assert client.call('LLEN', 'l') == b':0\r\n'
+
+
+def test_wrong_type(client):
+    client.call('SET', 's', 'v')
+    client.call('RPUSH', 'l', 'v')
+    err = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    for args in (('LPUSH', 's', 'a'), ('RPOP', 's'), ('LLEN', 's'), ('LRANGE', 's', '0', '1'),
+                 ('LINDEX', 's', '0'), ('LSET', 's', '0', 'a'), ('LTRIM', 's', '0', '1'),
+                 ('LREM', 's', '0', 'a'), ('LINSERT', 's', 'BEFORE', 'a', 'b'), ('GET', 'l'),
+                 ('APPEND', 'l', 'x'), ('INCR', 'l')):
+        assert client.call(*args) == err, args
+
+
+def test_queue_uses_few_nodes(client, server):
+    # 按默认配置, 一个短列表只有一个 ziplist 节点
+    from redis_server.quicklist import quicklistNodeCount
+    client.call('RPUSH', 'q', *['job:%d' % i for i in range(100)])
+    o = dictFind(server.db[0].dict, sdsnew('q')).v.val
+    assert quicklistNodeCount(o.ptr) == 1
+    for i in range(100):
+        assert client.call('LPOP', 'q') == b'$%d\r\njob:%d\r\n' % (len(b'job:%d' % i), i)
+
+
+def test_large_reply_keeps_shared_objects(client, server):
+    from redis_server.util import get_shared
+    crlf = get_shared().crlf
+    n = 20000
+    for start in range(0, n, 1000):
+        client.call('RPUSH', 'L', *range(start, start + 1000))
+    # 回复超过 16KB 时追加到回复链表末尾的对象, 共享的 \r\n 和数据库中的值不能被修改
+    expected = b'*%d\r\n' % n + b''.join(b'$%d\r\n%d\r\n' % (len(b'%d' % i), i) for i in range(n))
+    assert client.call('LRANGE', 'L', 0, -1) == expected
+    value = b'x' * 20000
+    # 请求不超过一次读取的大小, 分两次追加
+    client.call('APPEND', 'big', value[:10000])
+    client.call('APPEND', 'big', value[10000:])
+    get = b'*2\r\n$3\r\nGET\r\n$3\r\nbig\r\n'
+    assert client.send(get * 2) == (b'$20000\r\n%s\r\n' % value) * 2
+    assert bytes(crlf.ptr.buf[:crlf.ptr.len]) == b'\r\n'
+    assert client.call('GET', 'big') == b'$20000\r\n%s\r\n' % value
+    client.call('SET', 'k', 'v')
+    assert client.call('GET', 'k') == b'$1\r\nv\r\n'
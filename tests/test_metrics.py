@@ -0,0 +1,77 @@
+import socket
+
+from redis_server.ae import AE_READABLE
+from redis_server.metrics import (
+    metricsConn, genMetricsPayload, processMetricsRequest, listenToMetricsPort, acceptMetricsHandler, readMetricsRequest,
+)
+from redis_server.config import REDIS_OK
+
+
+def test_metrics_payload(client):
+    client.call('set', 'foo', 'bar')
+    client.call('get', 'foo')
+    client.server.cronloops += 1
+    payload = genMetricsPayload().decode()
+    assert payload.endswith('# EOF\n')
+    assert 'redis_connected_clients 1\n' in payload
+    assert 'redis_commands_processed_total ' in payload
+    calls = client.server.commands['get'].calls
+    assert 'redis_command_calls_total{cmd="get"} %d\n' % calls in payload
+    assert 'redis_command_latency_seconds_bucket{cmd="get",le="+Inf"} %d\n' % calls in payload
+    assert 'redis_command_latency_seconds_count{cmd="get"} %d\n' % calls in payload
+    assert 'redis_db_keys{db="db0"} 1\n' in payload
+    # 同一个 cron 周期内复用缓存
+    client.call('get', 'foo')
+    assert genMetricsPayload().decode() == payload
+
+
+def test_metrics_histogram_cumulative(client):
+    client.call('get', 'foo')
+    client.server.cronloops += 1
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in genMetricsPayload().decode().splitlines()
+               if line.startswith('redis_command_latency_seconds_bucket{cmd="get"')]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] >= 1
+
+
+def test_latency_hist_bucket():
+    from redis_server.config import REDIS_LATENCY_HIST_BUCKETS
+    from redis_server.redis import latencyHistBucket
+    # 第 i 个桶的上界 le 是 2**i 微秒, 包括等于上界的耗时
+    assert [latencyHistBucket(d) for d in (0, 1, 2, 3, 4, 5, 8, 9, 1024, 1025)] == [0, 0, 1, 2, 2, 3, 3, 4, 10, 11]
+    assert latencyHistBucket(1 << (REDIS_LATENCY_HIST_BUCKETS - 1)) == REDIS_LATENCY_HIST_BUCKETS - 1
+    assert latencyHistBucket(10 ** 9) == REDIS_LATENCY_HIST_BUCKETS
+
+
+def test_metrics_request_routing():
+    assert processMetricsRequest(b'GET /metrics HTTP/1.1\r\n\r\n').startswith(b'HTTP/1.1 200 OK\r\n')
+    assert b'application/openmetrics-text' in processMetricsRequest(b'GET / HTTP/1.1\r\n\r\n')
+    assert processMetricsRequest(b'GET /nope HTTP/1.1\r\n\r\n').startswith(b'HTTP/1.1 404')
+    assert processMetricsRequest(b'POST /metrics HTTP/1.1\r\n\r\n').startswith(b'HTTP/1.1 405')
+    assert processMetricsRequest(b'\r\n\r\n').startswith(b'HTTP/1.1 400')
+
+
+def test_metrics_http_roundtrip(server):
+    server.metrics_port = 0
+    assert listenToMetricsPort(server) == REDIS_OK
+    lfd = server.metrics_fd.fileno()
+    peer = socket.create_connection(server.metrics_fd.getsockname())
+    try:
+        acceptMetricsHandler(server.el, lfd, None, AE_READABLE)
+        fd = next(fd for fd, e in enumerate(server.el.events)
+                  if e.mask & AE_READABLE and isinstance(e.clientData, metricsConn))
+        peer.sendall(b'GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n')
+        readMetricsRequest(server.el, fd, server.el.events[fd].clientData, AE_READABLE)
+        chunks = []
+        while True:
+            chunk = peer.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        response = b''.join(chunks)
+        header, body = response.split(b'\r\n\r\n', 1)
+        assert header.startswith(b'HTTP/1.1 200 OK')
+        assert b'Content-Length: %d' % len(body) in header
+        assert body.endswith(b'# EOF\n')
+    finally:
+        peer.close()
@@ -0,0 +1,97 @@
+import pytest
+
+from .conftest import FakeClient, tcp_pair
+from redis_server.util import SocketCache
+
+
+@pytest.fixture
+def other(server, client):
+    from redis_server.redis import createClient, freeClient
+    a, b = tcp_pair()
+    SocketCache.set(a)
+    c = createClient(server, a)
+    yield FakeClient(server, c, b)
+    if c in server.clients:
+        freeClient(c)
+    b.close()
+
+
+def test_multi_exec(client):
+    assert client.call('MULTI') == b'+OK\r\n'
+    assert client.call('SET', 'foo', 'bar') == b'+QUEUED\r\n'
+    assert client.call('GET', 'foo') == b'+QUEUED\r\n'
+    assert client.call('GET', 'missing') == b'+QUEUED\r\n'
+    assert client.call('EXEC') == b'*3\r\n+OK\r\n$3\r\nbar\r\n$-1\r\n'
+    assert client.call('GET', 'foo') == b'$3\r\nbar\r\n'
+
+
+def test_multi_queues_without_executing(client, other):
+    client.call('MULTI')
+    client.call('SET', 'foo', 'bar')
+    assert other.call('GET', 'foo') == b'$-1\r\n'
+    assert client.call('DISCARD') == b'+OK\r\n'
+    assert client.call('GET', 'foo') == b'$-1\r\n'
+
+
+def test_multi_errors(client):
+    assert client.call('EXEC') == b'-ERR EXEC without MULTI\r\n'
+    assert client.call('DISCARD') == b'-ERR DISCARD without MULTI\r\n'
+    client.call('MULTI')
+    assert client.call('MULTI') == b'-ERR MULTI calls can not be nested\r\n'
+    assert client.call('WATCH', 'foo') == b'-ERR WATCH inside MULTI is not allowed\r\n'
+    assert client.call('EXEC') == b'*0\r\n'
+
+
+def test_exec_abort_after_queue_error(client):
+    client.call('MULTI')
+    client.call('SET', 'foo', 'bar')
+    assert client.call('NOSUCHCOMMAND').startswith(b'-ERR unknown command')
+    assert client.call('GET').startswith(b'-ERR wrong number of arguments')
+    assert client.call('EXEC') == b'-EXECABORT Transaction discarded because of previous errors.\r\n'
+    assert client.call('GET', 'foo') == b'$-1\r\n'
+
+
+def test_watch(client, other, server):
+    client.call('SET', 'foo', '1')
+    assert client.call('WATCH', 'foo', 'bar') == b'+OK\r\n'
+    assert set(server.db[0].watched_keys) == {b'foo', b'bar'}
+    client.call('MULTI')
+    client.call('SET', 'foo', '2')
+    other.call('SET', 'foo', '3')
+    assert client.call('EXEC') == b'*-1\r\n'
+    assert client.call('GET', 'foo') == b'$1\r\n3\r\n'
+    # EXEC 之后不再监视任何键
+    assert server.db[0].watched_keys == {}
+    assert client.c.watched_keys == []
+
+
+def test_watch_unmodified(client, other, server):
+    client.call('WATCH', 'foo')
+    other.call('WATCH', 'foo')
+    assert server.db[0].watched_keys[b'foo'].refcount == 2
+    other.call('GET', 'foo')
+    client.call('MULTI')
+    client.call('SET', 'foo', '1')
+    assert client.call('EXEC') == b'*1\r\n+OK\r\n'
+    # client 的事务修改了 foo, other 的事务会失败
+    other.call('MULTI')
+    other.call('SET', 'foo', '2')
+    assert other.call('EXEC') == b'*-1\r\n'
+    assert server.db[0].watched_keys == {}
+
+
+def test_unwatch(client, other, server):
+    client.call('WATCH', 'foo')
+    other.call('SET', 'foo', '1')
+    assert client.call('UNWATCH') == b'+OK\r\n'
+    client.call('MULTI')
+    client.call('SET', 'foo', '2')
+    assert client.call('EXEC') == b'*1\r\n+OK\r\n'
+
+
+def test_free_client_unwatches(server, other):
+    other.call('WATCH', 'foo')
+    other.call('MULTI')
+    other.call('SET', 'foo', 'bar')
+    other.call('QUIT')
+    assert server.db[0].watched_keys == {}
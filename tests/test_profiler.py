@@ -0,0 +1,52 @@
+import marshal
+import threading
+import time
+
+from redis_server.profiler import profiler
+
+
+def busy(ms: float) -> None:
+    end = time.process_time() + ms / 1000
+    while time.process_time() < end:
+        pass
+
+
+def wait_dump_threads() -> None:
+    for t in threading.enumerate():
+        if t.name == 'redis-profile-dump':
+            t.join()
+
+
+def test_debug_profile_sampling(client, tmp_path):
+    assert client.call('debug', 'profile', 'stop') == b'-ERR Profiler not running\r\n'
+    assert client.call('debug', 'profile', 'start') == b'+OK\r\n'
+    assert client.call('debug', 'profile', 'start') == b'-ERR Profiler already running\r\n'
+    busy(100)
+    assert client.call('debug', 'profile', 'stop') == b'+OK\r\n'
+    assert profiler.samples > 0
+    path = tmp_path / 'stacks.txt'
+    assert client.call('debug', 'profile', 'dump', str(path)) == b'+OK\r\n'
+    wait_dump_threads()
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any('busy (test_profiler.py' in line for line in lines)
+
+
+def test_debug_profile_deterministic(client, tmp_path):
+    assert client.call('debug', 'profile', 'start', 'deterministic') == b'+OK\r\n'
+    client.call('set', 'foo', 'bar')
+    path = tmp_path / 'profile.pstats'
+    # 运行中也可以导出
+    assert client.call('debug', 'profile', 'dump', str(path)) == b'+OK\r\n'
+    assert client.call('debug', 'profile', 'stop') == b'+OK\r\n'
+    wait_dump_threads()
+    stats = marshal.loads(path.read_bytes())
+    assert any(func[2] == 'setCommand' for func in stats)
+
+
+def test_debug_profile_syntax(client):
+    assert client.call('debug', 'profile', 'start', 'nope') == b'-ERR Unknown profile mode, use SAMPLING or DETERMINISTIC\r\n'
+    assert client.call('debug', 'nope').startswith(b'-ERR Syntax error')
+    assert client.call('debug', 'profile', 'dump').startswith(b'-ERR Syntax error')
@@ -0,0 +1,157 @@
+import random
+from typing import List
+
+import pytest
+
+from redis_server.quicklist import *
+from redis_server.ziplist import ziplistLen
+
+
+@pytest.fixture
+def small_nodes(server, monkeypatch):
+    # 每个 ziplist 最多 4 个元素, 少量元素就会跨越多个节点
+    monkeypatch.setattr(server, 'list_max_ziplist_entries', 4)
+    monkeypatch.setattr(server, 'list_max_ziplist_value', 64)
+    return server
+
+
+def values(ql: quicklist, direction: int = AL_START_HEAD) -> List[bytes]:
+    res = []
+    it = quicklistGetIterator(ql, direction)
+    entry = quicklistEntry()
+    while quicklistNext(it, entry):
+        v = entry.value
+        res.append(b'%d' % v if isinstance(v, int) else v)
+    return res
+
+
+def check(ql: quicklist, model: List[bytes]) -> None:
+    assert values(ql) == model
+    assert values(ql, AL_START_TAIL) == model[::-1]
+    assert quicklistCount(ql) == len(model)
+    n = ql.nodes.head
+    total = 0
+    while n is not None:
+        assert ziplistLen(n.value) > 0
+        total += ziplistLen(n.value)
+        n = n.next
+    assert total == len(model)
+
+
+def test_push_pop(small_nodes):
+    ql = quicklistCreate()
+    for i in range(10):
+        quicklistPush(ql, b'%d' % i, len(b'%d' % i), QUICKLIST_TAIL)
+    quicklistPush(ql, b'head', 4, QUICKLIST_HEAD)
+    check(ql, [b'head'] + [b'%d' % i for i in range(10)])
+    assert quicklistNodeCount(ql) == 4
+    assert quicklistPop(ql, QUICKLIST_HEAD) == b'head'
+    assert quicklistPop(ql, QUICKLIST_TAIL) == 9
+    check(ql, [b'%d' % i for i in range(9)])
+    while quicklistPop(ql, QUICKLIST_HEAD) is not None:
+        pass
+    assert quicklistNodeCount(ql) == 0
+    assert quicklistPop(ql, QUICKLIST_TAIL) is None
+
+
+def test_long_values_start_new_node(small_nodes):
+    ql = quicklistCreate()
+    quicklistPush(ql, b'a', 1, QUICKLIST_TAIL)
+    quicklistPush(ql, b'b', 1, QUICKLIST_TAIL)
+    quicklistPush(ql, b'x' * 100, 100, QUICKLIST_TAIL)
+    assert quicklistNodeCount(ql) == 2
+    quicklistPush(ql, b'y' * 100, 100, QUICKLIST_HEAD)
+    assert quicklistNodeCount(ql) == 3
+    check(ql, [b'y' * 100, b'a', b'b', b'x' * 100])
+
+
+def test_index_and_replace(small_nodes):
+    ql = quicklistCreate()
+    model = [b'v%d' % i for i in range(13)]
+    for v in model:
+        quicklistPush(ql, v, len(v), QUICKLIST_TAIL)
+    for i in range(-13, 13):
+        entry = quicklistIndex(ql, i)
+        assert entry is not None and entry.value == model[i]
+    assert quicklistIndex(ql, 13) is None
+    assert quicklistIndex(ql, -14) is None
+    assert quicklistReplaceAtIndex(ql, 5, b'new', 3)
+    assert quicklistReplaceAtIndex(ql, -1, b'last', 4)
+    model[5] = b'new'
+    model[-1] = b'last'
+    check(ql, model)
+
+
+def test_random_operations(small_nodes):
+    rnd = random.Random(1234)
+    ql = quicklistCreate()
+    model: List[bytes] = []
+    for step in range(3000):
+        op = rnd.random()
+        v = rnd.choice([b'%d' % rnd.randrange(-1000, 1000), b'str%d' % rnd.randrange(50), b'y' * rnd.randrange(60, 80)])
+        if op < 0.3:
+            where = rnd.choice([QUICKLIST_HEAD, QUICKLIST_TAIL])
+            quicklistPush(ql, v, len(v), where)
+            if where == QUICKLIST_HEAD:
+                model.insert(0, v)
+            else:
+                model.append(v)
+        elif op < 0.45:
+            where = rnd.choice([QUICKLIST_HEAD, QUICKLIST_TAIL])
+            got = quicklistPop(ql, where)
+            expect = (model.pop(0) if where == QUICKLIST_HEAD else model.pop()) if model else None
+            assert (b'%d' % got if isinstance(got, int) else got) == expect
+        elif op < 0.65 and model:
+            i = rnd.randrange(len(model))
+            entry = quicklistIndex(ql, i)
+            assert entry is not None
+            if rnd.random() < 0.5:
+                quicklistInsertBefore(ql, entry, v, len(v))
+                model.insert(i, v)
+            else:
+                quicklistInsertAfter(ql, entry, v, len(v))
+                model.insert(i + 1, v)
+        elif op < 0.75 and model:
+            start = rnd.randrange(-len(model), len(model))
+            count = rnd.randrange(0, 6)
+            s = start if start >= 0 else start + len(model)
+            assert quicklistDelRange(ql, start, count) == min(count, len(model) - s)
+            del model[s:s+count]
+        elif op < 0.85 and model:
+            # 和 LREM 一样在迭代时删除
+            target = rnd.choice(model)
+            direction = rnd.choice([AL_START_HEAD, AL_START_TAIL])
+            it = quicklistGetIterator(ql, direction)
+            entry = quicklistEntry()
+            while quicklistNext(it, entry):
+                value = b'%d' % entry.value if isinstance(entry.value, int) else entry.value
+                if value == target:
+                    quicklistDelEntry(it, entry)
+            model = [m for m in model if m != target]
+        elif model:
+            i = rnd.randrange(len(model))
+            quicklistReplaceAtIndex(ql, i, v, len(v))
+            model[i] = v
+        if step % 50 == 0:
+            check(ql, model)
+    check(ql, model)
+
+
+def test_iterator_at_index(small_nodes):
+    ql = quicklistCreate()
+    for i in range(10):
+        quicklistPush(ql, b'%d' % i, len(b'%d' % i), QUICKLIST_TAIL)
+    it = quicklistGetIteratorAtIdx(ql, AL_START_HEAD, 6)
+    assert it is not None
+    entry = quicklistEntry()
+    res = []
+    while quicklistNext(it, entry):
+        res.append(entry.value)
+    assert res == [6, 7, 8, 9]
+    it = quicklistGetIteratorAtIdx(ql, AL_START_TAIL, -5)
+    assert it is not None
+    res = []
+    while quicklistNext(it, entry):
+        res.append(entry.value)
+    assert res == [5, 4, 3, 2, 1, 0]
+    assert quicklistGetIteratorAtIdx(ql, AL_START_HEAD, 10) is None
@@ -1,5 +1,5 @@
 from redis_server.sds import (
-    strlen, sdstrim, sdsnew, sdsrange, memcmp,
+    strlen, sdstrim, sdsnew, sdsrange, memcmp, sdscatlen, sdsclear, sdsgrowzero,
 )
 
 def test_strlen():
@@ -27,3 +27,29 @@ def test_memcmp():
     assert memcmp(b'123', b'12', 1) == 0
     assert memcmp(b'a23', b'b2', 1) == -1
     assert memcmp(b'a33', b'a2', 2) == 1
+
+def test_sdscatlen():
+    s = sdsnew(b"Hello")
+    s = sdscatlen(s, b"ab", 2)
+    assert s.content == b"Helloab"
+    s = sdscatlen(s, b"World!!", 7)
+    assert s.content == b"HelloabWorld!!"
+    assert len(s.buf) == s.len + s.free + 1
+    sdsclear(s)
+    s = sdscatlen(s, b"x" * 40, 40)
+    assert s.content == b"x" * 40
+    assert len(s.buf) == s.len + s.free + 1
+
+def test_sdsgrowzero():
+    s = sdsnew(b"Hello World")
+    sdsrange(s, 0, 1)
+    # free 部分残留的 "llo World" 被清零
+    sdsgrowzero(s, 5)
+    assert s.buf[:s.len+1] == bytearray(b'He\x00\x00\x00\x00')
+    assert len(s.buf) == s.len + s.free + 1
+    sdsgrowzero(s, 100)
+    assert s.len == 100
+    assert s.buf[:s.len+1] == bytearray(b'He' + bytes(99))
+    assert len(s.buf) == s.len + s.free + 1
+    sdsgrowzero(s, 10)
+    assert s.len == 100
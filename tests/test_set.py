@@ -0,0 +1,184 @@
+import pytest
+
+import redis_server.commands.sets
+from redis_server.rdict import dictFind
+from redis_server.sds import sdsnew
+from redis_server.robject import REDIS_ENCODING_HT, REDIS_ENCODING_INTSET
+
+
+@pytest.fixture
+def implementation(implementation, monkeypatch):
+    """numpy 的阈值调低以覆盖小集合"""
+    if implementation == 'numpy':
+        monkeypatch.setattr(redis_server.commands.sets, 'SET_NUMPY_MIN_SIZE', 1)
+    return implementation
+
+
+def setObject(server, key):
+    return dictFind(server.db[0].dict, sdsnew(key)).v.val
+
+
+def members(reply):
+    assert reply.startswith(b'*'), reply
+    return reply.split(b'\r\n')[2:-1:2]
+
+
+def smembers(client, key):
+    return sorted(members(client.call('SMEMBERS', key)))
+
+
+def test_sadd_srem(client, server):
+    assert client.call('SADD', 's', '3', '1', '2', '1') == b':3\r\n'
+    assert setObject(server, 's').encoding == REDIS_ENCODING_INTSET
+    assert client.call('SMEMBERS', 's') == b'*3\r\n$1\r\n1\r\n$1\r\n2\r\n$1\r\n3\r\n'
+    assert client.call('SCARD', 's') == b':3\r\n'
+    assert client.call('SISMEMBER', 's', '2') == b':1\r\n'
+    assert client.call('SISMEMBER', 's', 'x') == b':0\r\n'
+    assert client.call('SMISMEMBER', 's', '1', 'x', '3') == b'*3\r\n:1\r\n:0\r\n:1\r\n'
+    assert client.call('SMISMEMBER', 'missing', '1') == b'*1\r\n:0\r\n'
+    assert client.call('SREM', 's', '2', 'x') == b':1\r\n'
+    # 非整数元素使集合转换成哈希表
+    assert client.call('SADD', 's', 'a') == b':1\r\n'
+    assert setObject(server, 's').encoding == REDIS_ENCODING_HT
+    assert smembers(client, 's') == [b'1', b'3', b'a']
+    assert client.call('SISMEMBER', 's', '3') == b':1\r\n'
+    assert client.call('SREM', 's', '1', '3', 'a') == b':3\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('s')) is None
+    assert client.call('SCARD', 's') == b':0\r\n'
+
+
+def test_intset_converts_past_max_entries(client, server, monkeypatch):
+    monkeypatch.setattr(server, 'set_max_intset_entries', 4)
+    client.call('SADD', 's', '1', '2', '3', '4')
+    assert setObject(server, 's').encoding == REDIS_ENCODING_INTSET
+    client.call('SADD', 's', '-70000')
+    assert setObject(server, 's').encoding == REDIS_ENCODING_HT
+    assert smembers(client, 's') == [b'-70000', b'1', b'2', b'3', b'4']
+    # 不能保存为整数的字符串, 例如有前导 0
+    client.call('SADD', 't', '007')
+    assert setObject(server, 't').encoding == REDIS_ENCODING_HT
+
+
+def test_smove(client):
+    client.call('SADD', 'src', '1', 'a')
+    assert client.call('SMOVE', 'src', 'dst', 'a') == b':1\r\n'
+    assert client.call('SMOVE', 'src', 'dst', 'x') == b':0\r\n'
+    assert client.call('SMOVE', 'src', 'src', '1') == b':1\r\n'
+    assert client.call('SMOVE', 'src', 'dst', '1') == b':1\r\n'
+    assert client.call('SCARD', 'src') == b':0\r\n'
+    assert smembers(client, 'dst') == [b'1', b'a']
+
+
+def test_spop_srandmember(client, monkeypatch):
+    import redis_server.redis
+    propagated = []
+    monkeypatch.setattr(redis_server.redis, 'propagate',
+                        lambda cmd, dbid, argv, flags: propagated.append([bytes(o.ptr.buf[:o.ptr.len]) for o in argv]))
+    client.call('SADD', 's', *range(10))
+    all_members = set(b'%d' % i for i in range(10))
+    one = client.call('SRANDMEMBER', 's')
+    assert one.split(b'\r\n')[1] in all_members
+    assert len(set(members(client.call('SRANDMEMBER', 's', '5')))) == 5
+    assert sorted(members(client.call('SRANDMEMBER', 's', '20'))) == sorted(all_members)
+    assert len(members(client.call('SRANDMEMBER', 's', '-20'))) == 20
+    assert client.call('SRANDMEMBER', 's', '0') == b'*0\r\n'
+    assert client.call('SRANDMEMBER', 'missing') == b'$-1\r\n'
+
+    propagated.clear()
+    popped = client.call('SPOP', 's').split(b'\r\n')[1]
+    assert propagated == [[b'SREM', b's', popped]]
+    popped3 = members(client.call('SPOP', 's', '3'))
+    assert len(set(popped3)) == 3 and popped not in popped3
+    assert propagated[1][:2] == [b'SREM', b's'] and sorted(propagated[1][2:]) == sorted(popped3)
+    assert client.call('SCARD', 's') == b':6\r\n'
+    assert len(members(client.call('SPOP', 's', '10'))) == 6
+    assert propagated[2] == [b'DEL', b's']
+    assert client.call('SPOP', 's') == b'$-1\r\n'
+    assert client.call('SPOP', 's', '-1') == b'-ERR index out of range\r\n'
+
+
+def test_set_algebra(client, server, implementation):
+    client.call('SADD', 'a', *range(0, 100))
+    client.call('SADD', 'b', *range(50, 300, 2))
+    client.call('SADD', 'c', *range(-1000, 1000, 5))
+    client.call('SADD', 'big', 100000, 60, 70)
+    a, b, c = set(range(0, 100)), set(range(50, 300, 2)), set(range(-1000, 1000, 5))
+
+    def ints(reply):
+        return [int(x) for x in members(reply)]
+
+    assert ints(client.call('SINTER', 'a', 'b', 'c')) == sorted(a & b & c)
+    assert ints(client.call('SINTER', 'a', 'big')) == [60, 70]
+    assert ints(client.call('SUNION', 'a', 'b', 'missing')) == sorted(a | b)
+    assert ints(client.call('SDIFF', 'a', 'b', 'c')) == sorted(a - b - c)
+    assert client.call('SINTER', 'a', 'missing') == b'*0\r\n'
+    assert client.call('SDIFF', 'missing', 'a') == b'*0\r\n'
+
+    assert client.call('SINTERSTORE', 'dst', 'c', 'a') == b':%d\r\n' % len(a & c)
+    assert setObject(server, 'dst').encoding == REDIS_ENCODING_INTSET
+    assert ints(client.call('SMEMBERS', 'dst')) == sorted(a & c)
+    assert client.call('SUNIONSTORE', 'dst', 'a', 'big') == b':101\r\n'
+    assert client.call('SISMEMBER', 'dst', '100000') == b':1\r\n'
+    assert client.call('SDIFFSTORE', 'dst', 'a', 'a') == b':0\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('dst')) is None
+    # 目标键可以是参与运算的键
+    assert client.call('SINTERSTORE', 'a', 'a', 'b') == b':%d\r\n' % len(a & b)
+    assert ints(client.call('SMEMBERS', 'a')) == sorted(a & b)
+
+
+def test_set_algebra_mixed_encodings(client, server, monkeypatch, implementation):
+    monkeypatch.setattr(server, 'set_max_intset_entries', 8)
+    client.call('SADD', 'ints', '1', '2', '3', '4')
+    client.call('SADD', 'strs', '2', '3', 'x', 'y')
+    client.call('SADD', 'many', *range(20))
+    assert setObject(server, 'strs').encoding == REDIS_ENCODING_HT
+    assert setObject(server, 'many').encoding == REDIS_ENCODING_HT
+    assert sorted(members(client.call('SINTER', 'strs', 'ints'))) == [b'2', b'3']
+    assert sorted(members(client.call('SINTER', 'many', 'ints', 'strs'))) == [b'2', b'3']
+    assert sorted(members(client.call('SUNION', 'ints', 'strs'))) == [b'1', b'2', b'3', b'4', b'x', b'y']
+    assert sorted(members(client.call('SDIFF', 'strs', 'ints'))) == [b'x', b'y']
+    assert sorted(members(client.call('SDIFF', 'ints', 'strs'))) == [b'1', b'4']
+    # 结果全部是整数并且不多时保存为 intset
+    assert client.call('SDIFFSTORE', 'd', 'ints', 'strs') == b':2\r\n'
+    assert setObject(server, 'd').encoding == REDIS_ENCODING_INTSET
+    assert client.call('SUNIONSTORE', 'd', 'many', 'ints') == b':20\r\n'
+    assert setObject(server, 'd').encoding == REDIS_ENCODING_HT
+    assert client.call('SINTERSTORE', 'd', 'many', 'strs') == b':2\r\n'
+    assert smembers(client, 'd') == [b'2', b'3']
+
+
+def test_large_intset_intersection(client, server, monkeypatch, implementation):
+    monkeypatch.setattr(server, 'set_max_intset_entries', 100000)
+    # 每条命令的参数不要太多, 测试客户端只读一次查询缓冲区
+    for start in range(0, 40000, 500):
+        client.call('SADD', 'evens', *range(start, start + 500, 2))
+    for start in range(0, 6000, 1500):
+        client.call('SADD', 'triples', *range(start, start + 1500, 3))
+    client.call('SADD', 'wide', *range(0, 6000, 6), 2 ** 40)
+    assert setObject(server, 'evens').encoding == REDIS_ENCODING_INTSET
+    expected = list(range(0, 6000, 6))
+    assert [int(x) for x in members(client.call('SINTER', 'evens', 'triples', 'wide'))] == expected
+    assert client.call('SINTERSTORE', 'dst', 'wide', 'evens') == b':%d\r\n' % len(expected)
+    assert [int(x) for x in members(client.call('SMEMBERS', 'dst'))] == expected
+
+
+def test_wrong_type_and_sscan(client, server, monkeypatch):
+    client.call('SET', 'str', 'v')
+    err = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    for args in (['SADD', 'str', '1'], ['SREM', 'str', '1'], ['SCARD', 'str'], ['SISMEMBER', 'str', '1'],
+                 ['SPOP', 'str'], ['SRANDMEMBER', 'str'], ['SINTER', 'str'], ['SUNION', 'missing', 'str'],
+                 ['SDIFFSTORE', 'd', 'str'], ['SSCAN', 'str', '0']):
+        assert client.call(*args) == err, args
+
+    client.call('SADD', 'small', '2', '1')
+    assert client.call('SSCAN', 'small', '0') == b'*2\r\n$1\r\n0\r\n*2\r\n$1\r\n1\r\n$1\r\n2\r\n'
+    monkeypatch.setattr(server, 'set_max_intset_entries', 16)
+    client.call('SADD', 'big', *['m:%d' % i for i in range(200)])
+    seen, cursor = set(), b'0'
+    while True:
+        lines = client.call('SSCAN', 'big', cursor, 'MATCH', 'm:1*', 'COUNT', '5').split(b'\r\n')
+        cursor = lines[2]
+        seen.update(lines[5:-1:2])
+        if cursor == b'0':
+            break
+    assert seen == {b'm:%d' % i for i in range(200) if str(i).startswith('1')}
@@ -0,0 +1,38 @@
+import pytest
+
+from benchmarks.startup import runAll
+
+
+def test_parse_server_args(server):
+    from redis_server.redis import RedisServer, initServerConfig, parse_server_args
+    s = RedisServer.__new__(RedisServer)
+    s.__init__()
+    initServerConfig(s)
+    conf, options = parse_server_args(s, ['--port', '7000', '--bind', '127.0.0.1', '::1', '--metrics-port=9000'])
+    assert conf is None
+    assert options == {'port': '7000', 'bind': '127.0.0.1 ::1', 'metrics-port': '9000'}
+    assert s.port == 7000
+    assert s.bindaddr == ['127.0.0.1', '::1']
+    assert s.metrics_port == 9000
+    with pytest.raises(SystemExit):
+        parse_server_args(s, ['redis.conf', 'stray'])
+    with pytest.raises(SystemExit):
+        parse_server_args(s, ['--version'])
+
+
+def test_shared_integers_are_lazy(server):
+    from redis_server.config import ServerConfig
+    from redis_server.redis import sharedObjects
+    from redis_server.robject import REDIS_ENCODING_INT
+    shared = sharedObjects()
+    assert len(shared.integers) == ServerConfig.REDIS_SHARED_INTEGERS
+    assert len(shared.bulkhdr) == len(shared.mbulkhdr) == ServerConfig.REDIS_SHARED_BULKHDR_LEN
+    o = shared.integers[9999]
+    assert o is shared.integers[9999]
+    assert o.encoding == REDIS_ENCODING_INT and o.ptr == 9999
+
+
+def test_startup_benchmark():
+    results = runAll(1)
+    assert 0 < results['startup_ms.import.min'] <= results['startup_ms.import.median']
+    assert results['startup_ms.import.median'] < results['startup_ms.ready.median']
@@ -0,0 +1,202 @@
+import time
+
+from redis_server.rdict import dictSize
+
+
+def test_mset_mget(client):
+    assert client.call('MSET', 'a', '1', 'b', 'hello', 'c', 'x' * 100) == b'+OK\r\n'
+    assert client.call('MGET', 'a', 'missing', 'b', 'c') == (
+        b'*4\r\n$1\r\n1\r\n$-1\r\n$5\r\nhello\r\n$100\r\n' + b'x' * 100 + b'\r\n')
+    assert client.call('MSET', 'a', '2', 'a', '3') == b'+OK\r\n'
+    assert client.call('GET', 'a') == b'$1\r\n3\r\n'
+
+
+def test_mset_errors(client):
+    assert client.call('MSET', 'a', '1', 'b') == b'-ERR wrong number of arguments for MSET\r\n'
+    assert client.call('MSET', 'a').startswith(b"-ERR wrong number of arguments for 'mset'")
+    assert client.call('MGET', 'a') == b'*1\r\n$-1\r\n'
+
+
+def test_msetnx(client):
+    assert client.call('MSETNX', 'a', '1', 'b', '2') == b':1\r\n'
+    assert client.call('MSETNX', 'b', '3', 'c', '4') == b':0\r\n'
+    assert client.call('MGET', 'a', 'b', 'c') == b'*3\r\n$1\r\n1\r\n$1\r\n2\r\n$-1\r\n'
+
+
+def test_mset_clears_expire(client, server):
+    client.call('SET', 'a', '1', 'EX', '100')
+    assert dictSize(server.db[0].expires) == 1
+    client.call('MSET', 'a', '2')
+    assert dictSize(server.db[0].expires) == 0
+
+
+def test_mget_expired(client, server):
+    client.call('SET', 'a', '1', 'PX', '1')
+    client.call('SET', 'b', '2')
+    time.sleep(0.01)
+    assert client.call('MGET', 'a', 'b') == b'*2\r\n$-1\r\n$1\r\n2\r\n'
+    assert dictSize(server.db[0].expires) == 0
+    assert client.call('MSETNX', 'a', '3') == b':1\r\n'
+
+
+def test_mget_many_keys(client):
+    args = []
+    for i in range(300):
+        args += ['key:%d' % i, i]
+    client.call('MSET', *args)
+    reply = client.call('MGET', *['key:%d' % i for i in range(300)])
+    assert reply.startswith(b'*300\r\n$1\r\n0\r\n$1\r\n1\r\n')
+    assert reply.endswith(b'$3\r\n299\r\n')
+
+
+def test_incr_decr(client):
+    assert client.call('INCR', 'n') == b':1\r\n'
+    assert client.call('INCRBY', 'n', '41') == b':42\r\n'
+    assert client.call('DECR', 'n') == b':41\r\n'
+    assert client.call('DECRBY', 'n', '50') == b':-9\r\n'
+    assert client.call('GET', 'n') == b'$2\r\n-9\r\n'
+    client.call('SET', 'n', '  5')
+    assert client.call('INCR', 'n') == b'-ERR value is not an integer or out of range\r\n'
+    client.call('SET', 'n', '1_0')
+    assert client.call('INCR', 'n') == b'-ERR value is not an integer or out of range\r\n'
+    assert client.call('INCRBY', 'n', 'x') == b'-ERR value is not an integer or out of range\r\n'
+
+
+def test_incr_in_place(client, server):
+    from redis_server.rdict import dictFind
+    from redis_server.robject import REDIS_ENCODING_INT
+    from redis_server.sds import sdsnew
+    from redis_server.util import get_shared
+    client.call('SET', 'n', '100000')
+    o = dictFind(server.db[0].dict, sdsnew('n')).v.val
+    assert o.encoding == REDIS_ENCODING_INT
+    assert client.call('INCR', 'n') == b':100001\r\n'
+    # 不是共享对象, 直接修改原来的对象
+    assert dictFind(server.db[0].dict, sdsnew('n')).v.val is o
+    assert o.ptr == 100001
+    # 小整数使用共享对象, 不能原地修改
+    client.call('SET', 'n', '5')
+    client.call('INCR', 'n')
+    shared = get_shared()
+    assert dictFind(server.db[0].dict, sdsnew('n')).v.val is shared.integers[6]
+    assert shared.integers[5].ptr == 5
+
+
+def test_incr_keeps_expire(client, server):
+    client.call('SET', 'n', '1', 'EX', '100')
+    client.call('INCR', 'n')
+    assert dictSize(server.db[0].expires) == 1
+
+
+def test_incr_overflow(client):
+    client.call('SET', 'n', '9223372036854775807')
+    assert client.call('INCR', 'n') == b'-ERR increment or decrement would overflow\r\n'
+    client.call('SET', 'n', '-9223372036854775808')
+    assert client.call('DECR', 'n') == b'-ERR increment or decrement would overflow\r\n'
+    client.call('SET', 'n', '9223372036854775808')
+    assert client.call('INCR', 'n') == b'-ERR value is not an integer or out of range\r\n'
+    assert client.call('DECRBY', 'm', '-9223372036854775808') == b'-ERR decrement would overflow\r\n'
+
+
+def test_incr_wrongtype(client, server):
+    from redis_server.db import dbAdd
+    from redis_server.robject import createObject, createStringObject, REDIS_LIST
+    dbAdd(server.db[0], createStringObject(b'l', 1), createObject(REDIS_LIST, None))
+    assert client.call('INCR', 'l').startswith(b'-WRONGTYPE')
+    assert client.call('INCRBYFLOAT', 'l', '1').startswith(b'-WRONGTYPE')
+
+
+def test_incrbyfloat(client):
+    assert client.call('INCRBYFLOAT', 'f', '10.1') == b'$4\r\n10.1\r\n'
+    assert client.call('INCRBYFLOAT', 'f', '0.1') == b'$4\r\n10.2\r\n'
+    assert client.call('INCRBYFLOAT', 'f', '-0.2') == b'$2\r\n10\r\n'
+    assert client.call('INCRBYFLOAT', 'f', '5.0e3') == b'$4\r\n5010\r\n'
+    assert client.call('INCRBYFLOAT', 'g', '1e16') == b'$17\r\n10000000000000000\r\n'
+    assert client.call('INCRBYFLOAT', 'f', 'abc') == b'-ERR value is not a valid float\r\n'
+    assert client.call('INCRBYFLOAT', 'f', 'inf') == b'-ERR increment would produce NaN or Infinity\r\n'
+    client.call('SET', 'i', '3')
+    assert client.call('INCRBYFLOAT', 'i', '1.5') == b'$3\r\n4.5\r\n'
+    assert client.call('INCR', 'i') == b'-ERR value is not an integer or out of range\r\n'
+
+
+def test_incrbyfloat_propagates_as_set(client, monkeypatch):
+    import redis_server.redis
+    propagated = []
+    monkeypatch.setattr(redis_server.redis, 'propagate',
+                        lambda cmd, dbid, argv, flags: propagated.append([bytes(o.ptr.content) for o in argv]))
+    client.call('INCRBYFLOAT', 'f', '1.5')
+    assert propagated == [[b'SET', b'f', b'1.5']]
+
+
+def test_append(client, server):
+    from redis_server.rdict import dictFind
+    from redis_server.robject import REDIS_ENCODING_RAW
+    from redis_server.sds import sdsnew
+    assert client.call('APPEND', 'log', 'abc') == b':3\r\n'
+    assert client.call('APPEND', 'log', 'de') == b':5\r\n'
+    o = dictFind(server.db[0].dict, sdsnew('log')).v.val
+    assert o.encoding == REDIS_ENCODING_RAW
+    buf = o.ptr.buf
+    for i in range(100):
+        client.call('APPEND', 'log', 'x')
+    # 预分配的空间足够, 一直在同一个对象和 buf 上追加
+    assert dictFind(server.db[0].dict, sdsnew('log')).v.val is o
+    assert o.ptr.buf is buf
+    assert client.call('STRLEN', 'log') == b':105\r\n'
+    assert client.call('GET', 'log') == b'$105\r\nabcde' + b'x' * 100 + b'\r\n'
+
+
+def test_append_unshares_value(client):
+    from redis_server.util import get_shared
+    client.call('SET', 'n', '12')
+    assert client.call('APPEND', 'n', '3') == b':3\r\n'
+    assert client.call('GET', 'n') == b'$3\r\n123\r\n'
+    # 共享的整数对象没有被修改
+    assert get_shared().integers[12].ptr == 12
+
+
+def test_setrange(client, server):
+    assert client.call('SETRANGE', 'k', '0', '') == b':0\r\n'
+    assert dictSize(server.db[0].dict) == 0
+    assert client.call('SETRANGE', 'k', '3', 'abc') == b':6\r\n'
+    assert client.call('GET', 'k') == b'$6\r\n\x00\x00\x00abc\r\n'
+    assert client.call('SETRANGE', 'k', '1', 'XY') == b':6\r\n'
+    assert client.call('GET', 'k') == b'$6\r\n\x00XYabc\r\n'
+    assert client.call('SETRANGE', 'k', '1', '') == b':6\r\n'
+    client.call('SET', 'n', '1234')
+    assert client.call('SETRANGE', 'n', '1', '9') == b':4\r\n'
+    assert client.call('GET', 'n') == b'$4\r\n1934\r\n'
+    assert client.call('SETRANGE', 'k', '-1', 'x') == b'-ERR offset is out of range\r\n'
+    assert client.call('SETRANGE', 'k', '536870912', 'x') == (
+        b'-ERR string exceeds maximum allowed size (512MB)\r\n')
+
+
+def test_setrange_grows_with_zeros(client):
+    # 缩短之后 free 部分残留的内容不能出现在新的值中
+    client.call('SET', 'k', 'x' * 100)
+    client.call('APPEND', 'k', 'y')
+    client.call('SET', 'k', 'ab')
+    assert client.call('SETRANGE', 'k', '5', 'c') == b':6\r\n'
+    assert client.call('GET', 'k') == b'$6\r\nab\x00\x00\x00c\r\n'
+
+
+def test_getrange(client):
+    client.call('SET', 'k', 'Hello World')
+    assert client.call('GETRANGE', 'k', '0', '4') == b'$5\r\nHello\r\n'
+    assert client.call('GETRANGE', 'k', '-5', '-1') == b'$5\r\nWorld\r\n'
+    assert client.call('GETRANGE', 'k', '5', '100') == b'$6\r\n World\r\n'
+    assert client.call('GETRANGE', 'k', '5', '3') == b'$0\r\n\r\n'
+    assert client.call('GETRANGE', 'k', '-1', '-5') == b'$0\r\n\r\n'
+    assert client.call('SUBSTR', 'k', '0', '0') == b'$1\r\nH\r\n'
+    assert client.call('GETRANGE', 'missing', '0', '-1') == b'$0\r\n\r\n'
+    client.call('SET', 'n', '12345')
+    assert client.call('GETRANGE', 'n', '1', '2') == b'$2\r\n23\r\n'
+    # 回复之后值还可以继续原地追加
+    client.call('APPEND', 'k', '!')
+    assert client.call('GETRANGE', 'k', '-2', '-1') == b'$2\r\nd!\r\n'
+
+
+def test_strlen(client):
+    assert client.call('STRLEN', 'missing') == b':0\r\n'
+    client.call('SET', 'n', '-100')
+    assert client.call('STRLEN', 'n') == b':4\r\n'
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+import redis_server.zarray
+from redis_server.db import zsetDictType
+from redis_server.rdict import dictCreate, dictAdd, dictFind
+from redis_server.robject import createStringObject
+from redis_server.zarray import *
+from redis_server.zskiplist import zrangespec, zslParseLexRange
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """块很小时插入和删除会频繁地分裂和合并"""
+    monkeypatch.setattr(redis_server.zarray, 'ZARRAY_BLOCK_MAX', 8)
+    monkeypatch.setattr(redis_server.zarray, 'ZARRAY_BLOCK_MIN', 2)
+    monkeypatch.setattr(redis_server.zarray, 'ZARRAY_BLOCK_FILL', 4)
+
+
+def obj(s: bytes):
+    return createStringObject(s, len(s))
+
+
+def zarr2list(za: zarray) -> list:
+    res: list = []
+    for block in za.blocks:
+        assert 0 < len(block.members) <= redis_server.zarray.ZARRAY_BLOCK_MAX
+        assert len(block.scores) == len(block.members)
+        res.extend(zip(block.members, block.scores))
+    assert list(za.index) == [block.scores[-1] for block in za.blocks]
+    assert len(res) == za.length
+    return res
+
+
+def spec(min_: float, max_: float, minex: int = 0, maxex: int = 0) -> zrangespec:
+    r = zrangespec()
+    r.min, r.max, r.minex, r.maxex = min_, max_, minex, maxex
+    return r
+
+
+def test_random_operations_match_model(server, small_blocks):
+    rand = random.Random(3)
+    za = zarrCreate()
+    model = {}
+    for _ in range(2000):
+        ele = b'm%d' % rand.randrange(150)
+        score = float(rand.randrange(-10, 10))
+        op = rand.random()
+        if ele not in model and op < 0.55:
+            zarrInsert(za, score, ele)
+            model[ele] = score
+        elif ele in model and op < 0.75:
+            zarrUpdateScore(za, model[ele], ele, score)
+            model[ele] = score
+        elif ele in model:
+            assert zarrDelete(za, model[ele], ele) == 1
+            del model[ele]
+        else:
+            assert zarrDelete(za, score, ele) == 0
+    order = sorted((m, s) for m, s in model.items())
+    order.sort(key=lambda item: item[1])
+    assert zarr2list(za) == order
+    assert len(za.blocks) > 1
+    for rank, (m, s) in enumerate(order):
+        assert zarrGetRank(za, s, m) == rank
+        assert zarrGetElementByRank(za, rank) == (m, s)
+    assert zarrGetRank(za, 0.0, b'missing') is None
+    assert zarrRangeByRank(za, 5, 30) == order[5:31]
+    for lo, hi, minex, maxex in [(-3, 4, 0, 0), (-3, 4, 1, 1), (2, 2, 0, 0), (2, 2, 1, 0), (5, -5, 0, 0),
+                                 (float('-inf'), float('inf'), 0, 0), (100, 200, 0, 0)]:
+        first, last = zarrRankRangeByScore(za, spec(lo, hi, minex, maxex))
+        expected = [rank for rank, (m, s) in enumerate(order)
+                    if (s > lo if minex else s >= lo) and (s < hi if maxex else s <= hi)]
+        assert max(0, last - first + 1) == len(expected)
+        if expected:
+            assert (first, last) == (expected[0], expected[-1])
+
+
+def test_delete_range_by_rank(server, small_blocks):
+    za = zarrCreate()
+    d = dictCreate(zsetDictType, None)
+    items = [(b'm%03d' % i, float(i // 3)) for i in range(60)]
+    for ele, score in items:
+        zarrAppend(za, score, ele)
+        dictAdd(d, obj(ele), score)
+    assert [len(block.members) for block in za.blocks] == [4] * 15
+    assert zarrDeleteRangeByRank(za, 1, 42, d) == 42
+    assert zarr2list(za) == items[:1] + items[43:]
+    assert dictFind(d, obj(b'm001')) is None
+    assert dictFind(d, obj(b'm043')) is not None
+    # 范围两端剩下的部分都很小, 和相邻的块合并
+    assert [len(block.members) for block in za.blocks] == [6, 4, 4, 4]
+    assert zarrDeleteRangeByRank(za, 0, za.length - 1, d) == 18
+    assert za.blocks == [] and za.length == 0
+
+
+def test_lex_ranges(server, small_blocks):
+    za = zarrCreate()
+    for ch in b'abcdefghijklmnopqrst':
+        zarrInsert(za, 0.0, bytes([ch]))
+
+    def lexrange(min_, max_):
+        spec = zslParseLexRange(obj(min_), obj(max_))
+        first, last = zarrRankRangeByLex(za, spec)
+        return [m for m, s in zarrRangeByRank(za, first, last)]
+
+    assert lexrange(b'[c', b'(f') == [b'c', b'd', b'e']
+    assert lexrange(b'(c', b'[f') == [b'd', b'e', b'f']
+    assert lexrange(b'-', b'(c') == [b'a', b'b']
+    assert lexrange(b'[r', b'+') == [b'r', b's', b't']
+    assert lexrange(b'[zz', b'+') == []
+    assert lexrange(b'(c', b'(c') == []
+    assert lexrange(b'+', b'-') == []
@@ -0,0 +1,119 @@
+import random
+from typing import List
+
+from redis_server.csix import cstrptr, intptr
+from redis_server.ziplist import *
+
+
+def zl2list(zl: ziplist) -> List[bytes]:
+    sstr, slen, sval = cstrptr(bytearray()), intptr(), intptr()
+
+    def value(p) -> bytes:
+        assert ziplistGet(p, sstr, slen, sval)
+        if sstr.buf is None:
+            return b'%d' % sval.value
+        return bytes(sstr.buf[sstr.pos:sstr.pos+slen.value])
+
+    res = []
+    p = ziplistIndex(zl, 0)
+    while p is not None:
+        res.append(value(p))
+        p = ziplistNext(zl, p)
+    res2 = []
+    p = ziplistIndex(zl, -1)
+    while p is not None:
+        res2.append(value(p))
+        p = ziplistPrev(zl, p)
+    assert res == res2[::-1]
+    assert ziplistLen(zl) == len(res)
+    assert ziplistBlobLen(zl) == len(zl)
+    return res
+
+
+def list2zl(values: List[bytes]) -> ziplist:
+    zl = ziplistNew()
+    for v in values:
+        zl = ziplistPush(zl, v, len(v), ZIPLIST_TAIL)
+    return zl
+
+
+def test_ziplistPush():
+    zl = ziplistNew()
+    zl = ziplistPush(zl, b'foo', 3, ZIPLIST_TAIL)
+    zl = ziplistPush(zl, b'quux', 4, ZIPLIST_TAIL)
+    zl = ziplistPush(zl, b'hello', 5, ZIPLIST_HEAD)
+    zl = ziplistPush(zl, b'1024', 4, ZIPLIST_TAIL)
+    assert zl2list(zl) == [b'hello', b'foo', b'quux', b'1024']
+
+
+def test_integer_encodings():
+    values = [b'0', b'12', b'13', b'-1', b'127', b'-128', b'300', b'-40000', b'8388607', b'-8388608',
+              b'2147483647', b'-2147483648', b'1099511627776', b'9223372036854775807', b'-9223372036854775808']
+    zl = list2zl(values)
+    assert zl2list(zl) == values
+    # 不规范的整数表示按字符串保存
+    zl = list2zl([b'007', b'+1', b' 1', b'1_0', b'9223372036854775808'])
+    assert zl2list(zl) == [b'007', b'+1', b' 1', b'1_0', b'9223372036854775808']
+
+
+def test_ziplistFind():
+    zl = list2zl([b'k1', b'10', b'k2', b'hello', b'k3', b'1024'])
+    p = ziplistFind(ziplistIndex(zl, 0), b'1024', 4, 0)
+    assert p is not None and p == ziplistIndex(zl, 5)
+    assert ziplistCompare(p, b'1024', 4)
+    # skip=1 只比较 key
+    assert ziplistFind(ziplistIndex(zl, 0), b'k2', 2, 1) == ziplistIndex(zl, 2)
+    assert ziplistFind(ziplistIndex(zl, 0), b'hello', 5, 1) is None
+    assert ziplistFind(ziplistIndex(zl, 0), b'10', 2, 0) == ziplistIndex(zl, 1)
+
+
+def test_cascade_update():
+    # 长度在 253 字节附近的节点会让后继节点的 prevlen 在 1 和 5 字节之间变化
+    values = [b'x' * 250 for _ in range(10)]
+    zl = list2zl(values)
+    zl = ziplistPush(zl, b'y' * 300, 300, ZIPLIST_HEAD)
+    assert zl2list(zl) == [b'y' * 300] + values
+    zl = ziplistDelete(zl, ziplistIndex(zl, 0))
+    assert zl2list(zl) == values
+
+
+def test_random_operations():
+    rand = random.Random(1)
+
+    def randval() -> bytes:
+        k = rand.random()
+        if k < 0.3:
+            return b'%d' % rand.choice([0, 12, -1, 300, -40000, 8000000, 2**40, rand.randint(-10**6, 10**6)])
+        if k < 0.45:
+            return b'x' * rand.choice([250, 252, 253, 254, 300, 16384])
+        return bytes(rand.randrange(256) for _ in range(rand.randint(0, 70)))
+
+    for _ in range(50):
+        zl = ziplistNew()
+        model: List[bytes] = []
+        for _ in range(rand.randint(1, 40)):
+            k = rand.random()
+            if k < 0.3:
+                v = randval()
+                zl = ziplistPush(zl, v, len(v), ZIPLIST_TAIL)
+                model.append(v)
+            elif k < 0.5:
+                v = randval()
+                zl = ziplistPush(zl, v, len(v), ZIPLIST_HEAD)
+                model.insert(0, v)
+            elif k < 0.7 and model:
+                i = rand.randrange(len(model))
+                v = randval()
+                zl = ziplistInsert(zl, ziplistIndex(zl, i), v, len(v))
+                model.insert(i, v)
+            elif k < 0.85 and model:
+                i = rand.randrange(len(model))
+                p = ziplistIndex(zl, i)
+                zl = ziplistDelete(zl, p)
+                del model[i]
+            elif model:
+                i = rand.randrange(len(model))
+                n = rand.randint(1, 4)
+                zl = ziplistDeleteRange(zl, i, n)
+                del model[i:i+n]
+            assert zl2list(zl) == model
@@ -0,0 +1,459 @@
+import functools
+import math
+import operator
+import random
+import warnings
+
+import pytest
+
+import redis_server.commands.zset
+from redis_server.rdict import dictFind
+from redis_server.sds import sdsnew
+from redis_server.robject import (
+    REDIS_ENCODING_ZIPLIST, REDIS_ENCODING_SKIPLIST, REDIS_ENCODING_SORTEDARRAY, createStringObject,
+)
+
+
+@pytest.fixture(params=['ziplist', 'skiplist', 'sortedarray'])
+def encoding(request, server, monkeypatch):
+    """同样的命令分别在 ziplist, 跳跃表和有序数组编码上运行"""
+    if request.param == 'skiplist':
+        monkeypatch.setattr(server, 'zset_max_ziplist_entries', 0)
+        monkeypatch.setattr(server, 'zset_min_sortedarray_entries', 0)
+        return REDIS_ENCODING_SKIPLIST
+    if request.param == 'sortedarray':
+        monkeypatch.setattr(server, 'zset_max_ziplist_entries', 0)
+        monkeypatch.setattr(server, 'zset_min_sortedarray_entries', 1)
+        return REDIS_ENCODING_SORTEDARRAY
+    return REDIS_ENCODING_ZIPLIST
+
+
+@pytest.fixture
+def implementation(implementation, monkeypatch):
+    """numpy 的阈值调低以覆盖小的输入"""
+    if implementation == 'numpy':
+        monkeypatch.setattr(redis_server.commands.zset, 'ZSET_NUMPY_MIN_SIZE', 1)
+    return implementation
+
+
+def zsetObject(server, key):
+    return dictFind(server.db[0].dict, sdsnew(key)).v.val
+
+
+def multibulk(reply):
+    assert reply.startswith(b'*'), reply
+    return reply.split(b'\r\n')[2:-1:2]
+
+
+def test_zadd_zscore_zrem(client, server, encoding):
+    assert client.call('ZADD', 'z', '1', 'a', '2', 'b', '1.5', 'c', '2', 'a') == b':3\r\n'
+    assert zsetObject(server, 'z').encoding == encoding
+    assert client.call('ZCARD', 'z') == b':3\r\n'
+    assert client.call('ZSCORE', 'z', 'a') == b'$1\r\n2\r\n'
+    assert client.call('ZSCORE', 'z', 'c') == b'$3\r\n1.5\r\n'
+    assert client.call('ZSCORE', 'z', 'x') == b'$-1\r\n'
+    assert client.call('ZSCORE', 'missing', 'a') == b'$-1\r\n'
+    # 分值相同时按成员的字典序排列
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1', 'WITHSCORES')) == [b'c', b'1.5', b'a', b'2', b'b', b'2']
+    assert client.call('ZRANK', 'z', 'a') == b':1\r\n'
+    assert client.call('ZREVRANK', 'z', 'a') == b':1\r\n'
+    assert client.call('ZREVRANK', 'z', 'c') == b':2\r\n'
+    assert client.call('ZRANK', 'z', 'x') == b'$-1\r\n'
+    assert client.call('ZREM', 'z', 'a', 'x') == b':1\r\n'
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1')) == [b'c', b'b']
+    assert client.call('ZREM', 'z', 'b', 'c') == b':2\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('z')) is None
+    assert client.call('ZCARD', 'z') == b':0\r\n'
+    assert client.call('ZADD', 'z', 'x', 'a') == b'-ERR value is not a valid float\r\n'
+    assert client.call('ZADD', 'z', '1') == b"-ERR wrong number of arguments for 'zadd' command\r\n"
+    assert client.call('ZADD', 'z', '1', 'a', '2') == b'-ERR syntax error\r\n'
+
+
+def test_zadd_options(client, server, encoding):
+    client.call('ZADD', 'z', '10', 'a', '20', 'b')
+    assert client.call('ZADD', 'z', 'NX', '1', 'a', '30', 'c') == b':1\r\n'
+    assert client.call('ZADD', 'z', 'XX', '11', 'a', '40', 'd') == b':0\r\n'
+    assert client.call('ZSCORE', 'z', 'a') == b'$2\r\n11\r\n'
+    assert client.call('ZSCORE', 'z', 'd') == b'$-1\r\n'
+    # CH 同时计算更新的成员
+    assert client.call('ZADD', 'z', 'CH', '12', 'a', '20', 'b', '50', 'e') == b':2\r\n'
+    assert client.call('ZADD', 'z', 'GT', 'CH', '5', 'a', '25', 'b') == b':1\r\n'
+    assert client.call('ZADD', 'z', 'LT', 'CH', '50', 'b', '1', 'e') == b':1\r\n'
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1', 'WITHSCORES')) == [
+        b'e', b'1', b'a', b'12', b'b', b'25', b'c', b'30']
+    assert client.call('ZADD', 'z', 'INCR', '2.5', 'a') == b'$4\r\n14.5\r\n'
+    assert client.call('ZADD', 'z', 'NX', 'INCR', '1', 'a') == b'$-1\r\n'
+    assert client.call('ZADD', 'z', 'GT', 'INCR', '-1', 'a') == b'$-1\r\n'
+    assert client.call('ZADD', 'missing', 'XX', 'INCR', '1', 'a') == b'$-1\r\n'
+    assert client.call('ZADD', 'missing', 'XX', '1', 'a') == b':0\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('missing')) is None
+    assert client.call('ZINCRBY', 'z', '-4.5', 'a') == b'$2\r\n10\r\n'
+    assert client.call('ZINCRBY', 'z', '3', 'new') == b'$1\r\n3\r\n'
+
+    assert client.call('ZADD', 'z', 'NX', 'XX', '1', 'a') == \
+        b'-ERR XX and NX options at the same time are not compatible\r\n'
+    assert client.call('ZADD', 'z', 'GT', 'LT', '1', 'a') == \
+        b'-ERR GT, LT, and/or NX options at the same time are not compatible\r\n'
+    assert client.call('ZADD', 'z', 'INCR', '1', 'a', '2', 'b') == \
+        b'-ERR INCR option supports a single increment-element pair\r\n'
+    client.call('ZADD', 'inf', 'inf', 'a')
+    assert client.call('ZSCORE', 'inf', 'a') == b'$3\r\ninf\r\n'
+    assert client.call('ZINCRBY', 'inf', '-inf', 'a') == b'-ERR resulting score is not a number (NaN)\r\n'
+    assert client.call('ZADD', 'inf', 'nan', 'b') == b'-ERR value is not a valid float\r\n'
+    assert client.call('ZSCORE', 'inf', 'a') == b'$3\r\ninf\r\n'
+
+
+@pytest.mark.parametrize('trigger', ['entries', 'value'])
+def test_ziplist_converts_to_skiplist(client, server, monkeypatch, trigger):
+    monkeypatch.setattr(server, 'zset_max_ziplist_entries', 4)
+    monkeypatch.setattr(server, 'zset_max_ziplist_value', 8)
+    client.call('ZADD', 'z', '4', 'd', '1', 'a', '3', 'c', '2', 'b')
+    assert zsetObject(server, 'z').encoding == REDIS_ENCODING_ZIPLIST
+    if trigger == 'entries':
+        client.call('ZADD', 'z', '5', 'e')
+        expected = [b'a', b'b', b'c', b'd', b'e']
+    else:
+        client.call('ZADD', 'z', '0', 'x' * 9)
+        expected = [b'x' * 9, b'a', b'b', b'c', b'd']
+    assert zsetObject(server, 'z').encoding == REDIS_ENCODING_SKIPLIST
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1')) == expected
+    assert client.call('ZSCORE', 'z', 'c') == b'$1\r\n3\r\n'
+    # 一次添加很多成员时直接创建跳跃表
+    client.call('ZADD', 'big', *[x for i in range(5) for x in (i, 'm%d' % i)])
+    assert zsetObject(server, 'big').encoding == REDIS_ENCODING_SKIPLIST
+
+
+def test_skiplist_converts_to_sortedarray(client, server, monkeypatch):
+    monkeypatch.setattr(server, 'zset_max_ziplist_entries', 4)
+    monkeypatch.setattr(server, 'zset_min_sortedarray_entries', 8)
+    client.call('ZADD', 'z', *[x for i in range(7) for x in (i % 3, 'm%d' % i)])
+    assert zsetObject(server, 'z').encoding == REDIS_ENCODING_SKIPLIST
+    expected = multibulk(client.call('ZRANGE', 'z', '0', '-1', 'WITHSCORES'))
+    client.call('ZADD', 'z', '1.5', 'x')
+    assert zsetObject(server, 'z').encoding == REDIS_ENCODING_SORTEDARRAY
+    expected[10:10] = [b'x', b'1.5']
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1', 'WITHSCORES')) == expected
+    assert client.call('ZRANK', 'z', 'x') == b':5\r\n'
+    # 删除成员之后不会转换回跳跃表
+    client.call('ZREMRANGEBYRANK', 'z', '0', '5')
+    assert zsetObject(server, 'z').encoding == REDIS_ENCODING_SORTEDARRAY
+    assert client.call('ZCARD', 'z') == b':2\r\n'
+    # 一次添加的成员数达到阈值时直接创建有序数组
+    client.call('ZADD', 'big', *[x for i in range(8) for x in (i, 'm%d' % i)])
+    assert zsetObject(server, 'big').encoding == REDIS_ENCODING_SORTEDARRAY
+    monkeypatch.setattr(server, 'zset_min_sortedarray_entries', 0)
+    client.call('ZADD', 'off', *[x for i in range(20) for x in (i, 'm%d' % i)])
+    assert zsetObject(server, 'off').encoding == REDIS_ENCODING_SKIPLIST
+
+
+def test_zrange_by_rank_score_lex(client, encoding):
+    client.call('ZADD', 'z', *[x for i in range(10) for x in (i, 'm%d' % i)])
+    m = [b'm%d' % i for i in range(10)]
+    assert multibulk(client.call('ZRANGE', 'z', '2', '4')) == m[2:5]
+    assert multibulk(client.call('ZRANGE', 'z', '-3', '100')) == m[7:]
+    assert multibulk(client.call('ZRANGE', 'z', '0', '1', 'REV')) == [m[9], m[8]]
+    assert multibulk(client.call('ZREVRANGE', 'z', '0', '1', 'WITHSCORES')) == [m[9], b'9', m[8], b'8']
+    assert client.call('ZRANGE', 'z', '5', '2') == b'*0\r\n'
+    assert client.call('ZRANGE', 'z', '20', '30') == b'*0\r\n'
+    assert client.call('ZRANGE', 'missing', '0', '-1') == b'*0\r\n'
+
+    assert multibulk(client.call('ZRANGE', 'z', '(2', '5', 'BYSCORE')) == m[3:6]
+    assert multibulk(client.call('ZRANGEBYSCORE', 'z', '-inf', '+inf', 'LIMIT', '3', '2')) == m[3:5]
+    assert multibulk(client.call('ZRANGEBYSCORE', 'z', '7', '(9', 'WITHSCORES')) == [m[7], b'7', m[8], b'8']
+    assert multibulk(client.call('ZREVRANGEBYSCORE', 'z', '5', '2', 'LIMIT', '1', '2')) == [m[4], m[3]]
+    assert multibulk(client.call('ZRANGE', 'z', '(9', '0', 'BYSCORE', 'REV', 'LIMIT', '0', '-1')) == m[8::-1]
+    assert client.call('ZRANGEBYSCORE', 'z', '3', '5', 'LIMIT', '10', '1') == b'*0\r\n'
+    assert client.call('ZRANGEBYSCORE', 'z', '3', '5', 'LIMIT', '-1', '1') == b'*0\r\n'
+    assert client.call('ZRANGEBYSCORE', 'z', '(3', '(3') == b'*0\r\n'
+    assert client.call('ZCOUNT', 'z', '(2', '5') == b':3\r\n'
+    assert client.call('ZCOUNT', 'z', '-inf', '+inf') == b':10\r\n'
+    assert client.call('ZCOUNT', 'z', '3.5', '3.9') == b':0\r\n'
+    assert client.call('ZCOUNT', 'z', 'a', '1') == b'-ERR min or max is not a float\r\n'
+
+    client.call('ZADD', 'lex', *[x for ch in 'abcdefg' for x in ('0', ch)])
+    assert multibulk(client.call('ZRANGEBYLEX', 'lex', '-', '[c')) == [b'a', b'b', b'c']
+    assert multibulk(client.call('ZRANGEBYLEX', 'lex', '(b', '(f', 'LIMIT', '1', '2')) == [b'd', b'e']
+    assert multibulk(client.call('ZREVRANGEBYLEX', 'lex', '+', '[e')) == [b'g', b'f', b'e']
+    assert multibulk(client.call('ZRANGE', 'lex', '[f', '-', 'BYLEX', 'REV', 'LIMIT', '1', '10')) == [
+        b'e', b'd', b'c', b'b', b'a']
+    assert client.call('ZLEXCOUNT', 'lex', '[b', '(e') == b':3\r\n'
+    assert client.call('ZLEXCOUNT', 'lex', '-', '+') == b':7\r\n'
+    assert client.call('ZLEXCOUNT', 'lex', '+', '-') == b':0\r\n'
+    assert client.call('ZRANGEBYLEX', 'lex', 'a', '+') == b'-ERR min or max not valid string range item\r\n'
+
+    assert client.call('ZRANGE', 'z', '0', '1', 'LIMIT', '0', '1') == \
+        b'-ERR syntax error, LIMIT is only supported in combination with either BYSCORE or BYLEX\r\n'
+    assert client.call('ZRANGE', 'lex', '-', '+', 'BYLEX', 'WITHSCORES') == \
+        b'-ERR syntax error, WITHSCORES not supported in combination with BYLEX\r\n'
+    assert client.call('ZREVRANGE', 'z', '0', '1', 'REV') == b'-ERR syntax error\r\n'
+    assert client.call('ZRANGEBYSCORE', 'z', '0', '1', 'BYLEX') == b'-ERR syntax error\r\n'
+
+
+def test_zremrange(client, server, encoding):
+    def fill():
+        client.call('ZADD', 'z', *[x for i in range(10) for x in (i, 'm%d' % i)])
+    fill()
+    assert client.call('ZREMRANGEBYRANK', 'z', '0', '2') == b':3\r\n'
+    assert client.call('ZREMRANGEBYRANK', 'z', '-2', '-1') == b':2\r\n'
+    assert client.call('ZREMRANGEBYRANK', 'z', '10', '20') == b':0\r\n'
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1')) == [b'm%d' % i for i in range(3, 8)]
+    assert client.call('ZREMRANGEBYSCORE', 'z', '(4', '6') == b':2\r\n'
+    assert client.call('ZREMRANGEBYSCORE', 'z', '100', '200') == b':0\r\n'
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1')) == [b'm3', b'm4', b'm7']
+    assert client.call('ZREMRANGEBYSCORE', 'z', '-inf', '+inf') == b':3\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('z')) is None
+
+    client.call('ZADD', 'lex', *[x for ch in 'abcdefg' for x in ('0', ch)])
+    assert client.call('ZREMRANGEBYLEX', 'lex', '(a', '[c') == b':2\r\n'
+    assert client.call('ZREMRANGEBYLEX', 'lex', '[f', '+') == b':2\r\n'
+    assert multibulk(client.call('ZRANGE', 'lex', '0', '-1')) == [b'a', b'd', b'e']
+    assert client.call('ZREMRANGEBYLEX', 'lex', 'x', '+') == b'-ERR min or max not valid string range item\r\n'
+    assert client.call('ZREMRANGEBYSCORE', 'lex', '1', 'x') == b'-ERR min or max is not a float\r\n'
+    assert client.call('ZREMRANGEBYRANK', 'missing', '0', '-1') == b':0\r\n'
+
+
+def test_zpopmin_zpopmax(client, server, encoding):
+    client.call('ZADD', 'z', '1', 'a', '2', 'b', '3', 'c', '4', 'd')
+    assert client.call('ZPOPMIN', 'z') == b'*2\r\n$1\r\na\r\n$1\r\n1\r\n'
+    assert multibulk(client.call('ZPOPMAX', 'z', '2')) == [b'd', b'4', b'c', b'3']
+    assert client.call('ZPOPMIN', 'z', '0') == b'*0\r\n'
+    assert client.call('ZPOPMIN', 'z', 'x') == b'-ERR value is not an integer or out of range\r\n'
+    assert multibulk(client.call('ZPOPMAX', 'z', '10')) == [b'b', b'2']
+    assert dictFind(server.db[0].dict, sdsnew('z')) is None
+    assert client.call('ZPOPMIN', 'z') == b'*0\r\n'
+
+
+def test_random_operations_match_model(client, server, encoding):
+    rand = random.Random(7)
+    model = {}
+    for _ in range(400):
+        op = rand.random()
+        member = 'm%d' % rand.randint(0, 60)
+        if op < 0.5:
+            score = rand.randint(-20, 20) / 2
+            client.call('ZADD', 'z', score, member)
+            model[member.encode()] = score
+        elif op < 0.7:
+            incr = rand.randint(-5, 5)
+            client.call('ZINCRBY', 'z', incr, member)
+            model[member.encode()] = model.get(member.encode(), 0) + incr
+        else:
+            client.call('ZREM', 'z', member)
+            model.pop(member.encode(), None)
+    assert zsetObject(server, 'z').encoding == encoding
+    order = [m for m, s in sorted(model.items(), key=lambda kv: (kv[1], kv[0]))]
+    assert multibulk(client.call('ZRANGE', 'z', '0', '-1')) == order
+    for rank, m in enumerate(order):
+        assert client.call('ZRANK', 'z', m) == b':%d\r\n' % rank
+    for _ in range(20):
+        lo, hi = sorted(rand.randint(-15, 15) for _ in range(2))
+        inrange = [m for m in order if lo < model[m] <= hi]
+        assert client.call('ZCOUNT', 'z', '(%d' % lo, hi) == b':%d\r\n' % len(inrange)
+        offset, count = rand.randint(0, 5), rand.randint(1, 5)
+        reply = client.call('ZRANGEBYSCORE', 'z', '(%d' % lo, hi, 'LIMIT', offset, count)
+        assert multibulk(reply) == inrange[offset:offset + count]
+        reply = client.call('ZREVRANGEBYSCORE', 'z', hi, '(%d' % lo, 'LIMIT', offset, count)
+        assert multibulk(reply) == inrange[::-1][offset:offset + count]
+
+
+@pytest.mark.parametrize('sortedarray', [0, 1])
+def test_zscan_and_wrong_type(client, server, monkeypatch, sortedarray):
+    client.call('SET', 'str', 'v')
+    err = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    for args in (['ZADD', 'str', '1', 'a'], ['ZREM', 'str', 'a'], ['ZSCORE', 'str', 'a'], ['ZCARD', 'str'],
+                 ['ZRANGE', 'str', '0', '-1'], ['ZRANK', 'str', 'a'], ['ZCOUNT', 'str', '0', '1'],
+                 ['ZPOPMIN', 'str'], ['ZREMRANGEBYRANK', 'str', '0', '1'], ['ZSCAN', 'str', '0']):
+        assert client.call(*args) == err, args
+    client.call('ZADD', 'small', '1', 'a', '2.5', 'b')
+    assert client.call('GET', 'small') == err
+    assert client.call('ZSCAN', 'small', '0') == \
+        b'*2\r\n$1\r\n0\r\n*4\r\n$1\r\na\r\n$1\r\n1\r\n$1\r\nb\r\n$3\r\n2.5\r\n'
+
+    monkeypatch.setattr(server, 'zset_max_ziplist_entries', 16)
+    monkeypatch.setattr(server, 'zset_min_sortedarray_entries', 100 if sortedarray else 0)
+    for start in range(0, 200, 50):
+        client.call('ZADD', 'big', *[x for i in range(start, start + 50) for x in (i / 2, 'm:%d' % i)])
+    assert zsetObject(server, 'big').encoding == \
+        (REDIS_ENCODING_SORTEDARRAY if sortedarray else REDIS_ENCODING_SKIPLIST)
+    seen, cursor = {}, b'0'
+    while True:
+        lines = client.call('ZSCAN', 'big', cursor, 'MATCH', 'm:1*', 'COUNT', '5').split(b'\r\n')
+        cursor = lines[2]
+        items = lines[5:-1:2]
+        for j in range(0, len(items), 2):
+            seen[items[j]] = float(items[j+1])
+        if cursor == b'0':
+            break
+    assert seen == {b'm:%d' % i: i / 2 for i in range(200) if str(i).startswith('1')}
+
+
+def test_zunionstore_weights_aggregate(client, server, encoding, implementation):
+    client.call('ZADD', 'z1', '1', 'a', '2', 'b', '3', 'c')
+    client.call('ZADD', 'z2', '4', 'b', '5', 'c', '6', 'd')
+    client.call('SADD', 's', 'a', 'd')
+    assert client.call('ZUNIONSTORE', 'dst', '2', 'z1', 'z2') == b':4\r\n'
+    assert zsetObject(server, 'dst').encoding == encoding
+    assert multibulk(client.call('ZRANGE', 'dst', '0', '-1', 'WITHSCORES')) == [
+        b'a', b'1', b'b', b'6', b'd', b'6', b'c', b'8']
+    assert client.call('ZRANK', 'dst', 'c') == b':3\r\n'
+    client.call('ZUNIONSTORE', 'dst', '2', 'z1', 'z2', 'WEIGHTS', '2', '3')
+    assert multibulk(client.call('ZRANGE', 'dst', '0', '-1', 'WITHSCORES')) == [
+        b'a', b'2', b'b', b'16', b'd', b'18', b'c', b'21']
+    client.call('ZUNIONSTORE', 'dst', '2', 'z1', 'z2', 'AGGREGATE', 'MIN')
+    assert multibulk(client.call('ZRANGE', 'dst', '0', '-1', 'WITHSCORES')) == [
+        b'a', b'1', b'b', b'2', b'c', b'3', b'd', b'6']
+    client.call('ZUNIONSTORE', 'dst', '2', 'z1', 'z2', 'weights', '1', '-1', 'aggregate', 'max')
+    assert multibulk(client.call('ZRANGE', 'dst', '0', '-1', 'WITHSCORES')) == [
+        b'd', b'-6', b'a', b'1', b'b', b'2', b'c', b'3']
+    # 集合的成员分值是 1, 不存在的键当作空集
+    assert multibulk(client.call('ZUNION', '4', 'z1', 'z2', 's', 'missing', 'WITHSCORES')) == [
+        b'a', b'2', b'b', b'6', b'd', b'7', b'c', b'8']
+    assert multibulk(client.call('ZUNION', '1', 's')) == [b'a', b'd']
+
+    # inf + -inf 和 0 * inf 按 0 处理
+    client.call('ZADD', 'pinf', 'inf', 'x', '1', 'y')
+    client.call('ZADD', 'ninf', '-inf', 'x')
+    assert multibulk(client.call('ZUNION', '2', 'pinf', 'ninf', 'WITHSCORES')) == [b'x', b'0', b'y', b'1']
+    assert multibulk(client.call('ZUNION', '1', 'pinf', 'WEIGHTS', '0', 'WITHSCORES')) == [b'x', b'0', b'y', b'0']
+    assert multibulk(client.call('ZUNION', '2', 'pinf', 'ninf', 'AGGREGATE', 'MAX', 'WITHSCORES')) == [
+        b'y', b'1', b'x', b'inf']
+    # 权重乘法溢出得到无穷大, 不输出 numpy 的警告
+    client.call('ZADD', 'huge', '1e308', 'x')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert multibulk(client.call('ZUNION', '1', 'huge', 'WEIGHTS', '1e10', 'WITHSCORES')) == [b'x', b'inf']
+
+    # 和 Redis 一样按输入的大小从小到大累加: 1e308 + -1e308 + 1e308, 而不是按参数顺序先溢出成 inf
+    client.call('ZADD', 'three', '1e308', 'x', '1', 'y', '2', 'z')
+    client.call('ZADD', 'one', '1e308', 'x')
+    client.call('ZADD', 'two', '-1e308', 'x', '1', 'y')
+    assert client.call('ZUNIONSTORE', 'dst', '3', 'three', 'one', 'two') == b':3\r\n'
+    assert client.call('ZSCORE', 'dst', 'x') == client.call('ZSCORE', 'one', 'x')
+
+    # -0 和 0: SUM 只有全部是 -0 时结果是 -0, MIN / MAX 分值相同时保留先出现的
+    client.call('ZADD', 'zero', '0', 'x')
+    for weights, aggregate, score in ((('-1',), 'SUM', b'-0'), (('-1', '-1'), 'SUM', b'-0'), (('-1', '1'), 'SUM', b'0'),
+                                      (('-1', '1'), 'MIN', b'-0'), (('1', '-1'), 'MIN', b'0'),
+                                      (('-1', '1'), 'MAX', b'-0'), (('1', '-1'), 'MAX', b'0')):
+        keys = ['zero'] * len(weights)
+        assert multibulk(client.call('ZUNION', len(keys), *keys, 'WEIGHTS', *weights, 'AGGREGATE', aggregate,
+                                     'WITHSCORES')) == [b'x', score], (weights, aggregate)
+        assert client.call('ZUNIONSTORE', 'dst', len(keys), *keys, 'WEIGHTS', *weights, 'AGGREGATE', aggregate) \
+            == b':1\r\n'
+        assert client.call('ZSCORE', 'dst', 'x') == b'$%d\r\n%s\r\n' % (len(score), score)
+
+    # 结果为空时删除目标键
+    assert client.call('ZUNIONSTORE', 'dst', '1', 'missing') == b':0\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('dst')) is None
+
+
+def test_zunion_matches_model(client, server, encoding, implementation):
+    rand = random.Random(5)
+    keys, model = [], []
+    for k in range(4):
+        members = {'m%d' % rand.randrange(60): float(rand.randrange(-5, 5)) for _ in range(40)}
+        client.call('ZADD', 'k%d' % k, *[x for m, score in members.items() for x in (score, m)])
+        keys.append('k%d' % k)
+        model.append(members)
+    weights = [2, -1, 3, 1]
+    # 并集和交集都按输入的大小依次聚合, 分值相同时 MIN / MAX 保留先出现的 -0 或 0
+    order = sorted(range(4), key=lambda k: len(model[k]))
+
+    def formatted(items):
+        # 0 * -1 得到 -0, 和 Redis 一样回复 -0
+        return [x for score, m in items
+                for x in (m, b'-0' if score == 0 and math.copysign(1, score) < 0 else b'%d' % score)]
+
+    for aggregate, func in (('SUM', lambda v: functools.reduce(operator.add, v)), ('MIN', min), ('MAX', max)):
+        scores = {}
+        for k in order:
+            for m, score in model[k].items():
+                scores.setdefault(m, []).append(score * weights[k])
+        expected = sorted((func(v), m.encode()) for m, v in scores.items())
+        reply = multibulk(client.call('ZUNION', '4', *keys, 'WEIGHTS', *weights, 'AGGREGATE', aggregate,
+                                      'WITHSCORES'))
+        assert reply == formatted(expected)
+        inter = sorted((func([model[k][m] * weights[k] for k in order]), m.encode())
+                       for m in scores if all(m in model[k] for k in range(4)))
+        assert inter
+        reply = multibulk(client.call('ZINTER', '4', *keys, 'WEIGHTS', *weights, 'AGGREGATE', aggregate,
+                                      'WITHSCORES'))
+        assert reply == formatted(inter)
+
+
+def test_zinterstore_zintercard(client, server, encoding, monkeypatch):
+    client.call('ZADD', 'z1', '1', 'a', '2', 'b', '3', 'c', '4', 'e')
+    client.call('ZADD', 'z2', '4', 'b', '5', 'c', '6', 'd')
+    client.call('SADD', 's', 'b', 'd')
+    assert multibulk(client.call('ZINTER', '2', 'z1', 'z2', 'WITHSCORES')) == [b'b', b'6', b'c', b'8']
+    assert client.call('ZINTERSTORE', 'dst', '2', 'z2', 's', 'WEIGHTS', '1', '10', 'AGGREGATE', 'MAX') == b':2\r\n'
+    assert multibulk(client.call('ZRANGE', 'dst', '0', '-1', 'WITHSCORES')) == [b'b', b'10', b'd', b'10']
+    assert multibulk(client.call('ZINTER', '3', 'z1', 'z2', 's', 'AGGREGATE', 'MIN', 'WITHSCORES')) == [b'b', b'1']
+
+    # 从最小的输入开始遍历, 权重仍然对应各自的键
+    sources = []
+    items = redis_server.commands.zset.zsetSourceItems
+    monkeypatch.setattr(redis_server.commands.zset, 'zsetSourceItems',
+                        lambda o: sources.append(o) or items(o))
+    assert multibulk(client.call('ZINTER', '2', 'z1', 's', 'WEIGHTS', '100', '1', 'WITHSCORES')) == [b'b', b'201']
+    assert sources[0] is dictFind(server.db[0].dict, sdsnew('s')).v.val
+
+    assert client.call('ZINTERCARD', '2', 'z1', 'z2') == b':2\r\n'
+    assert client.call('ZINTERCARD', '2', 'z1', 'z2', 'LIMIT', '1') == b':1\r\n'
+    assert client.call('ZINTERCARD', '2', 'z1', 'z2', 'LIMIT', '0') == b':2\r\n'
+    assert client.call('ZINTERCARD', '2', 'z1', 'missing') == b':0\r\n'
+    assert client.call('ZINTERCARD', '2', 'z1', 'z2', 'LIMIT', '-1') == b"-ERR LIMIT can't be negative\r\n"
+    assert client.call('ZINTERCARD', '2', 'z1', 'z2', 'WEIGHTS', '1', '1') == b'-ERR syntax error\r\n'
+    assert client.call('ZINTERCARD', '2', 'z1', 'z2', 'WITHSCORES') == b'-ERR syntax error\r\n'
+
+    # 有一个键不存在时交集为空, 目标键被删除
+    assert client.call('ZINTERSTORE', 'dst', '2', 'z1', 'missing') == b':0\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('dst')) is None
+    assert client.call('ZINTER', '2', 'z1', 'missing') == b'*0\r\n'
+
+
+def test_zdiff(client, server, encoding):
+    client.call('ZADD', 'z1', '1', 'a', '2', 'b', '3', 'c')
+    client.call('ZADD', 'z2', '4', 'b', '6', 'd')
+    client.call('SADD', 's', 'c', 'a', 'x')
+    assert multibulk(client.call('ZDIFF', '2', 'z1', 'z2', 'WITHSCORES')) == [b'a', b'1', b'c', b'3']
+    assert multibulk(client.call('ZDIFF', '3', 'z1', 'z2', 's')) == []
+    assert multibulk(client.call('ZDIFF', '2', 's', 'z1', 'WITHSCORES')) == [b'x', b'1']
+    assert multibulk(client.call('ZDIFF', '1', 'z1')) == [b'a', b'b', b'c']
+    assert client.call('ZDIFFSTORE', 'dst', '2', 'z1', 'missing') == b':3\r\n'
+    assert multibulk(client.call('ZRANGE', 'dst', '0', '-1', 'WITHSCORES')) == [
+        b'a', b'1', b'b', b'2', b'c', b'3']
+    assert client.call('ZDIFFSTORE', 'dst', '2', 'missing', 'z1') == b':0\r\n'
+    assert dictFind(server.db[0].dict, sdsnew('dst')) is None
+    assert client.call('ZDIFF', '2', 'z1', 'z2', 'WEIGHTS', '1', '1') == b'-ERR syntax error\r\n'
+    assert client.call('ZDIFF', '2', 'z1', 'z2', 'AGGREGATE', 'SUM') == b'-ERR syntax error\r\n'
+
+
+def test_zunioninter_errors(client, server):
+    client.call('ZADD', 'z', '1', 'a')
+    client.call('SET', 'str', 'v')
+    assert client.call('ZUNIONSTORE', 'dst', '0', 'z') == \
+        b"-ERR at least 1 input key is needed for 'zunionstore' command\r\n"
+    assert client.call('ZINTER', '0', 'z') == b"-ERR at least 1 input key is needed for 'zinter' command\r\n"
+    assert client.call('ZUNION', 'x', 'z') == b'-ERR value is not an integer or out of range\r\n'
+    assert client.call('ZUNION', '3', 'z', 'z') == b'-ERR syntax error\r\n'
+    assert client.call('ZUNION', '2', 'z', 'str') == \
+        b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+    assert client.call('ZUNION', '1', 'z', 'WEIGHTS', 'x') == b'-ERR weight value is not a float\r\n'
+    assert client.call('ZUNION', '2', 'z', 'z', 'WEIGHTS', '1') == b'-ERR syntax error\r\n'
+    assert client.call('ZUNION', '1', 'z', 'AGGREGATE', 'AVG') == b'-ERR syntax error\r\n'
+    assert client.call('ZUNIONSTORE', 'dst', '1', 'z', 'WITHSCORES') == b'-ERR syntax error\r\n'
+    assert client.call('ZUNION', '1', 'z', 'LIMIT', '1') == b'-ERR syntax error\r\n'
+    assert client.call('ZUNIONSTORE', 'dst', '1') == b"-ERR wrong number of arguments for 'zunionstore' command\r\n"
+    # 出错时不修改目标键
+    assert dictFind(server.db[0].dict, sdsnew('dst')) is None
+
+
+def test_zunioninter_getkeys():
+    from redis_server.commands.zset import zunionInterDiffGetKeys, zunionInterDiffStoreGetKeys
+    argv = [createStringObject(s, len(s)) for s in (b'zunionstore', b'dst', b'2', b'a', b'b', b'WEIGHTS', b'1', b'2')]
+    assert zunionInterDiffStoreGetKeys(None, argv, len(argv)) == [3, 4, 1]
+    argv = [createStringObject(s, len(s)) for s in (b'zinter', b'3', b'a', b'b', b'c', b'WITHSCORES')]
+    assert zunionInterDiffGetKeys(None, argv, len(argv)) == [2, 3, 4]
+    argv = [createStringObject(s, len(s)) for s in (b'zinter', b'4', b'a', b'b')]
+    assert zunionInterDiffGetKeys(None, argv, len(argv)) == []
@@ -0,0 +1,113 @@
+import random
+
+from redis_server.robject import createStringObject
+from redis_server.zskiplist import *
+
+
+def obj(s: bytes):
+    return createStringObject(s, len(s))
+
+
+def zsl2list(zsl: zskiplist) -> list:
+    res = []
+    x = zsl.header.level[0].forward
+    while x:
+        res.append((bytes(x.obj.ptr.content), x.score))
+        x = x.level[0].forward
+    assert len(res) == zsl.length
+    return res
+
+
+def spec(min_: float, max_: float, minex: int = 0, maxex: int = 0) -> zrangespec:
+    r = zrangespec()
+    r.min, r.max, r.minex, r.maxex = min_, max_, minex, maxex
+    return r
+
+
+def test_zslInsert_and_rank(server):
+    zsl = zslCreate()
+    for m, s in [(b'c', 2.0), (b'a', 1.0), (b'b', 2.0), (b'd', 3.0)]:
+        zslInsert(zsl, s, obj(m))
+    assert zsl2list(zsl) == [(b'a', 1.0), (b'b', 2.0), (b'c', 2.0), (b'd', 3.0)]
+    assert [zslGetRank(zsl, s, obj(m)) for m, s in zsl2list(zsl)] == [1, 2, 3, 4]
+    assert zslGetRank(zsl, 2.0, obj(b'x')) == 0
+    assert zslGetElementByRank(zsl, 3).obj.ptr.content == b'c'   # type: ignore
+    assert zslDelete(zsl, 2.0, obj(b'b')) == 1
+    assert zslDelete(zsl, 2.0, obj(b'b')) == 0
+    assert zslGetRank(zsl, 3.0, obj(b'd')) == 3
+
+
+def test_zsl_ranges(server):
+    zsl = zslCreate()
+    for i in range(1, 6):
+        zslInsert(zsl, float(i), obj(b'm%d' % i))
+    assert zslFirstInRange(zsl, spec(2, 4)).score == 2   # type: ignore
+    assert zslFirstInRange(zsl, spec(2, 4, minex=1)).score == 3   # type: ignore
+    assert zslLastInRange(zsl, spec(2, 4)).score == 4   # type: ignore
+    assert zslLastInRange(zsl, spec(2, 4, maxex=1)).score == 3   # type: ignore
+    assert zslFirstInRange(zsl, spec(3, 3, minex=1)) is None
+    assert zslFirstInRange(zsl, spec(6, 10)) is None
+    assert zslFirstInRange(zsl, spec(3.5, 3.9)) is None
+
+
+def test_random_operations(server):
+    rand = random.Random(3)
+    zsl = zslCreate()
+    model = {}
+    for _ in range(300):
+        m = b'm%d' % rand.randint(0, 40)
+        if m in model:
+            assert zslDelete(zsl, model.pop(m), obj(m)) == 1
+        else:
+            model[m] = float(rand.randint(0, 10))
+            zslInsert(zsl, model[m], obj(m))
+        order = sorted(model.items(), key=lambda kv: (kv[1], kv[0]))
+        assert zsl2list(zsl) == order
+        for rank, (m2, s2) in enumerate(order, 1):
+            assert zslGetRank(zsl, s2, obj(m2)) == rank
+
+
+def test_zslUpdateScore(server):
+    zsl = zslCreate()
+    for i in range(1, 6):
+        zslInsert(zsl, float(i), obj(b'm%d' % i))
+    node = zslGetElementByRank(zsl, 3)
+    # 新的分值不改变顺序时原地修改节点
+    assert zslUpdateScore(zsl, 3.0, obj(b'm3'), 3.5) is node
+    assert zsl2list(zsl)[2] == (b'm3', 3.5)
+    moved = zslUpdateScore(zsl, 3.5, obj(b'm3'), 10.0)
+    assert moved is not node and moved is zsl.tail
+    assert [m for m, _ in zsl2list(zsl)] == [b'm1', b'm2', b'm4', b'm5', b'm3']
+    assert zslGetRank(zsl, 10.0, obj(b'm3')) == 5
+
+
+def test_zsl_lex_ranges(server):
+    from redis_server.util import get_shared
+    zsl = zslCreate()
+    for m in (b'a', b'b', b'c', b'd'):
+        zslInsert(zsl, 0.0, obj(m))
+    spec = zslParseLexRange(obj(b'(a'), obj(b'[c'))
+    assert spec is not None
+    assert zslFirstInLexRange(zsl, spec).obj.ptr.content == b'b'   # type: ignore
+    assert zslLastInLexRange(zsl, spec).obj.ptr.content == b'c'   # type: ignore
+    spec = zslParseLexRange(obj(b'-'), obj(b'+'))
+    assert spec is not None and spec.min is get_shared().minstring
+    assert zslFirstInLexRange(zsl, spec).obj.ptr.content == b'a'   # type: ignore
+    assert zslParseLexRange(obj(b'a'), obj(b'+')) is None
+    assert zslFirstInLexRange(zsl, zslParseLexRange(obj(b'(d'), obj(b'+'))) is None   # type: ignore
+
+
+def test_zslCreateFromSorted(server):
+    items = [(float(i // 3), obj(b'm%03d' % i)) for i in range(300)]
+    zsl = zslCreateFromSorted(items)
+    assert zsl2list(zsl) == [(bytes(o.ptr.content), s) for s, o in items]
+    assert zsl.tail.obj is items[-1][1] and zsl.tail.backward.obj is items[-2][1]   # type: ignore
+    for rank, (s, o) in enumerate(items, 1):
+        assert zslGetRank(zsl, s, o) == rank
+        assert zslGetElementByRank(zsl, rank).obj is o   # type: ignore
+    # 之后的插入和删除维护的跨度仍然正确
+    zslInsert(zsl, 50.5, obj(b'new'))
+    assert zslDelete(zsl, 0.0, obj(b'm001')) == 1
+    assert zslGetRank(zsl, 50.5, obj(b'new')) == 153
+    assert zslGetRank(zsl, 99.0, obj(b'm299')) == 300
+    assert zslCreateFromSorted([]).length == 0